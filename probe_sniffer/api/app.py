@@ -1,17 +1,44 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
 import asyncio
+import json
 import logging
 
-from probe_sniffer import config
+from probe_sniffer import config, heavy_hitters, ipc
+from probe_sniffer.api import live
+from probe_sniffer.api.cache import cache
+from probe_sniffer.api.ipc_server import server as ipc_server
 from probe_sniffer.api.discord_bot import bot
-from probe_sniffer.api.routes import devices, sightings, identities, fingerprints
-from probe_sniffer.api.schemas import NotifyRequest
+from probe_sniffer.api.routes import (
+    devices,
+    sightings,
+    identities,
+    fingerprints,
+    visits,
+    stats,
+    ssids,
+)
+from probe_sniffer.api.schemas import LiveFilter, NotifyRequest
+from probe_sniffer.storage.aio import StorageBusy
 
 logger = logging.getLogger("API")
 
 
+async def handle_notify_frame(payload: bytes):
+    message = NotifyRequest.model_validate_json(payload)
+    await bot.send_notification(message.fingerprint, message.probe_data, message.notification_type)
+
+
+def handle_config_frame(payload: bytes):
+    message = json.loads(payload)
+    if message.get("kind") == "trusted":
+        live.hub.set_trusted(message["mac"], message["is_trusted"])
+    else:
+        logger.debug(f"Ignoring config change: {message}")
+
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Start Discord bot as background task
@@ -20,7 +47,19 @@ async def lifespan(app: FastAPI):
         asyncio.create_task(bot.start(config.DISCORD_BOT_TOKEN))
     else:
         logger.warning("DISCORD_BOT_TOKEN not set, bot will not start")
+
+    # Notifications, live probes and config changes from the sniffer
+    live.hub.load_trusted()
+    ipc_server.on(ipc.NOTIFY, handle_notify_frame)
+    ipc_server.on(ipc.PROBES, live.hub.publish_lines)
+    ipc_server.on(ipc.CONFIG, handle_config_frame)
+    ipc_server.on(ipc.TOP, heavy_hitters.tracker.receive_snapshot)
+    try:
+        await ipc_server.start()
+    except OSError as e:
+        logger.error(f"IPC socket unavailable, sniffer messages will not arrive: {e}")
     yield
+    await ipc_server.close()
     logger.info("Shutting down Discord bot...")
     await bot.close()
 
@@ -41,10 +80,22 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+
+@app.exception_handler(StorageBusy)
+async def storage_busy(request: Request, exc: StorageBusy):
+    logger.warning(f"{request.method} {request.url.path}: {exc}")
+    return JSONResponse(
+        status_code=503, content={"detail": "Database busy"}, headers={"Retry-After": "1"}
+    )
+
+
 app.include_router(devices.router)
 app.include_router(sightings.router)
 app.include_router(identities.router)
 app.include_router(fingerprints.router)
+app.include_router(visits.router)
+app.include_router(stats.router)
+app.include_router(ssids.router)
 
 
 @app.get("/")
@@ -57,6 +108,54 @@ def health_check():
     return {"status": "healthy", "database": "connected"}
 
 
+@app.get("/metrics/cache")
+def cache_metrics():
+    """Response cache hit rate and the build time / bytes it saved since startup."""
+    return cache.stats()
+
+
+async def send_live_probes(websocket: WebSocket, subscription: live.Subscription):
+    while True:
+        for message in await subscription.get():
+            await websocket.send_text(message)
+
+
+@app.websocket("/ws/probes")
+async def probe_feed(
+    websocket: WebSocket,
+    hide_trusted: bool = True,
+    oui: str | None = None,
+    min_dbm: int | None = None,
+):
+    """
+    Live probe feed, one JSON sighting (without ids) per message.
+
+    Query params set the initial filter; the client can replace it at any time by
+    sending a LiveFilter JSON object. A client that falls behind loses its oldest
+    queued probes rather than slowing down the feed.
+    """
+    await websocket.accept()
+    subscription = live.hub.subscribe(
+        LiveFilter(hide_trusted=hide_trusted, oui=oui, min_dbm=min_dbm)
+    )
+    sender = asyncio.create_task(send_live_probes(websocket, subscription))
+    try:
+        while True:
+            message = await websocket.receive_text()
+            try:
+                subscription.filter = LiveFilter.model_validate_json(message)
+            except ValueError as e:
+                await websocket.send_json({"error": str(e)})
+    except WebSocketDisconnect:
+        pass
+    finally:
+        live.hub.unsubscribe(subscription)
+        if subscription.dropped:
+            logger.info(f"Live feed client dropped {subscription.dropped} probes while behind")
+        sender.cancel()
+        await asyncio.gather(sender, return_exceptions=True)
+
+
 @app.post("/internal/notify")
 async def notify(payload: NotifyRequest):
     logger.info(f"Notify request: type={payload.notification_type}, fingerprint={payload.fingerprint.get('fingerprint_id', 'unknown')[:16]}...")
@@ -0,0 +1,157 @@
+"""
+Conditional GET and response caching for the dashboard's read endpoints.
+
+The dashboard refetches /devices, /identities and /fingerprints far more often than
+their contents change. A cached endpoint names the tables it reads; their change
+counters (table_versions, bumped by triggers on every write) cost one primary-key
+query per request and are hashed with the request URL into the ETag:
+
+- If-None-Match with the current ETag: 304, nothing is recomputed or sent
+- If-None-Match: * on a resource that exists (cached, or built without error): 304
+- Cached body with the current ETag: returned from the LRU without touching the data
+- Otherwise the endpoint runs and its serialized body replaces the cached one
+
+Any write to one of the tables changes the ETag, so a stale body is never served; it
+is replaced on the next request for that URL or evicted by newer entries. Compressed
+copies (api/encoding.py) are made once per entry and content coding.
+"""
+
+import hashlib
+import time
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable
+from dataclasses import dataclass, field
+
+from fastapi import Request, Response
+
+from probe_sniffer import config
+from probe_sniffer.api import encoding
+from probe_sniffer.storage.aio import db
+from probe_sniffer.storage.queries import get_table_versions
+
+# Browsers may keep the body but must check the ETag before reusing it
+REVALIDATE = {"Cache-Control": "no-cache"}
+
+# An endpoint's serialized body plus any headers (e.g. X-Total-Count) that go with it
+Build = Callable[[], Awaitable[tuple[bytes, dict[str, str]]]]
+
+
+@dataclass(slots=True)
+class CachedBody:
+    etag: str
+    body: bytes
+    headers: dict[str, str]
+    build_seconds: float  # What a hit saves
+    encoded: dict[str, bytes] = field(default_factory=dict)  # Compressed once per coding
+
+    def encode(self, coding: str) -> bytes:
+        if coding not in self.encoded:
+            self.encoded[coding] = encoding.compress(self.body, coding)
+        return self.encoded[coding]
+
+
+class ResponseCache:
+    """LRU of serialized response bodies keyed by URL and validated by table versions."""
+
+    def __init__(self, max_entries: int = config.RESPONSE_CACHE_ENTRIES):
+        self.max_entries = max_entries
+        self.clear()
+
+    def clear(self) -> None:
+        """Drop every cached body and reset the counters."""
+        self.entries: OrderedDict[str, CachedBody] = OrderedDict()
+        self.hits = 0
+        self.not_modified = 0
+        self.misses = 0
+        self.evictions = 0
+        self.saved_seconds = 0.0  # Build time not spent thanks to hits and 304s
+        self.saved_bytes = 0  # Bodies not sent thanks to 304s
+
+    @staticmethod
+    def etag(key: str, versions: dict[str, int]) -> str:
+        state = key + "".join(f"|{name}={versions.get(name)}" for name in sorted(versions))
+        return f'"{hashlib.blake2b(state.encode(), digest_size=12).hexdigest()}"'
+
+    async def respond(self, request: Request, tables: tuple[str, ...], build: Build) -> Response:
+        """
+        Answer a GET from the cache, with a 304, or by running build().
+
+        Args:
+            request: The incoming request (its path and query string are the cache key)
+            tables: Every versioned table the response is computed from
+            build: Computes the response; exceptions (e.g. a 404) pass through uncached
+        """
+        key = f"{request.url.path}?{request.url.query}"
+        etag = self.etag(key, await db.read(get_table_versions, tables))
+        cached = self.entries.get(key)
+        if cached is not None and cached.etag != etag:
+            del self.entries[key]
+            cached = None
+
+        # Each content coding is a different representation with its own ETag
+        if_none_match = _etags(request.headers.get("if-none-match"))
+        variants = {etag} | {_coded_etag(etag, coding) for coding in ("gzip", "zstd")}
+        if variants & if_none_match or ("*" in if_none_match and cached is not None):
+            self.not_modified += 1
+            if cached is not None:
+                self.entries.move_to_end(key)
+                self.saved_seconds += cached.build_seconds
+                self.saved_bytes += len(cached.body)
+            return Response(status_code=304, headers={"ETag": etag, **REVALIDATE})
+
+        if cached is not None:
+            self.hits += 1
+            self.saved_seconds += cached.build_seconds
+            self.entries.move_to_end(key)
+        else:
+            self.misses += 1
+            start = time.perf_counter()
+            body, headers = await build()
+            cached = CachedBody(etag, body, headers, time.perf_counter() - start)
+            self.entries[key] = cached
+            if len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+        # * matches any current representation, so only once build() has produced one
+        # (a 404 raised by build() passes through above)
+        if "*" in if_none_match:
+            return Response(status_code=304, headers={"ETag": etag, **REVALIDATE})
+
+        body, headers = cached.body, {**cached.headers, **REVALIDATE, "Vary": "Accept-Encoding"}
+        coding = encoding.content_coding(request, body)
+        if coding is None:
+            headers["ETag"] = etag
+        else:
+            body = cached.encode(coding)
+            headers["ETag"] = _coded_etag(etag, coding)
+            headers["Content-Encoding"] = coding
+        return Response(body, media_type="application/json", headers=headers)
+
+    def stats(self) -> dict:
+        requests = self.hits + self.not_modified + self.misses
+        return {
+            "entries": len(self.entries),
+            "max_entries": self.max_entries,
+            "requests": requests,
+            "hits": self.hits,
+            "not_modified": self.not_modified,
+            "misses": self.misses,
+            "hit_rate": (self.hits + self.not_modified) / requests if requests else 0.0,
+            "evictions": self.evictions,
+            "saved_ms": round(self.saved_seconds * 1e3, 3),
+            "saved_bytes": self.saved_bytes,
+        }
+
+
+def _coded_etag(etag: str, coding: str) -> str:
+    return f'{etag[:-1]}-{coding}"'
+
+
+def _etags(header: str | None) -> set[str]:
+    """ETags listed in an If-None-Match header (weak ones compare equal, as RFC 9110 says)."""
+    if not header:
+        return set()
+    return {tag.strip().removeprefix("W/") for tag in header.split(",")}
+
+
+cache = ResponseCache()
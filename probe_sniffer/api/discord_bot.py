@@ -5,6 +5,7 @@ import discord
 from discord import ui
 
 from probe_sniffer import config
+from probe_sniffer.storage.aio import StorageBusy, db
 from probe_sniffer.storage.queries import disable_fingerprint_notifications, set_fingerprint_alias
 from probe_sniffer.utils.time_utils import format_eastern, utc_now
 
@@ -27,7 +28,12 @@ class AliasModal(ui.Modal, title="Set Device Alias"):
 
     async def on_submit(self, interaction: discord.Interaction):
         alias = self.alias_input.value.strip()
-        set_fingerprint_alias(self.fingerprint_id, alias)
+        try:
+            await db.write(set_fingerprint_alias, self.fingerprint_id, alias)
+        except StorageBusy as e:
+            logger.error(f"Failed to set alias for {self.fingerprint_id[:16]}...: {e}")
+            await interaction.response.send_message("Database busy, try again.", ephemeral=True)
+            return
 
         # Update the button to show the alias was set
         self.button.label = f"✏️ {alias[:20]}"
@@ -45,7 +51,12 @@ class NotificationView(ui.View):
 
     @ui.button(label="🔇 Silence", style=discord.ButtonStyle.secondary)
     async def silence(self, interaction: discord.Interaction, button: ui.Button):
-        disable_fingerprint_notifications(self.fingerprint_id)
+        try:
+            await db.write(disable_fingerprint_notifications, self.fingerprint_id)
+        except StorageBusy as e:
+            logger.error(f"Failed to silence {self.fingerprint_id[:16]}...: {e}")
+            await interaction.response.send_message("Database busy, try again.", ephemeral=True)
+            return
 
         button.disabled = True
         button.label = "🔇 Silenced"
@@ -93,6 +104,21 @@ def build_embed(fingerprint: dict, probe_data: dict, notification_type: str) ->
     return embed
 
 
+def build_flood_embed(summary: dict) -> discord.Embed:
+    """Build a Discord embed summarizing a probe flood (capture/flood.py alert_payload)."""
+    embed = discord.Embed(
+        title="🌊 Probe Flood Detected", color=discord.Color.orange(), timestamp=utc_now()
+    )
+    for flood in summary.get("floods", []):
+        embed.add_field(
+            name=f"{flood['kind']}: {flood['key']}" if flood["key"] != "" else flood["kind"],
+            value=f"{flood['peak']}/s (normally {flood['baseline']}/s)",
+            inline=False,
+        )
+    embed.set_footer(text="Sampling the flooding traffic until it stops")
+    return embed
+
+
 class SnifferBot(discord.Client):
     """Discord bot that sends device notifications with interactive buttons."""
 
@@ -116,6 +142,11 @@ class SnifferBot(discord.Client):
         if not self.channel:
             raise RuntimeError(f"Channel not found (ID={config.DISCORD_CHANNEL_ID})")
 
+        if notification_type == "flood":
+            await self.channel.send(embed=build_flood_embed(probe_data))
+            logger.info(f"Sent flood alert for {len(probe_data.get('floods', []))} classes")
+            return
+
         embed = build_embed(fingerprint, probe_data, notification_type)
         view = NotificationView(fingerprint["fingerprint_id"])
         await self.channel.send(embed=embed, view=view)
@@ -0,0 +1,158 @@
+"""
+Fast JSON responses for large list endpoints.
+
+FastAPI validates every item of a response_model against its pydantic schema and
+then JSON-encodes the result, which is most of the time spent serving a page of
+sightings or the device list. The rows come out of storage.queries already matching
+the schemas in api/schemas.py, so trusted routes skip validation: shape() only
+selects each schema's fields in order, fills defaults and coerces bool and float
+fields, and dumps() encodes the result with orjson when it is installed:
+    pip install probe-sniffer[fast]
+
+Bodies over COMPRESS_MIN_BYTES are compressed with zstd or gzip, whichever the
+client prefers in Accept-Encoding (zstd needs the zstandard package).
+"""
+
+import functools
+import gzip
+import json
+import types
+import typing
+
+from fastapi import Request, Response
+from pydantic import BaseModel
+
+try:
+    import orjson
+except ImportError:  # orjson is optional, json produces the same bytes more slowly
+    orjson = None
+
+try:
+    import zstandard
+except ImportError:  # zstandard is optional, clients then get gzip
+    zstandard = None
+
+COMPRESS_MIN_BYTES = 1024  # Smaller bodies fit in a packet or two anyway
+GZIP_LEVEL = 5
+ZSTD_LEVEL = 3
+
+
+def dumps(content) -> bytes:
+    """Compact UTF-8 JSON, the same bytes as FastAPI's default JSONResponse."""
+    if orjson is not None:
+        return orjson.dumps(content)
+    return json.dumps(content, ensure_ascii=False, separators=(",", ":")).encode()
+
+
+class _Shape:
+    """Field order, defaults and conversions of one schema, worked out once."""
+
+    def __init__(self, model: type[BaseModel]):
+        self.names = tuple(model.model_fields)
+        self.fields = []  # (name, default, convert)
+        self.plain = True  # Rows with exactly these keys can be used as they are
+        for name, field in model.model_fields.items():
+            default = None if field.is_required() else field.get_default(call_default_factory=True)
+            convert = _converter(field.annotation)
+            self.plain = self.plain and convert is None
+            self.fields.append((name, default, convert))
+
+    def row(self, row: dict) -> dict:
+        shaped = {}
+        for name, default, convert in self.fields:
+            value = row.get(name, default)
+            if convert is not None and value is not None:
+                value = convert(value)
+            shaped[name] = value
+        return shaped
+
+    def rows(self, rows: list[dict]) -> list[dict]:
+        # Rows of one query all have the same keys, so checking the first is enough
+        if self.plain and rows and tuple(rows[0]) == self.names:
+            return rows
+        return [self.row(row) for row in rows]
+
+
+def _converter(annotation):
+    if typing.get_origin(annotation) in (typing.Union, types.UnionType):
+        args = [arg for arg in typing.get_args(annotation) if arg is not type(None)]
+        annotation = args[0] if len(args) == 1 else None
+    if annotation in (bool, float):
+        return annotation  # SQLite has no booleans, and AVG of integers can be an int
+    if typing.get_origin(annotation) is list:
+        (item,) = typing.get_args(annotation)
+        if isinstance(item, type) and issubclass(item, BaseModel):
+            return _shape(item).rows
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        return _shape(annotation).row
+    return None
+
+
+@functools.cache
+def _shape(model: type[BaseModel]) -> _Shape:
+    return _Shape(model)
+
+
+def shape(model: type[BaseModel], content: dict | list[dict]) -> dict | list[dict]:
+    """
+    Put trusted storage rows into a schema's JSON shape without validating them.
+
+    Unlike a response_model, nothing is checked: only use this for rows from
+    storage.queries whose columns match the schema (tests/encoding_tests.py
+    compares the output with pydantic's for every route that uses it).
+
+    Args:
+        model: Schema of one item
+        content: One row or a list of rows
+    """
+    if isinstance(content, list):
+        return _shape(model).rows(content)
+    return _shape(model).row(content)
+
+
+def negotiate(accept_encoding: str | None) -> str | None:
+    """The content coding to use for an Accept-Encoding header (None = identity)."""
+    if not accept_encoding:
+        return None
+    weights = {}
+    for item in accept_encoding.split(","):
+        coding, _, params = item.strip().lower().partition(";")
+        weight = 1.0
+        if params.strip().startswith("q="):
+            try:
+                weight = float(params.strip()[2:])
+            except ValueError:
+                weight = 0.0
+        weights[coding.strip()] = weight
+
+    available = ("zstd", "gzip") if zstandard is not None else ("gzip",)
+    best, best_weight = None, 0.0
+    for coding in available:
+        weight = weights.get(coding, weights.get("*", 0.0))
+        if weight > best_weight:
+            best, best_weight = coding, weight
+    return best
+
+
+def compress(body: bytes, coding: str) -> bytes:
+    if coding == "zstd":
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(body)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+def content_coding(request: Request, body: bytes) -> str | None:
+    """The coding to compress a response body with, if it is worth compressing."""
+    if len(body) < COMPRESS_MIN_BYTES:
+        return None
+    return negotiate(request.headers.get("accept-encoding"))
+
+
+def json_response(request: Request, content, headers: dict[str, str] | None = None) -> Response:
+    """A JSON response, compressed if the client accepts it and it's big enough."""
+    body = dumps(content)
+    headers = {**(headers or {}), "Vary": "Accept-Encoding"}
+    coding = content_coding(request, body)
+    if coding is not None:
+        body = compress(body, coding)
+        headers["Content-Encoding"] = coding
+    return Response(body, media_type="application/json", headers=headers)
@@ -0,0 +1,118 @@
+"""
+Streaming encoders for /sightings/export.
+
+Each encoder turns the row chunks of queries.iter_sightings() into byte chunks for
+a StreamingResponse, holding at most one chunk at a time. Arrow and Parquet need
+the optional pyarrow dependency:
+    pip install probe-sniffer[export]
+"""
+
+import csv
+import io
+import json
+from collections.abc import Iterable, Iterator
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pyarrow is optional, only needed for Arrow/Parquet exports
+    pa = pq = None
+
+from probe_sniffer.storage.schema import SIGHTING_FIELDS
+
+# format -> (media type, file extension)
+EXPORT_FORMATS = {
+    "ndjson": ("application/x-ndjson", "ndjson"),
+    "csv": ("text/csv", "csv"),
+    "arrow": ("application/vnd.apache.arrow.stream", "arrow"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+}
+ARROW_FORMATS = ("arrow", "parquet")
+
+
+def encode_ndjson(chunks: Iterable[list[tuple]]) -> Iterator[bytes]:
+    """One JSON object per line."""
+    for rows in chunks:
+        yield "".join(
+            json.dumps(dict(zip(SIGHTING_FIELDS, row)), ensure_ascii=False) + "\n" for row in rows
+        ).encode()
+
+
+def encode_csv(chunks: Iterable[list[tuple]]) -> Iterator[bytes]:
+    """CSV with a header row; NULLs are empty fields."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(SIGHTING_FIELDS)
+    for rows in chunks:
+        writer.writerows(rows)
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+
+def _arrow_schema():
+    types = {"id": pa.int64(), "dbm": pa.int32(), "channel": pa.int32()}
+    return pa.schema([(name, types.get(name, pa.string())) for name in SIGHTING_FIELDS])
+
+
+def _record_batch(schema, rows: list[tuple]):
+    return pa.RecordBatch.from_arrays(
+        [pa.array(column, type=field.type) for column, field in zip(zip(*rows), schema)],
+        schema=schema,
+    )
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file that hands back whatever was written since the last drain()."""
+
+    def __init__(self):
+        self.parts = []
+        self.position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self.parts.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self.position
+
+    def drain(self) -> bytes:
+        data = b"".join(self.parts)
+        self.parts = []
+        return data
+
+
+def encode_arrow(chunks: Iterable[list[tuple]], parquet: bool = False) -> Iterator[bytes]:
+    """Arrow IPC stream, or Parquet with one row group per chunk."""
+    if pa is None:
+        raise RuntimeError(
+            "Arrow/Parquet export requires pyarrow: pip install probe-sniffer[export]"
+        )
+
+    schema = _arrow_schema()
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, schema) if parquet else pa.ipc.new_stream(sink, schema)
+    for rows in chunks:
+        batch = _record_batch(schema, rows)
+        if parquet:
+            writer.write_batch(batch, row_group_size=len(rows))
+        else:
+            writer.write_batch(batch)
+        yield sink.drain()
+    writer.close()
+    yield sink.drain()
+
+
+def encode(export_format: str, chunks: Iterable[list[tuple]]) -> Iterator[bytes]:
+    """Byte chunks of the export in one of EXPORT_FORMATS."""
+    if export_format == "ndjson":
+        return encode_ndjson(chunks)
+    if export_format == "csv":
+        return encode_csv(chunks)
+    return encode_arrow(chunks, parquet=export_format == "parquet")
@@ -0,0 +1,109 @@
+"""
+API side of the sniffer <-> API message channel (see probe_sniffer.ipc).
+
+Listens on IPC_SOCKET_PATH, dispatches incoming frames to per-kind handlers on the
+event loop and broadcasts frames to every connected sniffer. A sniffer that stops
+reading has frames dropped once its write buffer passes MAX_WRITE_BUFFER_BYTES,
+rather than the API buffering without bound.
+"""
+
+import asyncio
+import inspect
+import logging
+import os
+from collections.abc import Callable
+
+from probe_sniffer import config, ipc
+
+logger = logging.getLogger("IPC")
+
+MAX_WRITE_BUFFER_BYTES = 1 << 20
+
+
+class IpcServer:
+    def __init__(self, path: str = config.IPC_SOCKET_PATH):
+        self.path = path
+        self.handlers: dict[int, Callable] = {ipc.PING: self._pong}
+        self.writers: set[asyncio.StreamWriter] = set()
+        self.dropped = 0
+        self.server = None
+        self.tasks: set[asyncio.Task] = set()
+
+    def on(self, kind: int, handler: Callable) -> None:
+        """Call handler(payload) for each incoming frame of this kind; may be async."""
+        self.handlers[kind] = handler
+
+    async def start(self) -> None:
+        # A socket file left behind by a previous run would make bind() fail
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+        self.server = await asyncio.start_unix_server(self._handle, self.path)
+        logger.info(f"Listening for the sniffer on {self.path}")
+
+    async def close(self) -> None:
+        if self.server:
+            self.server.close()
+        for writer in list(self.writers):
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+        if self.server:
+            await self.server.wait_closed()
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+    def broadcast(self, kind: int, payload: bytes) -> int:
+        """Send a frame to every connected sniffer; returns how many it was queued for."""
+        frame = ipc.encode_frame(kind, payload)
+        sent = 0
+        for writer in self.writers:
+            if writer.transport.get_write_buffer_size() > MAX_WRITE_BUFFER_BYTES:
+                self.dropped += 1
+                continue
+            writer.write(frame)
+            sent += 1
+        return sent
+
+    def config_changed(self, message: dict) -> int:
+        return self.broadcast(ipc.CONFIG, ipc.encode_json(message))
+
+    def _pong(self, payload: bytes) -> None:
+        self.broadcast(ipc.PONG, payload)
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.writers.add(writer)
+        frames = ipc.FrameReader()
+        try:
+            while data := await reader.read(65536):
+                for kind, payload in frames.feed(data):
+                    self._dispatch(kind, payload)
+        except (ConnectionError, ValueError) as e:
+            logger.warning(f"Sniffer connection lost: {e}")
+        finally:
+            self.writers.discard(writer)
+            writer.close()
+
+    def _dispatch(self, kind: int, payload: bytes) -> None:
+        handler = self.handlers.get(kind)
+        if handler is None:
+            logger.debug(f"Ignoring IPC frame of kind {kind}")
+            return
+        try:
+            result = handler(payload)
+        except Exception as e:
+            logger.error(f"IPC handler for kind {kind} failed: {e}", exc_info=True)
+            return
+        if inspect.isawaitable(result):
+            task = asyncio.ensure_future(result)
+            self.tasks.add(task)
+            task.add_done_callback(self._task_done)
+
+    def _task_done(self, task: asyncio.Task) -> None:
+        self.tasks.discard(task)
+        if not task.cancelled() and task.exception():
+            logger.error(f"IPC handler failed: {task.exception()}")
+
+
+server = IpcServer()
@@ -0,0 +1,109 @@
+"""
+In-process pub/sub hub behind the /ws/probes live feed.
+
+The sniffer sends every logged probe to the API as JSON lines in PROBES frames over
+the IPC channel (probe_sniffer.ipc). The hub parses each probe once, matches it
+against every subscriber's LiveFilter and queues the original JSON text for the ones
+that match.
+
+Each subscriber's backlog is bounded and drops its oldest probe when full, so a slow
+client only loses its own probes and never delays the IPC reader or the other
+clients. Nothing here touches the database except load_trusted() at startup.
+"""
+
+import asyncio
+import json
+import logging
+from collections import deque
+
+from probe_sniffer import config
+from probe_sniffer.api.schemas import LiveFilter
+from probe_sniffer.storage.queries import get_trusted_devices
+from probe_sniffer.utils.mac_utils import int_to_mac, mac_to_int
+
+logger = logging.getLogger("LIVE")
+
+
+class Subscription:
+    """One /ws/probes client: its filter and a bounded, drop-oldest backlog."""
+
+    def __init__(self, live_filter: LiveFilter, maxsize: int):
+        self.filter = live_filter
+        self.backlog: deque[str] = deque(maxlen=maxsize)
+        self.dropped = 0
+        self.ready = asyncio.Event()
+
+    def matches(self, probe: dict, trusted: set[str]) -> bool:
+        live_filter = self.filter
+        if live_filter.hide_trusted and probe["mac"] in trusted:
+            return False
+        if live_filter.oui is not None and probe["oui"] != live_filter.oui:
+            return False
+        if live_filter.min_dbm is not None and probe["dbm"] < live_filter.min_dbm:
+            return False
+        return True
+
+    def push(self, message: str) -> None:
+        if len(self.backlog) == self.backlog.maxlen:
+            self.dropped += 1
+        self.backlog.append(message)
+        self.ready.set()
+
+    async def get(self) -> list[str]:
+        """Wait for probes, then take everything queued (oldest first)."""
+        await self.ready.wait()
+        self.ready.clear()
+        messages = list(self.backlog)
+        self.backlog.clear()
+        return messages
+
+
+class ProbeHub:
+    """Fans live probes out to subscribers; all methods run on the event loop."""
+
+    def __init__(self, queue_size: int = config.LIVE_FEED_QUEUE_SIZE):
+        self.queue_size = queue_size
+        self.subscriptions: set[Subscription] = set()
+        self.trusted: set[str] = set()
+        self.published = 0
+
+    def subscribe(self, live_filter: LiveFilter) -> Subscription:
+        subscription = Subscription(live_filter, self.queue_size)
+        self.subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        self.subscriptions.discard(subscription)
+
+    def load_trusted(self) -> None:
+        """Load the trusted MACs used by hide_trusted from the devices table."""
+        self.trusted = {int_to_mac(mac_to_int(mac)) for mac in get_trusted_devices()}
+
+    def set_trusted(self, mac: str, is_trusted: bool) -> None:
+        """Keep hide_trusted current when a device's trusted flag changes."""
+        mac = int_to_mac(mac_to_int(mac))
+        if is_trusted:
+            self.trusted.add(mac)
+        else:
+            self.trusted.discard(mac)
+
+    def publish(self, payload: str) -> None:
+        """Queue one probe payload (Probe.live_json) for every matching subscriber."""
+        self.published += 1
+        if not self.subscriptions:
+            return
+        probe = json.loads(payload)
+        for subscription in self.subscriptions:
+            if subscription.matches(probe, self.trusted):
+                subscription.push(payload)
+
+    def publish_lines(self, data: bytes) -> None:
+        """Publish the newline-separated payloads of a PROBES frame."""
+        for line in data.decode().split("\n"):
+            try:
+                self.publish(line)
+            except (ValueError, KeyError) as e:
+                logger.warning(f"Ignoring malformed live feed payload: {e}")
+
+
+hub = ProbeHub()
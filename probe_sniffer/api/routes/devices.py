@@ -1,100 +1,128 @@
-from fastapi import APIRouter, HTTPException
-from probe_sniffer.api.schemas import Device, DeviceUpdate, DeviceWithStats
+from datetime import datetime
+from enum import Enum
+
+from fastapi import APIRouter, HTTPException, Query, Request
+
+from probe_sniffer.api import encoding, live
+from probe_sniffer.api.cache import cache
+from probe_sniffer.api.ipc_server import server as ipc_server
+from probe_sniffer.api.schemas import Device, DeviceActivity, DeviceUpdate, DeviceWithStats
+from probe_sniffer.api.routes.sightings import SortOrder
+from probe_sniffer.storage.aio import db
 from probe_sniffer.storage.queries import (
+    get_activity,
     get_device,
-    get_all_devices,
+    get_device_summaries,
+    get_device_summary,
     update_device,
 )
-from probe_sniffer.storage.database import get_cursor
+from probe_sniffer.utils.mac_utils import mac_to_int
+from probe_sniffer.utils.time_utils import to_epoch
+
+
+class DeviceSort(str, Enum):
+    """Sort keys for the device list"""
+
+    LAST_SEEN = "last_seen"
+    FIRST_SEEN = "first_seen"
+    NAME = "name"
+    MAC = "mac"
+    TOTAL_SIGHTINGS = "total_sightings"
+    AVG_SIGNAL_DBM = "avg_signal_dbm"
+
 
 router = APIRouter(prefix="/devices", tags=["devices"])
 
+DEVICE_TABLES = ("devices", "device_summary")
+
 
 @router.get("/", response_model=list[Device])
-def list_devices(is_trusted: bool | None = None):
+async def list_devices(
+    request: Request,
+    is_trusted: bool | None = None,
+    limit: int | None = Query(None, ge=1, le=1000, description="Page size (default all devices)"),
+    offset: int = Query(0, ge=0, description="Number of devices to skip"),
+    sort: DeviceSort = Query(DeviceSort.LAST_SEEN, description="Sort key"),
+    order: SortOrder = Query(SortOrder.DESC, description="Sort order"),
+):
     """
-    List all devices, optionally filtered by trusted status.
+    List devices with their sighting summary, optionally filtered by trusted status.
 
     Query params:
         is_trusted: Filter by trusted status (true/false/null for all)
+        limit: Page size (optional, default all devices)
+        offset: Skip N devices (for pagination)
+        sort: last_seen, first_seen, name, mac, total_sightings or avg_signal_dbm
+        order: ASC or DESC (default DESC)
+
+    The total number of matching devices is returned in the X-Total-Count header.
+    Supports If-None-Match (see api/cache.py).
     """
-    devices = get_all_devices(is_trusted=is_trusted)
-
-    # Enrich devices with OUI, SSIDs, and sighting count from sightings
-    with get_cursor() as cursor:
-        for device in devices:
-            # Get most recent OUI for this device
-            cursor.execute(
-                "SELECT oui FROM sightings WHERE mac = ? AND oui IS NOT NULL ORDER BY timestamp DESC LIMIT 1",
-                (device["mac"],)
-            )
-            oui_row = cursor.fetchone()
-            device["oui"] = oui_row["oui"] if oui_row else None
-
-            # Get unique SSIDs this device has probed for
-            cursor.execute(
-                "SELECT DISTINCT ssid FROM sightings WHERE mac = ? AND ssid IS NOT NULL AND ssid != '' ORDER BY ssid",
-                (device["mac"],)
-            )
-            ssid_rows = cursor.fetchall()
-            device["ssids"] = [row["ssid"] for row in ssid_rows]
-
-            # Get total sightings count
-            cursor.execute(
-                "SELECT COUNT(*) as count FROM sightings WHERE mac = ?",
-                (device["mac"],)
-            )
-            count_row = cursor.fetchone()
-            device["total_sightings"] = count_row["count"] if count_row else 0
-
-    return devices
+
+    async def build():
+        devices, total = await db.read(
+            get_device_summaries,
+            is_trusted=is_trusted,
+            sort=sort.value,
+            order=order.value,
+            limit=limit,
+            offset=offset,
+        )
+        body = encoding.dumps(encoding.shape(Device, devices))
+        return body, {"X-Total-Count": str(total)}
+
+    return await cache.respond(request, DEVICE_TABLES, build)
 
 
 @router.get("/{mac}", response_model=DeviceWithStats)
-def get_device_details(mac: str):
+async def get_device_details(request: Request, mac: str):
     """
-    Get device details with statistics.
+    Get device details with statistics. Supports If-None-Match.
 
     Path params:
         mac: Device MAC address (e.g., aa:bb:cc:dd:ee:ff)
     """
-    device = get_device(mac)
-    if not device:
-        raise HTTPException(status_code=404, detail="Device not found")
 
-    # Get statistics and enrich with OUI/SSIDs
-    with get_cursor() as cursor:
-        cursor.execute(
-            "SELECT COUNT(*) as count, AVG(dbm) as avg_dbm FROM sightings WHERE mac = ?",
-            (mac,)
-        )
-        stats = cursor.fetchone()
+    async def build():
+        device = await db.read(get_device_summary, mac)
+        if not device:
+            raise HTTPException(status_code=404, detail="Device not found")
+        return encoding.dumps(encoding.shape(DeviceWithStats, device)), {}
 
-        # Get most recent OUI
-        cursor.execute(
-            "SELECT oui FROM sightings WHERE mac = ? AND oui IS NOT NULL ORDER BY timestamp DESC LIMIT 1",
-            (mac,)
-        )
-        oui_row = cursor.fetchone()
+    return await cache.respond(request, DEVICE_TABLES, build)
 
-        # Get unique SSIDs
-        cursor.execute(
-            "SELECT DISTINCT ssid FROM sightings WHERE mac = ? AND ssid IS NOT NULL AND ssid != '' ORDER BY ssid",
-            (mac,)
-        )
-        ssid_rows = cursor.fetchall()
 
-    return {
-        **device,
-        "total_sightings": stats["count"],
-        "avg_signal_dbm": stats["avg_dbm"],
-        "oui": oui_row["oui"] if oui_row else None,
-        "ssids": [row["ssid"] for row in ssid_rows],
-    }
+@router.get("/{mac}/activity", response_model=DeviceActivity)
+async def get_device_activity(
+    mac: str,
+    since: datetime | None = Query(None, description="Start of the range (default 30 days ago)"),
+    until: datetime | None = Query(None, description="End of the range (default now)"),
+):
+    """
+    Get device activity over time from the rollup tables.
+
+    Path params:
+        mac: Device MAC address
+
+    Query params:
+        since: Start of the range (optional, UTC if no offset)
+        until: End of the range (optional, UTC if no offset)
+    """
+    device = await db.read(get_device, mac)
+    if not device:
+        raise HTTPException(status_code=404, detail="Device not found")
+
+    return await db.read(
+        get_activity,
+        "mac",
+        mac_to_int(mac),
+        since=to_epoch(since) if since else None,
+        until=to_epoch(until) if until else None,
+    )
 
 
 @router.put("/{mac}", response_model=Device)
-def update_device_info(mac: str, device_update: DeviceUpdate):
+async def update_device_info(mac: str, device_update: DeviceUpdate):
     """
     Update device name and/or trusted status.
 
@@ -106,45 +134,23 @@ def update_device_info(mac: str, device_update: DeviceUpdate):
         is_trusted: Whether to filter this device from logs
     """
     # Check device exists
-    existing = get_device(mac)
+    existing = await db.read(get_device, mac)
     if not existing:
         raise HTTPException(status_code=404, detail="Device not found")
 
     # Update device
-    update_device(
+    await db.write(
+        update_device,
         mac=mac,
         name=device_update.name,
         is_trusted=device_update.is_trusted,
     )
-
-    # Return updated device with OUI and SSIDs
-    updated = get_device(mac)
-
-    with get_cursor() as cursor:
-        # Get most recent OUI
-        cursor.execute(
-            "SELECT oui FROM sightings WHERE mac = ? AND oui IS NOT NULL ORDER BY timestamp DESC LIMIT 1",
-            (mac,)
-        )
-        oui_row = cursor.fetchone()
-
-        # Get unique SSIDs
-        cursor.execute(
-            "SELECT DISTINCT ssid FROM sightings WHERE mac = ? AND ssid IS NOT NULL AND ssid != '' ORDER BY ssid",
-            (mac,)
+    if device_update.is_trusted is not None:
+        live.hub.set_trusted(mac, device_update.is_trusted)
+        # The sniffer skips trusted MACs at capture time
+        ipc_server.config_changed(
+            {"kind": "trusted", "mac": mac, "is_trusted": device_update.is_trusted}
         )
-        ssid_rows = cursor.fetchall()
 
-        # Get total sightings count
-        cursor.execute(
-            "SELECT COUNT(*) as count FROM sightings WHERE mac = ?",
-            (mac,)
-        )
-        count_row = cursor.fetchone()
-
-    return {
-        **updated,
-        "oui": oui_row["oui"] if oui_row else None,
-        "ssids": [row["ssid"] for row in ssid_rows],
-        "total_sightings": count_row["count"] if count_row else 0,
-    }
+    # Return updated device with its sighting summary
+    return await db.read(get_device_summary, mac)
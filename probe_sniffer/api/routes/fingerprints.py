@@ -1,89 +1,115 @@
 """API routes for device fingerprint queries."""
 
-from fastapi import APIRouter, HTTPException
+from datetime import datetime
 
-from probe_sniffer.storage.database import get_cursor
+from fastapi import APIRouter, HTTPException, Query, Request
+
+from probe_sniffer.api import encoding
+from probe_sniffer.api.cache import cache
+from probe_sniffer.api.schemas import DeviceActivity
+from probe_sniffer.storage.aio import db
+from probe_sniffer.storage.queries import (
+    get_activity,
+    get_device_fingerprint,
+    get_fingerprints_offset,
+    get_fingerprints_page,
+)
+from probe_sniffer.storage.similarity import find_similar_fingerprints
+from probe_sniffer.utils.time_utils import to_epoch
 
 router = APIRouter(prefix="/fingerprints", tags=["fingerprints"])
 
+FINGERPRINT_TABLES = ("device_fingerprints",)
+
 
 @router.get("/")
-def list_fingerprints(limit: int = 50, offset: int = 0):
+async def list_fingerprints(
+    request: Request, limit: int = 50, offset: int = 0, cursor: str | None = None
+):
     """
-    List all device fingerprints with statistics.
+    List all device fingerprints with statistics, most sighted first.
 
     Query params:
     - limit: Maximum results (default 50)
-    - offset: Skip N results (default 0)
+    - offset: Skip N results (default 0, legacy; prefer cursor)
+    - cursor: next_cursor or prev_cursor from a previous page
+
+    Supports If-None-Match.
     """
-    with get_cursor() as cursor:
-        # Get total count
-        cursor.execute("SELECT COUNT(*) as count FROM device_fingerprints")
-        total = cursor.fetchone()["count"]
-
-        # Get fingerprints
-        cursor.execute(
-            """
-            SELECT
-                fingerprint_id,
-                identity_id,
-                first_seen,
-                last_seen,
-                sighting_count
-            FROM device_fingerprints
-            ORDER BY sighting_count DESC
-            LIMIT ? OFFSET ?
-            """,
-            (limit, offset)
-        )
-        fingerprints = [dict(row) for row in cursor.fetchall()]
 
-        return {
-            "fingerprints": fingerprints,
-            "total": total,
-            "limit": limit,
-            "offset": offset
-        }
+    async def build():
+        if offset and not cursor:
+            fingerprints, total = await db.read(get_fingerprints_offset, limit=limit, offset=offset)
+            body = {"fingerprints": fingerprints, "total": total, "limit": limit, "offset": offset}
+            return encoding.dumps(body), {}
+
+        try:
+            page = await db.read(get_fingerprints_page, limit=limit, cursor_token=cursor)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        return encoding.dumps({**page, "limit": limit, "offset": 0}), {}
+
+    return await cache.respond(request, FINGERPRINT_TABLES, build)
 
 
 @router.get("/{fingerprint_id}")
-def get_fingerprint(fingerprint_id: str):
-    """Get details about a specific fingerprint including SSID signature."""
-    with get_cursor() as cursor:
-        # Get fingerprint record
-        cursor.execute(
-            "SELECT * FROM device_fingerprints WHERE fingerprint_id = ?",
-            (fingerprint_id,)
-        )
-        fingerprint = cursor.fetchone()
+async def get_fingerprint(request: Request, fingerprint_id: str):
+    """
+    Get details about a specific fingerprint including SSID signature and unique MACs.
+
+    The aggregates are kept up to date on ingest, so this is a primary-key read.
+    Supports If-None-Match.
+    """
+
+    async def build():
+        fingerprint = await db.read(get_device_fingerprint, fingerprint_id)
         if not fingerprint:
             raise HTTPException(status_code=404, detail="Fingerprint not found")
+        return encoding.dumps(fingerprint), {}
 
-        # Get SSID signature
-        cursor.execute(
-            """
-            SELECT DISTINCT ssid
-            FROM sightings
-            WHERE ie_fingerprint = ? AND ssid != 'Undirected Probe'
-            ORDER BY ssid
-            """,
-            (fingerprint_id,)
-        )
-        ssids = [row["ssid"] for row in cursor.fetchall()]
-
-        # Get unique MAC count
-        cursor.execute(
-            """
-            SELECT COUNT(DISTINCT mac) as unique_macs
-            FROM sightings
-            WHERE ie_fingerprint = ?
-            """,
-            (fingerprint_id,)
+    return await cache.respond(request, FINGERPRINT_TABLES, build)
+
+
+@router.get("/{fingerprint_id}/similar")
+async def get_similar_fingerprints(
+    request: Request,
+    fingerprint_id: str,
+    limit: int = Query(10, ge=1, le=100),
+    min_similarity: float = Query(0.5, ge=0.0, le=1.0),
+):
+    """
+    Fingerprints that are probably the same device after IE drift, most similar first.
+
+    Similarity is the Jaccard similarity of the fingerprints' decoded IE features
+    (rates, capability bits, IE values and order); removed and added list the
+    features that differ. Supports If-None-Match.
+    """
+
+    async def build():
+        similar = await db.read(
+            find_similar_fingerprints, fingerprint_id, limit=limit, min_similarity=min_similarity
         )
-        unique_macs = cursor.fetchone()["unique_macs"]
+        if similar is None:
+            raise HTTPException(status_code=404, detail="Fingerprint not found")
+        return encoding.dumps({"fingerprint_id": fingerprint_id, "similar": similar}), {}
+
+    return await cache.respond(request, FINGERPRINT_TABLES, build)
+
 
-        result = dict(fingerprint)
-        result["ssid_signature"] = ssids
-        result["unique_mac_count"] = unique_macs
+@router.get("/{fingerprint_id}/activity", response_model=DeviceActivity)
+async def get_fingerprint_activity(
+    fingerprint_id: str,
+    since: datetime | None = Query(None, description="Start of the range (default 30 days ago)"),
+    until: datetime | None = Query(None, description="End of the range (default now)"),
+):
+    """Get fingerprint activity over time from the rollup tables."""
+    if not await db.read(get_device_fingerprint, fingerprint_id):
+        raise HTTPException(status_code=404, detail="Fingerprint not found")
 
-        return result
+    return await db.read(
+        get_activity,
+        "fingerprint",
+        fingerprint_id,
+        since=to_epoch(since) if since else None,
+        until=to_epoch(until) if until else None,
+    )
@@ -1,8 +1,11 @@
 """API routes for device identity management."""
 
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Request
 from pydantic import BaseModel
 
+from probe_sniffer.api import encoding
+from probe_sniffer.api.cache import cache
+from probe_sniffer.storage.aio import db
 from probe_sniffer.storage.queries import (
     create_device_identity,
     update_device_identity_alias,
@@ -35,25 +38,34 @@ class LinkFingerprintRequest(BaseModel):
 
 
 @router.get("/")
-def list_identities():
-    """List all device identities."""
-    return get_all_device_identities()
+async def list_identities(request: Request):
+    """List all device identities. Supports If-None-Match."""
+
+    async def build():
+        return encoding.dumps(await db.read(get_all_device_identities)), {}
+
+    return await cache.respond(request, ("device_identities",), build)
 
 
 @router.get("/{identity_id}")
-def get_identity(identity_id: str):
-    """Get a specific device identity."""
-    identity = get_device_identity(identity_id)
-    if not identity:
-        raise HTTPException(status_code=404, detail="Identity not found")
-    return identity
+async def get_identity(request: Request, identity_id: str):
+    """Get a specific device identity. Supports If-None-Match."""
+
+    async def build():
+        identity = await db.read(get_device_identity, identity_id)
+        if not identity:
+            raise HTTPException(status_code=404, detail="Identity not found")
+        return encoding.dumps(identity), {}
+
+    return await cache.respond(request, ("device_identities",), build)
 
 
 @router.post("/")
-def create_identity(request: CreateIdentityRequest):
+async def create_identity(request: CreateIdentityRequest):
     """Create a new device identity."""
     try:
-        return create_device_identity(
+        return await db.write(
+            create_device_identity,
             identity_id=request.identity_id,
             alias=request.alias,
             fingerprint_ids=request.fingerprint_ids,
@@ -63,19 +75,19 @@ def create_identity(request: CreateIdentityRequest):
 
 
 @router.put("/{identity_id}/alias")
-def update_alias(identity_id: str, request: UpdateAliasRequest):
+async def update_alias(identity_id: str, request: UpdateAliasRequest):
     """Update the alias for a device identity."""
-    identity = update_device_identity_alias(identity_id, request.alias)
+    identity = await db.write(update_device_identity_alias, identity_id, request.alias)
     if not identity:
         raise HTTPException(status_code=404, detail="Identity not found")
     return identity
 
 
 @router.post("/{identity_id}/fingerprints")
-def link_fingerprint(identity_id: str, request: LinkFingerprintRequest):
+async def link_fingerprint(identity_id: str, request: LinkFingerprintRequest):
     """Link a fingerprint to a device identity."""
     try:
-        link_fingerprint_to_identity(request.fingerprint_id, identity_id)
+        await db.write(link_fingerprint_to_identity, request.fingerprint_id, identity_id)
         return {"message": "Fingerprint linked successfully"}
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
@@ -1,7 +1,18 @@
+from datetime import datetime
 from enum import Enum
-from fastapi import APIRouter, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from probe_sniffer.api import encoding, export
 from probe_sniffer.api.schemas import Sighting, SightingsResponse
-from probe_sniffer.storage.queries import get_sightings, get_recent_sightings
+from probe_sniffer.storage.aio import db
+from probe_sniffer.storage.filters import SightingFilter
+from probe_sniffer.storage.queries import (
+    get_recent_sightings,
+    get_sightings,
+    get_sightings_page,
+    iter_sightings,
+)
+from probe_sniffer.utils.time_utils import to_epoch
 
 
 class SortOrder(str, Enum):
@@ -13,34 +24,136 @@ class SortOrder(str, Enum):
 router = APIRouter(prefix="/sightings", tags=["sightings"])
 
 
-@router.get("/", response_model=SightingsResponse)
-def list_sightings(
+def sighting_filters(
     mac: str | None = Query(None, description="Filter by device MAC address"),
+    since: datetime | None = Query(
+        None, description="Only sightings at or after this time (UTC if no offset)"
+    ),
+    until: datetime | None = Query(
+        None, description="Only sightings before this time (UTC if no offset)"
+    ),
+    min_dbm: int | None = Query(None, description="Only sightings at least this strong"),
+    max_dbm: int | None = Query(None, description="Only sightings at most this strong"),
+    oui: str | None = Query(None, description="Manufacturer designation, e.g. 'Apple, Inc.'"),
+    ssid: str | None = Query(None, description="Probed SSID"),
+    fingerprint: str | None = Query(None, description="IE fingerprint id"),
+    identity: str | None = Query(None, description="Device identity id"),
+    channel: int | None = Query(None, ge=0, description="WiFi channel"),
+    randomized: bool | None = Query(
+        None, description="Only randomized (true) or global (false) MACs"
+    ),
+) -> dict:
+    """Sighting filter query params shared by the list and export endpoints (SightingFilter fields)."""
+    return {
+        "mac": mac,
+        "since": to_epoch(since) if since else None,
+        "until": to_epoch(until) if until else None,
+        "min_dbm": min_dbm,
+        "max_dbm": max_dbm,
+        "oui": oui,
+        "ssid": ssid,
+        "fingerprint": fingerprint,
+        "identity": identity,
+        "channel": channel,
+        "randomized": randomized,
+    }
+
+
+@router.get("/", response_model=SightingsResponse)
+async def list_sightings(
+    request: Request,
+    filters: dict = Depends(sighting_filters),
     limit: int = Query(100, ge=1, le=1000, description="Maximum number of results"),
-    offset: int = Query(0, ge=0, description="Number of results to skip"),
-    order: SortOrder = Query(SortOrder.DESC, description="Sort order by timestamp")
+    offset: int = Query(0, ge=0, description="Number of results to skip (prefer cursor)"),
+    order: SortOrder = Query(SortOrder.DESC, description="Sort order by timestamp"),
+    cursor: str | None = Query(None, description="next_cursor or prev_cursor from a previous page"),
 ):
     """
     List sightings with optional filtering and pagination.
 
     Query params:
-        mac: Filter by device MAC address (optional)
+        mac, since, until, min_dbm, max_dbm, oui, ssid, fingerprint, identity,
+        channel, randomized: Filters, all optional and combined with AND
         limit: Maximum results (1-1000, default 100)
-        offset: Skip N results (for pagination)
+        offset: Skip N results (legacy pagination, cost grows with N)
         order: Sort by timestamp (ASC or DESC, default DESC)
+        cursor: Page token from next_cursor/prev_cursor (optional)
+
+    e.g. strong probes for one SSID from randomized MACs in the last hour:
+        /sightings?ssid=HOME-5G&min_dbm=-60&randomized=true&since=2026-10-19T13:00
+
+    Cursor pages seek straight to their position through the index of the most
+    selective filter, so every page costs the same. The total comes from maintained
+    counters where there is one; it is an estimate (or, past 10,000 matches, a lower
+    bound) when total_is_approximate is set. Offset pagination counts rows exactly.
     """
-    sightings, total = get_sightings(mac=mac, limit=limit, offset=offset, order=order.value)
-    return {
-        "sightings": sightings,
-        "total": total,
-        "limit": limit,
-        "offset": offset,
-    }
+    if offset and not cursor:
+        try:
+            sightings, total = await db.read(
+                get_sightings, limit=limit, offset=offset, order=order.value, **filters
+            )
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid MAC address")
+        page = {"sightings": sightings, "total": total, "limit": limit, "offset": offset}
+        return encoding.json_response(request, encoding.shape(SightingsResponse, page))
+
+    try:
+        page = await db.read(
+            get_sightings_page, limit=limit, order=order.value, cursor_token=cursor, **filters
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    page = {**page, "limit": limit, "offset": 0}
+    return encoding.json_response(request, encoding.shape(SightingsResponse, page))
+
+
+class ExportFormat(str, Enum):
+    """Formats for /sightings/export"""
+
+    NDJSON = "ndjson"
+    CSV = "csv"
+    ARROW = "arrow"
+    PARQUET = "parquet"
+
+
+@router.get("/export")
+def export_sightings(
+    filters: dict = Depends(sighting_filters),
+    format: ExportFormat = Query(ExportFormat.NDJSON, description="ndjson, csv, arrow or parquet"),
+    order: SortOrder = Query(SortOrder.ASC, description="Sort order by timestamp"),
+):
+    """
+    Stream every sighting matching the filters as a file download.
+
+    Query params:
+        mac, since, until, min_dbm, max_dbm, oui, ssid, fingerprint, identity,
+        channel, randomized: Same filters as GET /sightings
+        format: ndjson (default), csv, arrow (IPC stream) or parquet
+        order: Sort by timestamp (ASC or DESC, default ASC)
+
+    Rows are read and encoded a chunk at a time, so memory use doesn't depend on
+    the size of the export. Arrow and Parquet need pyarrow on the server.
+    """
+    try:
+        SightingFilter(**filters).mac_int
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid MAC address")
+    if format.value in export.ARROW_FORMATS and export.pa is None:
+        raise HTTPException(
+            status_code=501, detail="Arrow/Parquet export requires pyarrow on the server"
+        )
+
+    media_type, extension = export.EXPORT_FORMATS[format.value]
+    return StreamingResponse(
+        export.encode(format.value, iter_sightings(order=order.value, **filters)),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="sightings.{extension}"'},
+    )
 
 
 @router.get("/recent", response_model=list[Sighting])
-def recent_sightings(
-    limit: int = Query(50, ge=1, le=500, description="Maximum number of results")
+async def recent_sightings(
+    request: Request, limit: int = Query(50, ge=1, le=500, description="Maximum number of results")
 ):
     """
     Get the most recent sightings.
@@ -48,4 +161,5 @@ def recent_sightings(
     Query params:
         limit: Maximum results (1-500, default 50)
     """
-    return get_recent_sightings(limit=limit)
+    sightings = await db.read(get_recent_sightings, limit=limit)
+    return encoding.json_response(request, encoding.shape(Sighting, sightings))
@@ -0,0 +1,147 @@
+"""API routes for "who probes for this network" queries over the SSID index."""
+
+from fastapi import APIRouter, HTTPException, Query, Request
+
+from probe_sniffer.api import encoding
+from probe_sniffer.api.cache import cache
+from probe_sniffer.storage.aio import db
+from probe_sniffer.storage.ssid_index import (
+    find_ssid_overlap,
+    get_ssid_devices,
+    get_ssid_fingerprints,
+    search_ssids,
+    ssid_similarity,
+)
+
+router = APIRouter(prefix="/ssids", tags=["ssids"])
+
+# The posting lists change with every sighting batch, which also updates device_summary
+# (device postings) and device_fingerprints (fingerprint postings)
+DEVICE_TABLES = ("devices", "device_summary")
+SSID_TABLES = ("device_summary", "device_fingerprints")
+
+MAX_SSIDS = 20
+
+
+@router.get("/search")
+async def search(
+    request: Request,
+    q: str = Query(..., min_length=1, max_length=64),
+    limit: int = Query(20, ge=1, le=100),
+):
+    """
+    SSIDs whose name has words starting with each word of q (case-insensitive), most
+    probed-for first, with how many devices and fingerprints probed for each.
+
+    Supports If-None-Match.
+    """
+
+    async def build():
+        return encoding.dumps({"ssids": await db.read(search_ssids, q, limit=limit)}), {}
+
+    return await cache.respond(request, SSID_TABLES, build)
+
+
+@router.get("/devices")
+async def ssid_devices(
+    request: Request,
+    ssid: list[str] = Query(..., description="SSID; repeat for devices probing for several"),
+    min_match: int | None = Query(None, ge=1, description="At least this many of the SSIDs"),
+    limit: int = Query(50, ge=1, le=500),
+    offset: int = Query(0, ge=0),
+):
+    """
+    Devices that probed for every given SSID (or at least min_match of them), most
+    recently heard first.
+
+    Query params:
+        ssid: Directed SSID, repeated for an intersection (?ssid=Home&ssid=Work)
+        min_match: How many of the SSIDs a device must have probed for (default all)
+        limit: Maximum results (default 50)
+        offset: Skip N results (default 0)
+
+    Supports If-None-Match.
+    """
+    if len(ssid) > MAX_SSIDS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_SSIDS} SSIDs")
+
+    async def build():
+        try:
+            result = await db.read(
+                get_ssid_devices, ssid, min_match=min_match, limit=limit, offset=offset
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        return encoding.dumps({"ssids": ssid, "min_match": min_match, **result}), {}
+
+    return await cache.respond(request, DEVICE_TABLES, build)
+
+
+@router.get("/fingerprints")
+async def ssid_fingerprints(
+    request: Request, ssid: str = Query(...), limit: int = Query(50, ge=1, le=500)
+):
+    """
+    Fingerprints seen probing for an SSID, most sighted first.
+
+    Supports If-None-Match.
+    """
+
+    async def build():
+        fingerprints = await db.read(get_ssid_fingerprints, ssid, limit=limit)
+        if fingerprints is None:
+            raise HTTPException(status_code=404, detail="No device probed for this SSID")
+        return encoding.dumps({"ssid": ssid, "fingerprints": fingerprints}), {}
+
+    return await cache.respond(request, ("device_fingerprints",), build)
+
+
+@router.get("/overlap")
+async def overlap(
+    request: Request,
+    mac: str,
+    min_shared: int = Query(2, ge=1),
+    limit: int = Query(20, ge=1, le=100),
+):
+    """
+    Devices that probed for at least min_shared of the same networks as a device, most
+    similar SSID set (Jaccard similarity) first.
+
+    SSIDs probed for by very many devices (carrier hotspots) don't bring in candidates;
+    see config.SSID_OVERLAP_MAX_DEVICES. Supports If-None-Match.
+    """
+
+    async def build():
+        try:
+            devices = await db.read(find_ssid_overlap, mac, min_shared=min_shared, limit=limit)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid MAC address")
+        if devices is None:
+            raise HTTPException(status_code=404, detail="Device not found")
+        return encoding.dumps({"mac": mac.lower(), "devices": devices}), {}
+
+    return await cache.respond(request, DEVICE_TABLES, build)
+
+
+@router.get("/similarity")
+async def similarity(request: Request, a: str, b: str):
+    """
+    Jaccard similarity of the SSIDs two devices probed for, with the SSIDs they share
+    and the ones only each of them probed for.
+
+    Query params:
+        a, b: MAC addresses of the two devices
+
+    Supports If-None-Match.
+    """
+
+    async def build():
+        try:
+            result = await db.read(ssid_similarity, a, b)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid MAC address")
+        if result is None:
+            raise HTTPException(status_code=404, detail="Device not found")
+        return encoding.dumps(result), {}
+
+    return await cache.respond(request, DEVICE_TABLES, build)
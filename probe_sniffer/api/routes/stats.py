@@ -0,0 +1,129 @@
+"""API routes for dashboard statistics."""
+
+from datetime import datetime
+from enum import Enum
+
+from fastapi import APIRouter, HTTPException, Query
+
+from probe_sniffer import config
+from probe_sniffer.api.schemas import OverviewStats, TopList, UniqueCounts
+from probe_sniffer.heavy_hitters import tracker
+from probe_sniffer.storage.aio import db
+from probe_sniffer.storage.queries import get_overview_stats, get_unique_counts
+from probe_sniffer.utils.time_utils import epoch_to_utc_iso, to_epoch, utc_now
+
+MAX_UNIQUE_BUCKETS = 1000
+
+
+class UniqueSubject(str, Enum):
+    """What /stats/uniques counts"""
+
+    MAC = "mac"
+    FINGERPRINT = "fingerprint"
+
+
+class TopDimension(str, Enum):
+    """What /stats/top ranks"""
+
+    SSID = "ssid"
+    OUI = "oui"
+    FINGERPRINT = "fingerprint"
+
+
+class TopWindow(str, Enum):
+    """Sliding windows kept by heavy_hitters"""
+
+    FIVE_MINUTES = "5m"
+    HOUR = "1h"
+    DAY = "24h"
+
+
+class UniqueStep(int, Enum):
+    """Window size of the /stats/uniques series, in seconds"""
+
+    HOUR = 3600
+    DAY = 86400
+    WEEK = 7 * 86400
+
+
+router = APIRouter(prefix="/stats", tags=["stats"])
+
+
+@router.get("/overview", response_model=OverviewStats)
+async def overview():
+    """
+    Device, fingerprint and probe totals, today's and this week's activity, top
+    manufacturers and SSIDs, and probes per hour and minute.
+
+    Read from counters maintained as sightings are logged, so the cost is the same
+    however large the database is.
+    """
+    return await db.read(get_overview_stats)
+
+
+@router.get("/uniques", response_model=UniqueCounts)
+async def uniques(
+    subject: UniqueSubject = UniqueSubject.MAC,
+    ssid: str | None = Query(None, description="Only count devices that probed this SSID"),
+    since: datetime | None = Query(None, description="Start of the range (default 24h ago)"),
+    until: datetime | None = Query(None, description="End of the range (default now)"),
+    step: UniqueStep | None = Query(None, description="Also count windows of 3600/86400/604800s"),
+):
+    """
+    Estimated unique devices or fingerprints over a time range, from the HyperLogLog
+    sketches. Estimates are within 2 x relative_error of the exact count about 95% of
+    the time.
+
+    Query params:
+        subject: "mac" (default) or "fingerprint"
+        ssid: Only devices that probed this SSID (subject must be "mac")
+        since: Start of the range (optional, UTC if no offset)
+        until: End of the range (optional, UTC if no offset)
+        step: Also return a series of windows of this many seconds from since (optional)
+    """
+    until_ts = to_epoch(until) if until else int(utc_now().timestamp())
+    since_ts = to_epoch(since) if since else until_ts - 86400
+    if since_ts >= until_ts:
+        raise HTTPException(status_code=400, detail="since must be before until")
+    if step and (until_ts - since_ts) / step > MAX_UNIQUE_BUCKETS:
+        raise HTTPException(
+            status_code=400, detail=f"At most {MAX_UNIQUE_BUCKETS} windows, use a larger step"
+        )
+    try:
+        return await db.read(
+            get_unique_counts,
+            subject.value,
+            since_ts,
+            until_ts,
+            ssid=ssid,
+            step=step.value if step else None,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.get("/top", response_model=TopList)
+def top(
+    dimension: TopDimension = TopDimension.SSID,
+    window: TopWindow = TopWindow.HOUR,
+    limit: int = Query(10, ge=1, le=config.TOPK_SNAPSHOT_SIZE),
+):
+    """
+    Most probed-for SSIDs, most common manufacturers or noisiest fingerprints over a
+    sliding window, from the sniffer's streaming top-K (refreshed every few seconds).
+
+    Query params:
+        dimension: "ssid" (default, directed probes only), "oui" or "fingerprint"
+        window: "5m", "1h" (default) or "24h"
+        limit: Number of entries (default 10)
+    """
+    snapshot = tracker.snapshot
+    if snapshot is None:
+        return {"dimension": dimension.value, "window": window.value, "items": []}
+    items = snapshot["windows"][window.value][dimension.value][:limit]
+    return {
+        "dimension": dimension.value,
+        "window": window.value,
+        "updated_at": epoch_to_utc_iso(snapshot["ts"]),
+        "items": [{"key": key, "count": count, "error": error} for key, count, error in items],
+    }
@@ -0,0 +1,60 @@
+"""API routes for device visits (presence intervals)."""
+
+from datetime import datetime
+
+from fastapi import APIRouter, HTTPException, Query, Request
+
+from probe_sniffer.api import encoding
+from probe_sniffer.api.schemas import DevicePresence, Visit
+from probe_sniffer.storage.aio import db
+from probe_sniffer.storage.queries import get_devices_present, get_visits
+from probe_sniffer.utils.time_utils import to_epoch
+
+router = APIRouter(prefix="/visits", tags=["visits"])
+
+
+@router.get("/", response_model=list[Visit])
+async def list_visits(
+    request: Request,
+    mac: str | None = Query(None, description="Filter by device MAC address"),
+    since: datetime | None = Query(None, description="Visits active at or after this time"),
+    until: datetime | None = Query(None, description="Visits starting before this time"),
+    limit: int = Query(100, ge=1, le=1000, description="Maximum number of results"),
+):
+    """
+    List visits, most recent first.
+
+    Query params:
+        mac: Filter by device MAC address (optional)
+        since: Only visits still active at or after this time (optional, UTC if no offset)
+        until: Only visits starting before this time (optional, UTC if no offset)
+        limit: Maximum results (1-1000, default 100)
+    """
+    try:
+        visits = await db.read(
+            get_visits,
+            mac=mac,
+            since=to_epoch(since) if since else None,
+            until=to_epoch(until) if until else None,
+            limit=limit,
+        )
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid MAC address")
+    return encoding.json_response(request, encoding.shape(Visit, visits))
+
+
+@router.get("/present", response_model=list[DevicePresence])
+async def devices_present(
+    request: Request,
+    since: datetime = Query(..., description="Start of the range (UTC if no offset)"),
+    until: datetime = Query(..., description="End of the range (UTC if no offset)"),
+):
+    """
+    Devices present between two times.
+
+    Query params:
+        since: Start of the range
+        until: End of the range
+    """
+    devices = await db.read(get_devices_present, to_epoch(since), to_epoch(until))
+    return encoding.json_response(request, encoding.shape(DevicePresence, devices))
@@ -12,6 +12,7 @@ class Device(BaseModel):
     oui: str | None = None  # Manufacturer from OUI lookup
     ssids: list[str] = []  # Unique SSIDs probed
     total_sightings: int = 0  # Total number of probe requests seen
+    last_dbm: int | None = None  # Signal strength of the latest sighting
 
     class Config:
         from_attributes = True  # Allows conversion from sqlite3.Row
@@ -44,6 +45,9 @@ class Sighting(BaseModel):
     dbm: int
     ssid: str | None = None
     oui: str | None = None
+    ie_fingerprint: str | None = None
+    identity_id: str | None = None
+    channel: int | None = None  # None for sightings stored before channels were
 
     class Config:
         from_attributes = True
@@ -54,8 +58,136 @@ class SightingsResponse(BaseModel):
 
     sightings: list[Sighting]
     total: int
+    total_is_approximate: bool = False  # True when estimated from counters/rollups
     limit: int
     offset: int
+    next_cursor: str | None = None  # Pass as `cursor` for the next page
+    prev_cursor: str | None = None  # Pass as `cursor` for the previous page
+
+
+class Visit(BaseModel):
+    """Presence interval: consecutive sightings of one MAC without an idle gap"""
+
+    visit_id: int
+    mac: str
+    ie_fingerprint: str | None = None
+    start: str
+    end: str
+    duration_seconds: int
+    frame_count: int
+    min_dbm: int | None = None
+    max_dbm: int | None = None
+    avg_dbm: float | None = None
+    ssids: list[str] = []
+
+
+class DevicePresence(BaseModel):
+    """A device present during a time range"""
+
+    mac: str
+    first_seen: str  # Start of its first visit overlapping the range
+    last_seen: str  # End of its last visit overlapping the range
+    visit_count: int
+    frame_count: int
+
+
+class ActivityBucket(BaseModel):
+    """Sighting count and signal stats for one time bucket"""
+
+    start: str  # Bucket start (UTC)
+    count: int
+    avg_dbm: float | None = None
+    min_dbm: int | None = None
+    max_dbm: int | None = None
+
+
+class DeviceActivity(BaseModel):
+    """Activity of a device or fingerprint over a time range, from the rollup tables"""
+
+    resolution: str  # "minute", "hour" or "day"
+    buckets: list[ActivityBucket]
+    by_hour: list[int]  # 24 values, Eastern hour of day
+    by_day_of_week: list[int]  # 7 values, Monday first
+    by_date: dict[str, int]  # Eastern date -> sightings
+
+
+class ActiveDevice(BaseModel):
+    """The device seen most often today"""
+
+    mac: str
+    name: str | None = None
+    sightings: int
+
+
+class ManufacturerCount(BaseModel):
+    """Devices per manufacturer (OUI of each device's first sighting)"""
+
+    oui: str
+    count: int
+
+
+class SsidCount(BaseModel):
+    """Probes for one SSID"""
+
+    ssid: str
+    count: int
+
+
+class OverviewStats(BaseModel):
+    """Dashboard overview; days and weeks are Eastern, weeks start on Monday"""
+
+    total_devices: int
+    total_sightings: int
+    total_fingerprints: int
+    trusted_count: int
+    unknown_count: int  # Devices not marked trusted
+    devices_today: int  # Unique devices seen today
+    devices_this_week: int
+    new_today: int  # Devices seen for the first time today
+    new_this_week: int
+    new_fingerprints_today: int
+    new_fingerprints_this_week: int
+    sightings_today: int
+    most_active_today: ActiveDevice | None = None
+    top_manufacturers: list[ManufacturerCount]
+    top_ssids: list[SsidCount]  # Directed probes only
+    probes_by_hour: list[int]  # Last 24 hours, oldest first
+    probes_per_minute: list[int]  # Last 60 minutes, oldest first
+
+
+class UniqueCount(BaseModel):
+    """Estimated distinct MACs or fingerprints in a time range"""
+
+    since: str  # Range covered (UTC), rounded out to the sketch buckets
+    until: str
+    estimate: int
+
+
+class UniqueCounts(BaseModel):
+    """Unique-device estimates from the HyperLogLog sketches"""
+
+    subject: str  # "mac" or "fingerprint"
+    ssid: str | None = None  # Only devices that probed this SSID
+    relative_error: float  # Standard error of each estimate, e.g. 0.016 = 1.6%
+    total: UniqueCount
+    buckets: list[UniqueCount]  # Windows of `step` seconds, if requested
+
+
+class TopItem(BaseModel):
+    """One heavy hitter; the true count is within error of count"""
+
+    key: str  # SSID, OUI or fingerprint_id
+    count: int
+    error: int
+
+
+class TopList(BaseModel):
+    """Most frequent SSIDs, OUIs or fingerprints over a sliding window"""
+
+    dimension: str  # "ssid", "oui" or "fingerprint"
+    window: str  # "5m", "1h" or "24h"
+    updated_at: str | None = None  # When the sniffer took the snapshot (UTC), None if never
+    items: list[TopItem]
 
 
 class NotifyRequest(BaseModel):
@@ -64,3 +196,11 @@ class NotifyRequest(BaseModel):
     fingerprint: dict
     probe_data: dict
     notification_type: str
+
+
+class LiveFilter(BaseModel):
+    """Server-side filter for a /ws/probes client; clients may send a new one any time"""
+
+    hide_trusted: bool = True  # Skip devices marked trusted
+    oui: str | None = None  # Only this manufacturer
+    min_dbm: int | None = None  # Only probes at least this strong
@@ -0,0 +1,222 @@
+"""
+Columnar micro-batch pipeline for high probe rates.
+
+Parsed probes are appended to a preallocated NumPy structured array and every stage
+after parsing (trusted filtering, OUI resolution, dedup and coalescing) runs on the
+whole batch at once, so a burst costs a handful of array operations instead of one
+Python object and several SQLite round trips per frame.
+
+Enabled with BATCH_SIZE / --batch-size. Needs the optional numpy dependency:
+    pip install probe-sniffer[batch]
+"""
+
+from dataclasses import dataclass
+
+try:
+    import numpy as np
+except ImportError:  # numpy is optional, only needed for batch mode
+    np = None
+
+from probe_sniffer.utils.mac_utils import LOCAL_ADMIN_BIT
+
+# One row per parsed probe; strings live in StringTables and are referenced by id
+PROBE_FIELDS = [
+    ("ts", "i8"),  # epoch seconds
+    ("mac48", "u8"),  # MAC as 48-bit integer
+    ("dbm", "i2"),
+    ("channel", "u1"),
+    ("fp64", "u8"),  # IE fingerprint as integer, 0 if no stable IEs
+    ("oui_id", "i4"),  # resolved in process(), -1 until then
+    ("ssid_id", "i4"),
+    ("seq", "i2"),  # 802.11 sequence number, -1 if unknown
+]
+
+
+class StringTable:
+    """Maps repeated strings (SSIDs, OUI names) to small integer ids and back."""
+
+    def __init__(self):
+        self.ids: dict[str, int] = {}
+        self.values: list[str] = []
+
+    def intern(self, value: str) -> int:
+        """Return the id for value, assigning the next id if it is new."""
+        string_id = self.ids.get(value)
+        if string_id is None:
+            string_id = self.ids[value] = len(self.values)
+            self.values.append(value)
+        return string_id
+
+    def __getitem__(self, string_id: int) -> str:
+        return self.values[string_id]
+
+
+class OuiResolver:
+    """Vectorized OUI lookup: binary search of MAC prefixes in a sorted array."""
+
+    def __init__(self, oui_lookup: dict[int, str], ouis: StringTable):
+        prefixes = sorted(oui_lookup)
+        self.prefixes = np.array(prefixes, dtype="u8")
+        self.oui_ids = np.array([ouis.intern(oui_lookup[p]) for p in prefixes], dtype="i4")
+        self.locally_assigned_id = ouis.intern("Locally Assigned")
+        self.unknown_id = ouis.intern("Unknown OUI")
+
+    def resolve(self, mac48) -> "np.ndarray":
+        """Return the OUI id for every MAC in the array."""
+        local = (mac48 & np.uint64(LOCAL_ADMIN_BIT)) != 0
+        fallback = np.where(local, self.locally_assigned_id, self.unknown_id)
+        if not len(self.prefixes):
+            return fallback
+
+        prefix = mac48 >> np.uint64(24)
+        idx = np.minimum(np.searchsorted(self.prefixes, prefix), len(self.prefixes) - 1)
+        return np.where(self.prefixes[idx] == prefix, self.oui_ids[idx], fallback)
+
+
+@dataclass
+class BatchResult:
+    """
+    Output of ProbeBatch.process().
+
+    Attributes:
+        rows: Deduplicated, non-trusted probes in arrival order
+        devices: Unique MACs with their latest timestamp (coalesced device updates)
+        fingerprints: Unique non-zero fingerprints with latest timestamp and frame count
+        ie_data: First IE structure seen per fingerprint (fp64 -> ie_data)
+        dropped_trusted: Frames removed by the trusted filter
+        dropped_duplicate: Frames removed by dedup
+    """
+
+    rows: "np.ndarray"
+    devices: "np.ndarray"
+    fingerprints: "np.ndarray"
+    ie_data: dict[int, list[dict]]
+    dropped_trusted: int
+    dropped_duplicate: int
+
+
+class ProbeBatch:
+    """
+    Preallocated buffer of parsed probes processed as one vectorized batch.
+
+    Usage:
+        batch = ProbeBatch(512, oui_lookup, trusted_macs)
+        if batch.append(ts, mac, dbm, channel, ssid, fingerprint, ie_data):
+            result = batch.process()  # buffer is full
+    """
+
+    def __init__(self, size: int, oui_lookup: dict[int, str], trusted_macs: set[int]):
+        if np is None:
+            raise RuntimeError("Batch mode requires numpy: pip install probe-sniffer[batch]")
+
+        self.size = size
+        self.buffer = np.zeros(size, dtype=PROBE_FIELDS)
+        self.count = 0
+        self.ssids = StringTable()
+        self.ouis = StringTable()
+        self.oui_resolver = OuiResolver(oui_lookup, self.ouis)
+        self.set_trusted(trusted_macs)
+        # First IE structure seen per fingerprint, needed to create device_fingerprints rows
+        self.ie_data: dict[int, list[dict]] = {}
+
+    def set_trusted(self, trusted_macs: set[int]) -> None:
+        """Replace the trusted MAC list used by the trusted filter."""
+        self.trusted = np.array(sorted(trusted_macs), dtype="u8")
+
+    def append(
+        self,
+        ts: int,
+        mac: int,
+        dbm: int,
+        channel: int,
+        ssid: str,
+        fingerprint: bytes | None,
+        ie_data: list[dict] | None,
+        seq: int | None = None,
+    ) -> bool:
+        """
+        Add one parsed probe to the buffer.
+
+        Returns:
+            True when the buffer is full and should be processed
+        """
+        fp64 = int.from_bytes(fingerprint, "big") if fingerprint else 0
+        if fp64 and ie_data and fp64 not in self.ie_data:
+            self.ie_data[fp64] = ie_data
+
+        self.buffer[self.count] = (
+            ts,
+            mac,
+            dbm,
+            channel,
+            fp64,
+            -1,
+            self.ssids.intern(ssid),
+            -1 if seq is None else seq,
+        )
+        self.count += 1
+        return self.count >= self.size
+
+    def __len__(self) -> int:
+        return self.count
+
+    def process(self) -> BatchResult:
+        """Run the vectorized stages over the buffered probes and reset the buffer."""
+        rows = self.buffer[: self.count].copy()
+        ie_data, self.ie_data = self.ie_data, {}
+        self.count = 0
+
+        # Trusted filtering
+        if len(self.trusted):
+            keep = ~np.isin(rows["mac48"], self.trusted)
+            dropped_trusted = int(len(rows) - keep.sum())
+            rows = rows[keep]
+        else:
+            dropped_trusted = 0
+
+        # Dedup: the same frame is often heard several times in one second (retries,
+        # adjacent channels). Keep the strongest copy, then restore arrival order.
+        before_dedup = len(rows)
+        if before_dedup:
+            strongest_first = np.argsort(-rows["dbm"].astype("i4"), kind="stable")
+            keys = rows[["ts", "mac48", "fp64", "ssid_id"]][strongest_first]
+            _, first = np.unique(keys, return_index=True)
+            rows = rows[np.sort(strongest_first[first])]
+
+        # OUI resolution
+        rows["oui_id"] = self.oui_resolver.resolve(rows["mac48"])
+
+        return BatchResult(
+            rows=rows,
+            devices=self._coalesce_devices(rows),
+            fingerprints=self._coalesce_fingerprints(rows),
+            ie_data=ie_data,
+            dropped_trusted=dropped_trusted,
+            dropped_duplicate=before_dedup - len(rows),
+        )
+
+    @staticmethod
+    def _coalesce_devices(rows) -> "np.ndarray":
+        """One (mac48, last_ts) row per device."""
+        macs, inverse = np.unique(rows["mac48"], return_inverse=True)
+        last_ts = np.zeros(len(macs), dtype="i8")
+        np.maximum.at(last_ts, inverse, rows["ts"])
+        devices = np.zeros(len(macs), dtype=[("mac48", "u8"), ("last_ts", "i8")])
+        devices["mac48"] = macs
+        devices["last_ts"] = last_ts
+        return devices
+
+    @staticmethod
+    def _coalesce_fingerprints(rows) -> "np.ndarray":
+        """One (fp64, last_ts, count) row per fingerprint seen in the batch."""
+        fp_rows = rows[rows["fp64"] != 0]
+        fps, inverse, counts = np.unique(fp_rows["fp64"], return_inverse=True, return_counts=True)
+        last_ts = np.zeros(len(fps), dtype="i8")
+        np.maximum.at(last_ts, inverse, fp_rows["ts"])
+        fingerprints = np.zeros(
+            len(fps), dtype=[("fp64", "u8"), ("last_ts", "i8"), ("count", "i8")]
+        )
+        fingerprints["fp64"] = fps
+        fingerprints["last_ts"] = last_ts
+        fingerprints["count"] = counts
+        return fingerprints
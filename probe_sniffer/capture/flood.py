@@ -0,0 +1,289 @@
+"""
+Probe-flood detection and load shedding for the capture path.
+
+A probe-spraying tool or a broken IoT device can send thousands of probe requests a
+second, often from random MACs, and every one of them would otherwise be written to
+SQLite and sent to MQTT and Discord. FloodDetector keeps a baseline of the per-second
+probe rate of every traffic class, as an EWMA of the rate and of its variance:
+
+- ("global", ""): every probe
+- ("oui", name), ("fingerprint", id), ("channel", n): per manufacturer, IE fingerprint
+  and channel
+- ("random_mac", ""): probes from locally administered MACs not heard in the last
+  FLOOD_MAC_MEMORY_SECONDS, i.e. randomized-MAC storms
+
+A class floods as soon as its count within one second passes the larger of
+FLOOD_MIN_RATE and its mean plus FLOOD_SIGMAS standard deviations. Its baseline is
+frozen while it floods, so the flood doesn't become the new normal, and the flood ends
+after FLOOD_QUIET_SECONDS seconds back under that limit.
+
+While a class floods the pipeline sheds it: only every FLOOD_SAMPLE_EVERY'th of its
+probes is kept (and none of those notify), the rest are only counted. The sniffer sums
+them per minute into the same aggregates the load shedder writes (capture/shedding.py),
+so rollups, device summaries and overview counters still cover every probe. The global
+class is only shed when nothing narrower explains the flood. One summary alert covers
+each flood episode, sent once its first full second has been counted; the shed totals
+are logged when the episode ends.
+
+Probes the database has definitely never seen (definitely_new()) are neither shed nor
+sampled, so a device first heard during a flood still gets its sightings and its "new
+device" notification. The exception is a new random MAC during a random-MAC storm:
+that is what the storm is made of, often with a fresh fingerprint every time.
+"""
+
+import logging
+import math
+import threading
+from collections import Counter
+from dataclasses import dataclass, field
+
+from probe_sniffer import config
+from probe_sniffer.models.probe import NO_STABLE_IES
+from probe_sniffer.notifications.discord import post_flood_alert
+from probe_sniffer.storage.seen import seen_filters
+from probe_sniffer.utils.mac_utils import is_locally_administered
+
+logger = logging.getLogger("GENERAL")
+
+GLOBAL = ("global", "")
+RANDOM_MAC = ("random_mac", "")
+
+# check() verdicts
+KEEP, SAMPLE, SHED = range(3)
+
+
+class Baseline:
+    """EWMA of one class's per-second rate and its variance."""
+
+    __slots__ = ("mean", "var", "limit")
+
+    def __init__(self, limit: float):
+        self.mean = 0.0
+        self.var = 0.0
+        self.limit = limit
+
+    def update(self, rate: int, alpha: float, sigmas: float, min_rate: int) -> None:
+        diff = rate - self.mean
+        self.mean += alpha * diff
+        self.var = (1 - alpha) * (self.var + alpha * diff * diff)
+        self.limit = max(min_rate, self.mean + sigmas * math.sqrt(self.var))
+
+
+@dataclass
+class Flood:
+    """One flooding class."""
+
+    kind: str
+    key: object
+    started: int
+    baseline: float  # Rate the class was normally at, probes/second
+    peak: int = 0  # Highest rate seen in one second
+    seen: int = 0
+    shed: int = 0
+    quiet: int = 0  # Consecutive seconds back under the limit
+
+
+@dataclass
+class Episode:
+    """Floods overlapping in time, reported together."""
+
+    started: int
+    floods: list[Flood] = field(default_factory=list)
+    alerted: bool = False
+
+
+class FloodDetector:
+    """
+    Rate baselines per traffic class and the shedding decision for each probe.
+
+    Timestamps are the probes' own epoch seconds; a probe older than the current
+    second is counted in the current second.
+    """
+
+    def __init__(
+        self,
+        alpha: float = config.FLOOD_EWMA_ALPHA,
+        sigmas: float = config.FLOOD_SIGMAS,
+        min_rate: int = config.FLOOD_MIN_RATE,
+        quiet_seconds: int = config.FLOOD_QUIET_SECONDS,
+        sample_every: int = config.FLOOD_SAMPLE_EVERY,
+        mac_memory_seconds: int = config.FLOOD_MAC_MEMORY_SECONDS,
+        max_classes: int = config.FLOOD_MAX_CLASSES,
+        on_alert=None,
+        exempt=None,
+    ):
+        self.alpha = alpha
+        self.sigmas = sigmas
+        self.min_rate = min_rate
+        self.quiet_seconds = quiet_seconds
+        self.sample_every = sample_every
+        self.mac_memory_seconds = mac_memory_seconds
+        self.max_classes = max_classes
+        self.on_alert = on_alert  # on_alert(episode), once per episode
+        self.exempt = exempt  # exempt(mac, fingerprint_id): never shed or sample the probe
+        self.baselines: dict[tuple, Baseline] = {}
+        self.floods: dict[tuple, Flood] = {}
+        self.episode: Episode | None = None
+        self.shed_total = 0
+        self.counts = Counter()  # Probes per class in the current second
+        self.second: int | None = None
+        # Locally administered MAC -> last second heard, oldest first
+        self.recent_macs: dict[int, int] = {}
+        # The capture thread and the batch flusher both check probes
+        self._lock = threading.Lock()
+
+    def classes(self, ts: int, mac: int, oui: str, fingerprint_id: str, channel: int) -> list:
+        """Every class a probe belongs to (remembers the MAC for random_mac)."""
+        classes = [GLOBAL, ("oui", oui), ("channel", channel)]
+        if fingerprint_id != NO_STABLE_IES:
+            classes.append(("fingerprint", fingerprint_id))
+        if is_locally_administered(mac):
+            last = self.recent_macs.pop(mac, None)
+            self.recent_macs[mac] = ts
+            if len(self.recent_macs) > config.FLOOD_RECENT_MACS:
+                del self.recent_macs[next(iter(self.recent_macs))]
+            if last is None or ts - last > self.mac_memory_seconds:
+                classes.append(RANDOM_MAC)
+        return classes
+
+    def check(self, ts: int, mac: int, oui: str, fingerprint_id: str, channel: int) -> int:
+        """
+        Count one probe and decide what the pipeline does with it.
+
+        Returns:
+            KEEP, SAMPLE (keep it for storage and the live feed, but don't notify) or
+            SHED (drop it)
+        """
+        with self._lock:
+            return self._check(ts, mac, oui, fingerprint_id, channel)
+
+    def _check(self, ts: int, mac: int, oui: str, fingerprint_id: str, channel: int) -> int:
+        if self.second is None:
+            self.second = ts
+        elif ts > self.second:
+            self._close_seconds(ts)
+
+        flooding = None
+        classes = self.classes(ts, mac, oui, fingerprint_id, channel)
+        for cls in classes:
+            count = self.counts[cls] = self.counts[cls] + 1
+            flood = self.floods.get(cls)
+            if flood is None:
+                baseline = self.baselines.get(cls)
+                if count <= (baseline.limit if baseline else self.min_rate):
+                    continue
+                flood = self._start(cls, ts, baseline)
+            if cls != GLOBAL or flooding is None:
+                flooding = flood
+        if flooding is None or (flooding.kind == "global" and len(self.floods) > 1):
+            return KEEP
+        # New MACs (and their fingerprints) are what a random-MAC storm is made of
+        storm = RANDOM_MAC in classes and RANDOM_MAC in self.floods
+        if self.exempt is not None and not storm and self.exempt(mac, fingerprint_id):
+            return KEEP
+
+        flooding.seen += 1
+        if flooding.seen % self.sample_every == 1 or self.sample_every == 1:
+            return SAMPLE
+        flooding.shed += 1
+        self.shed_total += 1
+        return SHED
+
+    def _start(self, cls: tuple, ts: int, baseline: Baseline | None) -> Flood:
+        flood = self.floods[cls] = Flood(
+            cls[0], cls[1], ts, round(baseline.mean, 1) if baseline else 0.0
+        )
+        if self.episode is None:
+            self.episode = Episode(ts)
+        self.episode.floods.append(flood)
+        logger.warning(f"Probe flood from {cls[0]} {cls[1]!r} (baseline {flood.baseline}/s)")
+        return flood
+
+    def _close_seconds(self, ts: int) -> None:
+        """Fold the finished second(s) into the baselines and floods."""
+        counts, self.counts = self.counts, Counter()
+        # Seconds without any probes count as zeros; after ~5 / alpha of them every
+        # baseline has decayed to nothing, so longer gaps don't need more updates
+        idle = min(ts - self.second - 1, math.ceil(5 / self.alpha))
+        self.second = ts
+
+        for cls, flood in list(self.floods.items()):
+            rate = counts.get(cls, 0)
+            flood.peak = max(flood.peak, rate)
+            baseline = self.baselines.get(cls)
+            if rate > (baseline.limit if baseline else self.min_rate):
+                flood.quiet = 0
+            else:
+                flood.quiet += 1 + idle
+                if flood.quiet >= self.quiet_seconds:
+                    del self.floods[cls]
+
+        for cls, rate in counts.items():
+            if cls in self.floods:
+                continue  # Frozen while flooding
+            baseline = self.baselines.get(cls)
+            if baseline is None:
+                if len(self.baselines) >= self.max_classes:
+                    continue
+                baseline = self.baselines[cls] = Baseline(self.min_rate)
+            baseline.update(rate, self.alpha, self.sigmas, self.min_rate)
+        for cls, baseline in list(self.baselines.items()):
+            if cls in self.floods:
+                continue
+            for _ in range(idle if cls in counts else idle + 1):
+                baseline.update(0, self.alpha, self.sigmas, self.min_rate)
+            if baseline.mean < 0.01:
+                del self.baselines[cls]  # Idle classes stop costing memory
+
+        episode = self.episode
+        if episode is None:
+            return
+        if not episode.alerted:
+            episode.alerted = True
+            if self.on_alert:
+                self.on_alert(episode)
+        if not self.floods:
+            shed = sum(flood.shed for flood in episode.floods)
+            logger.warning(
+                f"Probe flood over after {ts - episode.started}s: "
+                + ", ".join(
+                    f"{flood.kind} {flood.key!r} peaked at {flood.peak}/s"
+                    for flood in episode.floods
+                )
+                + f"; {shed} probes shed"
+            )
+            self.episode = None
+
+
+def alert_payload(episode: Episode) -> dict:
+    """The probe_data of a "flood" notification: a summary of the episode so far."""
+    return {
+        "started": episode.started,
+        "floods": [
+            {
+                "kind": flood.kind,
+                "key": flood.key,
+                "baseline": flood.baseline,
+                "peak": flood.peak,
+                "shed": flood.shed,
+            }
+            for flood in episode.floods
+        ],
+    }
+
+
+def definitely_new(mac: int, fingerprint_id: str) -> bool:
+    """
+    True if the seen-before filters say the probe's fingerprint, or its globally
+    administered MAC, was never stored. Random MACs are new all the time (a random-MAC
+    storm is made of them), so a new random MAC alone doesn't count.
+    """
+    seen = seen_filters()
+    if fingerprint_id != NO_STABLE_IES and seen.unseen_fingerprints([fingerprint_id]):
+        return True
+    return not is_locally_administered(mac) and bool(seen.unseen_macs([mac]))
+
+
+detector = FloodDetector(
+    on_alert=lambda episode: post_flood_alert(alert_payload(episode)), exempt=definitely_new
+)
@@ -0,0 +1,172 @@
+"""
+Online linking of randomized MACs into logical devices.
+
+Phones rotate their locally administered (random) MAC every few minutes, so each
+rotation looks like a new device. MacLinker follows every random MAC it hears as a
+track and, when a new one appears, looks for the track it continues: one that went
+quiet less than LINK_WINDOW_SECONDS ago and hasn't been continued yet. Candidates
+must have the same IE fingerprint (or both none), and are scored on
+
+- 802.11 sequence numbers: many devices keep counting across a rotation, so a new
+  MAC starting just after an old one's last number (within LINK_SEQ_GAP) continues it
+- signal strength: within LINK_RSSI_DB of the old MAC's last reading, i.e. the same spot
+- probed SSIDs: a directed probe for an SSID the old MAC probed for
+- the gap since the old MAC was last heard
+
+The best candidate is linked if it scores at least LINK_MIN_SCORE and beats the next
+best by LINK_MARGIN; otherwise the MAC starts a new identity. The decision is made on
+the MAC's first frame and not revisited. Identity ids are
+"rand-" plus the hex of the chain's first MAC, written to the sightings' identity_id
+(see log_sightings_batch). Globally unique MACs aren't linked.
+
+Memory is bounded: tracks are forgotten LINK_MEMORY_SECONDS after their MAC was last
+heard, or oldest first beyond LINK_MAX_TRACKS, and at most LINK_MAX_CANDIDATES of the
+most recently quiet tracks are scored per new MAC. State is not persisted, so MACs
+heard again after a restart start new identities.
+"""
+
+import logging
+
+from probe_sniffer import config
+from probe_sniffer.models.probe import NO_STABLE_IES
+from probe_sniffer.utils.mac_utils import is_locally_administered
+
+logger = logging.getLogger("GENERAL")
+
+UNDIRECTED = "Undirected Probe"
+MAX_TRACK_SSIDS = 32
+SEQ_MODULO = 4096  # 12-bit sequence numbers
+
+
+class Track:
+    """One random MAC as heard so far."""
+
+    __slots__ = ("identity_id", "last_ts", "seq", "dbm", "fingerprint_id", "ssids", "open")
+
+    def __init__(self, identity_id: str, ts: int, seq, dbm: int, fingerprint_id: str):
+        self.identity_id = identity_id
+        self.last_ts = ts
+        self.seq = seq
+        self.dbm = dbm
+        self.fingerprint_id = fingerprint_id
+        self.ssids: set[str] = set()  # Directed probes only
+        self.open = True  # Not continued by another MAC yet
+
+
+class MacLinker:
+    """Assigns each random MAC an identity, continuing the MAC it replaced."""
+
+    def __init__(
+        self,
+        window_seconds: int = config.LINK_WINDOW_SECONDS,
+        memory_seconds: int = config.LINK_MEMORY_SECONDS,
+        max_tracks: int = config.LINK_MAX_TRACKS,
+        max_candidates: int = config.LINK_MAX_CANDIDATES,
+        seq_gap: int = config.LINK_SEQ_GAP,
+        rssi_db: float = config.LINK_RSSI_DB,
+        min_score: float = config.LINK_MIN_SCORE,
+        margin: float = config.LINK_MARGIN,
+    ):
+        self.window_seconds = window_seconds
+        self.memory_seconds = memory_seconds
+        self.max_tracks = max_tracks
+        self.max_candidates = max_candidates
+        self.seq_gap = seq_gap
+        self.rssi_db = rssi_db
+        self.min_score = min_score
+        self.margin = margin
+        # MAC -> track, least recently heard first
+        self.tracks: dict[int, Track] = {}
+        # Fingerprint -> MAC -> open track, least recently heard first
+        self.open_tracks: dict[str, dict[int, Track]] = {}
+        self.linked = 0
+        self.created = 0
+
+    def assign(
+        self, ts: int, mac: int, dbm: int, ssid: str, fingerprint_id: str, seq: int | None = None
+    ) -> str | None:
+        """
+        Record one sighting and return the identity of its MAC.
+
+        Args:
+            seq: 802.11 sequence number of the frame, None if unknown
+
+        Returns:
+            The identity_id, or None for globally unique MACs
+        """
+        if not is_locally_administered(mac):
+            return None
+        track = self.tracks.pop(mac, None)
+        if track is None:
+            self._expire(ts)
+            track = self._start(ts, mac, dbm, ssid, fingerprint_id, seq)
+        else:
+            track.last_ts = max(track.last_ts, ts)
+            track.dbm = dbm
+            if seq is not None:
+                track.seq = seq
+        self.tracks[mac] = track
+
+        if ssid != UNDIRECTED and len(track.ssids) < MAX_TRACK_SSIDS:
+            track.ssids.add(ssid)
+        if track.open:
+            open_tracks = self.open_tracks[track.fingerprint_id]
+            open_tracks.pop(mac, None)
+            open_tracks[mac] = track
+        return track.identity_id
+
+    def _start(self, ts: int, mac: int, dbm: int, ssid: str, fingerprint_id: str, seq) -> Track:
+        open_tracks = self.open_tracks.setdefault(fingerprint_id, {})
+        scored = []
+        for index, (other_mac, other) in enumerate(reversed(open_tracks.items())):
+            if index == self.max_candidates:
+                break
+            if ts - other.last_ts > self.window_seconds:
+                break  # Older ones are further out of the window
+            if other.last_ts >= ts:
+                continue  # Still being heard, so not the MAC this one replaced
+            scored.append((self._score(other, ts, dbm, ssid, fingerprint_id, seq), other_mac))
+        scored.sort(reverse=True)
+
+        if scored and scored[0][0] >= self.min_score:
+            if len(scored) == 1 or scored[0][0] - scored[1][0] >= self.margin:
+                previous = open_tracks.pop(scored[0][1])
+                previous.open = False
+                self.linked += 1
+                track = Track(previous.identity_id, ts, seq, dbm, fingerprint_id)
+                track.ssids = set(previous.ssids)
+                return track
+
+        self.created += 1
+        return Track(f"rand-{mac:012x}", ts, seq, dbm, fingerprint_id)
+
+    def _score(self, track: Track, ts: int, dbm: int, ssid: str, fingerprint_id: str, seq):
+        score = 2.0 if fingerprint_id != NO_STABLE_IES else 0.0  # Same stable IEs
+        if seq is not None and track.seq is not None:
+            if 0 < (seq - track.seq) % SEQ_MODULO <= self.seq_gap:
+                score += 3.0
+        score += 1.0 - abs(dbm - track.dbm) / self.rssi_db
+        if ssid != UNDIRECTED and track.ssids:
+            score += 1.5 if ssid in track.ssids else -1.0
+        return score + 1.0 - (ts - track.last_ts) / self.window_seconds
+
+    def _expire(self, ts: int) -> None:
+        """Forget idle tracks and close the ones out of the linking window."""
+        tracks = self.tracks
+        while tracks:
+            mac, track = next(iter(tracks.items()))
+            if ts - track.last_ts <= self.memory_seconds and len(tracks) < self.max_tracks:
+                break
+            del tracks[mac]
+            if track.open:
+                self._close(mac, track)
+
+    def _close(self, mac: int, track: Track) -> None:
+        track.open = False
+        open_tracks = self.open_tracks[track.fingerprint_id]
+        del open_tracks[mac]
+        if not open_tracks:
+            del self.open_tracks[track.fingerprint_id]
+
+
+linker = MacLinker()
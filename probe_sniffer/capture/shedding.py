@@ -0,0 +1,159 @@
+"""
+Adaptive load shedding between capture and storage.
+
+When SQLite can't keep up, the sightings writer falls behind and frames pile up in
+front of it. LoadShedder turns that backlog into a shedding level from 0 (keep
+everything) to SHED_MAX_LEVEL: every write reports how many batches were waiting
+behind it and how long its batch waited, and the level steps up while either is over
+its target (SHED_MAX_QUEUE_BATCHES, SHED_TARGET_LATENCY_SECONDS) and back down once
+both are under half of it.
+
+Never shed, at any level:
+
+- frames from MACs and fingerprints not seen in an earlier minute; never-seen devices
+  drive the "new device" notifications, so their whole first minute is kept
+- the first frame of every MAC and fingerprint in each minute, so visits, unique-device
+  sketches and active-device counts stay exact
+
+At level L only every 2**L-th further frame of a device within a minute is kept.
+Shed frames are not dropped without a trace: they are summed per (minute, MAC, SSID,
+OUI, fingerprint) and passed to log_sightings_batch(shed=...), which adds them to the
+activity rollups, device summaries and overview counters. Counts and signal stats stay
+exact; only the raw sighting rows are missing, and a device's latest signal reading can
+come from an earlier frame of its last minute. Probes shed by the flood detector
+(capture/flood.py) are summed into the same rows by aggregate_shed().
+
+Only batch mode sheds. The per-frame handler writes each sighting on the capture thread
+before reading the next frame, so storage can't fall behind it: there is no queue for
+a level to be measured from, and a slow database slows capture down instead.
+"""
+
+import logging
+
+from probe_sniffer import config
+from probe_sniffer.models.probe import NO_STABLE_IES
+
+logger = logging.getLogger("GENERAL")
+
+
+class LoadShedder:
+    """Shedding level from writer backlog, and which frames of a batch to keep."""
+
+    def __init__(
+        self,
+        target_latency: float = config.SHED_TARGET_LATENCY_SECONDS,
+        max_queue: int = config.SHED_MAX_QUEUE_BATCHES,
+        max_level: int = config.SHED_MAX_LEVEL,
+        known_keys: int = config.SHED_KNOWN_KEYS,
+    ):
+        self.target_latency = target_latency
+        self.max_queue = max_queue
+        self.max_level = max_level
+        self.known_keys = known_keys
+        self.level = 0
+        self.shed_total = 0
+        # MAC (int) or fingerprint (hex str) -> minute first seen, oldest first. Evicted
+        # keys count as never seen again, which only means keeping more.
+        self.known: dict = {}
+        self.minute = 0
+        self.repeats: dict = {}  # MAC or fingerprint -> frames in the current minute
+
+    def observe(self, queue_depth: int, latency: float) -> int:
+        """
+        Adjust the level after a write.
+
+        Args:
+            queue_depth: Batches waiting behind the one just written
+            latency: Seconds from the batch being queued to it being written
+
+        Returns:
+            The new level
+        """
+        pressure = max(queue_depth / self.max_queue, latency / self.target_latency)
+        if pressure > 1 and self.level < self.max_level:
+            self.level += 1
+            logger.warning(
+                f"Storage falling behind ({queue_depth} batches queued, {latency:.2f}s): "
+                f"keeping 1 in {1 << self.level} repeat sightings"
+            )
+        elif pressure < 0.5 and self.level:
+            self.level -= 1
+            if not self.level:
+                logger.info("Storage caught up, no longer shedding")
+        return self.level
+
+    def _seen(self, key, minute: int) -> bool:
+        """True if key was seen in an earlier minute; remembers it otherwise."""
+        first = self.known.get(key)
+        if first is None:
+            self.known[key] = minute
+            if len(self.known) > self.known_keys:
+                del self.known[next(iter(self.known))]
+            return False
+        return first < minute
+
+    def _repeat(self, key) -> int:
+        """Frames of key in the current minute before this one."""
+        count = self.repeats.get(key, 0)
+        self.repeats[key] = count + 1
+        return count
+
+    def filter(self, sightings: list[tuple]) -> tuple[list[tuple], list[tuple]]:
+        """
+        Split a batch into the sightings to write and aggregates of the shed ones.
+
+        Args:
+            sightings: (ts, mac, dbm, ssid, oui, ie_fingerprint, channel) per sighting
+
+        Returns:
+            (kept sightings, shed rows); a shed row is (minute, mac, ssid, oui,
+            ie_fingerprint, count, dbm_count, dbm_sum, min_dbm, max_dbm)
+        """
+        every = 1 << self.level
+        kept, shed = [], []
+        for row in sightings:
+            ts, mac, dbm, ssid, oui, fingerprint_id, _channel = row
+            minute = ts - ts % 60
+            if minute > self.minute:
+                self.minute = minute
+                self.repeats.clear()
+
+            keep = not self._seen(mac, minute)
+            repeat = self._repeat(mac)
+            if fingerprint_id != NO_STABLE_IES:
+                keep = not self._seen(fingerprint_id, minute) or keep
+                keep = self._repeat(fingerprint_id) == 0 or keep
+            if keep or repeat % every == 0:
+                kept.append(row)
+            else:
+                shed.append(row)
+
+        self.shed_total += len(shed)
+        return kept, aggregate_shed(shed)
+
+
+def aggregate_shed(sightings: list[tuple]) -> list[tuple]:
+    """
+    Sum frames left out of the sightings per (minute, MAC, SSID, OUI, fingerprint), as
+    log_sightings_batch(shed=...) takes them.
+
+    Args:
+        sightings: (ts, mac, dbm, ssid, oui, ie_fingerprint, channel) per shed frame
+
+    Returns:
+        (minute, mac, ssid, oui, ie_fingerprint, count, dbm_count, dbm_sum, min_dbm,
+        max_dbm) per group
+    """
+    shed = {}
+    for ts, mac, dbm, ssid, oui, fingerprint_id, _channel in sightings:
+        minute = ts - ts % 60
+        stats = shed.get((minute, mac, ssid, oui, fingerprint_id))
+        if stats is None:
+            stats = shed[minute, mac, ssid, oui, fingerprint_id] = [0, 0, 0, dbm, dbm]
+        stats[0] += 1
+        if dbm is not None:
+            stats[1] += 1
+            stats[2] += dbm
+            stats[3] = dbm if stats[3] is None else min(stats[3], dbm)
+            stats[4] = dbm if stats[4] is None else max(stats[4], dbm)
+    return [key + tuple(stats) for key, stats in shed.items()]
@@ -1,26 +1,40 @@
 import argparse
 import csv
+import json
 import logging
 import os
+import queue
 import random
-import requests
 import sys
+import threading
+import time
 from pathlib import Path
 
 from dotenv import load_dotenv
 from scapy.all import sniff, Dot11ProbeReq
 from paho.mqtt import client as mqtt_client, enums as paho_enums
 
-from probe_sniffer import config
-from probe_sniffer.storage.database import init_database
+from probe_sniffer import config, heavy_hitters, ipc
+from probe_sniffer.storage.database import (
+    backfill_compact_sightings,
+    drop_expired_partitions,
+    init_database,
+)
 from probe_sniffer.storage.queries import (
+    get_fingerprint_counts_since,
     get_trusted_devices,
     log_sighting,
+    log_sightings_batch,
     should_notify_fingerprint,
 )
+from probe_sniffer.storage.seen import seen_filters
 from probe_sniffer.notifications import discord as discord_notifier
-from probe_sniffer.utils import probe_utils, time_utils
-from probe_sniffer.models.probe import Probe
+from probe_sniffer.utils import mac_utils, probe_utils, time_utils
+from probe_sniffer.models.probe import NO_STABLE_IES, Probe, csv_line, live_payload, mqtt_payload
+from probe_sniffer.capture.batch import BatchResult, ProbeBatch
+from probe_sniffer.capture import flood
+from probe_sniffer.capture.linker import linker
+from probe_sniffer.capture.shedding import LoadShedder, aggregate_shed
 
 load_dotenv()
 
@@ -45,21 +59,24 @@ handler = logging.FileHandler(sniff_logs, mode="a")
 handler.setFormatter(formatter)
 general_logger.addHandler(handler)
 
-# Python Dict built to hold all known devices and known mac->manufacturer designations
-OUIMEM = {}
+# Full MACs (as ints) from the trusted device table; their probes are not logged
+TRUSTED_MACS: set[int] = set()
+# 24-bit OUI prefix -> interned manufacturer name
+OUIMEM: dict[int, str] = {}
 
 
 def build_oui_lookup() -> None:
     """
-    Builds OUIMEM dictionary for quick manufacturer lookup.
-    First adds trusted device *full mac addresses* from SQLite to the dictionary before adding all manufacturers from saved OUI.txt file
+    Builds TRUSTED_MACS and the OUIMEM dictionary for quick manufacturer lookup.
+    First loads trusted device *full mac addresses* from SQLite before adding all manufacturers from saved OUI.txt file
+    Manufacturer names are interned so every probe record shares one string per vendor.
     Eventually it would be good to curl OUI.txt from wireshark each day...
     """
     try:
         # Fetch trusted devices from SQLite
         trusted_macs = get_trusted_devices()
         for mac in trusted_macs:
-            OUIMEM[mac.lower()] = "Trusted Device"
+            TRUSTED_MACS.add(mac_utils.mac_to_int(mac))
     except Exception as e:
         general_logger.error(f"Failed to fetch trusted devices: {e}")
 
@@ -71,10 +88,27 @@ def build_oui_lookup() -> None:
         "r",
     ) as OUILookup:
         for line in csv.reader(OUILookup, delimiter="\t"):
-            if not line or line[0][0] == "#":
+            # Skip comments and the MA-M/MA-S blocks (e.g. 00:1B:C5:00:00/36), which
+            # only name part of a 24-bit OUI
+            if not line or line[0][0] == "#" or "/" in line[0]:
                 continue
             else:
-                OUIMEM[line[0].rstrip(" ")] = line[2]
+                prefix = int(line[0].rstrip(" ").replace(":", ""), 16)
+                OUIMEM[prefix] = sys.intern(line[2])
+
+
+def apply_config_change(payload: bytes) -> None:
+    """Apply a config change sent by the API over the IPC channel."""
+    message = json.loads(payload)
+    if message.get("kind") == "trusted":
+        mac = mac_utils.mac_to_int(message["mac"])
+        if message["is_trusted"]:
+            TRUSTED_MACS.add(mac)
+        else:
+            TRUSTED_MACS.discard(mac)
+        general_logger.info(f"Trusted list updated: {message['mac']} -> {message['is_trusted']}")
+    else:
+        general_logger.debug(f"Ignoring config change: {message}")
 
 
 # MQTT Configuration
@@ -115,95 +149,295 @@ def connect_mqtt():
     return client
 
 
-# Creates packet handler with MQTT client in closure
+def decode_ssid(packet) -> str:
+    """Return the probed SSID, or "Undirected Probe" for wildcard/garbled SSIDs."""
+    ssid = "Undirected Probe"
+    try:
+        if "\x00" not in packet[Dot11ProbeReq].info.decode("utf-8", "ignore"):
+            if str(packet.info):
+                decoded = str(packet.info.decode("utf-8", "ignore"))
+                ssid = decoded if decoded != "" else "Undirected Probe"
+    except UnicodeDecodeError:
+        general_logger.error(
+            "Unicode decode error: ",
+            packet[Dot11ProbeReq].info.decode("utf-8", "ignore"),
+        )
+    return ssid
+
+
+# Creates packet handler with MQTT client in closure. Each frame is stored before the
+# next one is read, so nothing backs up and there's no load shedding (batch mode only)
 def create_packet_handler(logger: logging):
 
     # Instantiate MQTT Client
     C = connect_mqtt()
+    # Probes the flood detector shed, stored as aggregates once a later minute starts
+    flood_shed: list[Probe] = []
 
     def probe_handler(packet):
-        radio = str(packet.mysummary)
-        log_time = time_utils.get_log_time()
+        # We're only concerned with wifi probes, i.e. packets with Dot11ProbeReq layer
+        if not packet.haslayer(Dot11ProbeReq) or packet.addr2 is None:
+            return
 
-        MAC = str(packet.addr2).upper()
-        clientOUI = MAC[:8]
-        firstOctet = clientOUI[:2]
-        binaryRep = probe_utils.binaryrep(firstOctet)
+        mac = mac_utils.mac_to_int(packet.addr2)
 
-        # We're only concerned with wifi probes, i.e. packets with Dot11ProbeReq layer
-        if packet.haslayer(Dot11ProbeReq):
+        # Handle trusted devices: full MACs from the trusted device table are not logged
+        if mac in TRUSTED_MACS:
+            return
 
-            # Handle trusted devices: if *full MAC address* is found in OUIMEM it came from the trusted device table
-            if OUIMEM.get(MAC.lower()):
-                # Noisy to actually log this but uncomment to debug
-                # general_logger.info(f"{OUIMEM.get(MAC.lower())} seen")
-                pass
-            else:
-                # Extract IE fingerprint for device identification
-                ie_fingerprint, ie_data = probe_utils.extract_ie_fingerprint(packet)
-
-                probe_class = Probe(
-                    log_time,
-                    probe_utils.get_dBm(radio),
-                    probe_utils.get_channel_number(radio),
-                    MAC.lower(),
-                    ie_fingerprint=ie_fingerprint,
-                    ie_data=ie_data,
-                )
-
-                if OUIMEM.get(clientOUI) is not None:
-                    probe_class.oui = OUIMEM.get(clientOUI)
-                else:
-                    if binaryRep[6:7] == "1":
-                        probe_class.oui = "Locally Assigned"
-                    else:
-                        probe_class.oui = "Unknown OUI"
-                try:
-                    if "\x00" not in packet[Dot11ProbeReq].info.decode("utf-8", "ignore"):
-                        if str(packet.info):
-                            decoded = str(packet.info.decode("utf-8", "ignore"))
-                            BSSID = decoded if decoded != "" else "Undirected Probe"
-                            probe_class.ssid = BSSID
-                except UnicodeDecodeError:
-                    general_logger.error(
-                        "Unicode decode error: ",
-                        packet[Dot11ProbeReq].info.decode("utf-8", "ignore"),
+        radio = str(packet.mysummary)
+
+        oui = OUIMEM.get(mac_utils.oui_prefix(mac))
+        if oui is None:
+            oui = "Locally Assigned" if mac_utils.is_locally_administered(mac) else "Unknown OUI"
+
+        ssid = decode_ssid(packet)
+
+        # Extract IE fingerprint for device identification
+        fingerprint, ie_data = probe_utils.extract_ie_fingerprint(packet)
+
+        probe = Probe(
+            int(time.time()),
+            probe_utils.get_dBm(radio),
+            probe_utils.get_channel_number(radio),
+            mac,
+            oui=oui,
+            ssid=ssid,
+            fingerprint=fingerprint,
+            ie_data=ie_data,
+            seq=probe_utils.get_sequence_number(packet),
+        )
+
+        if flood_shed and probe.ts // 60 > flood_shed[0].ts // 60:
+            write_flood_shed(flood_shed)
+            flood_shed.clear()
+
+        # Floods are sampled: shed probes are only counted, sampled ones don't notify
+        verdict = flood.detector.check(probe.ts, mac, oui, probe.fingerprint_hex, probe.channel)
+        if verdict == flood.SHED:
+            flood_shed.append(probe)
+            return
+        # Random MACs continue the identity of the MAC they replaced
+        identity_id = linker.assign(
+            probe.ts, mac, probe.dbm, ssid, probe.fingerprint_hex, probe.seq
+        )
+
+        # Logger writes probe to local CSV file (and STDOUT)
+        logger.info(probe.to_csv())
+        # MQQT Client publishes json-encoded data to broker
+        C.publish(topic, probe.mqtt_json())
+        # Live feed for /ws/probes clients (buffered, never blocks capture)
+        ipc.channel.publish_probes([probe.live_json()])
+        # Streaming top-K, also used by the notification spam filter
+        heavy_hitters.tracker.add_sightings([probe.sighting_params()])
+        # Save sighting to SQLite database and check for notifications
+        try:
+            # log_sighting returns the fingerprint as it was before this sighting, or the
+            # row it inserted
+            fingerprint = log_sighting(probe, identity_id)
+
+            # Check if Discord notification should be sent
+            if fingerprint and verdict == flood.KEEP:
+                should_send, notification_type = should_notify_fingerprint(fingerprint)
+
+                if should_send:
+                    discord_notifier.post_discord_notification(
+                        fingerprint, probe.notification_data(), notification_type
                     )
 
-                # Logger writes probe to local CSV file (and STDOUT)
-                logger.info(probe_class.to_csv())
-                # MQQT Client publishes json-encoded data to broker
-                C.publish(topic, probe_class.mqtt_json())
-                # Save sighting to SQLite database and check for notifications
-                try:
-                    # log_sighting returns OLD fingerprint (before updating last_seen)
-                    old_fingerprint = log_sighting(probe_class.to_sighting_dto())
-
-                    # Check if Discord notification should be sent
-                    if old_fingerprint:
-                        should_send, notification_type = should_notify_fingerprint(old_fingerprint)
-
-                        if should_send:
-                            probe_data = {
-                                "mac": MAC.lower(),
-                                "dbm": probe_class.dBm,
-                                "ssid": probe_class.ssid,
-                                "oui": probe_class.oui,
-                            }
-                            discord_notifier.post_discord_notification(
-                                old_fingerprint, probe_data, notification_type
-                            )
-
-                except Exception as e:
-                    general_logger.error(f"Failed to save sighting: {e}")
+        except Exception as e:
+            general_logger.error(f"Failed to save sighting: {e}")
+
+    return probe_handler
+
+
+def write_flood_shed(probes: list[Probe]) -> None:
+    """Store probes the flood detector shed in per-frame mode as shed aggregates."""
+    devices, fingerprints = {}, {}
+    for probe in probes:
+        seen_at = time_utils.epoch_to_utc_iso(probe.ts)
+        devices[probe.mac_str] = seen_at
+        if probe.fingerprint and probe.ie_data:
+            entry = fingerprints.setdefault(probe.fingerprint_hex, [probe.ie_data, seen_at, 0])
+            entry[1:] = [seen_at, entry[2] + 1]
+    try:
+        log_sightings_batch(
+            [],
+            list(devices.items()),
+            [(fingerprint_id, *entry) for fingerprint_id, entry in fingerprints.items()],
+            aggregate_shed([probe.sighting_params() for probe in probes]),
+        )
+    except Exception as e:
+        general_logger.error(f"Failed to save {len(probes)} flood-shed probes: {e}")
+
+
+def write_batch(
+    result: BatchResult,
+    batch: ProbeBatch,
+    logger: logging,
+    mqtt,
+    shedder: LoadShedder | None = None,
+) -> None:
+    """
+    Emit and persist a processed batch: CSV/MQTT lines per kept probe, then one
+    executemany transaction for sightings, devices and fingerprints.
+
+    Probes shed by the flood detector are left out of the sightings and only counted,
+    as shed aggregates; device and fingerprint last-seen times cover them too. Random MACs are linked into
+    identities. The load shedder, if given, then thins out repeat sightings of known
+    devices, which are only counted.
+    """
+    sightings = []
+    identities = {}  # Random MAC -> identity_id
+    live_payloads = []
+    latest_probe_data = {}
+    sampled = set()  # Fingerprints of flooding classes, which don't notify
+    flood_shed = []
+    for ts, mac, dbm, channel, fp64, oui_id, ssid_id, seq in result.rows.tolist():
+        oui = batch.ouis[oui_id]
+        ssid = batch.ssids[ssid_id]
+        fingerprint_id = f"{fp64:016x}" if fp64 else NO_STABLE_IES
+        verdict = flood.detector.check(ts, mac, oui, fingerprint_id, channel)
+        if verdict == flood.SHED:
+            flood_shed.append((ts, mac, dbm, ssid, oui, fingerprint_id, channel))
+            continue
+        if verdict == flood.SAMPLE:
+            sampled.add(fingerprint_id)
+        mac_str = mac_utils.int_to_mac(mac)
+        identity_id = linker.assign(ts, mac, dbm, ssid, fingerprint_id, seq if seq >= 0 else None)
+        if identity_id:
+            identities[mac] = identity_id
+
+        logger.info(csv_line(ts, dbm, channel, mac_str, oui, ssid))
+        mqtt.publish(topic, mqtt_payload(ts, dbm, channel, mac_str, oui, ssid))
+        live_payloads.append(live_payload(ts, dbm, channel, mac_str, oui, ssid, fingerprint_id))
+        sightings.append((ts, mac, dbm, ssid, oui, fingerprint_id, channel))
+        latest_probe_data[fingerprint_id] = {"mac": mac_str, "dbm": dbm, "ssid": ssid, "oui": oui}
+
+    ipc.channel.publish_probes(live_payloads)
+    heavy_hitters.tracker.add_sightings(sightings)
+
+    devices = [
+        (mac_utils.int_to_mac(mac), time_utils.epoch_to_utc_iso(last_ts))
+        for mac, last_ts in result.devices.tolist()
+    ]
+    fingerprints = [
+        (f"{fp64:016x}", result.ie_data.get(fp64), time_utils.epoch_to_utc_iso(last_ts), count)
+        for fp64, last_ts, count in result.fingerprints.tolist()
+    ]
+
+    shed = aggregate_shed(flood_shed)
+    if shedder is not None:
+        sightings, load_shed = shedder.filter(sightings)
+        shed += load_shed
+
+    try:
+        stored = log_sightings_batch(sightings, devices, fingerprints, shed, identities)
+    except Exception as e:
+        general_logger.error(f"Failed to save batch of {len(sightings)} sightings: {e}")
+        return
+
+    for fingerprint_id, fingerprint in stored.items():
+        # Fingerprints whose every frame was shed have no probe to notify about
+        if fingerprint_id in sampled or fingerprint_id not in latest_probe_data:
+            continue
+        should_send, notification_type = should_notify_fingerprint(fingerprint)
+        if should_send:
+            discord_notifier.post_discord_notification(
+                fingerprint, latest_probe_data[fingerprint_id], notification_type
+            )
+
+
+# Creates batching packet handler; a background thread flushes partial batches and a
+# writer thread stores processed batches, shedding load when it falls behind
+def create_batch_handler(logger: logging, batch_size: int):
+
+    # Instantiate MQTT Client
+    C = connect_mqtt()
+
+    batch = ProbeBatch(batch_size, OUIMEM, TRUSTED_MACS)
+    lock = threading.Lock()
+    # Capture only blocks on storage once SHED_QUEUE_LIMIT batches are waiting
+    pending = queue.Queue(maxsize=config.SHED_QUEUE_LIMIT)
+    shedder = LoadShedder()
+
+    def flush():
+        with lock:
+            if not len(batch):
+                return
+            result = batch.process()
+        pending.put((result, time.monotonic()))
+
+    def write_pending():
+        # Keep draining the queue whatever a batch raises, or capture blocks on a full
+        # queue once this thread is gone
+        while True:
+            result, queued_at = pending.get()
+            try:
+                write_batch(result, batch, logger, C, shedder)
+                shedder.observe(pending.qsize(), time.monotonic() - queued_at)
+            except Exception:
+                general_logger.exception("Failed to write batch; dropping it")
+
+    threading.Thread(target=write_pending, name="batch-writer", daemon=True).start()
+
+    def flush_periodically():
+        while True:
+            time.sleep(config.BATCH_MAX_AGE_SECONDS)
+            flush()
+
+    threading.Thread(target=flush_periodically, name="batch-flush", daemon=True).start()
+
+    def refresh_trusted(payload: bytes):
+        # Runs after apply_config_change has updated TRUSTED_MACS
+        with lock:
+            batch.set_trusted(TRUSTED_MACS)
+
+    ipc.channel.on(ipc.CONFIG, refresh_trusted)
+
+    def probe_handler(packet):
+        # Only parse here; filtering, OUI lookup and storage run per batch
+        if not packet.haslayer(Dot11ProbeReq) or packet.addr2 is None:
+            return
+
+        radio = str(packet.mysummary)
+        fingerprint, ie_data = probe_utils.extract_ie_fingerprint(packet)
+
+        with lock:
+            full = batch.append(
+                int(time.time()),
+                mac_utils.mac_to_int(packet.addr2),
+                probe_utils.get_dBm(radio),
+                probe_utils.get_channel_number(radio),
+                decode_ssid(packet),
+                fingerprint,
+                ie_data,
+                probe_utils.get_sequence_number(packet),
+            )
+        if full:
+            flush()
 
     return probe_handler
 
 
+def publish_heavy_hitters():
+    """Send the API a top-K snapshot for /stats/top every TOPK_PUBLISH_SECONDS."""
+    while True:
+        time.sleep(config.TOPK_PUBLISH_SECONDS)
+        ipc.channel.publish_top(heavy_hitters.tracker.make_snapshot())
+
+
 def main():
     # Arguments for terminal control
     parser = argparse.ArgumentParser()
     parser.add_argument("-m", "--monitor")
+    parser.add_argument(
+        "-b",
+        "--batch-size",
+        type=int,
+        default=config.BATCH_SIZE,
+        help="Process probes in vectorized batches of this size (0 = per-frame, needs numpy)",
+    )
     args = parser.parse_args()
 
     if not args.monitor:
@@ -214,13 +448,33 @@ def main():
 
     # Initialize SQLite database
     init_database()
+    drop_expired_partitions()
+    # Seen-before filters, so the first batches don't wait for them
+    seen_filters()
+    # Move any pre-compaction sightings into the sighting partitions while capture runs
+    threading.Thread(
+        target=backfill_compact_sightings, name="compact-backfill", daemon=True
+    ).start()
 
     logger = logging.getLogger("PROBES")
 
     build_oui_lookup()
 
+    # Notifications and live probes to the API, trusted list changes from it
+    ipc.channel.on(ipc.CONFIG, apply_config_change)
+    ipc.channel.start()
+
+    # Remember the last day's noisiest fingerprints across restarts
+    heavy_hitters.tracker.warm_up(get_fingerprint_counts_since(int(time.time()) - 86400))
+    threading.Thread(target=publish_heavy_hitters, name="heavy-hitters", daemon=True).start()
+
+    if args.batch_size > 0:
+        handler = create_batch_handler(logger, args.batch_size)
+    else:
+        handler = create_packet_handler(logger)
+
     try:
-        sniff(iface=args.monitor, prn=create_packet_handler(logger), store=0)
+        sniff(iface=args.monitor, prn=handler, store=0)
     except Exception as e:
         general_logger.warning(type(e))
         general_logger.exception(e)
@@ -17,3 +17,106 @@ DISCORD_CHANNEL_ID = int(os.getenv("DISCORD_CHANNEL_ID", "0"))
 DISCORD_ENABLED = True
 DISCORD_DRY_RUN = False  # Set False for real notifications
 DISCORD_RETURNING_THRESHOLD_HOURS = 24
+
+# Batch mode: process probes in vectorized batches of this size (0 = per-frame, needs numpy)
+BATCH_SIZE = int(os.getenv("BATCH_SIZE", "0"))
+BATCH_MAX_AGE_SECONDS = 1.0  # Flush partial batches at least this often
+
+# Sighting retention: keep the current month plus this many full months (0 = keep forever)
+RETENTION_MONTHS = int(os.getenv("RETENTION_MONTHS", "0"))
+
+# Visits: a device that is silent for longer than this starts a new visit
+VISIT_IDLE_GAP_SECONDS = int(os.getenv("VISIT_IDLE_GAP_SECONDS", "300"))
+
+# Activity rollups: minute buckets are compacted into hours after this many hours,
+# hour buckets into days after this many days
+ROLLUP_MINUTE_HOURS = 24
+ROLLUP_HOUR_DAYS = 90
+
+# Unique-device sketches: hour sketches are kept this many days, day sketches forever
+SKETCH_HOUR_DAYS = 35
+
+# Streaming top-K (heavy_hitters.py): keys tracked per window slice, and how often the
+# sniffer sends the API the top TOPK_SNAPSHOT_SIZE of every window
+TOPK_CAPACITY = 200
+TOPK_SNAPSHOT_SIZE = 50
+TOPK_PUBLISH_SECONDS = 10.0
+
+# Notification spam filter: no notifications for the NOTIFY_NOISY_TOP most seen
+# fingerprints of the last 24 hours that have at least NOTIFY_NOISY_MIN_SIGHTINGS
+NOTIFY_NOISY_TOP = 10
+NOTIFY_NOISY_MIN_SIGHTINGS = 100
+
+# Probe-flood detection (capture/flood.py): EWMA weight of each second, how far above
+# its baseline a class's rate must go (in standard deviations, and at least
+# FLOOD_MIN_RATE probes/second) to count as a flood, and how many quiet seconds end it.
+# While flooding, one in FLOOD_SAMPLE_EVERY of the class's probes is kept.
+FLOOD_EWMA_ALPHA = 0.05
+FLOOD_SIGMAS = 6.0
+FLOOD_MIN_RATE = 50
+FLOOD_QUIET_SECONDS = 30
+FLOOD_SAMPLE_EVERY = 100
+# A locally administered MAC not heard for this long counts as a new random MAC
+FLOOD_MAC_MEMORY_SECONDS = 300
+FLOOD_RECENT_MACS = 50_000  # Random MACs remembered for that
+FLOOD_MAX_CLASSES = 10_000  # Rate baselines kept (idle classes are forgotten)
+
+# Load shedding (capture/shedding.py, batch mode): processed batches waiting for the
+# writer before capture blocks, and the backlog / wait past which repeat sightings of
+# known devices are sampled, each level halving what is kept down to 1 in 2**SHED_MAX_LEVEL.
+# Per-frame mode (--batch-size 0) never sheds on purpose: it writes each frame on the
+# capture thread, so there is no backlog to measure and a slow write just slows capture
+SHED_QUEUE_LIMIT = 32
+SHED_MAX_QUEUE_BATCHES = 4
+SHED_TARGET_LATENCY_SECONDS = 2.0
+SHED_MAX_LEVEL = 6
+SHED_KNOWN_KEYS = 200_000  # MACs and fingerprints remembered as seen before
+
+# Seen-before filters (storage/seen.py): Bloom filter sizing for the MACs and
+# fingerprints already in the database; they grow past the capacity in stages while
+# keeping the false-positive rate
+SEEN_FILTER_CAPACITY = int(os.getenv("SEEN_FILTER_CAPACITY", "100000"))
+SEEN_FILTER_FP_RATE = float(os.getenv("SEEN_FILTER_FP_RATE", "0.01"))
+
+# Fingerprint similarity (storage/similarity.py): IE-feature Jaccard similarity at which
+# two fingerprints are proposed as one device, LSH buckets larger than this are too
+# generic to pair up, and candidates re-ranked per "similar" query
+SIMILARITY_MERGE_THRESHOLD = 0.8
+SIMILARITY_MAX_BUCKET = 50
+SIMILARITY_MAX_CANDIDATES = 500
+
+# Randomized-MAC linking (capture/linker.py): a new random MAC can continue one quiet
+# for at most LINK_WINDOW_SECONDS; MACs keep their identity for LINK_MEMORY_SECONDS
+# after they were last heard, LINK_MAX_TRACKS at most
+LINK_WINDOW_SECONDS = 300
+LINK_MEMORY_SECONDS = 3600
+LINK_MAX_TRACKS = 50_000
+LINK_MAX_CANDIDATES = 64  # Most recently quiet MACs scored per new MAC
+LINK_SEQ_GAP = 64  # Sequence numbers at most this far ahead continue a MAC
+LINK_RSSI_DB = 8.0  # Signal difference that cancels out a same-spot match
+# Same fingerprint, signal and timing alone stay below it: a link also needs sequence
+# continuity or a directed probe for an SSID the old MAC probed for
+LINK_MIN_SCORE = 4.0
+LINK_MARGIN = 1.0  # Over the runner-up, else the link is ambiguous
+
+# SSID overlap (storage/ssid_index.py): SSIDs probed for by more devices than this
+# (carrier hotspots, airport WiFi) say little about who a device is, so they don't bring
+# in candidates for "devices sharing networks" queries, but still count as shared
+SSID_OVERLAP_MAX_DEVICES = 1000
+SSID_SEARCH_CANDIDATES = 500  # Name matches ranked by device count per search
+
+# API database access (storage.aio): reader threads, calls allowed to wait per pool,
+# and how long a request waits for the database before getting a 503
+DB_READ_THREADS = 4
+DB_MAX_PENDING = 64
+DB_TIMEOUT_SECONDS = 10.0
+
+# Sniffer <-> API message channel (notifications, live probes, config changes)
+IPC_SOCKET_PATH = os.getenv("IPC_SOCKET_PATH", "/tmp/probe-sniffer.sock")
+IPC_BUFFER_FRAMES = 1024  # Frames buffered per class while the API is unreachable
+
+# Live probe feed: per-client /ws/probes backlog; the oldest probes are dropped past this
+LIVE_FEED_QUEUE_SIZE = 256
+
+# API response cache: serialized bodies kept for conditional GETs (see api/cache.py)
+RESPONSE_CACHE_ENTRIES = 256
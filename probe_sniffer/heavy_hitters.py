@@ -0,0 +1,116 @@
+"""
+Most probed-for SSIDs, most common manufacturers and noisiest fingerprints, live.
+
+The sniffer feeds every logged probe to `tracker`, which keeps streaming top-K
+summaries (utils/topk.py) per dimension over sliding windows of 5 minutes, 1 hour
+and 24 hours in bounded memory. Every config.TOPK_PUBLISH_SECONDS it sends the API a
+snapshot over the IPC channel (ipc.TOP); the API's copy of `tracker` only holds the
+latest snapshot, which /stats/top serves.
+
+The notification spam filter asks tracker.is_noisy(): fingerprints among the
+NOTIFY_NOISY_TOP most seen in the last 24 hours (with at least
+NOTIFY_NOISY_MIN_SIGHTINGS sightings) are neighbours' always-on devices, not arrivals.
+At startup the sniffer warms the fingerprint windows up from the minute rollups so a
+restart doesn't forget them.
+"""
+
+import json
+import threading
+import time
+from collections import Counter
+
+from probe_sniffer import config
+from probe_sniffer.models.probe import NO_STABLE_IES
+from probe_sniffer.utils.topk import SlidingTopK
+
+DIMENSIONS = ("ssid", "oui", "fingerprint")
+# Window name -> (seconds, slices)
+WINDOWS = {"5m": (300, 10), "1h": (3600, 12), "24h": (86400, 24)}
+NOISY_WINDOW = "24h"
+NOISY_REFRESH_SECONDS = 10  # How long is_noisy() reuses the noisiest-fingerprints set
+UNDIRECTED = "Undirected Probe"
+
+
+class HeavyHitters:
+    """Sliding top-K per dimension and window, fed by the sniffer."""
+
+    def __init__(self, capacity: int = config.TOPK_CAPACITY):
+        self.windows = {
+            (dimension, name): SlidingTopK(seconds, slices, capacity)
+            for dimension in DIMENSIONS
+            for name, (seconds, slices) in WINDOWS.items()
+        }
+        self.snapshot: dict | None = None  # API side: the latest snapshot received
+        self._noisy: tuple[int, frozenset] = (-NOISY_REFRESH_SECONDS, frozenset())
+        # The capture thread, batch flusher and publisher share the summaries
+        self._lock = threading.Lock()
+
+    def _add(self, counts: Counter) -> None:
+        with self._lock:
+            for (dimension, key, ts), count in counts.items():
+                for name in WINDOWS:
+                    self.windows[dimension, name].add(key, ts, count)
+
+    def add_sightings(self, sightings: list[tuple]) -> None:
+        """
+        Count a batch of sightings, aggregated per key and second first.
+
+        Args:
+            sightings: (ts, mac, dbm, ssid, oui, ie_fingerprint, channel) per sighting
+        """
+        counts = Counter()
+        for ts, _mac, _dbm, ssid, oui, fingerprint_id, _channel in sightings:
+            if ssid != UNDIRECTED:
+                counts["ssid", ssid, ts] += 1
+            counts["oui", oui, ts] += 1
+            if fingerprint_id != NO_STABLE_IES:
+                counts["fingerprint", fingerprint_id, ts] += 1
+        self._add(counts)
+
+    def warm_up(self, fingerprint_counts) -> None:
+        """Seed the fingerprint windows with (fingerprint_id, bucket_ts, count) rollups."""
+        self._add(
+            Counter({("fingerprint", key, ts): count for key, ts, count in fingerprint_counts})
+        )
+
+    def top(self, dimension: str, window: str, n: int, now: int | None = None) -> list:
+        """The n highest (key, count, error) of one dimension over one window."""
+        now = int(time.time()) if now is None else now
+        with self._lock:
+            return self.windows[dimension, window].top(n, now)
+
+    def is_noisy(self, fingerprint_id: str | None, now: int | None = None) -> bool:
+        """True for one of the most seen fingerprints of the last 24 hours."""
+        now = int(time.time()) if now is None else now
+        computed_at, noisy = self._noisy
+        if now - computed_at >= NOISY_REFRESH_SECONDS or now < computed_at:
+            noisy = frozenset(
+                key
+                for key, count, _error in self.top(
+                    "fingerprint", NOISY_WINDOW, config.NOTIFY_NOISY_TOP, now
+                )
+                if count >= config.NOTIFY_NOISY_MIN_SIGHTINGS
+            )
+            self._noisy = (now, noisy)
+        return fingerprint_id in noisy
+
+    def make_snapshot(self, now: int | None = None) -> dict:
+        """Top config.TOPK_SNAPSHOT_SIZE of every dimension and window, for the API."""
+        now = int(time.time()) if now is None else now
+        return {
+            "ts": now,
+            "windows": {
+                name: {
+                    dimension: self.top(dimension, name, config.TOPK_SNAPSHOT_SIZE, now)
+                    for dimension in DIMENSIONS
+                }
+                for name in WINDOWS
+            },
+        }
+
+    def receive_snapshot(self, payload: bytes) -> None:
+        """API side: keep a snapshot sent by the sniffer."""
+        self.snapshot = json.loads(payload)
+
+
+tracker = HeavyHitters()
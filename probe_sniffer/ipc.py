@@ -0,0 +1,264 @@
+"""
+Message channel between the sniffer and the API over a Unix domain socket.
+
+The API listens (api/ipc_server.py); the sniffer connects with IpcClient. Every
+message is one frame: a 4-byte big-endian payload length, a 1-byte message kind and
+the payload. NOTIFY and CONFIG payloads are compact JSON objects; PROBES payloads are
+newline-separated Probe.live_json() lines.
+
+IpcClient never blocks the capture path: messages go into bounded buffers that a
+background thread writes out, reconnecting with backoff whenever the API is down.
+Notifications and config changes are kept across reconnects; live probes are only
+useful while fresh, so the oldest are dropped first when their buffer is full, and a
+new top-K snapshot replaces one still waiting to be sent.
+"""
+
+import json
+import logging
+import select
+import socket
+import struct
+import threading
+import time
+from collections import deque
+from collections.abc import Callable
+
+from probe_sniffer import config
+
+logger = logging.getLogger("IPC")
+
+# Message kinds
+NOTIFY = 1  # sniffer -> API: {"fingerprint", "probe_data", "notification_type"}
+PROBES = 2  # sniffer -> API: live probe JSON lines for /ws/probes
+CONFIG = 3  # either way: {"kind": "trusted", "mac": ..., "is_trusted": ...}
+PING = 4  # either way: answered with PONG carrying the same payload
+PONG = 5
+TOP = 6  # sniffer -> API: heavy_hitters snapshot {"ts", "windows"}
+
+# Only the newest pending frame of these kinds is worth sending
+LATEST_ONLY = {TOP}
+
+HEADER = struct.Struct("!IB")
+MAX_FRAME_BYTES = 1 << 20
+# Live probe payloads are packed into PROBES frames of up to this size
+MAX_PROBES_FRAME_BYTES = 8192
+
+RECONNECT_MIN_SECONDS = 0.1
+RECONNECT_MAX_SECONDS = 5.0
+
+
+def encode_frame(kind: int, payload: bytes) -> bytes:
+    if len(payload) > MAX_FRAME_BYTES:
+        raise ValueError(f"IPC frame of {len(payload)} bytes exceeds {MAX_FRAME_BYTES}")
+    return HEADER.pack(len(payload), kind) + payload
+
+
+def encode_json(message: dict) -> bytes:
+    return json.dumps(message, separators=(",", ":")).encode()
+
+
+class FrameReader:
+    """Splits a byte stream back into (kind, payload) frames."""
+
+    def __init__(self):
+        self.buffer = bytearray()
+
+    def feed(self, data: bytes) -> list[tuple[int, bytes]]:
+        """
+        Add received bytes and return the frames they complete.
+
+        Raises:
+            ValueError: On a frame larger than MAX_FRAME_BYTES (a corrupt stream)
+        """
+        self.buffer += data
+        frames = []
+        start = 0
+        while len(self.buffer) - start >= HEADER.size:
+            length, kind = HEADER.unpack_from(self.buffer, start)
+            if length > MAX_FRAME_BYTES:
+                raise ValueError(f"IPC frame of {length} bytes exceeds {MAX_FRAME_BYTES}")
+            end = start + HEADER.size + length
+            if end > len(self.buffer):
+                break
+            frames.append((kind, bytes(self.buffer[start + HEADER.size : end])))
+            start = end
+        del self.buffer[:start]
+        return frames
+
+
+class IpcClient:
+    """
+    Sniffer side of the channel.
+
+    send() and the helpers built on it only append to a buffer; start() runs the
+    thread that connects, writes buffered frames and dispatches incoming ones to the
+    handlers registered with on(). Handlers run on that thread.
+    """
+
+    def __init__(
+        self,
+        path: str = config.IPC_SOCKET_PATH,
+        buffer_frames: int = config.IPC_BUFFER_FRAMES,
+    ):
+        self.path = path
+        self.handlers: dict[int, list[Callable[[bytes], None]]] = {}
+        self.messages: deque[bytes] = deque()  # NOTIFY/CONFIG/PING, kept across reconnects
+        self.probes: deque[bytes] = deque()  # PROBES, oldest dropped first
+        self.latest: dict[int, bytes] = {}  # LATEST_ONLY kinds, newest frame only
+        self.buffer_frames = buffer_frames
+        self.dropped = 0
+        self.connected = threading.Event()
+        self._lock = threading.Lock()
+        # send() wakes the client thread out of select() by writing a byte here
+        self._wake_r, self._wake_w = socket.socketpair()
+        self._wake_r.setblocking(False)
+        self._wake_w.setblocking(False)
+        self._woken = False
+        self._closed = False
+        self._thread = None
+        self.on(PING, lambda payload: self.send(PONG, payload))
+
+    def on(self, kind: int, handler: Callable[[bytes], None]) -> None:
+        """Call handler(payload) for every incoming frame of this kind."""
+        self.handlers.setdefault(kind, []).append(handler)
+
+    def start(self) -> "IpcClient":
+        self._thread = threading.Thread(target=self._run, name="ipc-client", daemon=True)
+        self._thread.start()
+        return self
+
+    def close(self) -> None:
+        self._closed = True
+        self._wake()
+        if self._thread:
+            self._thread.join()
+
+    def _wake(self) -> None:
+        try:
+            self._wake_w.send(b"\0")
+        except BlockingIOError:
+            pass  # Already plenty of wakeups pending
+
+    def send(self, kind: int, payload: bytes) -> None:
+        """Buffer a frame for the API; drops the oldest buffered frame of its class if full."""
+        queue = self.probes if kind == PROBES else self.messages
+        frame = encode_frame(kind, payload)
+        with self._lock:
+            if kind in LATEST_ONLY:
+                self.latest[kind] = frame
+            else:
+                if len(queue) >= self.buffer_frames:
+                    queue.popleft()
+                    self.dropped += 1
+                queue.append(frame)
+            wake, self._woken = not self._woken, True
+        if wake:
+            self._wake()
+
+    def notify(self, fingerprint: dict, probe_data: dict, notification_type: str) -> None:
+        """Ask the API's Discord bot to post a fingerprint notification."""
+        self.send(
+            NOTIFY,
+            encode_json(
+                {
+                    "fingerprint": fingerprint,
+                    "probe_data": probe_data,
+                    "notification_type": notification_type,
+                }
+            ),
+        )
+
+    def config_changed(self, message: dict) -> None:
+        self.send(CONFIG, encode_json(message))
+
+    def publish_top(self, snapshot: dict) -> None:
+        """Send a heavy_hitters snapshot, replacing any not yet sent."""
+        self.send(TOP, encode_json(snapshot))
+
+    def publish_probes(self, payloads: list[str]) -> None:
+        """Send live probe payloads (Probe.live_json), packed into few frames."""
+        frame = bytearray()
+        for payload in payloads:
+            line = payload.encode()
+            if frame and len(frame) + len(line) + 1 > MAX_PROBES_FRAME_BYTES:
+                self.send(PROBES, bytes(frame))
+                frame = bytearray()
+            if frame:
+                frame += b"\n"
+            frame += line
+        if frame:
+            self.send(PROBES, bytes(frame))
+
+    def _run(self) -> None:
+        backoff = RECONNECT_MIN_SECONDS
+        while not self._closed:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                sock.connect(self.path)
+            except OSError:
+                sock.close()
+                self._wait(backoff)
+                backoff = min(backoff * 2, RECONNECT_MAX_SECONDS)
+                continue
+
+            logger.info(f"Connected to API at {self.path}")
+            backoff = RECONNECT_MIN_SECONDS
+            self.connected.set()
+            try:
+                self._serve(sock)
+            except (OSError, ValueError) as e:
+                logger.warning(f"IPC connection lost: {e}")
+            finally:
+                self.connected.clear()
+                sock.close()
+
+    def _wait(self, timeout: float) -> None:
+        """Sleep until close(), without busy-looping on send() wakeups."""
+        deadline = time.monotonic() + timeout
+        while not self._closed and (remaining := deadline - time.monotonic()) > 0:
+            if select.select([self._wake_r], [], [], remaining)[0]:
+                self._drain_wakeups()
+
+    def _drain_wakeups(self) -> None:
+        try:
+            while self._wake_r.recv(4096):
+                pass
+        except BlockingIOError:
+            pass
+
+    def _serve(self, sock: socket.socket) -> None:
+        reader = FrameReader()
+        while not self._closed:
+            with self._lock:
+                messages, probes = list(self.messages), list(self.probes)
+                latest = list(self.latest.values())
+                self.messages.clear()
+                self.probes.clear()
+                self.latest.clear()
+                self._woken = False
+
+            if messages or probes or latest:
+                try:
+                    sock.sendall(b"".join(messages + latest + probes))
+                except OSError:
+                    # The stream is gone; keep the messages for the next connection
+                    with self._lock:
+                        self.messages.extendleft(reversed(messages))
+                    raise
+
+            readable = select.select([sock, self._wake_r], [], [])[0]
+            if self._wake_r in readable:
+                self._drain_wakeups()
+            if sock in readable:
+                data = sock.recv(65536)
+                if not data:
+                    raise ConnectionResetError("API closed the connection")
+                for kind, payload in reader.feed(data):
+                    for handler in self.handlers.get(kind, ()):
+                        try:
+                            handler(payload)
+                        except Exception as e:
+                            logger.error(f"IPC handler for kind {kind} failed: {e}")
+
+
+channel = IpcClient()
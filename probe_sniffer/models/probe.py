@@ -1,76 +1,118 @@
-import json
-from probe_sniffer.storage.dto import SightingDTO
+from dataclasses import dataclass
+from json.encoder import encode_basestring_ascii as _json_str
 
+from probe_sniffer.utils.mac_utils import int_to_mac, is_locally_administered
+from probe_sniffer.utils.time_utils import epoch_to_log_time, epoch_to_utc_iso
 
+# Stored in place of a fingerprint when a probe carries no stable IEs
+NO_STABLE_IES = "no_stable_ies"
+
+
+def csv_line(ts: int, dbm: int, channel: int, mac: str, oui: str, ssid: str) -> str:
+    """CSV log line shared by the per-frame and batch pipelines."""
+    return f"{epoch_to_log_time(ts)},{dbm} dBm,Ch: {channel},{mac},{oui},{ssid}"
+
+
+def mqtt_payload(ts: int, dbm: int, channel: int, mac: str, oui: str, ssid: str) -> str:
+    """MQTT JSON payload, byte-identical to json.dumps of the equivalent dict."""
+    return (
+        f'{{"timestamp": "{epoch_to_log_time(ts)}", "rssi": {dbm}, '
+        f'"channel": {channel}, "MAC": "{mac}", '
+        f'"clientOUI": {_json_str(oui)}, "SSID": {_json_str(ssid)}}}'
+    )
+
+
+def live_payload(
+    ts: int, dbm: int, channel: int, mac: str, oui: str, ssid: str, fingerprint: str
+) -> str:
+    """/ws/probes JSON payload, shaped like an API sighting without the row ids."""
+    return (
+        f'{{"timestamp": "{epoch_to_utc_iso(ts)}", "mac": "{mac}", "rssi": "{dbm} dBm", '
+        f'"dbm": {dbm}, "ssid": {_json_str(ssid)}, "oui": {_json_str(oui)}, '
+        f'"ie_fingerprint": "{fingerprint}", "channel": {channel}}}'
+    )
+
+
+@dataclass(frozen=True, slots=True)
 class Probe:
     """
-    Class to hold some formatting logic for a wifi probe
+    Compact, immutable record for a single wifi probe.
+
+    Built once per frame in the capture handler and passed unchanged to the CSV
+    logger, MQTT publisher, storage layer and notifier, which all read it directly.
+
+    Attributes:
+        ts: Capture time as epoch seconds
+        dbm: Signal strength in dBm
+        channel: WiFi channel number (0 if unknown)
+        mac: Source MAC address as a 48-bit integer
+        oui: Manufacturer designation (interned)
+        ssid: Probed SSID or "Undirected Probe"
+        fingerprint: 8-byte IE fingerprint, None if the probe had no stable IEs
+        ie_data: Full IE structure for the device_fingerprints table
+        seq: 802.11 sequence number, None if unknown (used to link random MACs)
     """
 
-    def __init__(
-        self,
-        timestamp: str,
-        dBm: int,
-        channel: int,
-        mac: str,
-        oui="Unknown OUI",
-        ssid="Undirected Probe",
-        device_name="",
-        ie_fingerprint: str | None = None,
-        ie_data: list[dict] | None = None,
-    ) -> None:
-        self.timestamp = timestamp
-        self.dBm = dBm
-        self.channel = channel
-        self.mac = mac
-        self.oui = oui
-        self.ssid = ssid
-        self.device_name = device_name
-        self.ie_fingerprint = ie_fingerprint
-        self.ie_data = ie_data
-
-    def mqtt_json(self) -> json:
+    ts: int
+    dbm: int
+    channel: int
+    mac: int
+    oui: str = "Unknown OUI"
+    ssid: str = "Undirected Probe"
+    fingerprint: bytes | None = None
+    ie_data: list[dict] | None = None
+    seq: int | None = None
+
+    @property
+    def mac_str(self) -> str:
+        """MAC address as lowercase 'aa:bb:cc:dd:ee:ff'."""
+        return int_to_mac(self.mac)
+
+    @property
+    def fingerprint_hex(self) -> str:
+        """16-char hex fingerprint as stored in the database."""
+        return self.fingerprint.hex() if self.fingerprint else NO_STABLE_IES
+
+    @property
+    def is_randomized(self) -> bool:
+        """True for locally administered (randomized) MACs."""
+        return is_locally_administered(self.mac)
+
+    def mqtt_json(self) -> str:
         """
         Returns json object to be published to mqtt topic
         """
-        return json.dumps(
-            {
-                "timestamp": self.timestamp,
-                "rssi": self.dBm,
-                "channel": self.channel,
-                "MAC": self.mac,
-                "clientOUI": self.oui,
-                "SSID": self.ssid,
-            }
+        return mqtt_payload(self.ts, self.dbm, self.channel, self.mac_str, self.oui, self.ssid)
+
+    def live_json(self) -> str:
+        """JSON payload for the /ws/probes live feed."""
+        return live_payload(
+            self.ts, self.dbm, self.channel, self.mac_str, self.oui, self.ssid, self.fingerprint_hex
         )
 
     def to_csv(self) -> str:
         """Returns csv string for logging
         024-04-04 14:00:26,-77dBm,8,e2:1d:5e:17:3f:0d,Locally Assigned,Red Sox-2.4
         """
-        return ",".join(
-            [
-                self.timestamp,
-                str(self.dBm) + " dBm",
-                "Ch: " + str(self.channel),
-                self.mac,
-                self.oui,
-                self.ssid,
-            ]
-        )
+        return csv_line(self.ts, self.dbm, self.channel, self.mac_str, self.oui, self.ssid)
 
-    def to_sighting_dto(self) -> SightingDTO:
+    def sighting_params(self) -> tuple:
         """
-        Convert Probe to SightingDTO for storage layer.
+        Parameters for the sighting_log INSERT:
+        (ts, mac, dbm, ssid, oui, ie_fingerprint, channel)
 
-        Returns:
-            SightingDTO object for database persistence
+        The storage layer swaps ssid/oui for their dictionary table ids.
         """
-        return SightingDTO(
-            mac=self.mac,
-            dbm=self.dBm,
-            ssid=self.ssid,
-            oui=self.oui,
-            ie_fingerprint=self.ie_fingerprint,
-            ie_data=self.ie_data,
+        return (
+            self.ts,
+            self.mac,
+            self.dbm,
+            self.ssid,
+            self.oui,
+            self.fingerprint_hex,
+            self.channel,
         )
+
+    def notification_data(self) -> dict:
+        """Probe fields shown in Discord notifications (mac, dbm, ssid, oui)."""
+        return {"mac": self.mac_str, "dbm": self.dbm, "ssid": self.ssid, "oui": self.oui}
@@ -1,35 +1,23 @@
 """Discord notification integration."""
 
-import logging
-import requests
+from probe_sniffer import ipc
 
-logger = logging.getLogger("DISCORD")
 
-
-def post_discord_notification(fingerprint: dict, probe_data: dict, notification_type: str) -> bool:
+def post_discord_notification(fingerprint: dict, probe_data: dict, notification_type: str) -> None:
     """
-    Post a notification to the Discord bot via the local API.
+    Queue a notification for the Discord bot, which runs in the API process.
+
+    Sent over the IPC channel rather than HTTP, so the capture path never waits on the
+    API; the channel keeps it buffered while the API is down or restarting.
 
     Args:
         fingerprint: Device fingerprint dict from database
         probe_data: Current probe data (mac, dbm, ssid, oui)
         notification_type: "new" or "returning"
-
-    Returns:
-        True if notification posted successfully, False otherwise
     """
-    try:
-        response = requests.post(
-            "http://localhost:8000/internal/notify",
-            json={
-                "fingerprint": fingerprint,
-                "probe_data": probe_data,
-                "notification_type": notification_type,
-            },
-            timeout=5,
-        )
-        response.raise_for_status()
-        return True
-    except requests.exceptions.RequestException as e:
-        logger.error(f"Failed to post Discord notification: {e}")
-        return False
+    ipc.channel.notify(fingerprint, probe_data, notification_type)
+
+
+def post_flood_alert(summary: dict) -> None:
+    """Queue the one summary alert of a probe flood (capture/flood.py alert_payload)."""
+    ipc.channel.notify({}, summary, "flood")
@@ -0,0 +1,335 @@
+"""
+Fingerprint and identity aggregates (SSID signature, unique MACs, sighting totals,
+first/last seen) maintained on ingest.
+
+The fingerprint and identity endpoints read them with a primary-key lookup instead
+of scanning every sighting partition. The distinct MACs and directed SSIDs of each
+fingerprint and identity are kept in membership tables (schema.AGGREGATE_TABLES), so
+a batch only inserts its pairs: the new ones bump unique_mac_count or refresh the
+sorted ssid_signature. device_fingerprints' sighting_count and first/last seen are
+kept by the fingerprint upsert in log_sightings_batch.
+
+A sighting counts toward the identity the MAC linker gave it (capture/linker.py)
+and toward the identity its fingerprint is linked to, once if they are the same.
+Linking a fingerprint changes which past sightings belong to an identity, so the
+identities involved are recounted from the sightings (refresh_identities). Identity
+totals therefore count stored sightings only: frames the load shedder or flood
+detector left out extend last seen and the MACs and SSIDs but not total_sightings.
+"""
+
+import logging
+from collections import Counter
+
+from probe_sniffer.storage.database import compact_sighting_sources, get_cursor
+from probe_sniffer.utils.time_utils import epoch_to_utc_iso
+
+logger = logging.getLogger("DATABASE")
+
+UNDIRECTED = ("", "Undirected Probe")
+INSERT_CHUNK = 400  # Pairs per multi-row INSERT, under SQLite's 999 variable limit
+IN_CHUNK = 200  # Identities per refresh query, whose IN lists appear twice
+
+# table, key, MAC membership table, SSID membership table
+OWNERS = {
+    "fingerprint": (
+        "device_fingerprints",
+        "fingerprint_id",
+        "fingerprint_macs",
+        "fingerprint_ssids",
+    ),
+    "identity": ("device_identities", "identity_id", "identity_macs", "identity_ssids"),
+}
+
+# Sorted JSON array of an owner's directed SSIDs, from its membership table
+SIGNATURE = """(
+    SELECT json_group_array(ssid) FROM (
+        SELECT ssids.ssid FROM {members} AS m JOIN ssids ON ssids.ssid_id = m.ssid_id
+        WHERE m.{key} = {table}.{key} ORDER BY ssids.ssid
+    )
+)"""
+
+DIRECTED_SSID_IDS = "SELECT ssid_id FROM ssids WHERE ssid NOT IN ('', 'Undirected Probe')"
+
+# Adds a batch to an identity. first_seen (?2) is NULL when all of the identity's
+# frames in the batch were shed: they only tell that it was seen in that minute.
+IDENTITY_UPSERT = """
+    INSERT INTO device_identities
+        (identity_id, ssid_signature, first_seen, last_seen, total_sightings)
+    VALUES (?1, '[]', COALESCE(?2, ?3), ?3, ?4)
+    ON CONFLICT(identity_id) DO UPDATE SET
+        first_seen = MIN(first_seen, COALESCE(?2, first_seen)),
+        last_seen = MAX(last_seen, ?3),
+        total_sightings = total_sightings + ?4
+"""
+
+
+def _insert_new(cursor, table: str, key: str, pairs) -> list:
+    """INSERT OR IGNORE (key, value) pairs; returns the key of every pair that was new."""
+    pairs = list(pairs)
+    new = []
+    for start in range(0, len(pairs), INSERT_CHUNK):
+        chunk = pairs[start : start + INSERT_CHUNK]
+        cursor.execute(
+            f"INSERT OR IGNORE INTO {table} VALUES {', '.join(['(?, ?)'] * len(chunk))} "
+            f"RETURNING {key}",
+            [value for pair in chunk for value in pair],
+        )
+        new.extend(row[0] for row in cursor.fetchall())
+    return new
+
+
+def _add_members(cursor, subject: str, macs, ssid_ids) -> None:
+    """Add (owner, mac) and (owner, ssid_id) pairs and update the owners they extend."""
+    table, key, mac_table, ssid_table = OWNERS[subject]
+    new_macs = Counter(_insert_new(cursor, mac_table, key, macs))
+    cursor.executemany(
+        f"UPDATE {table} SET unique_mac_count = unique_mac_count + ? WHERE {key} = ?",
+        ((count, owner) for owner, count in new_macs.items()),
+    )
+    changed = set(_insert_new(cursor, ssid_table, key, ssid_ids))
+    cursor.executemany(
+        f"UPDATE {table} SET ssid_signature = "
+        f"{SIGNATURE.format(members=ssid_table, key=key, table=table)} WHERE {key} = ?",
+        ((owner,) for owner in changed),
+    )
+
+
+def _fingerprint_identities(cursor, fingerprint_ids) -> dict[str, str]:
+    """Identity of each of the fingerprints that are linked to one."""
+    fingerprint_ids = list(fingerprint_ids)
+    linked = {}
+    for start in range(0, len(fingerprint_ids), 500):
+        chunk = fingerprint_ids[start : start + 500]
+        cursor.execute(
+            f"SELECT fingerprint_id, identity_id FROM device_fingerprints "
+            f"WHERE identity_id IS NOT NULL AND fingerprint_id IN ({', '.join('?' * len(chunk))})",
+            chunk,
+        )
+        linked.update((row[0], row[1]) for row in cursor.fetchall())
+    return linked
+
+
+def update_aggregates(
+    cursor,
+    sightings: list[tuple],
+    ssid_ids: dict[str, int],
+    shed: list[tuple] = (),
+    identities: dict[int, str] | None = None,
+) -> None:
+    """
+    Add a batch of new sightings to the fingerprint and identity aggregates.
+
+    Runs inside the writer's transaction, after the batch's fingerprints are upserted.
+
+    Args:
+        cursor: Cursor of the transaction writing the sightings
+        sightings: (ts, mac, dbm, ssid, oui, ie_fingerprint, channel) per sighting
+        ssid_ids: ssids.ssid_id of every SSID in the batch
+        shed: LoadShedder.filter() aggregates of frames not written; they add to the
+            MACs and SSIDs, and their minute to last seen, but only fingerprint
+            sighting counts (kept by the fingerprint upsert) include them
+        identities: identity_id per linked MAC (see capture/linker.py)
+    """
+    # (first_ts, last_ts, mac, ssid, ie_fingerprint, stored sightings); shed frames are
+    # somewhere in their minute, after the one that was written, and not recountable
+    frames = [(ts, ts, mac, ssid, fid, 1) for ts, mac, _dbm, ssid, _oui, fid, _ch in sightings]
+    frames += [(None, row[0], row[1], row[2], row[4], 0) for row in shed]
+
+    fingerprint_macs, fingerprint_ssids = set(), set()
+    for _first, _last, mac, ssid, fingerprint_id, _count in frames:
+        if fingerprint_id is None:
+            continue
+        fingerprint_macs.add((fingerprint_id, mac))
+        if ssid not in UNDIRECTED:
+            fingerprint_ssids.add((fingerprint_id, ssid_ids[ssid]))
+    _add_members(cursor, "fingerprint", fingerprint_macs, fingerprint_ssids)
+
+    identities = identities or {}
+    linked = _fingerprint_identities(
+        cursor, {fingerprint_id for fingerprint_id, _ in fingerprint_macs}
+    )
+    if not identities and not linked:
+        return
+
+    stats = {}  # identity_id -> [first_ts, last_ts, sightings]
+    identity_macs, identity_ssids = set(), set()
+    for first_ts, last_ts, mac, ssid, fingerprint_id, count in frames:
+        for identity_id in {identities.get(mac), linked.get(fingerprint_id)} - {None}:
+            entry = stats.get(identity_id)
+            if entry is None:
+                entry = stats[identity_id] = [first_ts, last_ts, 0]
+            else:
+                if first_ts is not None:
+                    entry[0] = first_ts if entry[0] is None else min(entry[0], first_ts)
+                entry[1] = max(entry[1], last_ts)
+            entry[2] += count
+            identity_macs.add((identity_id, mac))
+            if ssid not in UNDIRECTED:
+                identity_ssids.add((identity_id, ssid_ids[ssid]))
+
+    cursor.executemany(
+        IDENTITY_UPSERT,
+        (
+            (
+                identity_id,
+                None if first_ts is None else epoch_to_utc_iso(first_ts),
+                epoch_to_utc_iso(last_ts),
+                count,
+            )
+            for identity_id, (first_ts, last_ts, count) in stats.items()
+        ),
+    )
+    _add_members(cursor, "identity", identity_macs, identity_ssids)
+
+
+def _owned_sightings(source: str, identity_ids: list[str] | None) -> tuple[str, list]:
+    """
+    The (owner, ts, mac, ssid_id) of the sightings in a source that count toward an
+    identity, all identities or the given ones.
+    """
+    if identity_ids is None:
+        by_linker, by_fingerprint, params = "IS NOT NULL", "IS NOT NULL", []
+    else:
+        marks = f"IN ({', '.join('?' * len(identity_ids))})"
+        by_linker = by_fingerprint = marks
+        params = [*identity_ids, *identity_ids]
+    return (
+        f"""
+        SELECT s.identity_id AS owner, s.ts, s.mac, s.ssid_id
+        FROM {source} AS s WHERE s.identity_id {by_linker}
+        UNION ALL
+        SELECT f.identity_id, s.ts, s.mac, s.ssid_id
+        FROM device_fingerprints AS f JOIN {source} AS s ON s.ie_fingerprint = f.fingerprint_id
+        WHERE f.identity_id {by_fingerprint} AND s.identity_id IS NOT f.identity_id
+    """,
+        params,
+    )
+
+
+def _recount_identities(cursor, identity_ids: list[str] | None) -> int:
+    """
+    Recount identities (all if None) from the sightings; their membership rows must be
+    empty. Returns the number of identities with sightings.
+    """
+    totals = {}  # identity_id -> [first_ts, last_ts, sightings]
+    for source in compact_sighting_sources(cursor):
+        owned, params = _owned_sightings(source, identity_ids)
+        cursor.execute(
+            f"SELECT owner, MIN(ts), MAX(ts), COUNT(*) FROM ({owned}) GROUP BY owner", params
+        )
+        for owner, first_ts, last_ts, count in cursor.fetchall():
+            entry = totals.setdefault(owner, [first_ts, last_ts, 0])
+            entry[0], entry[1] = min(entry[0], first_ts), max(entry[1], last_ts)
+            entry[2] += count
+        cursor.execute(
+            f"INSERT OR IGNORE INTO identity_macs SELECT DISTINCT owner, mac FROM ({owned})",
+            params,
+        )
+        cursor.execute(
+            f"INSERT OR IGNORE INTO identity_ssids SELECT DISTINCT owner, ssid_id "
+            f"FROM ({owned}) WHERE ssid_id IN ({DIRECTED_SSID_IDS})",
+            params,
+        )
+
+    cursor.executemany(
+        """
+        INSERT INTO device_identities
+            (identity_id, ssid_signature, first_seen, last_seen, total_sightings)
+        VALUES (?, '[]', ?, ?, ?)
+        ON CONFLICT(identity_id) DO UPDATE SET
+            first_seen = excluded.first_seen,
+            last_seen = excluded.last_seen,
+            total_sightings = excluded.total_sightings
+    """,
+        (
+            (identity_id, epoch_to_utc_iso(first_ts), epoch_to_utc_iso(last_ts), count)
+            for identity_id, (first_ts, last_ts, count) in totals.items()
+        ),
+    )
+    where, params = "", []
+    if identity_ids is not None:
+        where = f"WHERE identity_id IN ({', '.join('?' * len(identity_ids))})"
+        params = identity_ids
+    cursor.execute(
+        f"""
+        UPDATE device_identities SET
+            unique_mac_count = (
+                SELECT COUNT(*) FROM identity_macs AS m
+                WHERE m.identity_id = device_identities.identity_id
+            ),
+            ssid_signature = {SIGNATURE.format(
+                members="identity_ssids", key="identity_id", table="device_identities"
+            )}
+        {where}
+    """,
+        params,
+    )
+    return len(totals)
+
+
+def refresh_identities(cursor, identity_ids) -> None:
+    """
+    Recount identities from the sightings after their fingerprints changed.
+
+    Runs inside the caller's transaction. Cost is proportional to the identities'
+    sightings (read through the identity and fingerprint indexes).
+
+    Args:
+        cursor: Cursor of the transaction that relinked the fingerprints
+        identity_ids: Identities to recount; None entries are ignored
+    """
+    identity_ids = sorted(set(identity_ids) - {None})
+    for start in range(0, len(identity_ids), IN_CHUNK):
+        chunk = identity_ids[start : start + IN_CHUNK]
+        marks = ", ".join("?" * len(chunk))
+        for table in ("identity_macs", "identity_ssids"):
+            cursor.execute(f"DELETE FROM {table} WHERE identity_id IN ({marks})", chunk)
+        cursor.execute(
+            f"UPDATE device_identities SET total_sightings = 0 WHERE identity_id IN ({marks})",
+            chunk,
+        )
+        _recount_identities(cursor, chunk)
+
+
+def rebuild_aggregates() -> tuple[int, int]:
+    """
+    Rebuild the fingerprint and identity aggregates from every sighting partition
+    (bulk maintenance). Rows still waiting in sightings_legacy are included.
+
+    Fingerprint sighting counts and first/last seen are left as they are: the
+    fingerprint upsert has kept them since the first sighting, shed frames included.
+
+    Returns:
+        (fingerprints, identities) with sightings
+    """
+    with get_cursor() as cursor:
+        for table in ("fingerprint_macs", "fingerprint_ssids", "identity_macs", "identity_ssids"):
+            cursor.execute(f"DELETE FROM {table}")
+        for source in compact_sighting_sources(cursor):
+            cursor.execute(
+                f"INSERT OR IGNORE INTO fingerprint_macs SELECT DISTINCT ie_fingerprint, mac "
+                f"FROM {source} WHERE ie_fingerprint IS NOT NULL"
+            )
+            cursor.execute(
+                f"INSERT OR IGNORE INTO fingerprint_ssids SELECT DISTINCT ie_fingerprint, ssid_id "
+                f"FROM {source} WHERE ie_fingerprint IS NOT NULL "
+                f"AND ssid_id IN ({DIRECTED_SSID_IDS})"
+            )
+        cursor.execute(f"""
+            UPDATE device_fingerprints SET
+                unique_mac_count = (
+                    SELECT COUNT(*) FROM fingerprint_macs AS m
+                    WHERE m.fingerprint_id = device_fingerprints.fingerprint_id
+                ),
+                ssid_signature = {SIGNATURE.format(
+                    members="fingerprint_ssids", key="fingerprint_id", table="device_fingerprints"
+                )}
+        """)
+        cursor.execute("SELECT COUNT(DISTINCT fingerprint_id) FROM fingerprint_macs")
+        fingerprints = cursor.fetchone()[0]
+
+        cursor.execute("UPDATE device_identities SET total_sightings = 0")
+        identities = _recount_identities(cursor, None)
+
+    logger.info(f"Rebuilt aggregates ({fingerprints} fingerprints, {identities} identities)")
+    return fingerprints, identities
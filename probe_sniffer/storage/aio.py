@@ -0,0 +1,94 @@
+"""
+Async facade over the storage layer for code running on the event loop.
+
+The functions in storage.queries are blocking sqlite3 calls. AsyncStorage runs them
+on dedicated thread pools, several readers and a single writer (SQLite takes one
+write lock at a time anyway), and bounds how many calls may wait on each pool. A
+locked or slow database then turns into a quick StorageBusy instead of a frozen
+event loop or an ever-growing backlog:
+
+    page = await db.read(get_sightings_page, limit=100)
+    await db.write(set_fingerprint_alias, fingerprint_id, alias)
+"""
+
+import asyncio
+import sqlite3
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any
+
+from probe_sniffer import config
+
+
+class StorageBusy(Exception):
+    """Too many calls waiting, a call past its timeout, or SQLite's own lock timeout."""
+
+
+class _Pool:
+    def __init__(self, name: str, workers: int, max_pending: int):
+        self.name = name
+        self.executor = ThreadPoolExecutor(workers, thread_name_prefix=f"db-{name}")
+        self.max_pending = max_pending
+        self.pending = 0  # Calls holding a thread or queued; only touched on the event loop
+
+
+class AsyncStorage:
+    """
+    Runs storage calls off the event loop with concurrency limits and timeouts.
+
+    Args:
+        readers: Reader threads (concurrent read queries)
+        max_pending: Calls allowed to run or wait per pool before StorageBusy
+        timeout: Seconds a caller waits for its call (the thread may still finish it)
+    """
+
+    def __init__(
+        self,
+        readers: int = config.DB_READ_THREADS,
+        max_pending: int = config.DB_MAX_PENDING,
+        timeout: float = config.DB_TIMEOUT_SECONDS,
+    ):
+        self.reader = _Pool("read", readers, max_pending)
+        self.writer = _Pool("write", 1, max_pending)
+        self.timeout = timeout
+
+    async def read(self, func: Callable, *args, **kwargs) -> Any:
+        """Run a read-only storage call on the reader pool."""
+        return await self._run(self.reader, func, args, kwargs)
+
+    async def write(self, func: Callable, *args, **kwargs) -> Any:
+        """Run a storage call that writes on the single writer thread."""
+        return await self._run(self.writer, func, args, kwargs)
+
+    async def _run(self, pool: _Pool, func: Callable, args: tuple, kwargs: dict) -> Any:
+        if pool.pending >= pool.max_pending:
+            raise StorageBusy(f"{pool.pending} database {pool.name}s already pending")
+        loop = asyncio.get_running_loop()
+        future = pool.executor.submit(func, *args, **kwargs)
+        pool.pending += 1
+        # A call that times out keeps its thread until it returns, so its slot is only
+        # released once the thread is done with it (or it's cancelled before starting)
+        future.add_done_callback(lambda _: _release(loop, pool))
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(future), self.timeout)
+        except asyncio.TimeoutError:
+            raise StorageBusy(f"Database {pool.name} took longer than {self.timeout}s")
+        except sqlite3.OperationalError as e:
+            if "locked" not in str(e):
+                raise
+            raise StorageBusy(f"Database {pool.name} failed: {e}") from e
+
+
+def _release(loop: asyncio.AbstractEventLoop, pool: _Pool):
+    """Give back a pool slot from the thread that finished the call."""
+
+    def release():
+        pool.pending -= 1
+
+    try:
+        loop.call_soon_threadsafe(release)
+    except RuntimeError:  # The loop is closed, and the pool's count with it
+        pass
+
+
+db = AsyncStorage()
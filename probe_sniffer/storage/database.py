@@ -1,10 +1,19 @@
 """Database connection and initialization for SQLite."""
 
+import logging
 import sqlite3
 import os
+import time
+from datetime import datetime
+from functools import lru_cache
 from pathlib import Path
 from contextlib import contextmanager
 
+from probe_sniffer.utils.mac_utils import int_to_mac, mac_to_int
+from probe_sniffer.utils.time_utils import UTC
+
+logger = logging.getLogger("DATABASE")
+
 # Get database path from environment or use default
 DB_PATH = Path(os.getenv("DATABASE_PATH", "/var/lib/probe-sniffer/probes.db"))
 
@@ -22,6 +31,9 @@ def get_connection() -> sqlite3.Connection:
     conn = sqlite3.connect(DB_PATH)
     conn.execute("PRAGMA foreign_keys = ON")
     conn.row_factory = sqlite3.Row  # Row lets us access columns by name instead of tuple indices
+    # Used by the sightings view's INSERT trigger, migrations and bulk rebuilds
+    conn.create_function("mac_to_int", 1, mac_to_int, deterministic=True)
+    conn.create_function("int_to_mac", 1, int_to_mac, deterministic=True)
     return conn
 
 
@@ -55,6 +67,10 @@ def migrate_to_fingerprinting():
     Safe to run multiple times (idempotent).
     """
     with get_cursor() as cursor:
+        # The compact sighting_log layout already has these columns
+        if _object_type(cursor, "sightings") != "table":
+            return
+
         # Check if columns already exist
         cursor.execute("PRAGMA table_info(sightings)")
         columns = {row[1] for row in cursor.fetchall()}
@@ -101,13 +117,616 @@ def migrate_to_discord_notifications():
             print("✓ Added notification_enabled column to device_fingerprints table")
 
 
+def _object_type(cursor: sqlite3.Cursor, name: str) -> str | None:
+    """Return 'table', 'view', etc. for a schema object, or None if it doesn't exist."""
+    cursor.execute("SELECT type FROM sqlite_master WHERE name = ?", (name,))
+    row = cursor.fetchone()
+    return row["type"] if row else None
+
+
+def _create_sightings_view(cursor: sqlite3.Cursor):
+    """(Re)create the `sightings` compatibility view and its INSERT trigger over every partition."""
+    from probe_sniffer.storage.schema import (
+        SIGHTINGS_INSERT_TRIGGER,
+        SIGHTINGS_VIEW,
+        SIGHTINGS_VIEW_LEGACY_ARM,
+    )
+
+    cursor.execute("SELECT name FROM sighting_partitions ORDER BY start_ts, end_ts")
+    partitions = [row["name"] for row in cursor.fetchall()]
+    if len(partitions) == 1:
+        source = partitions[0]
+    else:
+        source = "(" + " UNION ALL ".join(f"SELECT * FROM {name}" for name in partitions) + ")"
+
+    view = SIGHTINGS_VIEW.format(source=source)
+    if _object_type(cursor, "sightings_legacy") == "table":
+        view += SIGHTINGS_VIEW_LEGACY_ARM
+
+    cursor.execute("DROP VIEW IF EXISTS sightings")
+    cursor.execute(view)
+    cursor.execute(SIGHTINGS_INSERT_TRIGGER.format(table=partitions[-1]))
+
+
+def migrate_to_sighting_filters():
+    """
+    Add the channel column and the filter indexes to existing sighting tables.
+    Safe to run multiple times (idempotent).
+
+    Runs before the sightings view is rebuilt, which needs every partition to have
+    the same columns. Building the indexes is a one-off pass over each partition.
+    """
+    from probe_sniffer.storage.schema import SIGHTING_TABLE, SUPERSEDED_SIGHTING_INDEXES
+
+    with get_cursor() as cursor:
+        cursor.execute("SELECT name FROM sighting_partitions")
+        tables = {row["name"] for row in cursor.fetchall()}
+        if _object_type(cursor, "sighting_log") == "table":
+            tables.add("sighting_log")  # not registered until migrate_to_partitioned_sightings
+
+        upgraded = []
+        for table in sorted(tables):
+            cursor.execute(f"PRAGMA table_info({table})")
+            if "channel" in {row[1] for row in cursor.fetchall()}:
+                continue
+            cursor.execute(f"ALTER TABLE {table} ADD COLUMN channel INTEGER")
+            for index in SUPERSEDED_SIGHTING_INDEXES:
+                cursor.execute(f"DROP INDEX IF EXISTS {index.format(table=table)}")
+            cursor.executescript(SIGHTING_TABLE.format(table=table))
+            upgraded.append(table)
+
+    if upgraded:
+        print(f"✓ Added channel column and filter indexes to {', '.join(upgraded)}")
+
+
+def migrate_to_compact_sightings():
+    """
+    Switch from the text `sightings` table to the compact sighting_log layout.
+    Safe to run multiple times (idempotent).
+
+    Only renames the old table to sightings_legacy, so it is instant; the
+    compatibility view is put in front of it by migrate_to_partitioned_sightings().
+    Rows are moved afterwards, in small transactions, by backfill_compact_sightings()
+    while capture keeps running.
+    """
+    with get_cursor() as cursor:
+        if _object_type(cursor, "sightings") == "table":
+            cursor.execute("ALTER TABLE sightings RENAME TO sightings_legacy")
+            print("✓ Renamed sightings to sightings_legacy, compact backfill pending")
+
+
+PARTITION_PREFIX = "sighting_log_"
+
+# Database path -> partition tables known to exist (see ensure_partitions)
+_PARTITIONS: dict[str, set[str]] = {}
+
+
+@lru_cache(maxsize=8)
+def partition_name(ts: int) -> str:
+    """
+    Name of the monthly partition holding sightings at epoch seconds ts
+    (UTC month, e.g. sighting_log_202610).
+
+    Cached because bursts of frames share the same second.
+    """
+    return PARTITION_PREFIX + datetime.fromtimestamp(ts, UTC).strftime("%Y%m")
+
+
+def month_bounds(name: str) -> tuple[int, int]:
+    """[start, end) epoch seconds of a monthly partition."""
+    year, month = divmod(int(name[len(PARTITION_PREFIX) :]), 100)
+    start = datetime(year, month, 1, tzinfo=UTC)
+    end = datetime(year + month // 12, month % 12 + 1, 1, tzinfo=UTC)
+    return int(start.timestamp()), int(end.timestamp())
+
+
+def _create_partition(cursor: sqlite3.Cursor, name: str):
+    """Create a monthly partition table and register it."""
+    from probe_sniffer.storage.schema import SIGHTING_TABLE
+
+    start_ts, end_ts = month_bounds(name)
+    cursor.executescript(SIGHTING_TABLE.format(table=name))
+    # Ids start at YYYYMM << 32 so they stay unique and increasing across partitions
+    # (and above every id from before partitioning)
+    cursor.execute("DELETE FROM sqlite_sequence WHERE name = ?", (name,))
+    cursor.execute(
+        "INSERT INTO sqlite_sequence (name, seq) VALUES (?, ?)",
+        (name, int(name[len(PARTITION_PREFIX) :]) << 32),
+    )
+    cursor.execute(
+        "INSERT INTO sighting_partitions (name, start_ts, end_ts) VALUES (?, ?, ?)",
+        (name, start_ts, end_ts),
+    )
+
+
+def ensure_partitions(names) -> None:
+    """
+    Make sure the given monthly partitions exist, creating missing ones.
+
+    New partitions are created in their own short transaction, so callers can look
+    them up before opening the transaction that writes to them and the in-process
+    cache never holds a table from a transaction that was rolled back. Creating the
+    partition for a new month also applies the retention policy.
+    """
+    known = _PARTITIONS.setdefault(str(DB_PATH), set())
+    missing = set(names) - known
+    if not missing:
+        return
+
+    created = []
+    with get_cursor() as cursor:
+        for name in sorted(missing):
+            cursor.execute("SELECT 1 FROM sighting_partitions WHERE name = ?", (name,))
+            if cursor.fetchone() is None:
+                _create_partition(cursor, name)
+                created.append(name)
+        if created:
+            _create_sightings_view(cursor)
+    known.update(missing)
+
+    if created:
+        logger.info(f"Created sighting partitions: {', '.join(created)}")
+        if partition_name(int(time.time())) in created:
+            drop_expired_partitions()
+
+
+def drop_expired_partitions(retention_months: int | None = None) -> list[str]:
+    """
+    Apply the retention policy by dropping whole monthly partitions.
+
+    Keeps the current month plus the previous `retention_months` full months, so
+    retention costs a DROP TABLE per expired month instead of a row-by-row DELETE.
+    Freed pages are handed back to the OS on databases created with incremental
+    auto-vacuum; older databases reuse them for new sightings.
+
+    Args:
+        retention_months: Months to keep (default RETENTION_MONTHS, 0 = keep everything)
+
+    Returns:
+        Names of the dropped partitions
+    """
+    from probe_sniffer import config
+
+    if retention_months is None:
+        retention_months = config.RETENTION_MONTHS
+    if retention_months <= 0:
+        return []
+
+    now = datetime.now(UTC)
+    months = now.year * 12 + now.month - 1 - retention_months
+    cutoff = datetime(months // 12, months % 12 + 1, 1, tzinfo=UTC).timestamp()
+
+    with get_cursor() as cursor:
+        # Partitions are refilled from sightings_legacy until its backfill finishes
+        if _object_type(cursor, "sightings_legacy") == "table":
+            return []
+
+        cursor.execute(
+            """
+            SELECT name FROM sighting_partitions
+            WHERE end_ts <= ? AND name != (
+                SELECT name FROM sighting_partitions ORDER BY start_ts DESC, end_ts DESC LIMIT 1
+            )
+        """,
+            (cutoff,),
+        )
+        expired = [row["name"] for row in cursor.fetchall()]
+        for name in expired:
+            cursor.execute(f"DROP TABLE IF EXISTS {name}")
+            cursor.execute("DELETE FROM sighting_partitions WHERE name = ?", (name,))
+            cursor.execute("DELETE FROM sqlite_sequence WHERE name = ?", (name,))
+        if expired:
+            _create_sightings_view(cursor)
+            # Visits are small enough to expire row by row
+            cursor.execute("DELETE FROM visits WHERE end_ts < ?", (cutoff,))
+
+    if expired:
+        _PARTITIONS.get(str(DB_PATH), set()).difference_update(expired)
+        with get_cursor() as cursor:
+            cursor.execute("PRAGMA incremental_vacuum")
+            cursor.fetchall()
+        logger.info(f"Dropped expired sighting partitions: {', '.join(expired)}")
+    return expired
+
+
+def migrate_to_partition_counts():
+    """
+    Add the row_count column to sighting_partitions and count the existing rows.
+    Safe to run multiple times (idempotent).
+    """
+    with get_cursor() as cursor:
+        cursor.execute("PRAGMA table_info(sighting_partitions)")
+        if "row_count" in {row[1] for row in cursor.fetchall()}:
+            return
+
+        cursor.execute(
+            "ALTER TABLE sighting_partitions ADD COLUMN row_count INTEGER NOT NULL DEFAULT 0"
+        )
+        cursor.execute("SELECT name FROM sighting_partitions")
+        for name in [row["name"] for row in cursor.fetchall()]:
+            cursor.execute(
+                f"UPDATE sighting_partitions SET row_count = (SELECT COUNT(*) FROM {name}) "
+                "WHERE name = ?",
+                (name,),
+            )
+        print("✓ Added row counts to sighting_partitions")
+
+
+def migrate_to_partitioned_sightings():
+    """
+    Switch to monthly sighting partitions.
+    Safe to run multiple times (idempotent).
+
+    A sighting_log table from before partitioning is kept as-is and registered as
+    the partition covering everything up to now, so the switch is instant; it is
+    dropped by retention like any other partition once all of its rows expire.
+    """
+    now = int(time.time())
+    with get_cursor() as cursor:
+        if _object_type(cursor, "sighting_log") == "table":
+            cursor.execute(
+                "INSERT OR IGNORE INTO sighting_partitions (name, start_ts, end_ts, row_count) "
+                "SELECT 'sighting_log', 0, ?, COUNT(*) FROM sighting_log",
+                (now,),
+            )
+
+    ensure_partitions([partition_name(now)])
+    with get_cursor() as cursor:
+        _create_sightings_view(cursor)
+
+
+def sighting_sources(cursor: sqlite3.Cursor) -> list[str]:
+    """
+    Every table holding sightings, as subqueries with the same columns
+    (ts, mac, dbm, ssid, oui, ie_fingerprint), for bulk rebuilds of derived tables.
+
+    Includes rows still waiting in sightings_legacy during a backfill.
+    """
+    partition_source = """(SELECT s.ts, s.mac, s.dbm, ssids.ssid, ouis.oui, s.ie_fingerprint
+            FROM {partition} AS s
+            LEFT JOIN ssids ON ssids.ssid_id = s.ssid_id
+            LEFT JOIN ouis ON ouis.oui_id = s.oui_id)"""
+    cursor.execute("SELECT name FROM sighting_partitions ORDER BY start_ts, end_ts")
+    sources = [partition_source.format(partition=row["name"]) for row in cursor.fetchall()]
+    if _object_type(cursor, "sightings_legacy") == "table":
+        sources.append(
+            """(SELECT CAST(strftime('%s', timestamp) AS INTEGER) AS ts, mac_to_int(mac) AS mac,
+                   dbm, ssid, oui, ie_fingerprint
+            FROM sightings_legacy)"""
+        )
+    return sources
+
+
+def compact_sighting_sources(cursor: sqlite3.Cursor) -> list[str]:
+    """
+    Every table holding sightings, with the partition columns (ts, mac, ssid_id,
+    ie_fingerprint, identity_id), for bulk rebuilds that work on dictionary ids.
+
+    Includes rows still waiting in sightings_legacy during a backfill; their SSIDs
+    are added to the ssids table first.
+    """
+    cursor.execute("SELECT name FROM sighting_partitions ORDER BY start_ts, end_ts")
+    sources = [row[0] for row in cursor.fetchall()]
+    if _object_type(cursor, "sightings_legacy") == "table":
+        cursor.execute(
+            "INSERT OR IGNORE INTO ssids (ssid) "
+            "SELECT DISTINCT ssid FROM sightings_legacy WHERE ssid IS NOT NULL"
+        )
+        sources.append("""(
+            SELECT CAST(strftime('%s', l.timestamp) AS INTEGER) AS ts, mac_to_int(l.mac) AS mac,
+                ssids.ssid_id, l.ie_fingerprint, l.identity_id
+            FROM sightings_legacy AS l LEFT JOIN ssids ON ssids.ssid = l.ssid
+        )""")
+    return sources
+
+
+def migrate_to_visits():
+    """
+    Add the visits table and build it from the existing sightings.
+    Safe to run multiple times (idempotent).
+
+    The one-off build runs here, before capture starts, because it blocks writers;
+    afterwards the sighting writer keeps visits up to date.
+    """
+    from probe_sniffer.storage.schema import VISITS_TABLE
+    from probe_sniffer.storage.visits import rebuild_visits
+
+    with get_cursor() as cursor:
+        if _object_type(cursor, "visits") == "table":
+            return
+        cursor.executescript(VISITS_TABLE)
+
+    if rebuild_visits():
+        print("✓ Built visits table from existing sightings")
+
+
+def migrate_to_rollups():
+    """
+    Add the activity rollup tables and build them from the existing sightings.
+    Safe to run multiple times (idempotent).
+    """
+    from probe_sniffer.storage.rollups import rebuild_rollups, rollup_table
+    from probe_sniffer.storage.schema import ACTIVITY_TABLE, ROLLUP_RESOLUTIONS, ROLLUP_SUBJECTS
+
+    with get_cursor() as cursor:
+        if _object_type(cursor, rollup_table("mac", "minute")) == "table":
+            return
+        for subject, (key, key_type) in ROLLUP_SUBJECTS.items():
+            for resolution in ROLLUP_RESOLUTIONS:
+                cursor.executescript(
+                    ACTIVITY_TABLE.format(
+                        table=rollup_table(subject, resolution), key=key, key_type=key_type
+                    )
+                )
+
+    rebuild_rollups()
+    print("✓ Built activity rollups from existing sightings")
+
+
+def migrate_to_device_summary():
+    """
+    Add the device_summary table and build it from the existing sightings.
+    Safe to run multiple times (idempotent).
+    """
+    from probe_sniffer.storage.schema import DEVICE_SUMMARY_TABLE
+    from probe_sniffer.storage.summaries import rebuild_device_summary
+
+    with get_cursor() as cursor:
+        if _object_type(cursor, "device_summary") == "table":
+            return
+        cursor.executescript(DEVICE_SUMMARY_TABLE)
+
+    if rebuild_device_summary():
+        print("✓ Built device_summary from existing sightings")
+
+
+def migrate_to_table_versions():
+    """
+    Add the table_versions change counters and the triggers that bump them.
+    Safe to run multiple times (idempotent).
+    """
+    from probe_sniffer.storage.schema import (
+        TABLE_VERSIONS_TABLE,
+        VERSION_TRIGGER,
+        VERSIONED_TABLES,
+    )
+
+    with get_cursor() as cursor:
+        cursor.executescript(TABLE_VERSIONS_TABLE)
+        cursor.executemany(
+            "INSERT OR IGNORE INTO table_versions (name) VALUES (?)",
+            ((table,) for table in VERSIONED_TABLES),
+        )
+        for table in VERSIONED_TABLES:
+            for event in ("INSERT", "UPDATE", "DELETE"):
+                cursor.executescript(
+                    VERSION_TRIGGER.format(table=table, event=event, action=event.lower())
+                )
+
+
+def migrate_to_overview_stats():
+    """
+    Add the counter tables behind /stats/overview and fill them from existing data.
+    Safe to run multiple times (idempotent).
+    """
+    from probe_sniffer.storage.schema import OVERVIEW_TABLES
+    from probe_sniffer.storage.stats import rebuild_overview_stats
+
+    with get_cursor() as cursor:
+        if _object_type(cursor, "stat_totals") == "table":
+            return
+        cursor.executescript(OVERVIEW_TABLES)
+
+    rebuild_overview_stats()
+    print("✓ Built overview stats from existing sightings")
+
+
+def migrate_to_sketches():
+    """
+    Add the unique-device sketch tables and build them from the existing sightings.
+    Safe to run multiple times (idempotent).
+    """
+    from probe_sniffer.storage.schema import SKETCH_RESOLUTIONS, SKETCH_TABLE
+    from probe_sniffer.storage.sketches import rebuild_sketches, sketch_table
+
+    with get_cursor() as cursor:
+        if _object_type(cursor, sketch_table("day")) == "table":
+            return
+        for resolution in SKETCH_RESOLUTIONS:
+            cursor.executescript(SKETCH_TABLE.format(table=sketch_table(resolution)))
+
+    rebuild_sketches()
+    print("✓ Built unique-device sketches from existing sightings")
+
+
+def migrate_to_fingerprint_similarity():
+    """
+    Add the fingerprint similarity index and build it from the stored IE data.
+    Safe to run multiple times (idempotent).
+    """
+    from probe_sniffer.storage.schema import SIMILARITY_TABLES
+    from probe_sniffer.storage.similarity import rebuild_similarity_index
+
+    with get_cursor() as cursor:
+        if _object_type(cursor, "fingerprint_signatures") == "table":
+            return
+        cursor.executescript(SIMILARITY_TABLES)
+
+    if rebuild_similarity_index():
+        print("✓ Built fingerprint similarity index from stored IE data")
+
+
+def migrate_to_identity_aggregates():
+    """
+    Add the fingerprint and identity aggregate columns and membership tables, and
+    build them from the existing sightings.
+    Safe to run multiple times (idempotent).
+    """
+    from probe_sniffer.storage.aggregates import rebuild_aggregates
+    from probe_sniffer.storage.schema import AGGREGATE_TABLES
+
+    with get_cursor() as cursor:
+        if _object_type(cursor, "fingerprint_macs") == "table":
+            return
+        cursor.execute("PRAGMA table_info(device_fingerprints)")
+        if "ssid_signature" not in {row[1] for row in cursor.fetchall()}:
+            cursor.execute(
+                "ALTER TABLE device_fingerprints ADD COLUMN ssid_signature TEXT NOT NULL DEFAULT '[]'"
+            )
+            cursor.execute(
+                "ALTER TABLE device_fingerprints "
+                "ADD COLUMN unique_mac_count INTEGER NOT NULL DEFAULT 0"
+            )
+        cursor.execute("PRAGMA table_info(device_identities)")
+        if "unique_mac_count" not in {row[1] for row in cursor.fetchall()}:
+            cursor.execute(
+                "ALTER TABLE device_identities "
+                "ADD COLUMN unique_mac_count INTEGER NOT NULL DEFAULT 0"
+            )
+        cursor.executescript(AGGREGATE_TABLES)
+
+    if any(rebuild_aggregates()):
+        print("✓ Built fingerprint and identity aggregates from existing sightings")
+
+
+def migrate_to_ssid_index():
+    """
+    Add the SSID posting lists and name search index, and build them from the
+    existing sightings. The search index needs SQLite's FTS5 extension; without it
+    SSID search falls back to a prefix scan.
+    Safe to run multiple times (idempotent).
+    """
+    from probe_sniffer.storage.schema import SSID_INDEX_TABLES, SSID_SEARCH_TABLES
+    from probe_sniffer.storage.ssid_index import rebuild_ssid_index
+
+    with get_cursor() as cursor:
+        if _object_type(cursor, "ssid_devices") == "table":
+            return
+        cursor.execute("PRAGMA table_info(ssids)")
+        if "device_count" not in {row[1] for row in cursor.fetchall()}:
+            cursor.execute("ALTER TABLE ssids ADD COLUMN device_count INTEGER NOT NULL DEFAULT 0")
+        cursor.executescript(SSID_INDEX_TABLES)
+        try:
+            cursor.executescript(SSID_SEARCH_TABLES)
+        except sqlite3.OperationalError as e:
+            logger.warning(f"SSID search index not available ({e}), using prefix scans")
+
+    if rebuild_ssid_index():
+        print("✓ Built SSID index from existing sightings")
+
+
+def backfill_compact_sightings(chunk_size: int = 5000) -> int:
+    """
+    Move rows from sightings_legacy into the monthly sighting partitions.
+
+    Each chunk is converted and deleted from the legacy table in one transaction, so
+    the `sightings` view never shows a row twice or loses one, writers are only
+    blocked for a chunk at a time and an interrupted backfill resumes where it
+    stopped. Drops the legacy table once it is empty.
+
+    Returns:
+        Number of rows moved
+    """
+    moved = 0
+    while True:
+        with get_cursor() as cursor:
+            if _object_type(cursor, "sightings_legacy") != "table":
+                return moved
+
+            cursor.execute(
+                "SELECT MAX(id) AS last_id, COUNT(*) AS n FROM "
+                "(SELECT id FROM sightings_legacy ORDER BY id LIMIT ?)",
+                (chunk_size,),
+            )
+            chunk = cursor.fetchone()
+            if not chunk["n"]:
+                cursor.execute("DROP TABLE sightings_legacy")
+                _create_sightings_view(cursor)
+                logger.info(f"Compact sightings backfill complete ({moved} rows)")
+                break
+
+            last_id = chunk["last_id"]
+            cursor.execute(
+                "SELECT DISTINCT ? || strftime('%Y%m', timestamp) AS name "
+                "FROM sightings_legacy WHERE id <= ?",
+                (PARTITION_PREFIX, last_id),
+            )
+            # Rows whose timestamp can't be parsed have no partition and are dropped
+            partitions = [row["name"] for row in cursor.fetchall() if row["name"]]
+            # Nothing has been written on this connection yet, so this can commit
+            ensure_partitions(partitions)
+
+            cursor.execute(
+                "INSERT OR IGNORE INTO ssids (ssid) "
+                "SELECT DISTINCT ssid FROM sightings_legacy WHERE id <= ? AND ssid IS NOT NULL",
+                (last_id,),
+            )
+            cursor.execute(
+                "INSERT OR IGNORE INTO ouis (oui) "
+                "SELECT DISTINCT oui FROM sightings_legacy WHERE id <= ? AND oui IS NOT NULL",
+                (last_id,),
+            )
+            for name in partitions:
+                cursor.execute(
+                    f"""
+                    INSERT INTO {name} (id, ts, mac, dbm, ssid_id, oui_id, ie_fingerprint, identity_id)
+                    SELECT
+                        l.id,
+                        CAST(strftime('%s', l.timestamp) AS INTEGER),
+                        mac_to_int(l.mac),
+                        -- very old rows only have the "-75dBm" text form
+                        COALESCE(l.dbm, CAST(REPLACE(REPLACE(l.rssi, 'dBm', ''), ' ', '') AS INTEGER)),
+                        ssids.ssid_id,
+                        ouis.oui_id,
+                        l.ie_fingerprint,
+                        l.identity_id
+                    FROM sightings_legacy AS l
+                    LEFT JOIN ssids ON ssids.ssid = l.ssid
+                    LEFT JOIN ouis ON ouis.oui = l.oui
+                    WHERE l.id <= ? AND strftime('%Y%m', l.timestamp) = ?
+                """,
+                    (last_id, name[len(PARTITION_PREFIX) :]),
+                )
+                cursor.execute(
+                    "UPDATE sighting_partitions SET row_count = row_count + ? WHERE name = ?",
+                    (cursor.rowcount, name),
+                )
+            cursor.execute("DELETE FROM sightings_legacy WHERE id <= ?", (last_id,))
+            moved += chunk["n"]
+
+    # Retention is held back while the backfill is running
+    drop_expired_partitions()
+    return moved
+
+
 def init_database():
     """Initialize db schema if it doesn't exist."""
     from probe_sniffer.storage.schema import SCHEMA
 
     with get_cursor() as cursor:
+        # Fresh databases use incremental auto-vacuum so dropped partitions shrink the file
+        cursor.execute("SELECT COUNT(*) FROM sqlite_master")
+        if cursor.fetchone()[0] == 0:
+            cursor.execute("PRAGMA auto_vacuum = INCREMENTAL")
         cursor.executescript(SCHEMA)
 
     # Run migrations
     migrate_to_fingerprinting()
     migrate_to_discord_notifications()
+    migrate_to_partition_counts()
+    migrate_to_sighting_filters()
+    migrate_to_compact_sightings()
+    migrate_to_partitioned_sightings()
+    migrate_to_visits()
+    migrate_to_rollups()
+    migrate_to_device_summary()
+    migrate_to_table_versions()
+    migrate_to_overview_stats()
+    migrate_to_sketches()
+    migrate_to_fingerprint_similarity()
+    migrate_to_identity_aggregates()
+    migrate_to_ssid_index()
+
+    # WAL lets API reads run while the sniffer writes; the mode is stored in the file
+    with get_cursor() as cursor:
+        cursor.execute("PRAGMA journal_mode = WAL")
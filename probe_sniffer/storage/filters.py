@@ -0,0 +1,90 @@
+"""
+Sighting filters for the query API, compiled to parameterized SQL.
+
+Conditions are written against a compact sighting table aliased `s`, in the shape
+the partition indexes expect: equality on ssid/oui dictionary ids rather than on
+the joined text, and ts ranges on the raw epoch column. See SIGHTING_TABLE for the
+index each filter relies on.
+"""
+
+from dataclasses import dataclass, fields
+
+from probe_sniffer.utils.mac_utils import LOCAL_ADMIN_BIT, mac_to_int
+
+
+@dataclass(slots=True)
+class SightingFilter:
+    """Filters shared by the sightings list and export endpoints; None = no filter."""
+
+    mac: str | None = None
+    since: int | None = None  # epoch seconds, inclusive
+    until: int | None = None  # epoch seconds, exclusive
+    min_dbm: int | None = None
+    max_dbm: int | None = None
+    oui: str | None = None  # manufacturer designation, e.g. "Apple, Inc."
+    ssid: str | None = None
+    fingerprint: str | None = None
+    identity: str | None = None
+    channel: int | None = None
+    randomized: bool | None = None  # locally administered MACs only (or never)
+
+    @property
+    def mac_int(self) -> int | None:
+        """The MAC filter as an integer. Raises ValueError on an invalid address."""
+        return mac_to_int(self.mac) if self.mac else None
+
+    @property
+    def counter_backed(self) -> bool:
+        """True if only mac/since/until are set, which maintained counters can total."""
+        return all(
+            getattr(self, f.name) is None
+            for f in fields(self)
+            if f.name not in ("mac", "since", "until")
+        )
+
+    def compile(self, cursor) -> tuple[list[str], list] | None:
+        """
+        Build the WHERE conditions and their parameters.
+
+        The SSID and OUI filters are resolved to dictionary ids first.
+
+        Returns:
+            Tuple of (conditions, params), or None if no sighting can match (an SSID
+            or OUI that was never seen)
+
+        Raises:
+            ValueError: On an invalid MAC address
+        """
+        conditions, params = [], []
+
+        def where(condition: str, *values):
+            conditions.append(condition)
+            params.extend(values)
+
+        if self.mac:
+            where("s.mac = ?", self.mac_int)
+        for column, value in (("ssid", self.ssid), ("oui", self.oui)):
+            if value is None:
+                continue
+            cursor.execute(f"SELECT {column}_id FROM {column}s WHERE {column} = ?", (value,))
+            row = cursor.fetchone()
+            if row is None:
+                return None
+            where(f"s.{column}_id = ?", row[0])
+        if self.fingerprint is not None:
+            where("s.ie_fingerprint = ?", self.fingerprint)
+        if self.identity is not None:
+            where("s.identity_id = ?", self.identity)
+        if self.since is not None:
+            where("s.ts >= ?", self.since)
+        if self.until is not None:
+            where("s.ts < ?", self.until)
+        if self.min_dbm is not None:
+            where("s.dbm >= ?", self.min_dbm)
+        if self.max_dbm is not None:
+            where("s.dbm <= ?", self.max_dbm)
+        if self.channel is not None:
+            where("s.channel = ?", self.channel)
+        if self.randomized is not None:
+            where(f"(s.mac & {LOCAL_ADMIN_BIT} != 0) = ?", int(self.randomized))
+        return conditions, params
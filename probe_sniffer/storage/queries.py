@@ -1,10 +1,44 @@
 """Database queries"""
 
+import base64
+import binascii
 import json
-from datetime import datetime
+import logging
+from collections import defaultdict
+from collections.abc import Iterator
+from datetime import datetime, timedelta
+from probe_sniffer import heavy_hitters
+from probe_sniffer.storage import database
+from probe_sniffer.storage.aggregates import refresh_identities, update_aggregates
 from probe_sniffer.storage.database import get_cursor
-from probe_sniffer.storage.dto import SightingDTO
-from probe_sniffer.utils.time_utils import UTC, utc_now, utc_now_iso
+from probe_sniffer.storage.filters import SightingFilter
+from probe_sniffer.storage.rollups import maybe_compact_rollups, rollup_table, update_rollups
+from probe_sniffer.storage.seen import seen_filters
+from probe_sniffer.storage.similarity import index_fingerprints
+from probe_sniffer.storage.ssid_index import update_ssid_index
+from probe_sniffer.storage.schema import (
+    ROLLUP_RESOLUTIONS,
+    ROLLUP_SUBJECTS,
+    SIGHTING_COLUMNS,
+    SIGHTING_JOINS,
+)
+from probe_sniffer.storage.sketches import range_sketch, update_sketches
+from probe_sniffer.storage.stats import update_overview_stats
+from probe_sniffer.storage.summaries import update_device_summary
+from probe_sniffer.storage.visits import remember_open_visits, update_visits
+from probe_sniffer.models.probe import Probe
+from probe_sniffer.utils.mac_utils import int_to_mac, mac_to_int
+from probe_sniffer.utils.time_utils import (
+    EASTERN,
+    UTC,
+    eastern_day_start,
+    eastern_week_start,
+    epoch_to_utc_iso,
+    utc_now,
+    utc_now_iso,
+)
+
+logger = logging.getLogger("DATABASE")
 
 
 def get_trusted_devices() -> list[str]:
@@ -55,53 +89,6 @@ def is_trusted(mac: str) -> bool:
         return bool(row["is_trusted"]) if row else False
 
 
-def update_last_seen(mac: str):
-    """
-    Update the last_seen timestamp for a device.
-
-    Args:
-        mac: Device MAC address
-    """
-    now = utc_now_iso()
-
-    with get_cursor() as cursor:
-        cursor.execute(
-            """
-            INSERT INTO devices (mac, first_seen, last_seen, is_trusted)
-            VALUES (?, ?, ?, 0)
-            ON CONFLICT(mac) DO UPDATE SET last_seen = ?
-        """,
-            (mac, now, now, now),
-        )
-
-
-def upsert_device_fingerprint(fingerprint_id: str, ie_data: list[dict] | None):
-    """
-    Create or update a device fingerprint record.
-
-    Args:
-        fingerprint_id: The IE fingerprint hash
-        ie_data: Full IE structure as list of dicts
-    """
-    if not fingerprint_id or fingerprint_id == "no_stable_ies":
-        return  # Skip invalid fingerprints
-
-    now = utc_now_iso()
-    ie_data_json = json.dumps(ie_data) if ie_data else None
-
-    with get_cursor() as cursor:
-        cursor.execute(
-            """
-            INSERT INTO device_fingerprints (fingerprint_id, ie_data, first_seen, last_seen, sighting_count)
-            VALUES (?, ?, ?, ?, 1)
-            ON CONFLICT(fingerprint_id) DO UPDATE SET
-                last_seen = ?,
-                sighting_count = sighting_count + 1
-        """,
-            (fingerprint_id, ie_data_json, now, now, now),
-        )
-
-
 def get_device_fingerprint(fingerprint_id: str) -> dict | None:
     """
     Get a device fingerprint record by ID.
@@ -110,23 +97,33 @@ def get_device_fingerprint(fingerprint_id: str) -> dict | None:
         fingerprint_id: The IE fingerprint hash
 
     Returns:
-        Fingerprint dict or None if not found
+        Fingerprint dict with its aggregates (sighting_count, first/last seen,
+        unique_mac_count and ssid_signature, the sorted directed SSIDs), or None if
+        not found
     """
     with get_cursor() as cursor:
         cursor.execute(
             "SELECT * FROM device_fingerprints WHERE fingerprint_id = ?", (fingerprint_id,)
         )
         row = cursor.fetchone()
-        return dict(row) if row else None
+        return _with_signature(row) if row else None
+
+
+def _with_signature(row) -> dict:
+    """Row of device_fingerprints or device_identities with ssid_signature decoded."""
+    record = dict(row)
+    record["ssid_signature"] = json.loads(record["ssid_signature"] or "[]")
+    return record
 
 
 def should_notify_fingerprint(fingerprint: dict) -> tuple[bool, str]:
     """
     Checks fingerprint table for "notification_enabled" to determine if a Discord notification should be sent
-    As a safeguard, does not send notifications for devices seen 100+ times to avoid spamming myself
+    As a safeguard, does not send notifications for the fingerprints seen most in the last 24 hours
+    (heavy_hitters.tracker) to avoid spamming myself
 
     Args:
-        fingerprint: Device fingerprint dict from database
+        fingerprint: Device fingerprint dict as returned by log_sightings_batch
 
     Returns:
         Tuple of (should_notify: bool, notification_type: "new"|"returning"|"")
@@ -138,15 +135,16 @@ def should_notify_fingerprint(fingerprint: dict) -> tuple[bool, str]:
     if not fingerprint.get("notification_enabled", 1):
         return (False, "")
 
-    sighting_count = fingerprint.get("sighting_count", 0)
-
-    # Spam filter: don't notify for neighbor IoT devices (>100 sightings)
-    if sighting_count > 100:
-        print(f"[Discord] Not pushing notification for {fingerprint} seen {sighting_count} times.")
+    # Spam filter: don't notify for neighbor IoT devices (today's noisiest fingerprints)
+    if heavy_hitters.tracker.is_noisy(fingerprint.get("fingerprint_id")):
+        logger.debug(
+            "Not notifying for fingerprint %s: one of today's noisiest",
+            fingerprint.get("fingerprint_id"),
+        )
         return (False, "")
 
-    # New device: first time seeing this fingerprint
-    if sighting_count == 1:
+    # New device: this sighting (or batch, however many frames) created the fingerprint
+    if fingerprint.get("inserted"):
         return (True, "new")
 
     # Returning device: detect arrival by gap in last_seen
@@ -167,48 +165,298 @@ def should_notify_fingerprint(fingerprint: dict) -> tuple[bool, str]:
     return (False, "")
 
 
-def log_sighting(sighting: SightingDTO) -> dict | None:
+# (database path, dictionary table) -> {value: id}
+_DICTIONARY_IDS: dict[tuple[str, str], dict[str, int]] = {}
+
+
+def _dictionary_ids(table: str, values) -> dict[str, int]:
+    """
+    Resolve strings to ids in a dictionary table (ssids/ouis), inserting new ones.
+
+    New entries are committed in their own short transaction so the in-process cache
+    never holds an id from a transaction that was rolled back.
+
+    Returns:
+        The (shared) value -> id cache for this table
+    """
+    column = table[:-1]  # ssids -> ssid, ouis -> oui
+    cache = _DICTIONARY_IDS.setdefault((str(database.DB_PATH), table), {})
+    missing = {value for value in values if value not in cache}
+    if missing:
+        with get_cursor() as cursor:
+            cursor.executemany(
+                f"INSERT OR IGNORE INTO {table} ({column}) VALUES (?)",
+                ((value,) for value in missing),
+            )
+            for value in missing:
+                cursor.execute(f"SELECT {column}_id FROM {table} WHERE {column} = ?", (value,))
+                cache[value] = cursor.fetchone()[0]
+    return cache
+
+
+def log_sighting(probe: Probe, identity_id: str | None = None) -> dict | None:
     """
     Log a probe request sighting to the database.
 
     Args:
-        sighting: SightingDTO containing probe data
+        probe: Probe record from the capture pipeline
+        identity_id: Identity of the probe's MAC (see capture/linker.py), if any
 
     Returns:
-        OLD fingerprint dict (before update) for notification logic, or None
+        Fingerprint dict for notification logic (see log_sightings_batch), or None
     """
-    now = utc_now_iso()
+    seen_at = epoch_to_utc_iso(probe.ts)
+    fingerprints = []
+    if probe.fingerprint and probe.ie_data:
+        fingerprints.append((probe.fingerprint_hex, probe.ie_data, seen_at, 1))
+
+    old_fingerprints = log_sightings_batch(
+        [probe.sighting_params()],
+        [(probe.mac_str, seen_at)],
+        fingerprints,
+        identities={probe.mac: identity_id} if identity_id else None,
+    )
+    return old_fingerprints.get(probe.fingerprint_hex)
+
+
+def _select_fingerprints(cursor, fingerprint_ids: list[str]) -> dict[str, dict]:
+    """device_fingerprints rows by fingerprint_id, for the ones that exist."""
+    rows = {}
+    for start in range(0, len(fingerprint_ids), 500):  # stay under SQLite's variable limit
+        chunk = fingerprint_ids[start : start + 500]
+        cursor.execute(
+            f"SELECT * FROM device_fingerprints WHERE fingerprint_id IN "
+            f"({', '.join('?' * len(chunk))})",
+            chunk,
+        )
+        rows.update((row["fingerprint_id"], dict(row)) for row in cursor)
+    return rows
+
 
-    # Ensure device exists first (for foreign key constraint)
-    update_last_seen(sighting.mac)
+def log_sightings_batch(
+    sightings: list[tuple],
+    devices: list[tuple[str, str]],
+    fingerprints: list[tuple[str, list[dict] | None, str, int]],
+    shed: list[tuple] = (),
+    identities: dict[int, str] | None = None,
+) -> dict[str, dict]:
+    """
+    Log a coalesced batch of sightings in a single transaction with executemany.
+
+    Args:
+        sightings: (ts, mac, dbm, ssid, oui, ie_fingerprint, channel) per sighting, as from
+            Probe.sighting_params()
+        devices: (mac, last_seen) per unique device in the batch
+        fingerprints: (fingerprint_id, ie_data, last_seen, frame_count) per unique fingerprint
+        shed: Frames the load shedder or flood detector left out of sightings, as
+            capture.shedding.aggregate_shed() rows; counted in the visits, rollups,
+            device summaries and overview counters but not stored
+        identities: identity_id per MAC (random MACs linked by capture/linker.py),
+            written to the sightings and counted in the identity aggregates
 
-    # Fetch OLD fingerprint BEFORE updating (for arrival detection)
-    old_fingerprint = None
-    if sighting.ie_fingerprint and sighting.ie_data:
-        old_fingerprint = get_device_fingerprint(sighting.ie_fingerprint)
+    Returns:
+        Fingerprint dicts keyed by fingerprint_id, for notification logic: the row before
+        the update with inserted=False, or the row this batch inserted with inserted=True
+    """
+    ssid_ids = _dictionary_ids("ssids", {row[3] for row in sightings} | {row[2] for row in shed})
+    oui_ids = _dictionary_ids("ouis", {row[4] for row in sightings} | {row[3] for row in shed})
 
-        # Now update the fingerprint (updates last_seen to now)
-        upsert_device_fingerprint(sighting.ie_fingerprint, sighting.ie_data)
+    # Route each sighting to its monthly partition (almost always a single one)
+    by_partition = defaultdict(list)
+    for row in sightings:
+        by_partition[database.partition_name(row[0])].append(row)
+    database.ensure_partitions(by_partition)
+    seen = seen_filters()
 
-    # Then log the sighting
     with get_cursor() as cursor:
-        cursor.execute(
+        # Ensure devices exist first
+        cursor.executemany(
             """
-            INSERT INTO sightings (timestamp, mac, rssi, dbm, ssid, oui, ie_fingerprint)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
+            INSERT INTO devices (mac, first_seen, last_seen, is_trusted)
+            VALUES (?1, ?2, ?2, 0)
+            ON CONFLICT(mac) DO UPDATE SET last_seen = MAX(last_seen, ?2)
+        """,
+            devices,
+        )
+
+        # Fetch OLD fingerprints BEFORE updating (for arrival detection); the seen-before
+        # filter rules out the ones that definitely have no row yet
+        unseen = seen.unseen_fingerprints([row[0] for row in fingerprints])
+        old_fingerprints = _select_fingerprints(
+            cursor, [row[0] for row in fingerprints if row[0] not in unseen]
+        )
+
+        cursor.executemany(
+            """
+            INSERT INTO device_fingerprints (fingerprint_id, ie_data, first_seen, last_seen, sighting_count)
+            VALUES (?1, ?2, ?3, ?3, ?4)
+            ON CONFLICT(fingerprint_id) DO UPDATE SET
+                last_seen = MAX(last_seen, ?3),
+                sighting_count = sighting_count + ?4
         """,
             (
-                now,
-                sighting.mac,
-                f"{sighting.dbm} dBm",  # rssi as formatted string
-                sighting.dbm,  # dbm as integer for numeric queries
-                sighting.ssid,
-                sighting.oui,
-                sighting.ie_fingerprint,
+                (fingerprint_id, json.dumps(ie_data) if ie_data else None, last_seen, count)
+                for fingerprint_id, ie_data, last_seen, count in fingerprints
             ),
         )
 
-    return old_fingerprint
+        # The rest were inserted by this batch, however many frames it had of them
+        new_fingerprints = _select_fingerprints(
+            cursor, [row[0] for row in fingerprints if row[0] not in old_fingerprints]
+        )
+
+        index_fingerprints(
+            cursor,
+            [
+                (fingerprint_id, ie_data)
+                for fingerprint_id, ie_data, _, _ in fingerprints
+                if fingerprint_id not in old_fingerprints
+            ],
+        )
+        open_visits = update_visits(cursor, sightings, shed)
+        update_rollups(cursor, sightings, shed)
+        # Reads each device's previous last_ts, so it goes before the summary update
+        update_overview_stats(
+            cursor,
+            sightings,
+            {row[0] for row in fingerprints if row[0] not in old_fingerprints},
+            ssid_ids,
+            oui_ids,
+            shed,
+        )
+        update_device_summary(cursor, sightings, shed)
+        update_sketches(cursor, sightings, ssid_ids)
+        # After the fingerprint upsert: fingerprint aggregates update existing rows
+        update_aggregates(cursor, sightings, ssid_ids, shed, identities)
+        update_ssid_index(cursor, sightings, ssid_ids, shed)
+        identities = identities or {}
+
+        for partition, rows in by_partition.items():
+            cursor.executemany(
+                f"""
+                INSERT INTO {partition}
+                    (ts, mac, dbm, ssid_id, oui_id, ie_fingerprint, identity_id, channel)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+                (
+                    (
+                        ts,
+                        mac,
+                        dbm,
+                        ssid_ids[ssid],
+                        oui_ids[oui],
+                        fingerprint_id,
+                        identities.get(mac),
+                        channel,
+                    )
+                    for ts, mac, dbm, ssid, oui, fingerprint_id, channel in rows
+                ),
+            )
+            cursor.execute(
+                "UPDATE sighting_partitions SET row_count = row_count + ? WHERE name = ?",
+                (len(rows), partition),
+            )
+
+    remember_open_visits(open_visits)
+    seen.remember(
+        macs={row[1] for row in sightings} | {row[1] for row in shed},
+        fingerprint_ids=[row[0] for row in fingerprints],
+    )
+    maybe_compact_rollups()
+    return {
+        **{fid: {**row, "inserted": False} for fid, row in old_fingerprints.items()},
+        **{fid: {**row, "inserted": True} for fid, row in new_fingerprints.items()},
+    }
+
+
+def _sighting_partitions(
+    cursor, since: int | None = None, until: int | None = None, newest_first: bool = False
+) -> list[str]:
+    """
+    Partition router: the sighting tables whose time range overlaps [since, until).
+
+    Args:
+        since: Epoch seconds, inclusive (None = unbounded)
+        until: Epoch seconds, exclusive (None = unbounded)
+        newest_first: Return the newest partition first instead of the oldest
+
+    Returns:
+        Partition table names in time order
+    """
+    conditions, params = [], []
+    if since is not None:
+        conditions.append("end_ts > ?")
+        params.append(since)
+    if until is not None:
+        conditions.append("start_ts < ?")
+        params.append(until)
+    where_clause = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    order = "DESC" if newest_first else "ASC"
+
+    cursor.execute(
+        f"SELECT name FROM sighting_partitions {where_clause} "
+        f"ORDER BY start_ts {order}, end_ts {order}",
+        params,
+    )
+    return [row["name"] for row in cursor.fetchall()]
+
+
+def get_device_sighting_stats(mac: str) -> dict:
+    """
+    Summarize a device's sightings across all partitions.
+
+    Args:
+        mac: Device MAC address
+
+    Returns:
+        Dict with oui (most recent), ssids (sorted unique), total_sightings and avg_signal_dbm
+    """
+    mac_int = mac_to_int(mac)
+    total, dbm_sum, dbm_count = 0, 0, 0
+    oui = None
+    ssids = set()
+    with get_cursor() as cursor:
+        for partition in _sighting_partitions(cursor, newest_first=True):
+            cursor.execute(
+                f"SELECT COUNT(*) AS count, SUM(dbm) AS dbm_sum, COUNT(dbm) AS dbm_count "
+                f"FROM {partition} WHERE mac = ?",
+                (mac_int,),
+            )
+            stats = cursor.fetchone()
+            if not stats["count"]:
+                continue
+            total += stats["count"]
+            dbm_sum += stats["dbm_sum"] or 0
+            dbm_count += stats["dbm_count"]
+
+            # Most recent OUI
+            if oui is None:
+                cursor.execute(
+                    f"""
+                    SELECT ouis.oui FROM {partition} AS s JOIN ouis ON ouis.oui_id = s.oui_id
+                    WHERE s.mac = ? ORDER BY s.ts DESC LIMIT 1
+                """,
+                    (mac_int,),
+                )
+                oui_row = cursor.fetchone()
+                oui = oui_row["oui"] if oui_row else None
+
+            # Unique SSIDs
+            cursor.execute(
+                f"""
+                SELECT DISTINCT ssids.ssid FROM {partition} AS s JOIN ssids ON ssids.ssid_id = s.ssid_id
+                WHERE s.mac = ? AND ssids.ssid != ''
+            """,
+                (mac_int,),
+            )
+            ssids.update(row["ssid"] for row in cursor.fetchall())
+
+    return {
+        "oui": oui,
+        "ssids": sorted(ssids),
+        "total_sightings": total,
+        "avg_signal_dbm": dbm_sum / dbm_count if dbm_count else None,
+    }
 
 
 def get_device(mac: str) -> dict | None:
@@ -245,6 +493,92 @@ def get_all_devices(is_trusted: bool | None = None) -> list[dict]:
         return [dict(row) for row in cursor.fetchall()]
 
 
+# Sort keys accepted by get_device_summaries (API name -> SQL expression)
+DEVICE_SORT_KEYS = {
+    "last_seen": "d.last_seen",
+    "first_seen": "d.first_seen",
+    "name": "d.name",
+    "mac": "d.mac",
+    "total_sightings": "COALESCE(s.total_sightings, 0)",
+    "avg_signal_dbm": "s.dbm_sum * 1.0 / s.dbm_count",
+}
+
+DEVICE_SUMMARY_SELECT = """
+    SELECT d.*, s.oui, COALESCE(s.ssids, '[]') AS ssids,
+           COALESCE(s.total_sightings, 0) AS total_sightings,
+           s.dbm_sum * 1.0 / s.dbm_count AS avg_signal_dbm, s.last_dbm
+    FROM devices AS d
+    LEFT JOIN device_summary AS s ON s.mac = d.mac
+"""
+
+
+def _device_summary_row(row) -> dict:
+    device = dict(row)
+    device["ssids"] = json.loads(device["ssids"])
+    return device
+
+
+def get_device_summaries(
+    is_trusted: bool | None = None,
+    sort: str = "last_seen",
+    order: str = "DESC",
+    limit: int | None = None,
+    offset: int = 0,
+) -> tuple[list[dict], int]:
+    """
+    Get devices with their sighting summary, sorted and paginated in SQL.
+
+    Args:
+        is_trusted: Filter by trusted status (None = all devices)
+        sort: One of DEVICE_SORT_KEYS
+        order: 'ASC' or 'DESC'
+        limit: Page size (None = all devices)
+        offset: Number of devices to skip
+
+    Returns:
+        Tuple of (device dicts with oui, ssids, total_sightings, avg_signal_dbm and
+        last_dbm, total matching devices)
+    """
+    if sort not in DEVICE_SORT_KEYS:
+        raise ValueError(f"Unknown sort key: {sort}")
+    order = "ASC" if order.upper() == "ASC" else "DESC"
+
+    where_clause, params = "", []
+    if is_trusted is not None:
+        where_clause = "WHERE d.is_trusted = ?"
+        params.append(int(is_trusted))
+
+    with get_cursor() as cursor:
+        cursor.execute(f"SELECT COUNT(*) FROM devices AS d {where_clause}", params)
+        total = cursor.fetchone()[0]
+
+        # NULLs (no sightings yet) sort last either way; mac breaks ties
+        cursor.execute(
+            f"""
+            {DEVICE_SUMMARY_SELECT}
+            {where_clause}
+            ORDER BY {DEVICE_SORT_KEYS[sort]} IS NULL, {DEVICE_SORT_KEYS[sort]} {order}, d.mac
+            LIMIT ? OFFSET ?
+        """,
+            params + [-1 if limit is None else limit, offset],
+        )
+        return [_device_summary_row(row) for row in cursor.fetchall()], total
+
+
+def get_device_summary(mac: str) -> dict | None:
+    """
+    Get a single device with its sighting summary (one primary-key join).
+
+    Returns:
+        Device dict with oui, ssids, total_sightings, avg_signal_dbm and last_dbm, or
+        None if not found
+    """
+    with get_cursor() as cursor:
+        cursor.execute(f"{DEVICE_SUMMARY_SELECT} WHERE d.mac = ?", (mac,))
+        row = cursor.fetchone()
+        return _device_summary_row(row) if row else None
+
+
 def update_device(mac: str, name: str | None = None, is_trusted: bool | None = None):
     """
     Update device name and/or trusted status.
@@ -273,44 +607,460 @@ def update_device(mac: str, name: str | None = None, is_trusted: bool | None = N
             cursor.execute(query, params)
 
 
+def get_table_versions(tables) -> dict[str, int]:
+    """
+    Get the change counters of versioned tables (schema.VERSIONED_TABLES).
+
+    Every insert, update or delete bumps its table's version, so equal versions mean
+    equal contents.
+
+    Returns:
+        Version keyed by table name
+    """
+    tables = list(tables)
+    with get_cursor() as cursor:
+        cursor.execute(
+            f"SELECT name, version FROM table_versions "
+            f"WHERE name IN ({', '.join('?' * len(tables))})",
+            tables,
+        )
+        return {row["name"]: row["version"] for row in cursor.fetchall()}
+
+
 def get_sightings(
-    mac: str | None = None, limit: int = 100, offset: int = 0, order: str = "DESC"
+    limit: int = 100, offset: int = 0, order: str = "DESC", **filters
 ) -> tuple[list[dict], int]:
     """
-    Get sightings with optional filtering and pagination.
+    Get sightings with optional filtering and offset pagination.
+
+    Counts every match, so the cost grows with the table; the API uses
+    get_sightings_page() unless a client asks for an offset. Only the partitions
+    overlapping [since, until) are read, walked in sort order until the page is
+    filled.
 
     Args:
-        mac: Filter by device MAC address
         limit: Maximum number of results
         offset: Number of results to skip
         order: Sort order ("ASC" or "DESC")
+        **filters: Fields of SightingFilter (mac, since, until, ssid, ...)
 
     Returns:
         Tuple of (sightings list, total count)
+
+    Raises:
+        ValueError: On an invalid MAC address
     """
+    sighting_filter = SightingFilter(**filters)
     with get_cursor() as cursor:
-        # Build query
-        where_clause = "WHERE mac = ?" if mac else ""
-        params = [mac] if mac else []
+        compiled = sighting_filter.compile(cursor)
+        if compiled is None:
+            return [], 0
+        conditions, params = compiled
+        where_clause = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        partitions = _sighting_partitions(
+            cursor, sighting_filter.since, sighting_filter.until, newest_first=order == "DESC"
+        )
 
         # Get total count
-        count_query = f"SELECT COUNT(*) as count FROM sightings {where_clause}"
-        cursor.execute(count_query, params)
-        total = cursor.fetchone()["count"]
+        counts = []
+        for partition in partitions:
+            cursor.execute(f"SELECT COUNT(*) as count FROM {partition} AS s {where_clause}", params)
+            counts.append(cursor.fetchone()["count"])
+        total = sum(counts)
 
         # Get sightings
-        query = f"""
-            SELECT * FROM sightings
-            {where_clause}
-            ORDER BY timestamp {order}
-            LIMIT ? OFFSET ?
-        """
-        cursor.execute(query, params + [limit, offset])
-        sightings = [dict(row) for row in cursor.fetchall()]
+        sightings = []
+        skip = offset
+        for partition, count in zip(partitions, counts):
+            if len(sightings) >= limit:
+                break
+            if skip >= count:
+                skip -= count
+                continue
+            query = f"""
+                SELECT {SIGHTING_COLUMNS} FROM {partition} AS s {SIGHTING_JOINS}
+                {where_clause}
+                ORDER BY s.ts {order}, s.id {order}
+                LIMIT ? OFFSET ?
+            """
+            cursor.execute(query, params + [limit - len(sightings), skip])
+            sightings.extend(dict(row) for row in cursor.fetchall())
+            skip = 0
 
         return sightings, total
 
 
+def encode_cursor(direction: str, *key) -> str:
+    """
+    Opaque pagination token for the row at `key`.
+
+    Args:
+        direction: 'next' for rows after the key, 'prev' for rows before it
+        key: Sort key of the boundary row, e.g. (ts, id)
+    """
+    raw = ":".join([direction[0], *(str(value) for value in key)])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(token: str, types: tuple = (int, int)) -> tuple[str, tuple]:
+    """
+    Parse a token from encode_cursor().
+
+    Returns:
+        Tuple of (direction, key)
+
+    Raises:
+        ValueError: If the token is malformed
+    """
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)).decode()
+        direction, *values = raw.split(":", len(types))
+        if direction not in ("n", "p") or len(values) != len(types):
+            raise ValueError
+        key = tuple(cast(value) for cast, value in zip(types, values))
+    except (ValueError, UnicodeDecodeError, binascii.Error):
+        raise ValueError("Invalid cursor") from None
+    return ("next" if direction == "n" else "prev"), key
+
+
+def _keyset_condition(first: str, second: str, descending: bool) -> str:
+    """
+    Rows strictly after (?, ?) in (first, second) order. Written as a range on the
+    first column so its index applies; takes params (first, first, second).
+    """
+    op = "<" if descending else ">"
+    return f"{first} {op}= ? AND ({first} {op} ? OR {second} {op} ?)"
+
+
+def _page_cursors(
+    rows: list, key, direction: str | None, has_more: bool
+) -> tuple[str | None, str | None]:
+    """next/prev tokens for a page of rows fetched with a (possibly absent) cursor."""
+    if not rows:
+        return None, None
+    next_cursor = prev_cursor = None
+    if direction == "prev" or has_more:
+        next_cursor = encode_cursor("next", *key(rows[-1]))
+    if direction == "next" or (direction == "prev" and has_more):
+        prev_cursor = encode_cursor("prev", *key(rows[0]))
+    return next_cursor, prev_cursor
+
+
+# Rows counted at most for totals of filters without a maintained counter
+TOTAL_COUNT_CAP = 10_000
+
+
+def _sightings_total(
+    cursor, sighting_filter: SightingFilter, where_clause: str, params: list
+) -> tuple[int, bool]:
+    """
+    Number of sightings matching the filters without counting every row.
+
+    Unfiltered and per-device totals are exact (partition row counts and
+    device_summary). Time ranges are estimated, from the device's activity buckets
+    or by pro-rating partition row counts over the time they cover. Other filters
+    count matches through their index up to TOTAL_COUNT_CAP; a capped total is a
+    lower bound.
+
+    Returns:
+        Tuple of (total, is_approximate)
+    """
+    mac_int, since, until = sighting_filter.mac_int, sighting_filter.since, sighting_filter.until
+    if not sighting_filter.counter_backed:
+        total = 0
+        for partition in _sighting_partitions(cursor, since, until):
+            # Same index walk as the page query (ts order), so it is just as cheap
+            cursor.execute(
+                f"SELECT COUNT(*) FROM (SELECT 1 FROM {partition} AS s {where_clause} "
+                "ORDER BY s.ts LIMIT ?)",
+                params + [TOTAL_COUNT_CAP - total],
+            )
+            total += cursor.fetchone()[0]
+            if total >= TOTAL_COUNT_CAP:
+                return total, True
+        return total, False
+
+    if mac_int is not None and since is None and until is None:
+        cursor.execute(
+            "SELECT total_sightings FROM device_summary WHERE mac = ?", (int_to_mac(mac_int),)
+        )
+        row = cursor.fetchone()
+        return (row[0] if row else 0), False
+
+    if mac_int is not None:
+        # Every sighting is in exactly one bucket of one resolution; count the buckets
+        # overlapping the range
+        total = 0
+        for resolution, size in ROLLUP_RESOLUTIONS.items():
+            cursor.execute(
+                f"SELECT COALESCE(SUM(count), 0) FROM {rollup_table('mac', resolution)} "
+                "WHERE mac = ? AND bucket_ts > ? AND bucket_ts < ?",
+                (
+                    mac_int,
+                    -1 if since is None else since - size,
+                    1 << 62 if until is None else until,
+                ),
+            )
+            total += cursor.fetchone()[0]
+        return total, True
+
+    if since is None and until is None:
+        cursor.execute("SELECT COALESCE(SUM(row_count), 0) FROM sighting_partitions")
+        return cursor.fetchone()[0], False
+
+    total = 0.0
+    approximate = False
+    for partition in _sighting_partitions(cursor, since, until):
+        # Separate MIN/MAX subqueries, so each is a single ts index lookup
+        cursor.execute(
+            f"SELECT row_count, (SELECT MIN(ts) FROM {partition}), "
+            f"(SELECT MAX(ts) FROM {partition}) FROM sighting_partitions WHERE name = ?",
+            (partition,),
+        )
+        row_count, first, last = cursor.fetchone()
+        if not row_count or first is None:
+            continue
+        start = first if since is None else max(first, since)
+        end = last + 1 if until is None else min(last + 1, until)
+        if start <= first and end > last:
+            total += row_count
+        elif end > start:
+            total += row_count * (end - start) / (last + 1 - first)
+            approximate = True
+    return round(total), approximate
+
+
+def sighting_page_query(conditions: list[str], descending: bool) -> str:
+    """
+    SELECT for one partition's share of a sightings page; {partition} is left for
+    the caller and the page size is the last parameter.
+    """
+    where_clause = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+    order = "DESC" if descending else "ASC"
+    return f"""
+        SELECT {SIGHTING_COLUMNS}, s.ts FROM {{partition}} AS s {SIGHTING_JOINS}
+        {where_clause}
+        ORDER BY s.ts {order}, s.id {order}
+        LIMIT ?
+    """
+
+
+def get_sightings_page(
+    limit: int = 100, order: str = "DESC", cursor_token: str | None = None, **filters
+) -> dict:
+    """
+    Get one page of sightings with keyset pagination.
+
+    Each page seeks straight to its (ts, id) position through the index of the
+    most selective filter (see SIGHTING_TABLE), in the partitions it needs, so deep
+    pages cost the same as the first one. Rows still waiting in sightings_legacy
+    are not listed or counted until backfill_compact_sightings() has moved them.
+
+    Args:
+        limit: Page size
+        order: Sort order ("ASC" or "DESC")
+        cursor_token: next_cursor or prev_cursor of a previous page (None = first page)
+        **filters: Fields of SightingFilter (mac, since, until, ssid, ...)
+
+    Returns:
+        Dict with sightings, total, total_is_approximate, next_cursor and prev_cursor
+
+    Raises:
+        ValueError: On an invalid MAC address or cursor
+    """
+    direction, key = decode_cursor(cursor_token) if cursor_token else (None, None)
+    descending = (order == "DESC") != (direction == "prev")
+    sighting_filter = SightingFilter(**filters)
+    since, until = sighting_filter.since, sighting_filter.until
+
+    # Partitions past the cursor can't hold the page
+    scan_since, scan_until = since, until
+    if key and descending:
+        scan_until = key[0] + 1 if until is None else min(until, key[0] + 1)
+    elif key:
+        scan_since = key[0] if since is None else max(since, key[0])
+
+    rows = []
+    with get_cursor() as cursor:
+        compiled = sighting_filter.compile(cursor)
+        if compiled is None:
+            return {
+                "sightings": [],
+                "total": 0,
+                "total_is_approximate": False,
+                "next_cursor": None,
+                "prev_cursor": None,
+            }
+        conditions, params = compiled
+        where_clause = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        total, approximate = _sightings_total(cursor, sighting_filter, where_clause, params)
+
+        if key:
+            conditions = conditions + [_keyset_condition("s.ts", "s.id", descending)]
+            params = params + [key[0], key[0], key[1]]
+        query = sighting_page_query(conditions, descending)
+        for partition in _sighting_partitions(cursor, scan_since, scan_until, descending):
+            cursor.execute(query.format(partition=partition), params + [limit + 1 - len(rows)])
+            rows.extend(dict(row) for row in cursor.fetchall())
+            if len(rows) > limit:
+                break
+
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if direction == "prev":
+        rows.reverse()
+    next_cursor, prev_cursor = _page_cursors(
+        rows, lambda row: (row["ts"], row["id"]), direction, has_more
+    )
+    for row in rows:
+        del row["ts"]
+    return {
+        "sightings": rows,
+        "total": total,
+        "total_is_approximate": approximate,
+        "next_cursor": next_cursor,
+        "prev_cursor": prev_cursor,
+    }
+
+
+def iter_sightings(order: str = "ASC", chunk_size: int = 5000, **filters) -> Iterator[list[tuple]]:
+    """
+    Stream every sighting matching the filters, in chunks, for bulk exports.
+
+    Walks the partitions in ts order with keyset chunks. Each chunk is read in its
+    own short transaction, so memory stays at one chunk and a long export doesn't
+    hold a read snapshot (and the WAL) open. Like get_sightings_page(), it skips
+    rows still waiting in sightings_legacy during a backfill.
+
+    Args:
+        order: Sort order ("ASC" or "DESC")
+        chunk_size: Rows per chunk
+        **filters: Fields of SightingFilter (mac, since, until, ssid, ...)
+
+    Yields:
+        Lists of row tuples in SIGHTING_FIELDS order
+
+    Raises:
+        ValueError: On an invalid MAC address
+    """
+    descending = order == "DESC"
+    sighting_filter = SightingFilter(**filters)
+    with get_cursor() as cursor:
+        compiled = sighting_filter.compile(cursor)
+        if compiled is None:
+            return
+        partitions = _sighting_partitions(
+            cursor, sighting_filter.since, sighting_filter.until, descending
+        )
+    conditions, params = compiled
+    first_query = sighting_page_query(conditions, descending)
+    next_query = sighting_page_query(
+        conditions + [_keyset_condition("s.ts", "s.id", descending)], descending
+    )
+
+    for partition in partitions:
+        key = None
+        while True:
+            with get_cursor() as cursor:
+                cursor.row_factory = None  # plain tuples
+                if key is None:
+                    cursor.execute(first_query.format(partition=partition), params + [chunk_size])
+                else:
+                    cursor.execute(
+                        next_query.format(partition=partition),
+                        params + [key[0], key[0], key[1], chunk_size],
+                    )
+                rows = cursor.fetchall()
+            if rows:
+                key = (rows[-1][-1], rows[-1][0])  # trailing ts, id
+                yield [row[:-1] for row in rows]
+            if len(rows) < chunk_size:
+                break
+
+
+def get_fingerprints_offset(limit: int = 50, offset: int = 0) -> tuple[list[dict], int]:
+    """
+    Get device fingerprints, most sighted first, with legacy offset pagination.
+
+    Args:
+        limit: Maximum number of results
+        offset: Number of results to skip
+
+    Returns:
+        Tuple of (fingerprints, exact total count)
+    """
+    with get_cursor() as cursor:
+        cursor.execute("SELECT COUNT(*) as count FROM device_fingerprints")
+        total = cursor.fetchone()["count"]
+
+        cursor.execute(
+            """
+            SELECT fingerprint_id, identity_id, first_seen, last_seen, sighting_count
+            FROM device_fingerprints
+            ORDER BY sighting_count DESC, fingerprint_id DESC
+            LIMIT ? OFFSET ?
+        """,
+            (limit, offset),
+        )
+        return [dict(row) for row in cursor.fetchall()], total
+
+
+def get_fingerprints_page(limit: int = 50, cursor_token: str | None = None) -> dict:
+    """
+    Get one page of device fingerprints, most sighted first, with keyset pagination.
+
+    Args:
+        limit: Page size
+        cursor_token: next_cursor or prev_cursor of a previous page (None = first page)
+
+    Returns:
+        Dict with fingerprints, total, total_is_approximate, next_cursor and prev_cursor
+
+    Raises:
+        ValueError: On an invalid cursor
+    """
+    direction, key = decode_cursor(cursor_token, (int, str)) if cursor_token else (None, None)
+    descending = direction != "prev"
+    order = "DESC" if descending else "ASC"
+
+    where_clause, params = "", []
+    if key:
+        where_clause = "WHERE " + _keyset_condition("sighting_count", "fingerprint_id", descending)
+        params = [key[0], key[0], key[1]]
+
+    with get_cursor() as cursor:
+        cursor.execute(
+            f"""
+            SELECT fingerprint_id, identity_id, first_seen, last_seen, sighting_count
+            FROM device_fingerprints
+            {where_clause}
+            ORDER BY sighting_count {order}, fingerprint_id {order}
+            LIMIT ?
+        """,
+            params + [limit + 1],
+        )
+        rows = [dict(row) for row in cursor.fetchall()]
+
+        # Merges and pruning delete fingerprints, so rowids aren't a row count
+        cursor.execute("SELECT COUNT(*) FROM device_fingerprints")
+        total = cursor.fetchone()[0]
+
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if direction == "prev":
+        rows.reverse()
+    next_cursor, prev_cursor = _page_cursors(
+        rows, lambda row: (row["sighting_count"], row["fingerprint_id"]), direction, has_more
+    )
+    return {
+        "fingerprints": rows,
+        "total": total,
+        "total_is_approximate": False,
+        "next_cursor": next_cursor,
+        "prev_cursor": prev_cursor,
+    }
+
+
 def get_recent_sightings(limit: int = 50) -> list[dict]:
     """
     Get the most recent sightings.
@@ -321,9 +1071,389 @@ def get_recent_sightings(limit: int = 50) -> list[dict]:
     Returns:
         List of recent sightings
     """
+    sightings = []
     with get_cursor() as cursor:
-        cursor.execute("SELECT * FROM sightings ORDER BY timestamp DESC LIMIT ?", (limit,))
-        return [dict(row) for row in cursor.fetchall()]
+        for partition in _sighting_partitions(cursor, newest_first=True):
+            cursor.execute(
+                f"SELECT {SIGHTING_COLUMNS} FROM {partition} AS s {SIGHTING_JOINS} "
+                "ORDER BY s.ts DESC, s.id DESC LIMIT ?",
+                (limit - len(sightings),),
+            )
+            sightings.extend(dict(row) for row in cursor.fetchall())
+            if len(sightings) >= limit:
+                break
+    return sightings
+
+
+def get_devices_present(since: int, until: int) -> list[dict]:
+    """
+    Devices present between two times, read from the visits table.
+
+    Args:
+        since: Epoch seconds, inclusive
+        until: Epoch seconds, exclusive
+
+    Returns:
+        One dict per MAC (most recently seen first) with first_seen/last_seen of its
+        overlapping visits, visit_count and frame_count
+    """
+    with get_cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT mac, MIN(start_ts) AS first_ts, MAX(end_ts) AS last_ts,
+                   COUNT(*) AS visit_count, SUM(frame_count) AS frame_count
+            FROM visits
+            WHERE end_ts >= ? AND start_ts < ?
+            GROUP BY mac
+            ORDER BY last_ts DESC
+        """,
+            (since, until),
+        )
+        return [
+            {
+                "mac": int_to_mac(row["mac"]),
+                "first_seen": epoch_to_utc_iso(row["first_ts"]),
+                "last_seen": epoch_to_utc_iso(row["last_ts"]),
+                "visit_count": row["visit_count"],
+                "frame_count": row["frame_count"],
+            }
+            for row in cursor.fetchall()
+        ]
+
+
+def get_visits(
+    mac: str | None = None,
+    since: int | None = None,
+    until: int | None = None,
+    limit: int = 100,
+) -> list[dict]:
+    """
+    Get visits (presence intervals), most recent first.
+
+    Args:
+        mac: Filter by device MAC address
+        since: Only visits still active at or after this epoch second
+        until: Only visits starting before this epoch second
+        limit: Maximum number of results
+
+    Returns:
+        List of visit dicts
+    """
+    conditions, params = [], []
+    if mac:
+        conditions.append("mac = ?")
+        params.append(mac_to_int(mac))
+    if since is not None:
+        conditions.append("end_ts >= ?")
+        params.append(since)
+    if until is not None:
+        conditions.append("start_ts < ?")
+        params.append(until)
+    where_clause = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+    with get_cursor() as cursor:
+        cursor.execute(
+            f"SELECT * FROM visits {where_clause} ORDER BY end_ts DESC LIMIT ?",
+            params + [limit],
+        )
+        return [
+            {
+                "visit_id": row["visit_id"],
+                "mac": int_to_mac(row["mac"]),
+                "ie_fingerprint": row["ie_fingerprint"],
+                "start": epoch_to_utc_iso(row["start_ts"]),
+                "end": epoch_to_utc_iso(row["end_ts"]),
+                "duration_seconds": row["end_ts"] - row["start_ts"],
+                "frame_count": row["frame_count"],
+                "min_dbm": row["min_dbm"],
+                "max_dbm": row["max_dbm"],
+                "avg_dbm": row["dbm_sum"] / row["frame_count"] if row["frame_count"] else None,
+                "ssids": json.loads(row["ssids"]),
+            }
+            for row in cursor.fetchall()
+        ]
+
+
+def _activity_buckets(cursor, subject: str, key, since: int, until: int, resolution: str) -> dict:
+    """
+    Merge a subject's rollup tables into buckets of one resolution.
+
+    Buckets coarser than the resolution (already compacted) are returned as-is.
+
+    Returns:
+        {bucket_ts: [count, dbm_sum, min_dbm, max_dbm]}
+    """
+    size = ROLLUP_RESOLUTIONS[resolution]
+    key_column = ROLLUP_SUBJECTS[subject][0]
+    buckets = {}
+    for table_resolution, table_size in ROLLUP_RESOLUTIONS.items():
+        cursor.execute(
+            f"""
+            SELECT bucket_ts - bucket_ts % ? AS bucket, SUM(count) AS count,
+                   SUM(dbm_sum) AS dbm_sum, MIN(min_dbm) AS min_dbm, MAX(max_dbm) AS max_dbm
+            FROM {rollup_table(subject, table_resolution)}
+            WHERE {key_column} = ? AND bucket_ts > ? AND bucket_ts < ?
+            GROUP BY bucket
+        """,
+            (max(size, table_size), key, since - table_size, until),
+        )
+        for row in cursor.fetchall():
+            stats = buckets.setdefault(row["bucket"], [0, 0, None, None])
+            stats[0] += row["count"]
+            stats[1] += row["dbm_sum"]
+            if row["min_dbm"] is not None:
+                stats[2] = row["min_dbm"] if stats[2] is None else min(stats[2], row["min_dbm"])
+                stats[3] = row["max_dbm"] if stats[3] is None else max(stats[3], row["max_dbm"])
+    return buckets
+
+
+def get_fingerprint_counts_since(since: int) -> list[tuple[str, int, int]]:
+    """
+    Sightings per fingerprint and minute since a time, from the minute rollups.
+
+    Returns:
+        (fingerprint_id, bucket_ts, count) tuples
+    """
+    with get_cursor() as cursor:
+        cursor.execute(
+            f"SELECT ie_fingerprint, bucket_ts, count FROM {rollup_table('fingerprint', 'minute')} "
+            f"WHERE bucket_ts >= ?",
+            (since,),
+        )
+        return [tuple(row) for row in cursor.fetchall()]
+
+
+def get_activity(subject: str, key, since: int | None = None, until: int | None = None) -> dict:
+    """
+    Activity of a MAC or fingerprint from the rollup tables.
+
+    The series resolution follows the range: minutes up to 6 hours, hours up to 31
+    days, days beyond. by_hour, by_day_of_week (Monday = 0) and by_date summarize the
+    same range in Eastern time, from hour buckets. The rollups are built from every
+    sighting source, so rows still waiting in sightings_legacy are included.
+
+    Args:
+        subject: "mac" or "fingerprint"
+        key: 48-bit MAC or fingerprint_id
+        since: Epoch seconds, inclusive (default 30 days before until)
+        until: Epoch seconds, exclusive (default now)
+
+    Returns:
+        Dict with resolution, buckets, by_hour, by_day_of_week and by_date
+    """
+    until = until if until is not None else int(utc_now().timestamp())
+    since = since if since is not None else until - 30 * 86400
+    span = until - since
+    resolution = "minute" if span <= 6 * 3600 else "hour" if span <= 31 * 86400 else "day"
+
+    with get_cursor() as cursor:
+        series = _activity_buckets(cursor, subject, key, since, until, resolution)
+        if resolution == "hour":
+            hourly = series
+        else:
+            hourly = _activity_buckets(cursor, subject, key, since, until, "hour")
+
+    by_hour = [0] * 24
+    by_day_of_week = [0] * 7
+    by_date = {}
+    day = datetime.fromtimestamp(since, EASTERN).date()
+    last_day = datetime.fromtimestamp(until - 1, EASTERN).date()
+    while day <= last_day:
+        by_date[day.isoformat()] = 0
+        day += timedelta(days=1)
+    for bucket, (count, *_) in hourly.items():
+        local = datetime.fromtimestamp(bucket, EASTERN)
+        by_hour[local.hour] += count
+        by_day_of_week[local.weekday()] += count
+        date = local.date().isoformat()
+        if date in by_date:
+            by_date[date] += count
+
+    return {
+        "resolution": resolution,
+        "buckets": [
+            {
+                "start": epoch_to_utc_iso(bucket),
+                "count": count,
+                "avg_dbm": dbm_sum / count if count else None,
+                "min_dbm": min_dbm,
+                "max_dbm": max_dbm,
+            }
+            for bucket, (count, dbm_sum, min_dbm, max_dbm) in sorted(series.items())
+        ],
+        "by_hour": by_hour,
+        "by_day_of_week": by_day_of_week,
+        "by_date": by_date,
+    }
+
+
+OVERVIEW_TOP = 5  # Manufacturers and SSIDs listed in the overview
+
+
+def get_overview_stats(now: int | None = None) -> dict:
+    """
+    Dashboard overview from the counters kept by storage/stats.py.
+
+    Every figure is a primary-key lookup or a short index scan over tables of bounded
+    size, so the cost doesn't grow with the number of sightings or devices.
+
+    Args:
+        now: Epoch seconds the day, week and last-24-hours windows end at (default now)
+
+    Returns:
+        Dict matching api.schemas.OverviewStats
+    """
+    now = now if now is not None else int(utc_now().timestamp())
+    today, this_week = eastern_day_start(now), eastern_week_start(now)
+    minute = now - now % 60
+
+    with get_cursor() as cursor:
+        cursor.execute("SELECT name, value FROM stat_totals")
+        totals = {row["name"]: row["value"] for row in cursor.fetchall()}
+        cursor.execute("SELECT COALESCE(SUM(row_count), 0) FROM sighting_partitions")
+        total_sightings = cursor.fetchone()[0]
+        cursor.execute("SELECT COUNT(*) FROM device_fingerprints")
+        total_fingerprints = cursor.fetchone()[0]
+
+        periods = {}
+        for period, start in (("day", today), ("week", this_week)):
+            cursor.execute(
+                "SELECT sightings, devices, new_devices, new_fingerprints FROM stat_periods "
+                "WHERE period = ? AND start_ts = ?",
+                (period, start),
+            )
+            row = cursor.fetchone()
+            periods[period] = (
+                dict(row)
+                if row
+                else {"sightings": 0, "devices": 0, "new_devices": 0, "new_fingerprints": 0}
+            )
+
+        cursor.execute(
+            "SELECT mac, sightings FROM stat_device_days WHERE day_ts = ? "
+            "ORDER BY sightings DESC LIMIT 1",
+            (today,),
+        )
+        row = cursor.fetchone()
+        most_active = None
+        if row:
+            mac = int_to_mac(row["mac"])
+            cursor.execute("SELECT name FROM devices WHERE mac = ?", (mac,))
+            device = cursor.fetchone()
+            most_active = {
+                "mac": mac,
+                "name": device["name"] if device else None,
+                "sightings": row["sightings"],
+            }
+
+        cursor.execute(
+            "SELECT ouis.oui, s.devices AS count FROM stat_ouis AS s "
+            "JOIN ouis ON ouis.oui_id = s.oui_id ORDER BY s.devices DESC LIMIT ?",
+            (OVERVIEW_TOP,),
+        )
+        top_manufacturers = [dict(row) for row in cursor.fetchall()]
+        cursor.execute(
+            "SELECT ssids.ssid, s.sightings AS count FROM stat_ssids AS s "
+            "JOIN ssids ON ssids.ssid_id = s.ssid_id WHERE ssids.ssid != 'Undirected Probe' "
+            "ORDER BY s.sightings DESC LIMIT ?",
+            (OVERVIEW_TOP,),
+        )
+        top_ssids = [dict(row) for row in cursor.fetchall()]
+
+        # Oldest first, the last entries are the current hour and minute
+        probes_by_hour = [0] * 24
+        cursor.execute(
+            "SELECT (? - bucket_ts) / 3600 AS hours_ago, SUM(sightings) FROM stat_minutes "
+            "WHERE bucket_ts > ? AND bucket_ts <= ? GROUP BY hours_ago",
+            (minute, minute - 24 * 3600, minute),
+        )
+        for hours_ago, sightings in cursor.fetchall():
+            probes_by_hour[23 - hours_ago] = sightings
+        probes_per_minute = [0] * 60
+        cursor.execute(
+            "SELECT bucket_ts, sightings FROM stat_minutes WHERE bucket_ts > ? AND bucket_ts <= ?",
+            (minute - 3600, minute),
+        )
+        for bucket_ts, sightings in cursor.fetchall():
+            probes_per_minute[59 - (minute - bucket_ts) // 60] = sightings
+
+    total_devices = totals.get("devices", 0)
+    trusted_count = totals.get("trusted", 0)
+    return {
+        "total_devices": total_devices,
+        "total_sightings": total_sightings,
+        "total_fingerprints": total_fingerprints,
+        "trusted_count": trusted_count,
+        "unknown_count": total_devices - trusted_count,
+        "devices_today": periods["day"]["devices"],
+        "devices_this_week": periods["week"]["devices"],
+        "new_today": periods["day"]["new_devices"],
+        "new_this_week": periods["week"]["new_devices"],
+        "new_fingerprints_today": periods["day"]["new_fingerprints"],
+        "new_fingerprints_this_week": periods["week"]["new_fingerprints"],
+        "sightings_today": periods["day"]["sightings"],
+        "most_active_today": most_active,
+        "top_manufacturers": top_manufacturers,
+        "top_ssids": top_ssids,
+        "probes_by_hour": probes_by_hour,
+        "probes_per_minute": probes_per_minute,
+    }
+
+
+def get_unique_counts(
+    subject: str,
+    since: int,
+    until: int,
+    ssid: str | None = None,
+    step: int | None = None,
+) -> dict:
+    """
+    Estimated unique MACs or fingerprints over a time range, from the sketches.
+
+    Args:
+        subject: "mac" or "fingerprint"
+        since: Epoch seconds, inclusive
+        until: Epoch seconds, exclusive
+        ssid: Only count MACs that probed this SSID (subject must be "mac")
+        step: Also estimate consecutive windows of this many seconds from since
+
+    Returns:
+        Dict with subject, ssid, relative_error, total and buckets (each with since,
+        until and estimate; since/until are the range actually covered)
+    """
+    if ssid is not None and subject != "mac":
+        raise ValueError("SSID audiences count MACs only")
+
+    with get_cursor() as cursor:
+        key = 0
+        if ssid is not None:
+            cursor.execute("SELECT ssid_id FROM ssids WHERE ssid = ?", (ssid,))
+            row = cursor.fetchone()
+            key = row["ssid_id"] if row else -1  # Unknown SSID: no sketches, estimate 0
+
+        def window(start: int, end: int):
+            sketch, covered_since, covered_until = range_sketch(
+                cursor, "ssid" if ssid is not None else subject, key, start, end
+            )
+            return sketch, {
+                "since": epoch_to_utc_iso(covered_since),
+                "until": epoch_to_utc_iso(covered_until),
+                "estimate": len(sketch),
+            }
+
+        total_sketch, total = window(since, until)
+        buckets = []
+        if step:
+            for start in range(since, until, step):
+                buckets.append(window(start, min(start + step, until))[1])
+
+    return {
+        "subject": subject,
+        "ssid": ssid,
+        "relative_error": total_sketch.relative_error,
+        "total": total,
+        "buckets": buckets,
+    }
 
 
 def create_device_identity(
@@ -353,20 +1483,11 @@ def create_device_identity(
         )
 
         # Link fingerprints to this identity if provided
-        if fingerprint_ids:
-            for fingerprint_id in fingerprint_ids:
-                cursor.execute(
-                    """
-                    UPDATE device_fingerprints
-                    SET identity_id = ?
-                    WHERE fingerprint_id = ?
-                """,
-                    (identity_id, fingerprint_id),
-                )
+        _relink_fingerprints(cursor, fingerprint_ids or [], identity_id)
 
         # Get and return the created identity
         cursor.execute("SELECT * FROM device_identities WHERE identity_id = ?", (identity_id,))
-        return dict(cursor.fetchone())
+        return _with_signature(cursor.fetchone())
 
 
 def update_device_identity_alias(identity_id: str, alias: str) -> dict | None:
@@ -396,7 +1517,7 @@ def update_device_identity_alias(identity_id: str, alias: str) -> dict | None:
             return None
 
         cursor.execute("SELECT * FROM device_identities WHERE identity_id = ?", (identity_id,))
-        return dict(cursor.fetchone())
+        return _with_signature(cursor.fetchone())
 
 
 def get_device_identity(identity_id: str) -> dict | None:
@@ -412,7 +1533,7 @@ def get_device_identity(identity_id: str) -> dict | None:
     with get_cursor() as cursor:
         cursor.execute("SELECT * FROM device_identities WHERE identity_id = ?", (identity_id,))
         row = cursor.fetchone()
-        return dict(row) if row else None
+        return _with_signature(row) if row else None
 
 
 def get_all_device_identities() -> list[dict]:
@@ -424,7 +1545,7 @@ def get_all_device_identities() -> list[dict]:
     """
     with get_cursor() as cursor:
         cursor.execute("SELECT * FROM device_identities ORDER BY last_seen DESC")
-        return [dict(row) for row in cursor.fetchall()]
+        return [_with_signature(row) for row in cursor.fetchall()]
 
 
 def link_fingerprint_to_identity(fingerprint_id: str, identity_id: str):
@@ -436,14 +1557,24 @@ def link_fingerprint_to_identity(fingerprint_id: str, identity_id: str):
         identity_id: The device identity ID
     """
     with get_cursor() as cursor:
-        cursor.execute(
-            """
-            UPDATE device_fingerprints
-            SET identity_id = ?
-            WHERE fingerprint_id = ?
-        """,
-            (identity_id, fingerprint_id),
-        )
+        _relink_fingerprints(cursor, [fingerprint_id], identity_id)
+
+
+def _relink_fingerprints(cursor, fingerprint_ids: list[str], identity_id: str) -> None:
+    """Link fingerprints to an identity and recount the identities that gained or lost them."""
+    if not fingerprint_ids:
+        return
+    marks = ", ".join("?" * len(fingerprint_ids))
+    cursor.execute(
+        f"SELECT DISTINCT identity_id FROM device_fingerprints WHERE fingerprint_id IN ({marks})",
+        fingerprint_ids,
+    )
+    previous = [row[0] for row in cursor.fetchall()]
+    cursor.execute(
+        f"UPDATE device_fingerprints SET identity_id = ? WHERE fingerprint_id IN ({marks})",
+        [identity_id, *fingerprint_ids],
+    )
+    refresh_identities(cursor, [identity_id, *previous])
 
 
 def disable_fingerprint_notifications(fingerprint_id: str):
@@ -494,8 +1625,5 @@ def set_fingerprint_alias(fingerprint_id: str, alias: str) -> str:
                 (fingerprint_id, alias, now, now, now),
             )
             # Link fingerprint to this identity
-            cursor.execute(
-                "UPDATE device_fingerprints SET identity_id = ? WHERE fingerprint_id = ?",
-                (fingerprint_id, fingerprint_id),
-            )
+            _relink_fingerprints(cursor, [fingerprint_id], fingerprint_id)
             return fingerprint_id
@@ -0,0 +1,197 @@
+"""
+Time-bucketed activity rollups per MAC and per fingerprint.
+
+The sighting writer adds every batch to the minute buckets. compact_rollups() folds
+minute buckets older than ROLLUP_MINUTE_HOURS into hour buckets, and hour buckets
+older than ROLLUP_HOUR_DAYS into day buckets, so every sighting is counted in
+exactly one table and the fine tables stay small. Activity queries read all three
+tables of a subject and re-bucket them to the requested resolution.
+"""
+
+import logging
+import time
+
+from probe_sniffer import config
+from probe_sniffer.models.probe import NO_STABLE_IES
+from probe_sniffer.storage import database
+from probe_sniffer.storage.database import get_cursor
+from probe_sniffer.storage.schema import ROLLUP_RESOLUTIONS, ROLLUP_SUBJECTS
+
+logger = logging.getLogger("DATABASE")
+
+
+def rollup_table(subject: str, resolution: str) -> str:
+    """Table holding one subject's buckets at one resolution, e.g. mac_activity_hour."""
+    return f"{subject}_activity_{resolution}"
+
+
+def _upsert(subject: str, resolution: str, select: str | None = None) -> str:
+    """INSERT that adds into existing buckets; VALUES placeholders unless a SELECT is given."""
+    key = ROLLUP_SUBJECTS[subject][0]
+    return f"""
+        INSERT INTO {rollup_table(subject, resolution)}
+            ({key}, bucket_ts, count, dbm_sum, min_dbm, max_dbm)
+        {select or "VALUES (?, ?, ?, ?, ?, ?)"}
+        ON CONFLICT({key}, bucket_ts) DO UPDATE SET
+            count = count + excluded.count,
+            dbm_sum = dbm_sum + excluded.dbm_sum,
+            min_dbm = MIN(COALESCE(min_dbm, excluded.min_dbm), COALESCE(excluded.min_dbm, min_dbm)),
+            max_dbm = MAX(COALESCE(max_dbm, excluded.max_dbm), COALESCE(excluded.max_dbm, max_dbm))
+    """
+
+
+def _add(buckets: dict, key, dbm: int | None):
+    """Add one sighting to a [count, dbm_sum, min_dbm, max_dbm] bucket."""
+    stats = buckets.get(key)
+    if stats is None:
+        buckets[key] = [1, dbm or 0, dbm, dbm]
+        return
+    stats[0] += 1
+    if dbm is not None:
+        stats[1] += dbm
+        stats[2] = dbm if stats[2] is None else min(stats[2], dbm)
+        stats[3] = dbm if stats[3] is None else max(stats[3], dbm)
+
+
+def _merge(buckets: dict, key, count: int, dbm_sum: int, min_dbm, max_dbm):
+    """Add an already aggregated group of sightings to a bucket."""
+    stats = buckets.get(key)
+    if stats is None:
+        buckets[key] = [count, dbm_sum, min_dbm, max_dbm]
+        return
+    stats[0] += count
+    stats[1] += dbm_sum
+    if min_dbm is not None:
+        stats[2] = min_dbm if stats[2] is None else min(stats[2], min_dbm)
+        stats[3] = max_dbm if stats[3] is None else max(stats[3], max_dbm)
+
+
+def update_rollups(cursor, sightings: list[tuple], shed: list[tuple] = ()):
+    """
+    Add a batch of new sightings to the minute buckets (incremental maintenance).
+
+    Runs inside the writer's transaction. The batch is aggregated first, so each
+    (subject, minute) costs one upsert however many frames it had.
+
+    Args:
+        cursor: Cursor of the transaction writing the sightings
+        sightings: (ts, mac, dbm, ssid, oui, ie_fingerprint, channel) per sighting
+        shed: (minute, mac, ssid, oui, ie_fingerprint, count, dbm_count, dbm_sum,
+            min_dbm, max_dbm) per group of frames the load shedder didn't write
+    """
+    by_mac, by_fingerprint = {}, {}
+    for ts, mac, dbm, _ssid, _oui, fingerprint_id, _channel in sightings:
+        minute = ts - ts % 60
+        _add(by_mac, (mac, minute), dbm)
+        if fingerprint_id and fingerprint_id != NO_STABLE_IES:
+            _add(by_fingerprint, (fingerprint_id, minute), dbm)
+    for minute, mac, _ssid, _oui, fingerprint_id, count, _dbm_count, *dbm_stats in shed:
+        _merge(by_mac, (mac, minute), count, *dbm_stats)
+        if fingerprint_id and fingerprint_id != NO_STABLE_IES:
+            _merge(by_fingerprint, (fingerprint_id, minute), count, *dbm_stats)
+
+    for subject, buckets in (("mac", by_mac), ("fingerprint", by_fingerprint)):
+        cursor.executemany(
+            _upsert(subject, "minute"),
+            (key + tuple(stats) for key, stats in buckets.items()),
+        )
+
+
+def _cutoffs(now: int) -> dict[str, int]:
+    """Oldest bucket_ts kept at minute and hour resolution, aligned to the coarser bucket."""
+    minute_cutoff = now - config.ROLLUP_MINUTE_HOURS * 3600
+    hour_cutoff = now - config.ROLLUP_HOUR_DAYS * 86400
+    return {
+        "minute": minute_cutoff - minute_cutoff % 3600,
+        "hour": hour_cutoff - hour_cutoff % 86400,
+    }
+
+
+def compact_rollups(now: int | None = None) -> int:
+    """
+    Fold aged minute buckets into hour buckets and aged hour buckets into day buckets.
+
+    Returns:
+        Number of fine buckets folded
+    """
+    cutoffs = _cutoffs(now or int(time.time()))
+    folded = 0
+    with get_cursor() as cursor:
+        for subject, (key, _) in ROLLUP_SUBJECTS.items():
+            for fine, coarse in (("minute", "hour"), ("hour", "day")):
+                table = rollup_table(subject, fine)
+                size = ROLLUP_RESOLUTIONS[coarse]
+                cursor.execute(
+                    _upsert(
+                        subject,
+                        coarse,
+                        f"""
+                        SELECT {key}, bucket_ts - bucket_ts % {size}, SUM(count), SUM(dbm_sum),
+                               MIN(min_dbm), MAX(max_dbm)
+                        FROM {table} WHERE bucket_ts < ? GROUP BY 1, 2
+                        """,
+                    ),
+                    (cutoffs[fine],),
+                )
+                cursor.execute(f"DELETE FROM {table} WHERE bucket_ts < ?", (cutoffs[fine],))
+                folded += cursor.rowcount
+    return folded
+
+
+# Database path -> hour (epoch // 3600) of the last compaction in this process
+_COMPACTED_HOUR: dict[str, int] = {}
+
+
+def maybe_compact_rollups():
+    """Compact at most once per hour; called by the writer after each batch."""
+    hour = int(time.time()) // 3600
+    if _COMPACTED_HOUR.get(str(database.DB_PATH)) == hour:
+        return
+    _COMPACTED_HOUR[str(database.DB_PATH)] = hour
+    folded = compact_rollups()
+    if folded:
+        logger.info(f"Compacted {folded} activity buckets")
+
+
+def rebuild_rollups() -> None:
+    """
+    Rebuild every rollup table from the sighting partitions (bulk maintenance).
+
+    Each sighting goes straight to the resolution its age calls for, with one
+    INSERT ... SELECT per partition and resolution. Rows still waiting in
+    sightings_legacy are included.
+    """
+    cutoffs = _cutoffs(int(time.time()))
+    ranges = {
+        "day": (None, cutoffs["hour"]),
+        "hour": (cutoffs["hour"], cutoffs["minute"]),
+        "minute": (cutoffs["minute"], None),
+    }
+
+    with get_cursor() as cursor:
+        sources = database.sighting_sources(cursor)
+
+        for subject, (key, _) in ROLLUP_SUBJECTS.items():
+            for resolution in ROLLUP_RESOLUTIONS:
+                cursor.execute(f"DELETE FROM {rollup_table(subject, resolution)}")
+
+            skip = "" if subject == "mac" else f"AND ie_fingerprint != '{NO_STABLE_IES}'"
+            for source in sources:
+                for resolution, (start, end) in ranges.items():
+                    size = ROLLUP_RESOLUTIONS[resolution]
+                    cursor.execute(
+                        _upsert(
+                            subject,
+                            resolution,
+                            f"""
+                            SELECT {key}, ts - ts % {size}, COUNT(*), COALESCE(SUM(dbm), 0),
+                                   MIN(dbm), MAX(dbm)
+                            FROM {source} AS s
+                            WHERE ts >= ? AND ts < ? AND {key} IS NOT NULL {skip}
+                            GROUP BY 1, 2
+                            """,
+                        ),
+                        (start if start is not None else -1, end if end is not None else 1 << 62),
+                    )
+
+    logger.info("Rebuilt activity rollups")
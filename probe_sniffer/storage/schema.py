@@ -1,5 +1,48 @@
 """Database schema for local SQLite database."""
 
+# Compact sighting table: one row per probe request capture. Used for every monthly
+# partition (sighting_log_YYYYMM) and, on databases compacted before partitioning
+# existed, the unpartitioned sighting_log table.
+# Read through the `sightings` view for the text layout.
+SIGHTING_TABLE = """
+CREATE TABLE IF NOT EXISTS {table} (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    ts INTEGER NOT NULL,           -- Epoch seconds (UTC)
+    mac INTEGER NOT NULL,          -- 48-bit MAC address
+    dbm INTEGER,                   -- Signal strength in dBm
+    ssid_id INTEGER,               -- ssids.ssid_id
+    oui_id INTEGER,                -- ouis.oui_id
+    ie_fingerprint TEXT,           -- IE fingerprint hash (device_fingerprints.fingerprint_id)
+    identity_id TEXT,              -- device_identities.identity_id (NULL if unassigned)
+    channel INTEGER                -- WiFi channel (NULL for rows from before it was stored)
+);
+
+-- Every selective filter of the sightings query API leads a (column, ts) index, so
+-- filtered pages come back in ts order without a sort. Low-selectivity filters
+-- (dBm range, channel, randomized) are checked while walking the ts index.
+-- tests/query_plan_tests.py fails if a filter combination loses its index.
+CREATE INDEX IF NOT EXISTS idx_{table}_ts
+    ON {table}(ts);
+
+CREATE INDEX IF NOT EXISTS idx_{table}_mac
+    ON {table}(mac, ts);
+
+CREATE INDEX IF NOT EXISTS idx_{table}_fingerprint_ts
+    ON {table}(ie_fingerprint, ts);
+
+CREATE INDEX IF NOT EXISTS idx_{table}_identity_ts
+    ON {table}(identity_id, ts);
+
+CREATE INDEX IF NOT EXISTS idx_{table}_ssid_ts
+    ON {table}(ssid_id, ts);
+
+CREATE INDEX IF NOT EXISTS idx_{table}_oui_ts
+    ON {table}(oui_id, ts);
+"""
+
+# Single-column indexes replaced by the (column, ts) ones above
+SUPERSEDED_SIGHTING_INDEXES = ("idx_{table}_fingerprint", "idx_{table}_identity")
+
 SCHEMA = """
 -- Devices table: tracks all WiFi devices (trusted and untrusted)
 CREATE TABLE IF NOT EXISTS devices (
@@ -10,16 +53,25 @@ CREATE TABLE IF NOT EXISTS devices (
     last_seen TEXT NOT NULL        -- ISO 8601: 'YYYY-MM-DD HH:MM:SS'
 );
 
--- Sightings table: logs each probe request capture
-CREATE TABLE IF NOT EXISTS sightings (
-    id INTEGER PRIMARY KEY AUTOINCREMENT,
-    timestamp TEXT NOT NULL,       -- ISO 8601: 'YYYY-MM-DD HH:MM:SS'
-    mac TEXT NOT NULL,
-    rssi TEXT,                     -- Signal strength string (e.g., "-75dBm")
-    dbm INTEGER,                   -- Signal strength as integer
-    ssid TEXT,                     -- Probed SSID or "Undirected Probe"
-    oui TEXT,                      -- Manufacturer/OUI designation
-    FOREIGN KEY (mac) REFERENCES devices(mac)
+-- Dictionary tables: each OUI designation / SSID is stored once and referenced by id
+CREATE TABLE IF NOT EXISTS ouis (
+    oui_id INTEGER PRIMARY KEY,
+    oui TEXT NOT NULL UNIQUE       -- Manufacturer/OUI designation
+);
+
+CREATE TABLE IF NOT EXISTS ssids (
+    ssid_id INTEGER PRIMARY KEY,
+    ssid TEXT NOT NULL UNIQUE      -- Probed SSID or "Undirected Probe"
+);
+
+-- Sighting partitions: registry of the tables holding sightings, one per UTC month
+-- (plus the pre-partitioning sighting_log). Queries only read partitions whose
+-- [start_ts, end_ts) range overlaps the requested time range.
+CREATE TABLE IF NOT EXISTS sighting_partitions (
+    name TEXT PRIMARY KEY,         -- Table name, e.g. sighting_log_202610
+    start_ts INTEGER NOT NULL,     -- Epoch seconds, inclusive
+    end_ts INTEGER NOT NULL,       -- Epoch seconds, exclusive
+    row_count INTEGER NOT NULL DEFAULT 0  -- Maintained by every writer, for cheap totals
 );
 
 -- Device identities: logical device grouping (handles IE fingerprint drift)
@@ -45,15 +97,353 @@ CREATE TABLE IF NOT EXISTS device_fingerprints (
 );
 
 -- Indexes for common queries
-CREATE INDEX IF NOT EXISTS idx_sightings_timestamp
-    ON sightings(timestamp);
-
-CREATE INDEX IF NOT EXISTS idx_sightings_mac
-    ON sightings(mac);
-
 CREATE INDEX IF NOT EXISTS idx_devices_trusted
     ON devices(is_trusted);
 
+CREATE INDEX IF NOT EXISTS idx_fingerprints_count
+    ON device_fingerprints(sighting_count, fingerprint_id);
+
 CREATE INDEX IF NOT EXISTS idx_fingerprints_identity
     ON device_fingerprints(identity_id);
 """
+
+# Visits: sightings folded into presence intervals per MAC (see storage/visits.py).
+# Created by migrate_to_visits(), which also builds it from existing sightings.
+VISITS_TABLE = """
+CREATE TABLE IF NOT EXISTS visits (
+    visit_id INTEGER PRIMARY KEY,
+    mac INTEGER NOT NULL,          -- 48-bit MAC address
+    ie_fingerprint TEXT,           -- Fingerprint of the latest sighting in the visit
+    start_ts INTEGER NOT NULL,     -- Epoch seconds of the first sighting
+    end_ts INTEGER NOT NULL,       -- Epoch seconds of the last sighting
+    frame_count INTEGER NOT NULL,
+    min_dbm INTEGER,
+    max_dbm INTEGER,
+    dbm_sum INTEGER,               -- avg_dbm = dbm_sum / frame_count
+    ssids TEXT                     -- JSON array of SSIDs probed during the visit
+);
+
+CREATE INDEX IF NOT EXISTS idx_visits_mac
+    ON visits(mac, end_ts);
+
+CREATE INDEX IF NOT EXISTS idx_visits_end
+    ON visits(end_ts);
+
+CREATE INDEX IF NOT EXISTS idx_visits_fingerprint
+    ON visits(ie_fingerprint);
+"""
+
+# Device summary: per-device sighting stats kept up to date by the writer, so device
+# endpoints don't aggregate sightings (see storage/summaries.py)
+DEVICE_SUMMARY_TABLE = """
+CREATE TABLE IF NOT EXISTS device_summary (
+    mac TEXT PRIMARY KEY,          -- devices.mac
+    oui TEXT,                      -- OUI designation of the latest sighting
+    ssids TEXT NOT NULL,           -- JSON array of probed SSIDs, sorted
+    total_sightings INTEGER NOT NULL,
+    dbm_sum INTEGER NOT NULL,      -- avg_signal_dbm = dbm_sum / dbm_count
+    dbm_count INTEGER NOT NULL,    -- Sightings with a signal reading
+    last_dbm INTEGER,              -- Signal strength of the latest sighting
+    last_ts INTEGER NOT NULL       -- Epoch seconds of the latest sighting
+);
+
+CREATE INDEX IF NOT EXISTS idx_device_summary_total
+    ON device_summary(total_sightings);
+
+CREATE INDEX IF NOT EXISTS idx_devices_last_seen
+    ON devices(last_seen);
+"""
+
+# Change counters for the API response cache (see api/cache.py): triggers bump a
+# table's version on every insert, update and delete, so "has this changed since the
+# cached response" is one primary-key read.
+VERSIONED_TABLES = ("devices", "device_summary", "device_fingerprints", "device_identities")
+
+TABLE_VERSIONS_TABLE = """
+CREATE TABLE IF NOT EXISTS table_versions (
+    name TEXT PRIMARY KEY,         -- Versioned table
+    version INTEGER NOT NULL DEFAULT 0
+);
+"""
+
+VERSION_TRIGGER = """
+CREATE TRIGGER IF NOT EXISTS {table}_{action}_version AFTER {event} ON {table}
+BEGIN
+    UPDATE table_versions SET version = version + 1 WHERE name = '{table}';
+END;
+"""
+
+# Overview counters behind /stats/overview (see storage/stats.py), kept up to date by
+# the sighting writer so the dashboard never aggregates sightings. Days and weeks are
+# Eastern calendar days and Monday-first weeks, keyed by their start in epoch seconds.
+OVERVIEW_TABLES = """
+CREATE TABLE IF NOT EXISTS stat_totals (
+    name TEXT PRIMARY KEY,         -- 'devices' or 'trusted' (bumped by triggers on devices)
+    value INTEGER NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS stat_periods (
+    period TEXT NOT NULL,          -- 'day' or 'week'
+    start_ts INTEGER NOT NULL,     -- Eastern midnight starting the period
+    sightings INTEGER NOT NULL DEFAULT 0,
+    devices INTEGER NOT NULL DEFAULT 0,           -- Unique devices seen
+    new_devices INTEGER NOT NULL DEFAULT 0,       -- Devices seen for the first time
+    new_fingerprints INTEGER NOT NULL DEFAULT 0,  -- Fingerprints seen for the first time
+    PRIMARY KEY (period, start_ts)
+) WITHOUT ROWID;
+
+-- Sightings per device per day, kept for today and yesterday
+CREATE TABLE IF NOT EXISTS stat_device_days (
+    day_ts INTEGER NOT NULL,
+    mac INTEGER NOT NULL,          -- 48-bit MAC address
+    sightings INTEGER NOT NULL,
+    PRIMARY KEY (day_ts, mac)
+) WITHOUT ROWID;
+
+CREATE INDEX IF NOT EXISTS idx_stat_device_days_sightings
+    ON stat_device_days(day_ts, sightings);
+
+-- Sightings per minute, kept for the last 24 hours
+CREATE TABLE IF NOT EXISTS stat_minutes (
+    bucket_ts INTEGER PRIMARY KEY, -- Minute start, epoch seconds
+    sightings INTEGER NOT NULL
+);
+
+-- Devices per manufacturer (OUI of the device's first sighting) and probes per SSID
+CREATE TABLE IF NOT EXISTS stat_ouis (
+    oui_id INTEGER PRIMARY KEY,    -- ouis.oui_id
+    devices INTEGER NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_stat_ouis_devices
+    ON stat_ouis(devices);
+
+CREATE TABLE IF NOT EXISTS stat_ssids (
+    ssid_id INTEGER PRIMARY KEY,   -- ssids.ssid_id
+    sightings INTEGER NOT NULL
+);
+
+CREATE INDEX IF NOT EXISTS idx_stat_ssids_sightings
+    ON stat_ssids(sightings);
+
+CREATE TRIGGER IF NOT EXISTS devices_insert_totals AFTER INSERT ON devices
+BEGIN
+    UPDATE stat_totals SET value = value + 1 WHERE name = 'devices';
+    UPDATE stat_totals SET value = value + 1 WHERE name = 'trusted' AND NEW.is_trusted;
+END;
+
+CREATE TRIGGER IF NOT EXISTS devices_delete_totals AFTER DELETE ON devices
+BEGIN
+    UPDATE stat_totals SET value = value - 1 WHERE name = 'devices';
+    UPDATE stat_totals SET value = value - 1 WHERE name = 'trusted' AND OLD.is_trusted;
+END;
+
+CREATE TRIGGER IF NOT EXISTS devices_trusted_totals AFTER UPDATE OF is_trusted ON devices
+WHEN COALESCE(OLD.is_trusted, 0) != COALESCE(NEW.is_trusted, 0)
+BEGIN
+    UPDATE stat_totals SET value = value + CASE WHEN NEW.is_trusted THEN 1 ELSE -1 END
+    WHERE name = 'trusted';
+END;
+"""
+
+# HyperLogLog sketches of distinct MACs / fingerprints per time bucket (see
+# storage/sketches.py), one table per resolution: sketch_hour, sketch_day
+SKETCH_RESOLUTIONS = {"hour": 3600, "day": 86400}
+
+SKETCH_TABLE = """
+CREATE TABLE IF NOT EXISTS {table} (
+    subject TEXT NOT NULL,         -- 'mac', 'fingerprint' or 'ssid' (MACs probing the SSID)
+    key INTEGER NOT NULL,          -- ssids.ssid_id for 'ssid', 0 otherwise
+    bucket_ts INTEGER NOT NULL,    -- Bucket start, epoch seconds (UTC aligned)
+    registers BLOB NOT NULL,       -- zlib-compressed HyperLogLog registers
+    PRIMARY KEY (subject, key, bucket_ts)
+) WITHOUT ROWID;
+"""
+
+# Fingerprint similarity index (see storage/similarity.py): a MinHash signature of each
+# fingerprint's IE features, and the LSH bucket of each signature band for lookups
+SIMILARITY_TABLES = """
+CREATE TABLE IF NOT EXISTS fingerprint_signatures (
+    fingerprint_id TEXT PRIMARY KEY,   -- device_fingerprints.fingerprint_id
+    signature BLOB NOT NULL            -- MinHash signature, little-endian uint32s
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS fingerprint_lsh (
+    band INTEGER NOT NULL,             -- Signature band, 0 to minhash.BANDS - 1
+    bucket INTEGER NOT NULL,           -- Hash of the band's signature values
+    fingerprint_id TEXT NOT NULL,
+    PRIMARY KEY (band, bucket, fingerprint_id)
+) WITHOUT ROWID;
+"""
+
+# Distinct MACs and directed SSIDs seen per fingerprint and per identity, behind the
+# unique_mac_count and ssid_signature columns kept up to date on ingest (see
+# storage/aggregates.py). Created by migrate_to_identity_aggregates().
+AGGREGATE_TABLES = """
+CREATE TABLE IF NOT EXISTS fingerprint_macs (
+    fingerprint_id TEXT NOT NULL,      -- device_fingerprints.fingerprint_id
+    mac INTEGER NOT NULL,              -- 48-bit MAC address
+    PRIMARY KEY (fingerprint_id, mac)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS fingerprint_ssids (
+    fingerprint_id TEXT NOT NULL,
+    ssid_id INTEGER NOT NULL,          -- ssids.ssid_id, directed probes only
+    PRIMARY KEY (fingerprint_id, ssid_id)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS identity_macs (
+    identity_id TEXT NOT NULL,         -- device_identities.identity_id
+    mac INTEGER NOT NULL,
+    PRIMARY KEY (identity_id, mac)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS identity_ssids (
+    identity_id TEXT NOT NULL,
+    ssid_id INTEGER NOT NULL,
+    PRIMARY KEY (identity_id, ssid_id)
+) WITHOUT ROWID;
+"""
+
+# SSID inverted index (see storage/ssid_index.py): the devices that probed for each
+# directed SSID, clustered by SSID so a posting list is one range read, and by MAC for
+# a device's SSID set. fingerprint_ssids serves as the fingerprint posting lists, and
+# ssids.device_count (added by migrate_to_ssid_index) is each device list's length.
+SSID_INDEX_TABLES = """
+CREATE TABLE IF NOT EXISTS ssid_devices (
+    ssid_id INTEGER NOT NULL,          -- ssids.ssid_id, directed probes only
+    mac INTEGER NOT NULL,              -- 48-bit MAC address
+    first_ts INTEGER NOT NULL,         -- First / last probe for the SSID, epoch seconds
+    last_ts INTEGER NOT NULL,
+    sightings INTEGER NOT NULL,        -- Probes for the SSID, shed frames included
+    PRIMARY KEY (ssid_id, mac)
+) WITHOUT ROWID;
+
+CREATE INDEX IF NOT EXISTS idx_ssid_devices_mac ON ssid_devices(mac, ssid_id);
+CREATE INDEX IF NOT EXISTS idx_fingerprint_ssids_ssid ON fingerprint_ssids(ssid_id, fingerprint_id);
+"""
+
+# Full-text search over SSID names, kept in step with the ssids dictionary by a trigger
+# (SSIDs are never renamed or deleted). Needs SQLite's FTS5 extension; without it
+# ssid_index.search_ssids() falls back to a prefix match.
+SSID_SEARCH_TABLES = """
+CREATE VIRTUAL TABLE IF NOT EXISTS ssid_search USING fts5(
+    ssid, content='ssids', content_rowid='ssid_id', prefix='2 3'
+);
+
+CREATE TRIGGER IF NOT EXISTS ssids_search_insert AFTER INSERT ON ssids
+BEGIN
+    INSERT INTO ssid_search (rowid, ssid) VALUES (NEW.ssid_id, NEW.ssid);
+END;
+"""
+
+# Activity rollups: sighting count and dBm stats per MAC / fingerprint per time bucket
+# (see storage/rollups.py). One table per subject and resolution, e.g.
+# mac_activity_minute; fine buckets are compacted into coarser ones as they age.
+ROLLUP_RESOLUTIONS = {"minute": 60, "hour": 3600, "day": 86400}
+ROLLUP_SUBJECTS = {"mac": ("mac", "INTEGER"), "fingerprint": ("ie_fingerprint", "TEXT")}
+
+ACTIVITY_TABLE = """
+CREATE TABLE IF NOT EXISTS {table} (
+    {key} {key_type} NOT NULL,
+    bucket_ts INTEGER NOT NULL,    -- Bucket start, epoch seconds (UTC)
+    count INTEGER NOT NULL,
+    dbm_sum INTEGER NOT NULL,      -- avg_dbm = dbm_sum / count
+    min_dbm INTEGER,
+    max_dbm INTEGER,
+    PRIMARY KEY ({key}, bucket_ts)
+) WITHOUT ROWID;
+
+CREATE INDEX IF NOT EXISTS idx_{table}_bucket
+    ON {table}(bucket_ts);
+"""
+
+# Columns of the original text layout, computed from a compact sighting table aliased `s`
+SIGHTING_COLUMNS = """
+    s.id,
+    datetime(s.ts, 'unixepoch') AS timestamp,
+    printf('%02x:%02x:%02x:%02x:%02x:%02x',
+           (s.mac >> 40) & 255, (s.mac >> 32) & 255, (s.mac >> 24) & 255,
+           (s.mac >> 16) & 255, (s.mac >> 8) & 255, s.mac & 255) AS mac,
+    s.dbm || ' dBm' AS rssi,
+    s.dbm,
+    ssids.ssid,
+    ouis.oui,
+    s.ie_fingerprint,
+    s.identity_id,
+    s.channel
+"""
+
+# Names of SIGHTING_COLUMNS, in order (for tuple rows, e.g. exports)
+SIGHTING_FIELDS = (
+    "id",
+    "timestamp",
+    "mac",
+    "rssi",
+    "dbm",
+    "ssid",
+    "oui",
+    "ie_fingerprint",
+    "identity_id",
+    "channel",
+)
+
+# Joins that resolve the dictionary ids of a compact sighting table aliased `s`
+SIGHTING_JOINS = """
+    LEFT JOIN ssids ON ssids.ssid_id = s.ssid_id
+    LEFT JOIN ouis ON ouis.oui_id = s.oui_id
+"""
+
+# Compatibility view with the original `sightings` columns over every partition, so
+# ad-hoc SQL (make query) keeps working. {source} is a partition table or a UNION ALL
+# of them. App code should go through the partition router in queries.py instead:
+# filters on the computed mac/timestamp columns can't use indexes.
+SIGHTINGS_VIEW = f"""
+CREATE VIEW sightings AS
+SELECT {SIGHTING_COLUMNS}
+FROM {{source}} AS s {SIGHTING_JOINS}
+"""
+
+# Extra arm of the view while an online migration is still draining sightings_legacy
+SIGHTINGS_VIEW_LEGACY_ARM = """
+UNION ALL
+SELECT id, timestamp, mac, rssi, dbm, ssid, oui, ie_fingerprint, identity_id, NULL
+FROM sightings_legacy
+"""
+
+# Lets old writers keep inserting through the view; {table} is the newest partition
+SIGHTINGS_INSERT_TRIGGER = """
+CREATE TRIGGER sightings_insert INSTEAD OF INSERT ON sightings
+BEGIN
+    INSERT OR IGNORE INTO ssids (ssid) SELECT NEW.ssid WHERE NEW.ssid IS NOT NULL;
+    INSERT OR IGNORE INTO ouis (oui) SELECT NEW.oui WHERE NEW.oui IS NOT NULL;
+    INSERT INTO {table} (ts, mac, dbm, ssid_id, oui_id, ie_fingerprint, identity_id, channel)
+    VALUES (
+        CAST(strftime('%s', COALESCE(NEW.timestamp, 'now')) AS INTEGER),
+        mac_to_int(NEW.mac),
+        NEW.dbm,
+        (SELECT ssid_id FROM ssids WHERE ssid = NEW.ssid),
+        (SELECT oui_id FROM ouis WHERE oui = NEW.oui),
+        NEW.ie_fingerprint,
+        NEW.identity_id,
+        NEW.channel
+    );
+    UPDATE sighting_partitions SET row_count = row_count + 1 WHERE name = '{table}';
+END
+"""
+
+# Pre-compaction layout of the sightings table (renamed to sightings_legacy by migration)
+LEGACY_SIGHTINGS_TABLE = """
+CREATE TABLE IF NOT EXISTS sightings (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    timestamp TEXT NOT NULL,       -- ISO 8601: 'YYYY-MM-DD HH:MM:SS'
+    mac TEXT NOT NULL,
+    rssi TEXT,                     -- Signal strength string (e.g., "-75dBm")
+    dbm INTEGER,                   -- Signal strength as integer
+    ssid TEXT,                     -- Probed SSID or "Undirected Probe"
+    oui TEXT,                      -- Manufacturer/OUI designation
+    ie_fingerprint TEXT,
+    identity_id TEXT REFERENCES device_identities(identity_id),
+    FOREIGN KEY (mac) REFERENCES devices(mac)
+);
+"""
@@ -0,0 +1,126 @@
+"""
+"Seen before" prefilters for MACs and fingerprints.
+
+The sighting writer has to tell new keys from known ones in every batch: known
+fingerprints' old rows drive the notification logic, and the overview counts a MAC
+without a device_summary row as a new device. Both used to be indexed lookups for
+every key of every batch, and with randomized MACs most MACs are new.
+
+SeenFilters keeps a ScalableBloomFilter (utils/bloom.py) of the MACs in
+device_summary and the fingerprints in device_fingerprints. It is built from the
+database on first use (the sniffer builds it at startup) and updated once a batch has
+committed. "Definitely new" keys skip SQLite; "probably seen" ones are looked up as
+before, so a false positive only costs the lookup every key used to cost. Sizing comes
+from SEEN_FILTER_CAPACITY and SEEN_FILTER_FP_RATE; memory and the false-positive rate
+at the current fill are logged when a filter is built or grows.
+
+Only this process's writes reach its filters. The sniffer is the only process that
+writes sightings, device_summary rows and (through them) fingerprints.
+"""
+
+import logging
+
+from probe_sniffer import config
+from probe_sniffer.models.probe import NO_STABLE_IES
+from probe_sniffer.storage import database
+from probe_sniffer.utils.bloom import ScalableBloomFilter
+from probe_sniffer.utils.mac_utils import mac_to_int
+
+logger = logging.getLogger("DATABASE")
+
+
+def fingerprint_key(fingerprint_id: str) -> int:
+    return int(fingerprint_id, 16)
+
+
+class SeenFilters:
+    """Bloom filters of the MACs and fingerprints already in the database."""
+
+    def __init__(
+        self,
+        capacity: int = config.SEEN_FILTER_CAPACITY,
+        fp_rate: float = config.SEEN_FILTER_FP_RATE,
+    ):
+        self.macs = ScalableBloomFilter(capacity, fp_rate)
+        self.fingerprints = ScalableBloomFilter(capacity, fp_rate)
+        self.skipped = 0  # Lookups answered "definitely new"
+        self.checked = 0  # Lookups that went to SQLite
+
+    def unseen_macs(self, macs: list[int]) -> set[int]:
+        """The MACs that are definitely not in device_summary."""
+        found = self.macs.might_contain_many(macs)
+        unseen = {mac for mac, seen in zip(macs, found) if not seen}
+        self.skipped += len(unseen)
+        self.checked += len(macs) - len(unseen)
+        return unseen
+
+    def unseen_fingerprints(self, fingerprint_ids: list[str]) -> set[str]:
+        """The fingerprints that are definitely not in device_fingerprints."""
+        found = self.fingerprints.might_contain_many(list(map(fingerprint_key, fingerprint_ids)))
+        unseen = {
+            fingerprint_id for fingerprint_id, seen in zip(fingerprint_ids, found) if not seen
+        }
+        self.skipped += len(unseen)
+        self.checked += len(fingerprint_ids) - len(unseen)
+        return unseen
+
+    def remember(self, macs=(), fingerprint_ids=()) -> None:
+        """Add keys written by a committed transaction."""
+        stages = len(self.macs.stages) + len(self.fingerprints.stages)
+        self.macs.add_many(macs)
+        self.fingerprints.add_many(
+            fingerprint_key(fingerprint_id)
+            for fingerprint_id in fingerprint_ids
+            if fingerprint_id and fingerprint_id != NO_STABLE_IES
+        )
+        if len(self.macs.stages) + len(self.fingerprints.stages) > stages:
+            logger.info(f"Seen-before filters grew: {self.report()}")
+
+    def report(self) -> dict:
+        """Keys, memory and estimated false-positive rate of each filter."""
+        return {
+            name: {
+                "keys": len(bloom),
+                "bytes": bloom.nbytes,
+                "stages": len(bloom.stages),
+                "fp_rate": round(bloom.estimated_fp_rate(), 6),
+            }
+            for name, bloom in (("macs", self.macs), ("fingerprints", self.fingerprints))
+        } | {"skipped": self.skipped, "checked": self.checked}
+
+
+# database path -> filters of that database
+_FILTERS: dict[str, SeenFilters] = {}
+
+
+def seen_filters(cursor=None) -> SeenFilters:
+    """The filters of the current database, built from it on first use."""
+    key = str(database.DB_PATH)
+    filters = _FILTERS.get(key)
+    if filters is None:
+        filters = _FILTERS[key] = _build(cursor)
+    return filters
+
+
+def _build(cursor=None) -> SeenFilters:
+    if cursor is None:
+        with database.get_cursor() as cursor:
+            return _build(cursor)
+
+    cursor.execute(
+        "SELECT (SELECT COUNT(*) FROM device_summary), (SELECT COUNT(*) FROM device_fingerprints)"
+    )
+    existing = max(cursor.fetchone())
+    # Room to double before the first extra stage
+    filters = SeenFilters(max(config.SEEN_FILTER_CAPACITY, 2 * existing))
+    cursor.execute("SELECT mac FROM device_summary")
+    filters.remember(macs=[mac_to_int(row[0]) for row in cursor.fetchall()])
+    cursor.execute("SELECT fingerprint_id FROM device_fingerprints")
+    filters.remember(fingerprint_ids=[row[0] for row in cursor.fetchall()])
+    logger.info(f"Built seen-before filters: {filters.report()}")
+    return filters
+
+
+def forget_filters() -> None:
+    """Drop the current database's filters, e.g. after rewriting its tables."""
+    _FILTERS.pop(str(database.DB_PATH), None)
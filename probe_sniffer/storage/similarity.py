@@ -0,0 +1,350 @@
+"""
+Fingerprint similarity: which fingerprints are probably the same device after IE drift.
+
+A fingerprint is a hash of a device's stable IEs, so an OS update or one flipped
+capability bit gives the same device a new device_fingerprints row. To find those
+rows, each fingerprint's stored ie_data is decoded into a set of features
+(ie_features()): supported rates one by one, each set bit of the capability
+bitfields, vendor IEs by OUI and type, other IEs by value, and the IE order. One
+flipped bit then changes one feature out of dozens instead of the whole fingerprint.
+
+The sighting writer indexes every new fingerprint in the same transaction: a MinHash
+signature of its features goes to fingerprint_signatures and the LSH bucket of each
+signature band to fingerprint_lsh (utils/minhash.py). find_similar_fingerprints()
+looks up the fingerprints sharing a band with the query, at most
+SIMILARITY_MAX_CANDIDATES of them, and ranks them by the exact Jaccard similarity of
+their features, so a query costs a few primary-key lookups however many fingerprints
+there are. propose_identity_merges() is the batch side (scripts/propose_merges.py):
+it pairs up the fingerprints of every LSH bucket, keeps the pairs at least
+SIMILARITY_MERGE_THRESHOLD similar and groups them into proposed identities.
+"""
+
+import json
+import logging
+from collections import defaultdict
+
+from probe_sniffer import config
+from probe_sniffer.models.probe import NO_STABLE_IES
+from probe_sniffer.storage.database import get_cursor
+from probe_sniffer.utils import minhash
+
+logger = logging.getLogger("DATABASE")
+
+# Left out of the fingerprint too (see probe_utils.extract_ie_fingerprint)
+VARIABLE_IES = {0, 3}
+RATE_IES = {1, 50}  # Supported / extended supported rates
+BITFIELD_IES = {45, 70, 127, 191}  # HT, RM enabled, extended and VHT capabilities
+VENDOR_IE = 221
+EXTENSION_IE = 255
+HE_CAPABILITIES = 35  # Extension IE carrying a capability bitfield
+# Candidates whose signature estimate is this far under the wanted similarity are
+# dropped before the exact comparison (3 standard errors of a 64-position estimate)
+ESTIMATE_MARGIN = 0.15
+
+_BYTE_BITS = [[bit for bit in range(8) if value >> bit & 1] for value in range(256)]
+
+
+def _bits(prefix: str, data: bytes) -> list[str]:
+    return [
+        f"{prefix}:bit:{index * 8 + bit}"
+        for index, byte in enumerate(data)
+        for bit in _BYTE_BITS[byte]
+    ]
+
+
+def ie_features(ie_data: list[dict] | None) -> set[str]:
+    """
+    Decode a fingerprint's IEs into the feature set its similarity is computed on.
+
+    Args:
+        ie_data: IE dicts ({"id", "len", "data" hex}) as stored in device_fingerprints
+
+    Returns:
+        Feature strings; empty if there are no stable IEs
+    """
+    features = set()
+    previous = None
+    for ie in ie_data or ():
+        ie_id = ie.get("id")
+        if ie_id is None or ie_id in VARIABLE_IES:
+            continue
+        data = bytes.fromhex(ie.get("data") or "")
+        if ie_id == VENDOR_IE:
+            # Vendor IE payloads carry counters; their OUI and type are stable
+            name = f"{ie_id}.{data[:4].hex()}"
+        elif ie_id == EXTENSION_IE and data:
+            name = f"{ie_id}.{data[0]}"
+            data = data[1:]
+        else:
+            name = str(ie_id)
+
+        features.add(name)
+        features.add(f"after:{previous}:{name}")
+        previous = name
+        if ie_id in RATE_IES:
+            features.update(f"{name}:rate:{rate}" for rate in data)
+        elif ie_id in BITFIELD_IES or name == f"{EXTENSION_IE}.{HE_CAPABILITIES}":
+            features.add(f"{name}:len:{len(data)}")
+            features.update(_bits(name, data))
+        elif ie_id != VENDOR_IE:
+            features.add(f"{name}:{data.hex()}")
+    return features
+
+
+def _decode(ie_data_json: str | None) -> set[str]:
+    return ie_features(json.loads(ie_data_json) if ie_data_json else None)
+
+
+def index_fingerprints(cursor, fingerprints) -> int:
+    """
+    Add new fingerprints to the similarity index (called by the sighting writer).
+
+    Args:
+        fingerprints: (fingerprint_id, ie_data) per fingerprint; ones already indexed
+            or without stable IEs are skipped
+
+    Returns:
+        Fingerprints indexed
+    """
+    signatures, buckets = [], []
+    for fingerprint_id, ie_data in fingerprints:
+        features = ie_features(ie_data)
+        if not features or fingerprint_id == NO_STABLE_IES:
+            continue
+        signature = minhash.signature(features)
+        signatures.append((fingerprint_id, minhash.pack(signature)))
+        buckets.extend(
+            (band, bucket, fingerprint_id)
+            for band, bucket in enumerate(minhash.band_buckets(signature))
+        )
+    cursor.executemany(
+        "INSERT OR IGNORE INTO fingerprint_signatures (fingerprint_id, signature) VALUES (?, ?)",
+        signatures,
+    )
+    cursor.executemany(
+        "INSERT OR IGNORE INTO fingerprint_lsh (band, bucket, fingerprint_id) VALUES (?, ?, ?)",
+        buckets,
+    )
+    return len(signatures)
+
+
+def rebuild_similarity_index(chunk_size: int = 5000) -> int:
+    """
+    Rebuild the similarity index from device_fingerprints (bulk maintenance).
+
+    Returns:
+        Fingerprints indexed
+    """
+    indexed = 0
+    with get_cursor() as cursor:
+        cursor.execute("DELETE FROM fingerprint_signatures")
+        cursor.execute("DELETE FROM fingerprint_lsh")
+        writer = cursor.connection.cursor()
+        cursor.execute(
+            "SELECT fingerprint_id, ie_data FROM device_fingerprints WHERE ie_data IS NOT NULL"
+        )
+        while rows := cursor.fetchmany(chunk_size):
+            indexed += index_fingerprints(
+                writer, [(row["fingerprint_id"], json.loads(row["ie_data"])) for row in rows]
+            )
+
+    logger.info(f"Rebuilt fingerprint similarity index ({indexed} fingerprints)")
+    return indexed
+
+
+def _select_in(cursor, query: str, fingerprint_ids) -> list:
+    """Rows of a query with an IN list of fingerprint ids, in chunks."""
+    fingerprint_ids = list(fingerprint_ids)
+    rows = []
+    for start in range(0, len(fingerprint_ids), 500):  # stay under SQLite's variable limit
+        chunk = fingerprint_ids[start : start + 500]
+        cursor.execute(query.format(ids=", ".join("?" * len(chunk))), chunk)
+        rows.extend(cursor.fetchall())
+    return rows
+
+
+def _fingerprint_rows(cursor, fingerprint_ids) -> dict[str, dict]:
+    rows = _select_in(
+        cursor,
+        "SELECT fingerprint_id, identity_id, ie_data, first_seen, last_seen, sighting_count "
+        "FROM device_fingerprints WHERE fingerprint_id IN ({ids})",
+        fingerprint_ids,
+    )
+    return {row["fingerprint_id"]: dict(row) for row in rows}
+
+
+def _signatures(cursor, fingerprint_ids) -> dict[str, tuple[int, ...]]:
+    rows = _select_in(
+        cursor,
+        "SELECT fingerprint_id, signature FROM fingerprint_signatures "
+        "WHERE fingerprint_id IN ({ids})",
+        fingerprint_ids,
+    )
+    return {row["fingerprint_id"]: minhash.unpack(row["signature"]) for row in rows}
+
+
+def find_similar_fingerprints(
+    fingerprint_id: str, limit: int = 10, min_similarity: float = 0.5
+) -> list[dict] | None:
+    """
+    Fingerprints whose IE features are most similar to a fingerprint's.
+
+    Only fingerprints sharing an LSH band with it are considered, which finds nearly
+    all of those over 0.8 similar but only some under 0.5 (see utils/minhash.py).
+
+    Args:
+        fingerprint_id: The fingerprint to compare against
+        limit: Maximum results
+        min_similarity: Smallest Jaccard similarity returned
+
+    Returns:
+        Most similar first: fingerprint_id, identity_id, similarity, first_seen,
+        last_seen, sighting_count, and the features only in the query fingerprint
+        (removed) or only in this one (added). None if the fingerprint doesn't exist.
+    """
+    with get_cursor() as cursor:
+        cursor.execute(
+            "SELECT ie_data FROM device_fingerprints WHERE fingerprint_id = ?", (fingerprint_id,)
+        )
+        row = cursor.fetchone()
+        if row is None:
+            return None
+        features = _decode(row["ie_data"])
+        if not features:
+            return []
+
+        signature = minhash.signature(features)
+        buckets = list(enumerate(minhash.band_buckets(signature)))
+        cursor.execute(
+            f"""
+            WITH query (band, bucket) AS (VALUES {', '.join(['(?, ?)'] * len(buckets))})
+            SELECT lsh.fingerprint_id, COUNT(*) AS bands
+            FROM query JOIN fingerprint_lsh AS lsh
+                ON lsh.band = query.band AND lsh.bucket = query.bucket
+            WHERE lsh.fingerprint_id != ?
+            GROUP BY lsh.fingerprint_id
+            ORDER BY bands DESC
+            LIMIT ?
+        """,
+            [value for pair in buckets for value in pair]
+            + [fingerprint_id, config.SIMILARITY_MAX_CANDIDATES],
+        )
+        signatures = _signatures(cursor, [row["fingerprint_id"] for row in cursor.fetchall()])
+        candidates = _fingerprint_rows(
+            cursor,
+            (
+                candidate
+                for candidate, other in signatures.items()
+                if minhash.estimate(signature, other) >= min_similarity - ESTIMATE_MARGIN
+            ),
+        )
+
+    similar = []
+    for candidate in candidates.values():
+        other = _decode(candidate.pop("ie_data"))
+        similarity = minhash.jaccard(features, other)
+        if similarity >= min_similarity:
+            candidate["similarity"] = round(similarity, 3)
+            candidate["removed"] = sorted(features - other)
+            candidate["added"] = sorted(other - features)
+            similar.append(candidate)
+    similar.sort(key=lambda candidate: (-candidate["similarity"], candidate["fingerprint_id"]))
+    return similar[:limit]
+
+
+def _find(parents: dict, key):
+    while parents[key] != key:
+        parents[key] = parents[parents[key]]
+        key = parents[key]
+    return key
+
+
+def propose_identity_merges(
+    threshold: float = config.SIMILARITY_MERGE_THRESHOLD,
+    max_bucket: int = config.SIMILARITY_MAX_BUCKET,
+) -> list[dict]:
+    """
+    Group fingerprints that are probably one device into proposed identities.
+
+    Candidate pairs share an LSH bucket; buckets with more than max_bucket
+    fingerprints hold a band common to a whole device family and are skipped (the
+    pairs in them nearly always share a smaller bucket too). Pairs at least threshold
+    similar are joined transitively. Groups whose fingerprints already all belong to
+    one identity are left out.
+
+    Returns:
+        Proposals, most sighted first: identity_id (the group's most sighted existing
+        identity, else its most sighted fingerprint), identity_ids already in the
+        group, similarity (the weakest link's), and the fingerprints with their
+        identity_id, first_seen, last_seen and sighting_count, oldest first
+    """
+    with get_cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT group_concat(fingerprint_id) AS members FROM fingerprint_lsh
+            GROUP BY band, bucket
+            HAVING COUNT(*) BETWEEN 2 AND ?
+        """,
+            (max_bucket,),
+        )
+        pairs = set()
+        for row in cursor.fetchall():
+            members = sorted(row["members"].split(","))
+            pairs.update((a, b) for index, a in enumerate(members) for b in members[index + 1 :])
+        candidates = len(pairs)
+        signatures = _signatures(cursor, {key for pair in pairs for key in pair})
+        keys = {key: index for index, key in enumerate(signatures)}
+        pairs = list(pairs)
+        estimates = minhash.estimate_pairs(
+            list(signatures.values()), [(keys[a], keys[b]) for a, b in pairs]
+        )
+        pairs = [
+            pair
+            for pair, estimate in zip(pairs, estimates)
+            if estimate >= threshold - ESTIMATE_MARGIN
+        ]
+        fingerprints = _fingerprint_rows(cursor, {key for pair in pairs for key in pair})
+
+    features = {key: _decode(row.pop("ie_data")) for key, row in fingerprints.items()}
+    parents, weakest = {}, {}
+    for a, b in sorted(pairs):
+        similarity = minhash.jaccard(features[a], features[b])
+        if similarity < threshold:
+            continue
+        parents.setdefault(a, a)
+        parents.setdefault(b, b)
+        root_a, root_b = _find(parents, a), _find(parents, b)
+        if root_a != root_b:
+            parents[root_b] = root_a
+            similarity = min(similarity, weakest.pop(root_b, 1.0))
+        weakest[root_a] = min(weakest.get(root_a, 1.0), similarity)
+
+    groups = defaultdict(list)
+    for key in parents:
+        groups[_find(parents, key)].append(fingerprints[key])
+
+    proposals = []
+    for root, members in groups.items():
+        identities = defaultdict(int)
+        for member in members:
+            if member["identity_id"]:
+                identities[member["identity_id"]] += member["sighting_count"] or 0
+        if len(identities) == 1 and all(member["identity_id"] for member in members):
+            continue  # Already one identity
+        most_sighted = max(members, key=lambda member: member["sighting_count"] or 0)
+        proposals.append(
+            {
+                "identity_id": (
+                    max(identities, key=identities.get)
+                    if identities
+                    else most_sighted["fingerprint_id"]
+                ),
+                "identity_ids": sorted(identities),
+                "similarity": round(weakest[root], 3),
+                "sighting_count": sum(member["sighting_count"] or 0 for member in members),
+                "fingerprints": sorted(members, key=lambda member: member["first_seen"]),
+            }
+        )
+    proposals.sort(key=lambda proposal: -proposal["sighting_count"])
+    logger.info(f"Proposed {len(proposals)} identity merges from {candidates} candidate pairs")
+    return proposals
@@ -0,0 +1,197 @@
+"""
+HyperLogLog sketches of unique MACs and fingerprints per time bucket.
+
+An exact COUNT(DISTINCT mac) has to read every sighting in its range. Instead the
+sighting writer adds each batch to mergeable sketches (utils/hyperloglog.py) per UTC
+hour and day, stored as compressed blobs in sketch_hour and sketch_day:
+
+- mac: every device
+- fingerprint: distinct IE fingerprints
+- ssid: devices probing one SSID (its audience), day buckets only
+
+Queries union the sketches covering a range: whole days come from day sketches, the
+hours at either end from hour sketches. Hour sketches are kept for
+config.SKETCH_HOUR_DAYS days; older parts of a range are rounded out to whole UTC
+days. mac and fingerprint sketches have 4 KiB of registers (1.6% standard error),
+SSID audiences 1 KiB (3.3%); a union has the same error as a single bucket.
+"""
+
+import logging
+import time
+from collections import defaultdict
+
+from probe_sniffer import config
+from probe_sniffer.models.probe import NO_STABLE_IES
+from probe_sniffer.storage import database
+from probe_sniffer.storage.database import get_cursor
+from probe_sniffer.storage.schema import SKETCH_RESOLUTIONS
+from probe_sniffer.utils.hyperloglog import HyperLogLog, hash64
+
+logger = logging.getLogger("DATABASE")
+
+SUBJECT_PRECISION = {"mac": 12, "fingerprint": 12, "ssid": 10}
+HOURLY_SUBJECTS = ("mac", "fingerprint")
+UNDIRECTED = "Undirected Probe"
+
+
+def sketch_table(resolution: str) -> str:
+    return f"sketch_{resolution}"
+
+
+def _collect(rows, ssid_ids: dict[str, int], hourly_since: int | None = None) -> dict:
+    """
+    Group (ts, mac, ssid, ie_fingerprint) rows by sketch.
+
+    Returns:
+        (resolution, subject, key, bucket_ts) -> set of values to add
+    """
+    items = defaultdict(set)
+    for ts, mac, ssid, fingerprint_id in rows:
+        if mac is None:
+            continue
+        hour, day = ts - ts % 3600, ts - ts % 86400
+        hourly = hourly_since is None or hour >= hourly_since
+        fingerprint = (
+            int(fingerprint_id, 16) if fingerprint_id and fingerprint_id != NO_STABLE_IES else None
+        )
+        items["day", "mac", 0, day].add(mac)
+        if hourly:
+            items["hour", "mac", 0, hour].add(mac)
+        if fingerprint is not None:
+            items["day", "fingerprint", 0, day].add(fingerprint)
+            if hourly:
+                items["hour", "fingerprint", 0, hour].add(fingerprint)
+        if ssid is not None and ssid != UNDIRECTED and ssid in ssid_ids:
+            items["day", "ssid", ssid_ids[ssid], day].add(mac)
+    return items
+
+
+def _store(cursor, items: dict) -> int:
+    """Add grouped values to their stored sketches. Returns the number of sketches written."""
+    written = 0
+    for (resolution, subject, key, bucket_ts), values in items.items():
+        table = sketch_table(resolution)
+        cursor.execute(
+            f"SELECT registers FROM {table} WHERE subject = ? AND key = ? AND bucket_ts = ?",
+            (subject, key, bucket_ts),
+        )
+        row = cursor.fetchone()
+        if row:
+            sketch = HyperLogLog.from_blob(row[0])
+        else:
+            sketch = HyperLogLog(SUBJECT_PRECISION[subject])
+        # Devices seen earlier in the bucket leave the registers as they are
+        if sketch.update(map(hash64, values)):
+            cursor.execute(
+                f"INSERT OR REPLACE INTO {table} (subject, key, bucket_ts, registers) "
+                f"VALUES (?, ?, ?, ?)",
+                (subject, key, bucket_ts, sketch.to_blob()),
+            )
+            written += 1
+    return written
+
+
+def _prune_hours(cursor, newest: int):
+    cutoff = newest - newest % 86400 - config.SKETCH_HOUR_DAYS * 86400
+    for subject in HOURLY_SUBJECTS:
+        cursor.execute(
+            "DELETE FROM sketch_hour WHERE subject = ? AND key = 0 AND bucket_ts < ?",
+            (subject, cutoff),
+        )
+
+
+def update_sketches(cursor, sightings: list[tuple], ssid_ids: dict[str, int]):
+    """
+    Add a batch of new sightings to the hour and day sketches (incremental maintenance).
+
+    Runs inside the writer's transaction. Each sketch the batch touches is read once
+    and only written back if a register changed.
+
+    Args:
+        cursor: Cursor of the transaction writing the sightings
+        sightings: (ts, mac, dbm, ssid, oui, ie_fingerprint, channel) per sighting
+        ssid_ids: SSID -> ssids.ssid_id for every SSID in the batch
+    """
+    if not sightings:
+        return
+    _store(cursor, _collect(((row[0], row[1], row[3], row[5]) for row in sightings), ssid_ids))
+    _prune_hours(cursor, max(row[0] for row in sightings))
+
+
+def rebuild_sketches(now: int | None = None, chunk_size: int = 50_000) -> None:
+    """
+    Rebuild every sketch from the sighting partitions (bulk maintenance).
+
+    Day sketches cover all sightings, hour sketches the last SKETCH_HOUR_DAYS days.
+    Rows still waiting in sightings_legacy are included.
+    """
+    now = int(time.time()) if now is None else now
+    hourly_since = now - now % 86400 - config.SKETCH_HOUR_DAYS * 86400
+    with get_cursor() as cursor:
+        for resolution in SKETCH_RESOLUTIONS:
+            cursor.execute(f"DELETE FROM {sketch_table(resolution)}")
+        cursor.execute("SELECT ssid, ssid_id FROM ssids")
+        ssid_ids = {row["ssid"]: row["ssid_id"] for row in cursor.fetchall()}
+
+        writer = cursor.connection.cursor()
+        for source in database.sighting_sources(cursor):
+            cursor.execute(f"SELECT ts, mac, ssid, ie_fingerprint FROM {source}")
+            while rows := cursor.fetchmany(chunk_size):
+                _store(writer, _collect(rows, ssid_ids, hourly_since))
+
+    logger.info("Rebuilt unique-device sketches")
+
+
+def range_sketch(cursor, subject: str, key: int, since: int, until: int):
+    """
+    Union of one subject's sketches covering [since, until).
+
+    Args:
+        subject: "mac", "fingerprint" or "ssid"
+        key: ssids.ssid_id for "ssid", 0 otherwise
+
+    Returns:
+        (sketch, covered_since, covered_until); the covered range is the requested one
+        rounded out to whole hours, or whole days where hour sketches are not kept
+    """
+    start = since - since % 3600
+    end = until + (-until % 3600)
+    hourly_since = end  # Everything from day sketches unless hour sketches are kept
+    if subject in HOURLY_SUBJECTS:
+        cursor.execute(
+            "SELECT MIN(bucket_ts) FROM sketch_hour WHERE subject = ? AND key = 0",
+            (subject,),
+        )
+        hourly_since = cursor.fetchone()[0]
+        hourly_since = end if hourly_since is None else hourly_since
+
+    buckets = {"hour": set(), "day": set()}
+    bucket_ts = start
+    while bucket_ts < end:
+        day = bucket_ts - bucket_ts % 86400
+        if bucket_ts < hourly_since or (bucket_ts == day and day + 86400 <= end):
+            buckets["day"].add(day)
+            bucket_ts = day + 86400
+        else:
+            buckets["hour"].add(bucket_ts)
+            bucket_ts += 3600
+
+    sketches = []
+    for resolution, wanted in buckets.items():
+        if not wanted:
+            continue
+        cursor.execute(
+            f"SELECT bucket_ts, registers FROM {sketch_table(resolution)} "
+            f"WHERE subject = ? AND key = ? AND bucket_ts >= ? AND bucket_ts <= ?",
+            (subject, key, min(wanted), max(wanted)),
+        )
+        sketches.extend(
+            HyperLogLog.from_blob(row["registers"])
+            for row in cursor.fetchall()
+            if row["bucket_ts"] in wanted
+        )
+
+    covered_since = min(start, *buckets["day"]) if buckets["day"] else start
+    covered_until = max(end, *(day + 86400 for day in buckets["day"])) if buckets["day"] else end
+    sketch = HyperLogLog.union(sketches, SUBJECT_PRECISION[subject])
+    return sketch, covered_since, covered_until
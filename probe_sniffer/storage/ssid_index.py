@@ -0,0 +1,432 @@
+"""
+SSID inverted index: which devices and fingerprints probed for each network.
+
+The sighting writer keeps one ssid_devices row per directed SSID and MAC that probed
+for it (first/last probe and count), so "who probes for X" reads one posting list
+instead of every sighting of X, and ssids.device_count holds each list's length. The
+fingerprint posting lists are the fingerprint_ssids membership rows kept by
+storage/aggregates.py. Postings are lifetime, like device_summary: partitions
+dropped by retention don't remove them.
+
+On top of the postings:
+
+- get_ssid_devices(): devices that probed for all (or at least k) of a set of SSIDs.
+  A device matching k of n SSIDs is in at least one of the n - k + 1 shortest lists,
+  so only those are read; the other SSIDs are checked by primary-key lookups.
+- find_ssid_overlap() / ssid_similarity(): devices sharing remembered networks,
+  ranked by the Jaccard similarity of their SSID sets.
+- search_ssids(): prefix search over SSID names, with the FTS5 index in ssid_search
+  when SQLite has it (schema.SSID_SEARCH_TABLES) and a LIKE scan otherwise.
+"""
+
+import logging
+import re
+
+from probe_sniffer import config
+from probe_sniffer.storage.aggregates import UNDIRECTED
+from probe_sniffer.storage.database import compact_sighting_sources, get_cursor
+from probe_sniffer.utils.mac_utils import int_to_mac, mac_to_int
+from probe_sniffer.utils.time_utils import epoch_to_utc_iso
+
+logger = logging.getLogger("DATABASE")
+
+INSERT_CHUNK = 150  # Postings per multi-row INSERT, under SQLite's 999 variable limit
+
+# Adds a batch's probes to an existing posting. first_ts (?3) is NULL when all of
+# them were shed: they only tell that the device was heard in that minute.
+POSTING_UPDATE = """
+    UPDATE ssid_devices SET
+        first_ts = MIN(first_ts, COALESCE(?3, first_ts)),
+        last_ts = MAX(last_ts, ?4),
+        sightings = sightings + ?5
+    WHERE ssid_id = ?1 AND mac = ?2
+"""
+
+
+def update_ssid_index(
+    cursor, sightings: list[tuple], ssid_ids: dict[str, int], shed: list[tuple] = ()
+) -> None:
+    """
+    Add a batch of new sightings to the SSID posting lists.
+
+    Runs inside the writer's transaction.
+
+    Args:
+        cursor: Cursor of the transaction writing the sightings
+        sightings: (ts, mac, dbm, ssid, oui, ie_fingerprint, channel) per sighting
+        ssid_ids: ssids.ssid_id of every SSID in the batch
+        shed: LoadShedder.filter() aggregates of frames not written; they add to the
+            counts, and their minute to last_ts
+    """
+    postings = {}  # (ssid_id, mac) -> [first_ts, last_ts, sightings]
+    for ts, mac, _dbm, ssid, _oui, _fid, _channel in sightings:
+        if ssid in UNDIRECTED:
+            continue
+        entry = postings.get((ssid_ids[ssid], mac))
+        if entry is None:
+            postings[ssid_ids[ssid], mac] = [ts, ts, 1]
+        else:
+            entry[0], entry[1] = min(entry[0], ts), max(entry[1], ts)
+            entry[2] += 1
+    for minute, mac, ssid, _oui, _fid, count, *_dbm in shed:
+        if ssid in UNDIRECTED:
+            continue
+        entry = postings.setdefault((ssid_ids[ssid], mac), [None, minute, 0])
+        entry[1] = max(entry[1], minute)
+        entry[2] += count
+    if not postings:
+        return
+
+    # New postings are inserted (and counted toward their SSID), the rest updated
+    items = list(postings.items())
+    new = set()
+    for start in range(0, len(items), INSERT_CHUNK):
+        chunk = items[start : start + INSERT_CHUNK]
+        cursor.execute(
+            f"INSERT OR IGNORE INTO ssid_devices (ssid_id, mac, first_ts, last_ts, sightings) "
+            f"VALUES {', '.join(['(?, ?, ?, ?, ?)'] * len(chunk))} RETURNING ssid_id, mac",
+            [
+                value
+                for (ssid_id, mac), (first_ts, last_ts, count) in chunk
+                for value in (
+                    ssid_id,
+                    mac,
+                    last_ts if first_ts is None else first_ts,
+                    last_ts,
+                    count,
+                )
+            ],
+        )
+        new.update((row[0], row[1]) for row in cursor.fetchall())
+    cursor.executemany(
+        POSTING_UPDATE,
+        (
+            (ssid_id, mac, first_ts, last_ts, count)
+            for (ssid_id, mac), (first_ts, last_ts, count) in items
+            if (ssid_id, mac) not in new
+        ),
+    )
+    added = {}
+    for ssid_id, _mac in new:
+        added[ssid_id] = added.get(ssid_id, 0) + 1
+    cursor.executemany(
+        "UPDATE ssids SET device_count = device_count + ? WHERE ssid_id = ?",
+        ((count, ssid_id) for ssid_id, count in added.items()),
+    )
+
+
+def rebuild_ssid_index() -> int:
+    """
+    Rebuild the SSID posting lists and search index from every sighting partition
+    (bulk maintenance). Rows still waiting in sightings_legacy are included.
+
+    Returns:
+        Number of postings
+    """
+    with get_cursor() as cursor:
+        cursor.execute("DELETE FROM ssid_devices")
+        for source in compact_sighting_sources(cursor):
+            cursor.execute(f"""
+                INSERT INTO ssid_devices (ssid_id, mac, first_ts, last_ts, sightings)
+                SELECT s.ssid_id, s.mac, MIN(s.ts), MAX(s.ts), COUNT(*)
+                FROM {source} AS s JOIN ssids ON ssids.ssid_id = s.ssid_id
+                WHERE ssids.ssid NOT IN ('', 'Undirected Probe')
+                GROUP BY s.ssid_id, s.mac
+                ON CONFLICT (ssid_id, mac) DO UPDATE SET
+                    first_ts = MIN(first_ts, excluded.first_ts),
+                    last_ts = MAX(last_ts, excluded.last_ts),
+                    sightings = sightings + excluded.sightings
+            """)
+        cursor.execute("""
+            UPDATE ssids SET device_count = (
+                SELECT COUNT(*) FROM ssid_devices AS d WHERE d.ssid_id = ssids.ssid_id
+            )
+        """)
+        if _has_search_index(cursor):
+            cursor.execute("INSERT INTO ssid_search (ssid_search) VALUES ('rebuild')")
+        cursor.execute("SELECT COUNT(*) FROM ssid_devices")
+        postings = cursor.fetchone()[0]
+
+    logger.info(f"Rebuilt SSID index ({postings} postings)")
+    return postings
+
+
+def _has_search_index(cursor) -> bool:
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'ssid_search'")
+    return cursor.fetchone() is not None
+
+
+def _directed_ssids(cursor, ssids) -> dict[str, tuple[int, int]]:
+    """(ssid_id, device_count) of each of the SSIDs that is known and directed."""
+    ssids = [ssid for ssid in dict.fromkeys(ssids) if ssid not in UNDIRECTED]
+    if not ssids:
+        return {}
+    cursor.execute(
+        f"SELECT ssid, ssid_id, device_count FROM ssids "
+        f"WHERE ssid IN ({', '.join('?' * len(ssids))})",
+        ssids,
+    )
+    return {row["ssid"]: (row["ssid_id"], row["device_count"]) for row in cursor.fetchall()}
+
+
+def _device_ssids(cursor, mac: int) -> dict[int, str]:
+    """ssid_id -> SSID of every directed SSID a MAC probed for."""
+    cursor.execute(
+        "SELECT d.ssid_id, ssids.ssid FROM ssid_devices AS d "
+        "JOIN ssids ON ssids.ssid_id = d.ssid_id WHERE d.mac = ?",
+        (mac,),
+    )
+    return {row["ssid_id"]: row["ssid"] for row in cursor.fetchall()}
+
+
+def _device_exists(cursor, mac: int) -> bool:
+    cursor.execute("SELECT 1 FROM devices WHERE mac = ?", (int_to_mac(mac),))
+    return cursor.fetchone() is not None
+
+
+def search_ssids(text: str, limit: int = 20) -> list[dict]:
+    """
+    SSIDs whose name has words starting with each word of the search text, e.g.
+    "my 5" finds "MyNet-5G" (case-insensitive). Of the first SSID_SEARCH_CANDIDATES
+    matches, the most probed-for (by number of devices) come first.
+
+    Without FTS5, or for text without letters or digits, the name has to start with
+    the text instead.
+
+    Returns:
+        ssid, device_count and fingerprint_count per SSID
+    """
+    words = re.findall(r"\w+", text)
+    with get_cursor() as cursor:
+        if words and _has_search_index(cursor):
+            matches = "SELECT rowid FROM ssid_search WHERE ssid_search MATCH ? LIMIT ?"
+            params = [" ".join(f'"{word}"*' for word in words), config.SSID_SEARCH_CANDIDATES]
+        else:
+            escaped = re.sub(r"([\\%_])", r"\\\1", text)
+            matches = "SELECT ssid_id FROM ssids WHERE ssid LIKE ? ESCAPE '\\' LIMIT ?"
+            params = [f"{escaped}%", config.SSID_SEARCH_CANDIDATES]
+        cursor.execute(
+            f"""
+            SELECT ssid, device_count, (
+                SELECT COUNT(*) FROM fingerprint_ssids AS f WHERE f.ssid_id = ssids.ssid_id
+            ) AS fingerprint_count
+            FROM ssids
+            WHERE ssid_id IN ({matches}) AND ssid NOT IN ('', 'Undirected Probe')
+            ORDER BY device_count DESC, ssid
+            LIMIT ?
+        """,
+            [*params, limit],
+        )
+        return [dict(row) for row in cursor.fetchall()]
+
+
+def get_ssid_devices(
+    ssids: list[str], min_match: int | None = None, limit: int = 50, offset: int = 0
+) -> dict:
+    """
+    Devices that probed for all of a set of SSIDs, or at least min_match of them.
+
+    Args:
+        ssids: Directed SSIDs
+        min_match: How many of the SSIDs a device must have probed for (default all)
+        limit: Maximum devices
+        offset: Skip N devices
+
+    Returns:
+        total (matching devices) and devices, most recently heard first: mac, name,
+        matched (SSIDs probed for), sightings (probes for them), first_seen, last_seen
+
+    Raises:
+        ValueError: If there are no SSIDs or min_match is not between 1 and their number
+    """
+    ssids = list(dict.fromkeys(ssids))
+    min_match = len(ssids) if min_match is None else min_match
+    if not ssids or not 1 <= min_match <= len(ssids):
+        raise ValueError(f"min_match must be between 1 and {len(ssids)} (number of SSIDs)")
+
+    with get_cursor() as cursor:
+        known = sorted(_directed_ssids(cursor, ssids).values(), key=lambda ssid: ssid[1])
+        if len(known) < min_match:
+            return {"total": 0, "devices": []}
+        # Unknown SSIDs match nothing: the shortest lists of the ones that could match
+        drivers = [ssid_id for ssid_id, _count in known[: len(known) - min_match + 1]]
+        ssid_ids = [ssid_id for ssid_id, _count in known]
+        marks = ", ".join("?" * len(ssid_ids))
+        if min_match == 1:
+            # Every list is read anyway
+            postings, params = f"SELECT * FROM ssid_devices WHERE ssid_id IN ({marks})", ssid_ids
+        else:
+            postings = f"""
+                SELECT d.* FROM (
+                    SELECT DISTINCT mac FROM ssid_devices
+                    WHERE ssid_id IN ({', '.join('?' * len(drivers))})
+                ) AS driver
+                CROSS JOIN ssid_devices AS d ON d.mac = driver.mac AND d.ssid_id IN ({marks})
+            """
+            params = [*drivers, *ssid_ids]
+        matched = f"""
+            WITH matched AS (
+                SELECT mac, COUNT(*) AS matched, SUM(sightings) AS sightings,
+                    MIN(first_ts) AS first_ts, MAX(last_ts) AS last_ts
+                FROM ({postings})
+                GROUP BY mac
+                HAVING COUNT(*) >= ?
+            )
+        """
+        params = [*params, min_match]
+        cursor.execute(
+            f"""
+            {matched},
+            page AS (
+                SELECT *, COUNT(*) OVER () AS total FROM matched
+                ORDER BY last_ts DESC, mac LIMIT ? OFFSET ?
+            )
+            SELECT page.*, devices.name
+            FROM page LEFT JOIN devices ON devices.mac = int_to_mac(page.mac)
+            ORDER BY page.last_ts DESC, page.mac
+        """,
+            [*params, limit, offset],
+        )
+        rows = cursor.fetchall()
+        if rows:
+            total = rows[0]["total"]
+        else:  # Past the last page
+            cursor.execute(f"{matched} SELECT COUNT(*) FROM matched", params)
+            total = cursor.fetchone()[0]
+
+    return {
+        "total": total,
+        "devices": [
+            {
+                "mac": int_to_mac(row["mac"]),
+                "name": row["name"],
+                "matched": row["matched"],
+                "sightings": row["sightings"],
+                "first_seen": epoch_to_utc_iso(row["first_ts"]),
+                "last_seen": epoch_to_utc_iso(row["last_ts"]),
+            }
+            for row in rows
+        ],
+    }
+
+
+def get_ssid_fingerprints(ssid: str, limit: int = 50) -> list[dict] | None:
+    """
+    Fingerprints seen probing for an SSID, most sighted first.
+
+    Returns:
+        fingerprint_id, identity_id, sighting_count, unique_mac_count, first_seen and
+        last_seen per fingerprint; None if no device probed for the SSID
+    """
+    with get_cursor() as cursor:
+        known = _directed_ssids(cursor, [ssid])
+        if ssid not in known:
+            return None
+        cursor.execute(
+            """
+            SELECT fp.fingerprint_id, fp.identity_id, fp.sighting_count, fp.unique_mac_count,
+                fp.first_seen, fp.last_seen
+            FROM fingerprint_ssids AS f
+            JOIN device_fingerprints AS fp ON fp.fingerprint_id = f.fingerprint_id
+            WHERE f.ssid_id = ?
+            ORDER BY fp.sighting_count DESC, fp.fingerprint_id
+            LIMIT ?
+        """,
+            (known[ssid][0], limit),
+        )
+        return [dict(row) for row in cursor.fetchall()]
+
+
+def find_ssid_overlap(mac: str, min_shared: int = 2, limit: int = 20) -> list[dict] | None:
+    """
+    Devices that probed for at least min_shared of the same SSIDs as a device, most
+    similar SSID set (Jaccard similarity) first.
+
+    Only SSIDs probed for by at most SSID_OVERLAP_MAX_DEVICES devices bring in
+    candidates, so devices sharing nothing but such common SSIDs are not found.
+
+    Returns:
+        mac, name, shared (SSIDs in common), ssid_count (SSIDs the device probed for),
+        similarity and shared_ssids per device; None if the device doesn't exist
+
+    Raises:
+        ValueError: If mac is not a MAC address
+    """
+    mac_int = mac_to_int(mac)
+    with get_cursor() as cursor:
+        if not _device_exists(cursor, mac_int):
+            return None
+        own = _device_ssids(cursor, mac_int)
+        if len(own) < min_shared:
+            return []
+        marks = ", ".join("?" * len(own))
+        cursor.execute(
+            f"""
+            WITH candidates AS (
+                SELECT DISTINCT d.mac FROM ssid_devices AS d
+                JOIN ssids ON ssids.ssid_id = d.ssid_id
+                WHERE d.ssid_id IN ({marks}) AND ssids.device_count <= ? AND d.mac != ?
+            ),
+            scored AS (
+                SELECT c.mac, (
+                    SELECT COUNT(*) FROM ssid_devices AS d
+                    WHERE d.mac = c.mac AND d.ssid_id IN ({marks})
+                ) AS shared, (
+                    SELECT COUNT(*) FROM ssid_devices AS d WHERE d.mac = c.mac
+                ) AS ssid_count
+                FROM candidates AS c
+            )
+            SELECT scored.*, CAST(shared AS REAL) / (? + ssid_count - shared) AS similarity,
+                devices.name
+            FROM scored LEFT JOIN devices ON devices.mac = int_to_mac(scored.mac)
+            WHERE shared >= ?
+            ORDER BY similarity DESC, shared DESC, scored.mac
+            LIMIT ?
+        """,
+            [*own, config.SSID_OVERLAP_MAX_DEVICES, mac_int, *own, len(own), min_shared, limit],
+        )
+        rows = cursor.fetchall()
+        overlap = []
+        for row in rows:
+            cursor.execute(
+                f"SELECT ssid_id FROM ssid_devices WHERE mac = ? AND ssid_id IN ({marks})",
+                [row["mac"], *own],
+            )
+            overlap.append(
+                {
+                    "mac": int_to_mac(row["mac"]),
+                    "name": row["name"],
+                    "shared": row["shared"],
+                    "ssid_count": row["ssid_count"],
+                    "similarity": round(row["similarity"], 3),
+                    "shared_ssids": sorted(own[shared[0]] for shared in cursor.fetchall()),
+                }
+            )
+    return overlap
+
+
+def ssid_similarity(mac_a: str, mac_b: str) -> dict | None:
+    """
+    Jaccard similarity of the directed SSIDs two devices probed for (0.0 if neither
+    probed for any), with the SSIDs they share and the ones only each of them probed for.
+
+    Returns:
+        None if either device doesn't exist
+
+    Raises:
+        ValueError: If a MAC is not a MAC address
+    """
+    macs = [mac_to_int(mac_a), mac_to_int(mac_b)]
+    with get_cursor() as cursor:
+        if not all(_device_exists(cursor, mac) for mac in macs):
+            return None
+        a, b = (set(_device_ssids(cursor, mac).values()) for mac in macs)
+    union = a | b
+    return {
+        "mac_a": int_to_mac(macs[0]),
+        "mac_b": int_to_mac(macs[1]),
+        "similarity": round(len(a & b) / len(union), 3) if union else 0.0,
+        "shared": sorted(a & b),
+        "only_a": sorted(a - b),
+        "only_b": sorted(b - a),
+    }
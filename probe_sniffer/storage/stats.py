@@ -0,0 +1,279 @@
+"""
+Running counters behind /stats/overview, maintained on ingest.
+
+The sighting writer adds every batch to small counter tables (schema.OVERVIEW_TABLES)
+inside its transaction, like visits, rollups and device_summary, so the counters are
+exactly as durable as the sightings and a restart has nothing to reload or replay.
+The overview then reads a bounded number of rows however many sightings there are.
+
+Unique devices per day and week are exact: a device counts towards a period the
+first time it is seen in it, i.e. when its device_summary.last_ts from before the
+batch is older than the period's start. That relies on sightings arriving in time
+order, as they do from the capture pipeline.
+"""
+
+import logging
+import time
+from collections import Counter, defaultdict
+
+from probe_sniffer.storage import database
+from probe_sniffer.storage.database import get_cursor
+from probe_sniffer.storage.seen import seen_filters
+from probe_sniffer.utils.mac_utils import int_to_mac, mac_to_int
+from probe_sniffer.utils.time_utils import eastern_day_start, eastern_week_start, epoch_to_utc_iso
+
+logger = logging.getLogger("DATABASE")
+
+MINUTES_KEPT = 24 * 60  # stat_minutes covers the last 24 hours
+DEVICE_DAYS_KEPT = 2  # stat_device_days covers today and yesterday
+REBUILT_DAYS = 8  # Days (and the weeks they fall in) rebuilt from existing sightings
+
+# (period, start_ts) -> [sightings, devices, new_devices, new_fingerprints]
+PERIOD_UPSERT = """
+    INSERT INTO stat_periods (period, start_ts, sightings, devices, new_devices, new_fingerprints)
+    VALUES (?, ?, ?, ?, ?, ?)
+    ON CONFLICT(period, start_ts) DO UPDATE SET
+        sightings = sightings + excluded.sightings,
+        devices = devices + excluded.devices,
+        new_devices = new_devices + excluded.new_devices,
+        new_fingerprints = new_fingerprints + excluded.new_fingerprints
+"""
+
+
+def _counter_upsert(table: str, key: str, column: str) -> str:
+    return f"""
+        INSERT INTO {table} ({key}, {column}) VALUES (?, ?)
+        ON CONFLICT({key}) DO UPDATE SET {column} = {column} + excluded.{column}
+    """
+
+
+def _periods(ts: int) -> tuple[tuple[str, int], tuple[str, int]]:
+    return ("day", eastern_day_start(ts)), ("week", eastern_week_start(ts))
+
+
+def _last_seen(cursor, macs: list[int]) -> dict[int, int]:
+    """device_summary.last_ts of the given devices (absent = never seen)."""
+    unseen = seen_filters(cursor).unseen_macs(macs)
+    macs = [mac for mac in macs if mac not in unseen]
+    last_seen = {}
+    for start in range(0, len(macs), 500):  # stay under SQLite's variable limit
+        chunk = [int_to_mac(mac) for mac in macs[start : start + 500]]
+        cursor.execute(
+            f"SELECT mac, last_ts FROM device_summary WHERE mac IN "
+            f"({', '.join('?' * len(chunk))})",
+            chunk,
+        )
+        last_seen.update((mac_to_int(row["mac"]), row["last_ts"]) for row in cursor)
+    return last_seen
+
+
+def update_overview_stats(
+    cursor,
+    sightings: list[tuple],
+    new_fingerprints: set[str],
+    ssid_ids: dict[str, int],
+    oui_ids: dict[str, int],
+    shed: list[tuple] = (),
+):
+    """
+    Add a batch of new sightings to the overview counters (incremental maintenance).
+
+    Runs inside the writer's transaction, before update_device_summary(). The batch
+    is aggregated first, so each counter row costs one upsert per batch.
+
+    Args:
+        cursor: Cursor of the transaction writing the sightings
+        sightings: (ts, mac, dbm, ssid, oui, ie_fingerprint, channel) per sighting
+        new_fingerprints: Fingerprints inserted by this batch
+        ssid_ids: SSID -> ssids.ssid_id for every SSID in the batch
+        oui_ids: OUI -> ouis.oui_id for every OUI in the batch
+        shed: (minute, mac, ssid, oui, ie_fingerprint, count, ...) per group of frames
+            the load shedder or flood detector didn't write, counted like the sightings
+            they stand for
+    """
+    if not sightings and not shed:
+        return
+
+    periods_by_minute = {}
+    minutes, ssids, device_days = Counter(), Counter(), Counter()
+    periods = defaultdict(lambda: [0, 0, 0, 0])
+    device_periods = defaultdict(set)
+    first_sightings = {}  # mac -> (ts, oui)
+    fingerprint_ts = {}
+    for ts, mac, _dbm, ssid, oui, fingerprint_id, _channel in sightings:
+        minute = ts - ts % 60
+        day_and_week = periods_by_minute.get(minute)
+        if day_and_week is None:
+            day_and_week = periods_by_minute[minute] = _periods(ts)
+        minutes[minute] += 1
+        ssids[ssid_ids[ssid]] += 1
+        device_days[day_and_week[0][1], mac] += 1
+        for period in day_and_week:
+            periods[period][0] += 1
+        device_periods[mac].update(day_and_week)
+        if mac not in first_sightings or ts < first_sightings[mac][0]:
+            first_sightings[mac] = (ts, oui)
+        if fingerprint_id in new_fingerprints and fingerprint_id not in fingerprint_ts:
+            fingerprint_ts[fingerprint_id] = ts
+    for minute, mac, ssid, oui, _fingerprint_id, count, *_dbm in shed:
+        day_and_week = periods_by_minute.get(minute)
+        if day_and_week is None:
+            day_and_week = periods_by_minute[minute] = _periods(minute)
+        minutes[minute] += count
+        ssids[ssid_ids[ssid]] += count
+        device_days[day_and_week[0][1], mac] += count
+        for period in day_and_week:
+            periods[period][0] += count
+        device_periods[mac].update(day_and_week)
+        # A flood can shed every frame of a new random MAC
+        if mac not in first_sightings or minute < first_sightings[mac][0]:
+            first_sightings[mac] = (minute, oui)
+
+    new_ouis = Counter()
+    last_seen = _last_seen(cursor, list(device_periods))
+    for mac, mac_periods in device_periods.items():
+        last_ts = last_seen.get(mac)
+        for period in mac_periods:
+            if last_ts is None or last_ts < period[1]:
+                periods[period][1] += 1
+        if last_ts is None:
+            ts, oui = first_sightings[mac]
+            for period in _periods(ts):
+                periods[period][2] += 1
+            new_ouis[oui_ids[oui]] += 1
+
+    newest = max(minutes)
+    for fingerprint_id in new_fingerprints:
+        for period in _periods(fingerprint_ts.get(fingerprint_id, newest)):
+            periods[period][3] += 1
+
+    cursor.executemany(
+        PERIOD_UPSERT, (period + tuple(counts) for period, counts in periods.items())
+    )
+    cursor.executemany(_counter_upsert("stat_minutes", "bucket_ts", "sightings"), minutes.items())
+    cursor.executemany(_counter_upsert("stat_ssids", "ssid_id", "sightings"), ssids.items())
+    cursor.executemany(_counter_upsert("stat_ouis", "oui_id", "devices"), new_ouis.items())
+    cursor.executemany(
+        """
+        INSERT INTO stat_device_days (day_ts, mac, sightings) VALUES (?, ?, ?)
+        ON CONFLICT(day_ts, mac) DO UPDATE SET sightings = sightings + excluded.sightings
+    """,
+        (key + (count,) for key, count in device_days.items()),
+    )
+
+    # Both windows slide with the newest sighting; the deletes are index range scans
+    cursor.execute("DELETE FROM stat_minutes WHERE bucket_ts <= ?", (newest - MINUTES_KEPT * 60,))
+    cursor.execute(
+        "DELETE FROM stat_device_days WHERE day_ts < ?",
+        (eastern_day_start(newest - (DEVICE_DAYS_KEPT - 1) * 86400),),
+    )
+
+
+def rebuild_overview_stats(now: int | None = None) -> None:
+    """
+    Rebuild the overview counters from the existing data (bulk maintenance).
+
+    Totals, per-SSID and per-manufacturer counts cover everything; per-period counts
+    are rebuilt for the last REBUILT_DAYS days and the weeks they fall in. Rows still
+    waiting in sightings_legacy are included.
+    """
+    now = int(time.time()) if now is None else now
+    with get_cursor() as cursor:
+        for table in (
+            "stat_totals",
+            "stat_periods",
+            "stat_device_days",
+            "stat_minutes",
+            "stat_ouis",
+            "stat_ssids",
+        ):
+            cursor.execute(f"DELETE FROM {table}")
+
+        cursor.execute("""
+            INSERT INTO stat_totals (name, value)
+            SELECT 'devices', COUNT(*) FROM devices
+            UNION ALL
+            SELECT 'trusted', COUNT(*) FROM devices WHERE is_trusted
+        """)
+        cursor.execute("""
+            INSERT INTO stat_ouis (oui_id, devices)
+            SELECT ouis.oui_id, COUNT(*)
+            FROM device_summary AS d
+            JOIN ouis ON ouis.oui = d.oui
+            GROUP BY ouis.oui_id
+        """)
+
+        sources = database.sighting_sources(cursor)
+        union = " UNION ALL ".join(f"SELECT * FROM {source}" for source in sources)
+        if not union:
+            return
+
+        cursor.execute(f"""
+            INSERT INTO stat_ssids (ssid_id, sightings)
+            SELECT ssids.ssid_id, COUNT(*)
+            FROM ({union}) AS s
+            JOIN ssids ON ssids.ssid = s.ssid
+            GROUP BY ssids.ssid_id
+        """)
+        cursor.execute(
+            f"""
+            INSERT INTO stat_minutes (bucket_ts, sightings)
+            SELECT ts - ts % 60, COUNT(*)
+            FROM ({union}) AS s
+            WHERE ts >= ?
+            GROUP BY 1
+        """,
+            (now - now % 60 - (MINUTES_KEPT - 1) * 60,),
+        )
+
+        periods = set()
+        day_start = eastern_day_start(now)
+        for days_ago in range(REBUILT_DAYS):
+            if days_ago:
+                day_start = eastern_day_start(day_start - 1)
+            periods.update(_periods(day_start))
+            if days_ago < DEVICE_DAYS_KEPT:
+                cursor.execute(
+                    f"""
+                    INSERT INTO stat_device_days (day_ts, mac, sightings)
+                    SELECT ?, mac, COUNT(*)
+                    FROM ({union}) AS s
+                    WHERE ts >= ? AND ts < ?
+                    GROUP BY mac
+                """,
+                    (day_start, day_start, _period_end(("day", day_start))),
+                )
+
+        for period in periods:
+            start, end = period[1], _period_end(period)
+            cursor.execute(
+                f"SELECT COUNT(*), COUNT(DISTINCT mac) FROM ({union}) WHERE ts >= ? AND ts < ?",
+                (start, end),
+            )
+            sightings, devices = cursor.fetchone()
+            bounds = (epoch_to_utc_iso(start), epoch_to_utc_iso(end))
+            cursor.execute(
+                "SELECT COUNT(*) FROM devices WHERE first_seen >= ? AND first_seen < ?", bounds
+            )
+            new_devices = cursor.fetchone()[0]
+            cursor.execute(
+                "SELECT COUNT(*) FROM device_fingerprints "
+                "WHERE first_seen >= ? AND first_seen < ?",
+                bounds,
+            )
+            new_fingerprints = cursor.fetchone()[0]
+            if not (sightings or new_devices or new_fingerprints):
+                continue  # Same as never having written the row
+            cursor.execute(
+                PERIOD_UPSERT, period + (sightings, devices, new_devices, new_fingerprints)
+            )
+
+    logger.info("Rebuilt overview stats")
+
+
+def _period_end(period: tuple[str, int]) -> int:
+    """Start of the next day or week (DST days are 23 or 25 hours long)."""
+    kind, start = period
+    if kind == "day":
+        return eastern_day_start(start + 86400 + 7200)
+    return eastern_week_start(start + 7 * 86400 + 7200)
@@ -0,0 +1,133 @@
+"""
+Per-device summary (latest OUI, SSID set, totals, signal) maintained on ingest.
+
+Device endpoints read device_summary joined to devices instead of aggregating the
+sighting partitions for every device.
+"""
+
+import json
+import logging
+
+from probe_sniffer.storage import database
+from probe_sniffer.storage.database import get_cursor
+from probe_sniffer.storage.seen import forget_filters
+from probe_sniffer.utils.mac_utils import int_to_mac
+
+logger = logging.getLogger("DATABASE")
+
+# Adds a batch (or a partition's aggregate) to a device's summary. The latest
+# OUI/dBm win by timestamp, SSID sets are merged and kept sorted.
+SUMMARY_UPSERT = """
+    INSERT INTO device_summary (mac, oui, ssids, total_sightings, dbm_sum, dbm_count, last_dbm, last_ts)
+    {values}
+    ON CONFLICT(mac) DO UPDATE SET
+        oui = CASE WHEN excluded.last_ts >= last_ts THEN excluded.oui ELSE oui END,
+        last_dbm = CASE WHEN excluded.last_ts >= last_ts THEN excluded.last_dbm ELSE last_dbm END,
+        last_ts = MAX(last_ts, excluded.last_ts),
+        ssids = (
+            SELECT json_group_array(value) FROM (
+                SELECT value FROM json_each(device_summary.ssids)
+                UNION
+                SELECT value FROM json_each(excluded.ssids)
+                ORDER BY value
+            )
+        ),
+        total_sightings = total_sightings + excluded.total_sightings,
+        dbm_sum = dbm_sum + excluded.dbm_sum,
+        dbm_count = dbm_count + excluded.dbm_count
+"""
+
+
+def update_device_summary(cursor, sightings: list[tuple], shed: list[tuple] = ()):
+    """
+    Add a batch of new sightings to device_summary (incremental maintenance).
+
+    Runs inside the writer's transaction; the batch is aggregated per device first.
+
+    Args:
+        cursor: Cursor of the transaction writing the sightings
+        sightings: (ts, mac, dbm, ssid, oui, ie_fingerprint, channel) per sighting
+        shed: (minute, mac, ssid, oui, ie_fingerprint, count, dbm_count, dbm_sum,
+            min_dbm, max_dbm) per group of frames the load shedder or flood detector
+            didn't write; they add to the counts but not to the latest sighting
+    """
+    # mac -> [count, dbm_sum, dbm_count, ssids, last_ts, last_dbm, last_oui]
+    devices = {}
+    for ts, mac, dbm, ssid, oui, _fingerprint_id, _channel in sightings:
+        summary = devices.get(mac)
+        if summary is None:
+            summary = devices[mac] = [0, 0, 0, set(), ts, dbm, oui]
+        summary[0] += 1
+        if dbm is not None:
+            summary[1] += dbm
+            summary[2] += 1
+        if ssid:
+            summary[3].add(ssid)
+        if ts >= summary[4]:
+            summary[4:] = [ts, dbm, oui]
+    for minute, mac, ssid, oui, _fingerprint_id, count, dbm_count, dbm_sum, *_ in shed:
+        summary = devices.get(mac)
+        if summary is None:
+            # The load shedder writes the minute's first frame (the latest sighting)
+            # before shedding any; stay just older than it. A flood can shed all of
+            # them, leaving no signal reading
+            summary = devices[mac] = [0, 0, 0, set(), minute - 1, None, oui]
+        summary[0] += count
+        summary[1] += dbm_sum
+        summary[2] += dbm_count
+        if ssid:
+            summary[3].add(ssid)
+
+    cursor.executemany(
+        SUMMARY_UPSERT.format(values="VALUES (?, ?, ?, ?, ?, ?, ?, ?)"),
+        (
+            (int_to_mac(mac), oui, json.dumps(sorted(ssids)), count, dbm_sum, dbm_count, dbm, ts)
+            for mac, (count, dbm_sum, dbm_count, ssids, ts, dbm, oui) in devices.items()
+        ),
+    )
+
+
+def rebuild_device_summary() -> int:
+    """
+    Rebuild device_summary from every sighting partition (bulk maintenance).
+
+    One aggregate INSERT ... SELECT per partition. Rows still waiting in
+    sightings_legacy are included.
+
+    Returns:
+        Number of devices summarized
+    """
+    with get_cursor() as cursor:
+        cursor.execute("DELETE FROM device_summary")
+        for source in database.sighting_sources(cursor):
+            # With a single max() aggregate, SQLite takes the bare oui/dbm columns
+            # from the latest row
+            cursor.execute(SUMMARY_UPSERT.format(values=f"""
+                    SELECT
+                        int_to_mac(mac),
+                        oui,
+                        COALESCE(json_group_array(DISTINCT ssid) FILTER (WHERE ssid != ''), '[]'),
+                        COUNT(*),
+                        COALESCE(SUM(dbm), 0),
+                        COUNT(dbm),
+                        dbm,
+                        MAX(ts)
+                    FROM {source}
+                    WHERE true
+                    GROUP BY mac
+                """))
+
+        # json_group_array doesn't sort; the incremental path expects sorted sets
+        cursor.execute("""
+            UPDATE device_summary SET ssids = (
+                SELECT json_group_array(value) FROM (
+                    SELECT value FROM json_each(device_summary.ssids) ORDER BY value
+                )
+            )
+        """)
+        cursor.execute("SELECT COUNT(*) FROM device_summary")
+        devices = cursor.fetchone()[0]
+
+    forget_filters()  # Rebuilt on next use, with the devices found here
+    logger.info(f"Rebuilt device_summary ({devices} devices)")
+    return devices
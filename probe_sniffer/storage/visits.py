@@ -0,0 +1,304 @@
+"""
+Sessionization: fold sightings into per-MAC presence intervals (visits).
+
+A visit covers consecutive sightings of one MAC; a new visit starts when the MAC has
+been silent for longer than the idle gap (VISIT_IDLE_GAP_SECONDS). Visits are kept
+up to date by the sighting writer and can be rebuilt from the sighting partitions,
+e.g. after changing the idle gap.
+"""
+
+import json
+import logging
+from dataclasses import dataclass, field
+
+from probe_sniffer import config
+from probe_sniffer.storage import database
+from probe_sniffer.storage.database import get_cursor
+
+logger = logging.getLogger("DATABASE")
+
+
+@dataclass(slots=True)
+class Visit:
+    """One presence interval of a MAC, as stored in the visits table."""
+
+    mac: int
+    start_ts: int
+    end_ts: int
+    ie_fingerprint: str | None = None  # fingerprint of the latest sighting
+    frame_count: int = 0
+    min_dbm: int | None = None
+    max_dbm: int | None = None
+    dbm_sum: int = 0
+    ssids: set[str] = field(default_factory=set)
+    visit_id: int | None = None  # None until inserted
+
+    @classmethod
+    def from_row(cls, row) -> "Visit":
+        return cls(
+            mac=row["mac"],
+            start_ts=row["start_ts"],
+            end_ts=row["end_ts"],
+            ie_fingerprint=row["ie_fingerprint"],
+            frame_count=row["frame_count"],
+            min_dbm=row["min_dbm"],
+            max_dbm=row["max_dbm"],
+            dbm_sum=row["dbm_sum"],
+            ssids=set(json.loads(row["ssids"])),
+            visit_id=row["visit_id"],
+        )
+
+    def copy(self) -> "Visit":
+        return Visit(
+            self.mac,
+            self.start_ts,
+            self.end_ts,
+            self.ie_fingerprint,
+            self.frame_count,
+            self.min_dbm,
+            self.max_dbm,
+            self.dbm_sum,
+            set(self.ssids),
+            self.visit_id,
+        )
+
+    def add(self, ts: int, dbm: int | None, ssid: str | None, ie_fingerprint: str | None):
+        """Extend the visit with one sighting."""
+        self.start_ts = min(self.start_ts, ts)
+        if ts >= self.end_ts:
+            self.end_ts = ts
+            self.ie_fingerprint = ie_fingerprint
+        self.frame_count += 1
+        if dbm is not None:
+            self.min_dbm = dbm if self.min_dbm is None else min(self.min_dbm, dbm)
+            self.max_dbm = dbm if self.max_dbm is None else max(self.max_dbm, dbm)
+            self.dbm_sum += dbm
+        if ssid:
+            self.ssids.add(ssid)
+
+    def add_shed(self, minute: int, ssid: str | None, ie_fingerprint: str | None, stats):
+        """
+        Extend the visit with frames shed in one minute, which only tell their minute:
+        they count fully but move end_ts no further than the minute's start.
+        """
+        count, dbm_count, dbm_sum, min_dbm, max_dbm = stats
+        self.start_ts = min(self.start_ts, minute)
+        if minute > self.end_ts:
+            self.end_ts = minute
+            self.ie_fingerprint = ie_fingerprint
+        self.frame_count += count
+        if dbm_count:
+            self.min_dbm = min_dbm if self.min_dbm is None else min(self.min_dbm, min_dbm)
+            self.max_dbm = max_dbm if self.max_dbm is None else max(self.max_dbm, max_dbm)
+            self.dbm_sum += dbm_sum
+        if ssid:
+            self.ssids.add(ssid)
+
+    def params(self) -> tuple:
+        """Column values in VISIT_COLUMNS order."""
+        return (
+            self.mac,
+            self.ie_fingerprint,
+            self.start_ts,
+            self.end_ts,
+            self.frame_count,
+            self.min_dbm,
+            self.max_dbm,
+            self.dbm_sum,
+            json.dumps(sorted(self.ssids)),
+        )
+
+
+VISIT_COLUMNS = (
+    "mac, ie_fingerprint, start_ts, end_ts, frame_count, min_dbm, max_dbm, dbm_sum, ssids"
+)
+
+
+def fold_sighting(
+    open_visits: dict[int, Visit],
+    ts: int,
+    mac: int,
+    dbm: int | None,
+    ssid: str | None,
+    ie_fingerprint: str | None,
+    idle_gap: int,
+) -> Visit | None:
+    """
+    Add one sighting to the MAC's open visit, or start a new visit after an idle gap.
+
+    Returns:
+        The visit that was closed by starting a new one, or None
+    """
+    visit = open_visits.get(mac)
+    if visit is not None and ts - visit.end_ts <= idle_gap:
+        visit.add(ts, dbm, ssid, ie_fingerprint)
+        return None
+
+    open_visits[mac] = Visit(mac, ts, ts)
+    open_visits[mac].add(ts, dbm, ssid, ie_fingerprint)
+    return visit
+
+
+# Database path -> MAC -> its open visit (last sighting within the idle gap), so the
+# writer doesn't look visits up per batch. Loaded on first use and only updated once
+# the writing transaction has committed (see remember_open_visits).
+_OPEN_VISITS: dict[str, dict[int, Visit]] = {}
+_SWEPT_AT: dict[str, int] = {}  # database path -> cutoff of the last cache sweep
+
+
+def _open_visits(cursor, idle_gap: int) -> dict[int, Visit]:
+    """The open-visit cache for the current database, loading it on first use."""
+    key = str(database.DB_PATH)
+    if key not in _OPEN_VISITS:
+        cursor.execute(
+            "SELECT * FROM visits WHERE end_ts >= (SELECT MAX(end_ts) FROM visits) - ? "
+            "ORDER BY end_ts",
+            (idle_gap,),
+        )
+        _OPEN_VISITS[key] = {row["mac"]: Visit.from_row(row) for row in cursor.fetchall()}
+    return _OPEN_VISITS[key]
+
+
+def update_visits(
+    cursor, sightings: list[tuple], shed: list[tuple] = (), idle_gap: int | None = None
+) -> dict[int, Visit]:
+    """
+    Fold a batch of new sightings into the visits table (incremental maintenance).
+
+    Runs inside the writer's transaction, so visits never disagree with the sightings.
+    Works on copies of the cached open visits; pass the result to
+    remember_open_visits() after the transaction commits.
+
+    Args:
+        cursor: Cursor of the transaction writing the sightings
+        sightings: (ts, mac, dbm, ssid, oui, ie_fingerprint, channel) per sighting
+        shed: (minute, mac, ssid, oui, ie_fingerprint, count, dbm_count, dbm_sum,
+            min_dbm, max_dbm) per group of frames not written; they add to the frame
+            counts, signal stats and SSIDs of the visit open at their minute
+        idle_gap: Seconds of silence that end a visit (default VISIT_IDLE_GAP_SECONDS)
+
+    Returns:
+        Open visit per MAC in the batch
+    """
+    if idle_gap is None:
+        idle_gap = config.VISIT_IDLE_GAP_SECONDS
+
+    cached = _open_visits(cursor, idle_gap)
+    macs = {row[1] for row in sightings} | {row[1] for row in shed}
+    open_visits = {mac: cached[mac].copy() for mac in macs if mac in cached}
+
+    touched = {}  # id(visit) -> visit, for every visit changed by this batch
+    # A shed group sorts at its minute's start, before the sightings of that minute
+    in_time_order = sorted(
+        [(row[0], 1, row) for row in sightings] + [(row[0], 0, row) for row in shed],
+        key=lambda event: event[:2],
+    )
+    for ts, is_sighting, row in in_time_order:
+        mac = row[1]
+        if is_sighting:
+            _, _, dbm, ssid, _oui, ie_fingerprint, _channel = row
+            fold_sighting(open_visits, ts, mac, dbm, ssid, ie_fingerprint, idle_gap)
+        else:
+            _, _, ssid, _oui, ie_fingerprint, *stats = row
+            visit = open_visits.get(mac)
+            if visit is None or ts - visit.end_ts > idle_gap:
+                visit = open_visits[mac] = Visit(mac, ts, ts)
+            visit.add_shed(ts, ssid, ie_fingerprint, stats)
+        visit = open_visits[mac]
+        touched[id(visit)] = visit
+
+    placeholders = ", ".join("?" * 9)
+    cursor.executemany(
+        f"UPDATE visits SET ({VISIT_COLUMNS}) = ({placeholders}) WHERE visit_id = ?",
+        (visit.params() + (visit.visit_id,) for visit in touched.values() if visit.visit_id),
+    )
+    for visit in touched.values():
+        if visit.visit_id is None:
+            cursor.execute(
+                f"INSERT INTO visits ({VISIT_COLUMNS}) VALUES ({placeholders})", visit.params()
+            )
+            visit.visit_id = cursor.lastrowid
+    return open_visits
+
+
+def remember_open_visits(open_visits: dict[int, Visit], idle_gap: int | None = None):
+    """Store committed open visits in the cache and evict the ones that have closed."""
+    if idle_gap is None:
+        idle_gap = config.VISIT_IDLE_GAP_SECONDS
+
+    cache = _OPEN_VISITS.get(str(database.DB_PATH))
+    if cache is None or not open_visits:
+        return
+    cache.update(open_visits)
+    # Sweep at most once per idle gap of capture time
+    cutoff = max(visit.end_ts for visit in open_visits.values()) - idle_gap
+    if cutoff - _SWEPT_AT.get(str(database.DB_PATH), 0) < idle_gap:
+        return
+    _SWEPT_AT[str(database.DB_PATH)] = cutoff
+    for mac in [mac for mac, visit in cache.items() if visit.end_ts < cutoff]:
+        del cache[mac]
+
+
+def _sightings_in_time_order(cursor):
+    """Yield (ts, mac, dbm, ssid, ie_fingerprint) for every sighting, oldest first."""
+    conn = cursor.connection
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE name = 'sightings_legacy'")
+    if cursor.fetchone():
+        # Mid-backfill, rows are split between sightings_legacy and the partitions;
+        # only the view sees both (one-off full sort)
+        yield from conn.execute("""
+            SELECT CAST(strftime('%s', timestamp) AS INTEGER) AS ts, mac_to_int(mac),
+                   dbm, ssid, ie_fingerprint
+            FROM sightings ORDER BY ts
+        """)
+        return
+
+    cursor.execute("SELECT name FROM sighting_partitions ORDER BY start_ts, end_ts")
+    for partition in [row["name"] for row in cursor.fetchall()]:
+        yield from conn.execute(f"""
+            SELECT s.ts, s.mac, s.dbm, ssids.ssid, s.ie_fingerprint
+            FROM {partition} AS s LEFT JOIN ssids ON ssids.ssid_id = s.ssid_id
+            ORDER BY s.ts
+        """)
+
+
+def rebuild_visits(idle_gap: int | None = None) -> int:
+    """
+    Rebuild the visits table from every sighting partition (bulk maintenance).
+
+    Streams the partitions in time order in a single transaction, keeping only the
+    currently open visit per MAC in memory. Sighting writers are blocked until it
+    finishes, so run it before capture starts (init does so on upgrade).
+
+    Args:
+        idle_gap: Seconds of silence that end a visit (default VISIT_IDLE_GAP_SECONDS)
+
+    Returns:
+        Number of visits written
+    """
+    if idle_gap is None:
+        idle_gap = config.VISIT_IDLE_GAP_SECONDS
+
+    insert = f"INSERT INTO visits ({VISIT_COLUMNS}) VALUES ({', '.join('?' * 9)})"
+    written = 0
+    _OPEN_VISITS.pop(str(database.DB_PATH), None)
+    with get_cursor() as cursor:
+        cursor.execute("DELETE FROM visits")
+
+        open_visits: dict[int, Visit] = {}
+        closed: list[Visit] = []
+        for ts, mac, dbm, ssid, ie_fingerprint in _sightings_in_time_order(cursor):
+            visit = fold_sighting(open_visits, ts, mac, dbm, ssid, ie_fingerprint, idle_gap)
+            if visit is not None:
+                closed.append(visit)
+            if len(closed) >= 10_000:
+                cursor.executemany(insert, (visit.params() for visit in closed))
+                written += len(closed)
+                closed = []
+
+        closed.extend(open_visits.values())
+        cursor.executemany(insert, (visit.params() for visit in closed))
+        written += len(closed)
+
+    logger.info(f"Rebuilt visits table ({written} visits, idle gap {idle_gap}s)")
+    return written
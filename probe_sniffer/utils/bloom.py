@@ -0,0 +1,170 @@
+"""
+Bloom filters for "have we seen this key before?" in the ingest hot path.
+
+A BloomFilter answers might_contain() with no false negatives: False means the key was
+definitely never added, True means it probably was, wrong with probability close to
+the fp_rate it was sized for. ScalableBloomFilter (Almeida et al., "Scalable Bloom
+Filters", 2007) adds a new, twice as large and twice as strict, stage whenever the
+current one is full, so it can grow without knowing the final count while its overall
+false-positive rate stays under the configured one.
+
+Keys are integers of up to 64 bits, mixed with hyperloglog.hash64. Each of the k bit
+positions comes from the hash by double hashing (Kirsch and Mitzenmacher, "Less
+Hashing, Same Performance", 2006). The *_many methods check or add a whole batch of
+keys in a few NumPy operations when the optional numpy dependency is installed; a
+key at a time, a pure-Python check costs more than the SQLite lookup it saves.
+"""
+
+import math
+
+try:
+    import numpy as np
+except ImportError:  # numpy is optional, the *_many methods fall back to one key at a time
+    np = None
+
+from probe_sniffer.utils.hyperloglog import hash64
+
+_MIX = (0x9E3779B97F4A7C15, 0xBF58476D1CE4E5B9, 0x94D049BB133111EB)
+
+
+def _hash64_array(keys: list[int]) -> "np.ndarray":
+    """hash64() of every key, vectorized (uint64 arithmetic wraps like the & mask)."""
+    value = np.array(keys, dtype=np.uint64) + np.uint64(_MIX[0])
+    value = (value ^ (value >> np.uint64(30))) * np.uint64(_MIX[1])
+    value = (value ^ (value >> np.uint64(27))) * np.uint64(_MIX[2])
+    return value ^ (value >> np.uint64(31))
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter of 64-bit keys."""
+
+    __slots__ = ("capacity", "fp_rate", "size", "hashes", "bits", "count")
+
+    def __init__(self, capacity: int, fp_rate: float):
+        if capacity < 1 or not 0 < fp_rate < 1:
+            raise ValueError(f"Bad Bloom filter sizing: {capacity} keys at {fp_rate}")
+        self.capacity = capacity
+        self.fp_rate = fp_rate
+        # Optimal bits per key and hash count for the target rate
+        self.size = max(64, math.ceil(-capacity * math.log(fp_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0  # Keys added, counting duplicates the filter didn't recognize
+
+    def _positions(self, key: int):
+        hashed = hash64(key)
+        h1, h2 = hashed & 0xFFFFFFFF, hashed >> 32 | 1
+        size = self.size
+        return [(h1 + i * h2) % size for i in range(self.hashes)]
+
+    def add(self, key: int) -> bool:
+        """Add a key. Returns True if it was (probably) there already."""
+        bits = self.bits
+        present = True
+        for position in self._positions(key):
+            mask = 1 << (position & 7)
+            if not bits[position >> 3] & mask:
+                bits[position >> 3] |= mask
+                present = False
+        if not present:
+            self.count += 1
+        return present
+
+    def might_contain(self, key: int) -> bool:
+        bits = self.bits
+        return all(bits[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+
+    def _positions_array(self, keys: list[int]) -> "np.ndarray":
+        hashed = _hash64_array(keys)
+        h1, h2 = hashed & np.uint64(0xFFFFFFFF), hashed >> np.uint64(32) | np.uint64(1)
+        rounds = np.arange(self.hashes, dtype=np.uint64)
+        return (h1[:, None] + rounds[None, :] * h2[:, None]) % np.uint64(self.size)
+
+    def might_contain_many(self, keys: list[int]) -> list[bool]:
+        if np is None or not keys:
+            return [self.might_contain(key) for key in keys]
+        positions = self._positions_array(keys)
+        bits = np.frombuffer(self.bits, dtype=np.uint8)
+        found = (bits[positions >> np.uint64(3)] >> (positions & np.uint64(7)).astype(np.uint8)) & 1
+        return found.all(axis=1).tolist()
+
+    def add_many(self, keys: list[int]) -> None:
+        """Add keys known not to be in the filter yet (see ScalableBloomFilter.add_many)."""
+        if np is None:
+            for key in keys:
+                self.add(key)
+            return
+        if not keys:
+            return
+        positions = self._positions_array(keys).ravel()
+        bits = np.frombuffer(self.bits, dtype=np.uint8)
+        masks = np.left_shift(1, (positions & np.uint64(7)).astype(np.uint8)).astype(np.uint8)
+        np.bitwise_or.at(bits, (positions >> np.uint64(3)).astype(np.intp), masks)
+        self.count += len(keys)
+
+    @property
+    def fill_ratio(self) -> float:
+        return int.from_bytes(self.bits, "little").bit_count() / self.size
+
+    def estimated_fp_rate(self) -> float:
+        """False-positive rate at the current fill, as opposed to the sizing target."""
+        return self.fill_ratio**self.hashes
+
+
+class ScalableBloomFilter:
+    """Bloom filter that grows in stages, keeping its overall false-positive rate."""
+
+    GROWTH = 2  # Each stage holds twice as many keys as the previous one...
+    TIGHTENING = 0.5  # ...at half the false-positive rate
+
+    def __init__(self, capacity: int, fp_rate: float):
+        self.fp_rate = fp_rate
+        # The stages' rates form a geometric series summing to at most fp_rate
+        self.stages = [BloomFilter(capacity, fp_rate * (1 - self.TIGHTENING))]
+
+    def add(self, key: int) -> bool:
+        """Add a key. Returns True if it was (probably) there already."""
+        if self.might_contain(key):
+            return True
+        stage = self.stages[-1]
+        if stage.count >= stage.capacity:
+            stage = BloomFilter(stage.capacity * self.GROWTH, stage.fp_rate * self.TIGHTENING)
+            self.stages.append(stage)
+        stage.add(key)
+        return False
+
+    def might_contain(self, key: int) -> bool:
+        return any(stage.might_contain(key) for stage in self.stages)
+
+    def might_contain_many(self, keys: list[int]) -> list[bool]:
+        found = [False] * len(keys)
+        for stage in self.stages:
+            found = [a or b for a, b in zip(found, stage.might_contain_many(keys))]
+        return found
+
+    def add_many(self, keys) -> None:
+        """Add a batch of keys, growing by stages as add() would."""
+        keys = list(dict.fromkeys(keys))
+        keys = [key for key, found in zip(keys, self.might_contain_many(keys)) if not found]
+        while keys:
+            stage = self.stages[-1]
+            if stage.count >= stage.capacity:
+                stage = BloomFilter(stage.capacity * self.GROWTH, stage.fp_rate * self.TIGHTENING)
+                self.stages.append(stage)
+            room = stage.capacity - stage.count
+            stage.add_many(keys[:room])
+            keys = keys[room:]
+
+    def __len__(self) -> int:
+        return sum(stage.count for stage in self.stages)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(len(stage.bits) for stage in self.stages)
+
+    def estimated_fp_rate(self) -> float:
+        """Chance that a never-added key is reported as seen, at the current fill."""
+        miss = 1.0
+        for stage in self.stages:
+            miss *= 1 - stage.estimated_fp_rate()
+        return 1 - miss
@@ -0,0 +1,150 @@
+"""
+HyperLogLog cardinality sketches.
+
+A sketch with 2^p one-byte registers estimates the number of distinct items added
+to it with a relative standard error of about 1.04 / sqrt(2^p), whatever the count:
+
+    p    registers   standard error   ~95% of estimates within
+    10     1 KiB         3.3 %              6.5 %
+    12     4 KiB         1.6 %              3.3 %
+
+Sketches with the same p merge losslessly (register-wise max): the union of the
+sketches of several hours is exactly the sketch of the whole range, so a week's
+unique devices have the same error bound as an hour's. Small counts come out
+almost exact.
+
+Estimates use Ertl's improved estimator ("New cardinality estimation algorithms for
+HyperLogLog sketches", 2017), which stays unbiased across the whole range without
+the empirical bias tables of HyperLogLog++. tests/hyperloglog_tests.py checks the
+error bounds against exact counts.
+"""
+
+import math
+import zlib
+
+DEFAULT_PRECISION = 12
+_MASK64 = (1 << 64) - 1
+
+
+def hash64(value: int) -> int:
+    """
+    Mix an integer (MAC, fingerprint, id) into a uniformly distributed 64-bit hash.
+
+    The splitmix64 finalizer: cheap, and consecutive MACs come out unrelated.
+    """
+    value = (value + 0x9E3779B97F4A7C15) & _MASK64
+    value = ((value ^ (value >> 30)) * 0xBF58476D1CE4E5B9) & _MASK64
+    value = ((value ^ (value >> 27)) * 0x94D049BB133111EB) & _MASK64
+    return value ^ (value >> 31)
+
+
+class HyperLogLog:
+    """Mergeable distinct-count sketch over 64-bit hashes (see hash64())."""
+
+    __slots__ = ("p", "registers")
+
+    def __init__(self, p: int = DEFAULT_PRECISION, registers: bytes | None = None):
+        if not 4 <= p <= 18:
+            raise ValueError(f"HyperLogLog precision must be 4-18, got {p}")
+        self.p = p
+        self.registers = bytearray(registers) if registers is not None else bytearray(1 << p)
+        if len(self.registers) != 1 << p:
+            raise ValueError(f"Expected {1 << p} registers, got {len(self.registers)}")
+
+    @classmethod
+    def from_blob(cls, blob: bytes) -> "HyperLogLog":
+        """Load a sketch stored with to_blob(); p follows from the register count."""
+        registers = zlib.decompress(blob)
+        return cls(len(registers).bit_length() - 1, registers)
+
+    def to_blob(self) -> bytes:
+        """Compressed registers; a sparse sketch (few items) shrinks to a few bytes."""
+        return zlib.compress(self.registers, 1)
+
+    def update(self, hashes) -> bool:
+        """Add many 64-bit hashes. Returns True if the sketch changed."""
+        q = 64 - self.p
+        low = (1 << q) - 1
+        registers = self.registers
+        changed = False
+        for hashed in hashes:
+            index = hashed >> q
+            rank = q + 1 - (hashed & low).bit_length()
+            if rank > registers[index]:
+                registers[index] = rank
+                changed = True
+        return changed
+
+    def merge(self, other: "HyperLogLog") -> None:
+        """Add every item of another sketch with the same precision (in place)."""
+        if other.p != self.p:
+            raise ValueError(f"Cannot merge precision {other.p} into {self.p}")
+        self.registers = HyperLogLog.union([self, other]).registers
+
+    @classmethod
+    def union(cls, sketches, p: int = DEFAULT_PRECISION) -> "HyperLogLog":
+        """One sketch of everything in the given sketches (an empty one if there are none)."""
+        sketches = list(sketches)
+        if not sketches:
+            return cls(p)
+        if any(sketch.p != sketches[0].p for sketch in sketches):
+            raise ValueError("Cannot union sketches of different precisions")
+        # Register-wise max on the registers as one big integer each (SWAR): every
+        # register is < 0x80, so (a | 0x80) - b never borrows across registers and
+        # leaves the high bit set exactly where a >= b
+        size = len(sketches[0].registers)
+        high = int.from_bytes(b"\x80" * size, "big")
+        merged = int.from_bytes(sketches[0].registers, "big")
+        for sketch in sketches[1:]:
+            other = int.from_bytes(sketch.registers, "big")
+            keep = (((merged | high) - other) & high) >> 7
+            keep *= 0xFF
+            merged = (merged & keep) | (other & ~keep)
+        return cls(sketches[0].p, merged.to_bytes(size, "big"))
+
+    @property
+    def relative_error(self) -> float:
+        """Relative standard error of estimate()."""
+        return 1.04 / math.sqrt(1 << self.p)
+
+    def estimate(self) -> float:
+        """Estimated number of distinct hashes added."""
+        m = 1 << self.p
+        q = 64 - self.p
+        counts = [self.registers.count(rank) for rank in range(q + 2)]
+        if counts[0] == m:
+            return 0.0
+        z = m * _tau(1 - counts[q + 1] / m)
+        for rank in range(q, 0, -1):
+            z = 0.5 * (z + counts[rank])
+        z += m * _sigma(counts[0] / m)
+        return m * m / (2 * math.log(2) * z)
+
+    def __len__(self) -> int:
+        return round(self.estimate())
+
+
+def _sigma(x: float) -> float:
+    if x == 1.0:
+        return math.inf
+    y, z = 1.0, x
+    while True:
+        x *= x
+        previous = z
+        z += x * y
+        y += y
+        if z == previous:
+            return z
+
+
+def _tau(x: float) -> float:
+    if x == 0.0 or x == 1.0:
+        return 0.0
+    y, z = 1.0, 1 - x
+    while True:
+        x = math.sqrt(x)
+        previous = z
+        y *= 0.5
+        z -= (1 - x) ** 2 * y
+        if z == previous:
+            return z / 3
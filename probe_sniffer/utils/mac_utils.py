@@ -0,0 +1,35 @@
+"""MAC address helpers for the integer-encoded MAC representation."""
+
+from functools import lru_cache
+
+# Bit 1 of the first octet marks a locally administered (e.g. randomized) address
+LOCAL_ADMIN_BIT = 0x02 << 40
+
+
+def mac_to_int(mac: str) -> int:
+    """Convert 'aa:bb:cc:dd:ee:ff' (any case) to a 48-bit integer.
+
+    Raises:
+        ValueError: If the string is not a MAC address
+    """
+    return int(mac.replace(":", ""), 16)
+
+
+@lru_cache(maxsize=1024)
+def int_to_mac(mac: int) -> str:
+    """Convert a 48-bit integer to lowercase 'aa:bb:cc:dd:ee:ff'.
+
+    Cached because a device's frames arrive in bursts and every output formats it.
+    """
+    h = f"{mac:012x}"
+    return f"{h[0:2]}:{h[2:4]}:{h[4:6]}:{h[6:8]}:{h[8:10]}:{h[10:12]}"
+
+
+def oui_prefix(mac: int) -> int:
+    """Return the 24-bit OUI prefix of an integer MAC."""
+    return mac >> 24
+
+
+def is_locally_administered(mac: int) -> bool:
+    """True if the locally administered bit is set (randomized MACs)."""
+    return bool(mac & LOCAL_ADMIN_BIT)
@@ -0,0 +1,105 @@
+"""
+MinHash signatures and LSH banding for Jaccard similarity of feature sets.
+
+A MinHash signature (Broder, "On the resemblance and containment of documents", 1997)
+keeps, for each of NUM_PERM hash functions, the smallest hash of any feature in the
+set. Two sets agree on a signature position with probability equal to their Jaccard
+similarity, so the share of equal positions estimates it (standard error
+sqrt(J(1-J)/NUM_PERM), under 0.07 at 64 positions).
+
+Locality-sensitive hashing splits the signature into BANDS bands of ROWS positions;
+sets sharing any whole band are candidates. A pair with similarity J shares at least
+one band with probability 1 - (1 - J**ROWS)**BANDS: with 16 bands of 4 rows that is
+over 99.9% at J = 0.8, 64% at 0.5 and 12% at 0.3.
+
+The hash functions are multiply-shift hashes of 64-bit feature hashes, with fixed
+seeds so signatures stay comparable across processes and restarts. Signatures are
+computed with NumPy when the optional numpy dependency is installed.
+"""
+
+import hashlib
+import random
+import struct
+from functools import lru_cache
+
+try:
+    import numpy as np
+except ImportError:  # numpy is optional, signatures are computed in pure Python then
+    np = None
+
+NUM_PERM = 64
+BANDS = 16
+ROWS = NUM_PERM // BANDS
+
+_MASK = (1 << 64) - 1
+_seeds = random.Random(0x5EED)
+_A = [_seeds.getrandbits(64) | 1 for _ in range(NUM_PERM)]  # Odd multipliers
+_B = [_seeds.getrandbits(64) for _ in range(NUM_PERM)]
+_EMPTY = (0xFFFFFFFF,) * NUM_PERM
+_PACK = struct.Struct(f"<{NUM_PERM}I")
+
+
+@lru_cache(maxsize=1 << 16)  # Feature vocabularies are small and hashed over and over
+def feature_hash(feature: str) -> int:
+    """Stable 64-bit hash of a feature (str hashes are salted per process)."""
+    return int.from_bytes(hashlib.blake2b(feature.encode(), digest_size=8).digest(), "little")
+
+
+def signature(features) -> tuple[int, ...]:
+    """MinHash signature of a set of feature strings: NUM_PERM 32-bit minimums."""
+    hashes = [feature_hash(feature) for feature in set(features)]
+    if not hashes:
+        return _EMPTY
+    if np is not None:
+        values = np.array(hashes, dtype=np.uint64)[:, None] * np.array(_A, dtype=np.uint64)
+        values += np.array(_B, dtype=np.uint64)
+        return tuple((values >> np.uint64(32)).min(axis=0).tolist())
+    return tuple(min(((a * value + b) & _MASK) >> 32 for value in hashes) for a, b in zip(_A, _B))
+
+
+def pack(sig: tuple[int, ...]) -> bytes:
+    return _PACK.pack(*sig)
+
+
+def unpack(blob: bytes) -> tuple[int, ...]:
+    return _PACK.unpack(blob)
+
+
+def band_buckets(sig: tuple[int, ...]) -> list[int]:
+    """The LSH bucket of each band, as signed 64-bit integers (SQLite INTEGER)."""
+    blob = pack(sig)
+    width = ROWS * 4
+    return [
+        int.from_bytes(
+            hashlib.blake2b(blob[band * width : (band + 1) * width], digest_size=8).digest(),
+            "little",
+            signed=True,
+        )
+        for band in range(BANDS)
+    ]
+
+
+def estimate(a: tuple[int, ...], b: tuple[int, ...]) -> float:
+    """Estimated Jaccard similarity of the sets behind two signatures."""
+    return sum(x == y for x, y in zip(a, b)) / NUM_PERM
+
+
+def estimate_pairs(signatures: list[tuple[int, ...]], pairs: list[tuple[int, int]]) -> list[float]:
+    """estimate() of many pairs, given as indexes into signatures."""
+    if np is None or not pairs:
+        return [estimate(signatures[a], signatures[b]) for a, b in pairs]
+    matrix = np.array(signatures, dtype=np.uint32)
+    index = np.array(pairs, dtype=np.intp)
+    estimates = []
+    for start in range(0, len(index), 100_000):  # Bounds the temporary arrays
+        chunk = index[start : start + 100_000]
+        equal = matrix[chunk[:, 0]] == matrix[chunk[:, 1]]
+        estimates.extend((equal.sum(axis=1) / NUM_PERM).tolist())
+    return estimates
+
+
+def jaccard(a: set, b: set) -> float:
+    """Exact Jaccard similarity of two sets (1.0 for two empty sets)."""
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
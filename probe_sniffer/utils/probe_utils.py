@@ -2,7 +2,7 @@
 
 import hashlib
 import json
-from scapy.layers.dot11 import Dot11Elt
+from scapy.layers.dot11 import Dot11, Dot11Elt
 
 
 def rssi(radiodata) -> str:
@@ -116,7 +116,17 @@ def binaryrep(firstOctet, scale=16, num_of_bits=8):
     return str(binary[2:].zfill(num_of_bits))
 
 
-def extract_ie_fingerprint(packet) -> tuple[str, list[dict] | None]:
+def get_sequence_number(packet) -> int | None:
+    """
+    802.11 sequence number of a frame (upper 12 bits of Sequence Control), None if absent.
+    """
+    dot11 = packet.getlayer(Dot11)
+    if dot11 is None or dot11.SC is None:
+        return None
+    return dot11.SC >> 4
+
+
+def extract_ie_fingerprint(packet) -> tuple[bytes | None, list[dict] | None]:
     """
     Extract Information Elements from a probe request packet and generate fingerprint.
 
@@ -130,7 +140,7 @@ def extract_ie_fingerprint(packet) -> tuple[str, list[dict] | None]:
 
     Returns:
         Tuple of (fingerprint_hash, ie_data_json) where:
-          - fingerprint_hash: 16-char hex string
+          - fingerprint_hash: 8-byte digest (16 hex chars), None if no stable IEs
           - ie_data_json: List of IE dicts for storage (None if no IEs found)
     """
 
@@ -166,11 +176,11 @@ def extract_ie_fingerprint(packet) -> tuple[str, list[dict] | None]:
 
     # Generate fingerprint from stable IEs
     if not ie_raw:
-        return ("no_stable_ies", None)
+        return (None, None)
 
-    # Sort for consistency, hash, truncate to 16 chars
+    # Sort for consistency, hash, truncate to 8 bytes (16 hex chars)
     fingerprint_data = "|".join(sorted(ie_raw))
-    fingerprint = hashlib.sha256(fingerprint_data.encode()).hexdigest()[:16]
+    fingerprint = hashlib.sha256(fingerprint_data.encode()).digest()[:8]
 
     # Return fingerprint and full IE data (for storage)
     return (fingerprint, ie_list if ie_list else None)
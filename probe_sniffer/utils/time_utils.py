@@ -1,6 +1,7 @@
 """Timestamp utilities for consistent time handling across the app."""
 
-from datetime import datetime, timezone
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
 from zoneinfo import ZoneInfo
 
 # Standard timezones
@@ -54,3 +55,39 @@ def get_log_time() -> str:
     Format: 'YYYY-MM-DD HH:MM:SS'
     """
     return datetime.now(EASTERN).strftime("%Y-%m-%d %H:%M:%S")
+
+
+@lru_cache(maxsize=8)
+def epoch_to_log_time(ts: int) -> str:
+    """Format epoch seconds as Eastern 'YYYY-MM-DD HH:MM:SS' for CSV/MQTT output.
+
+    Cached because bursts of frames share the same second.
+    """
+    return datetime.fromtimestamp(ts, EASTERN).strftime("%Y-%m-%d %H:%M:%S")
+
+
+@lru_cache(maxsize=8)
+def epoch_to_utc_iso(ts: int) -> str:
+    """Format epoch seconds as UTC 'YYYY-MM-DD HH:MM:SS' (DB format)."""
+    return datetime.fromtimestamp(ts, UTC).strftime("%Y-%m-%d %H:%M:%S")
+
+
+def to_epoch(dt: datetime) -> int:
+    """Convert a datetime to epoch seconds. Naive datetimes are taken as UTC (DB convention)."""
+    return int((dt if dt.tzinfo else dt.replace(tzinfo=UTC)).timestamp())
+
+
+@lru_cache(maxsize=64)
+def _eastern_midnight(date) -> int:
+    return int(datetime(date.year, date.month, date.day, tzinfo=EASTERN).timestamp())
+
+
+def eastern_day_start(ts: int) -> int:
+    """Epoch seconds of the Eastern midnight starting the day that contains ts."""
+    return _eastern_midnight(datetime.fromtimestamp(ts, EASTERN).date())
+
+
+def eastern_week_start(ts: int) -> int:
+    """Epoch seconds of the Eastern Monday midnight starting the week that contains ts."""
+    date = datetime.fromtimestamp(ts, EASTERN).date()
+    return _eastern_midnight(date - timedelta(days=date.weekday()))
@@ -0,0 +1,112 @@
+"""
+Streaming top-K (heavy hitters) in bounded memory.
+
+SpaceSaving (Metwally et al., "Efficient computation of frequent and top-k elements
+in data streams", 2005) tracks at most `capacity` keys. A new key replaces the one
+with the lowest count and inherits that count as its possible overcount, so for every
+tracked key count - error <= true count <= count, and every key occurring more than
+total / capacity times is tracked.
+
+SlidingTopK keeps one SpaceSaving summary per time slice of a window and merges the
+live slices when asked, so old traffic drops out a slice at a time and memory stays
+at (slices + 1) * capacity keys.
+"""
+
+import heapq
+from collections import Counter
+
+
+class SpaceSaving:
+    """Approximate counts of the most frequent keys of a stream."""
+
+    __slots__ = ("capacity", "counts", "errors", "_heap")
+
+    def __init__(self, capacity: int):
+        if capacity < 1:
+            raise ValueError(f"capacity must be positive, got {capacity}")
+        self.capacity = capacity
+        self.counts: dict = {}
+        self.errors: dict = {}
+        # (count, key) per tracked key; counts here may be stale (too low) and are only
+        # brought up to date when looking for the key to evict
+        self._heap: list[tuple[int, object]] = []
+
+    def add(self, key, count: int = 1) -> None:
+        counts = self.counts
+        if key in counts:
+            counts[key] += count
+            return
+        if len(counts) < self.capacity:
+            counts[key] = count
+            self.errors[key] = 0
+            heapq.heappush(self._heap, (count, key))
+            return
+
+        heap = self._heap
+        while True:
+            floor, evicted = heap[0]
+            if counts[evicted] == floor:
+                break
+            heapq.heapreplace(heap, (counts[evicted], evicted))
+        heapq.heapreplace(heap, (floor + count, key))
+        del counts[evicted], self.errors[evicted]
+        counts[key] = floor + count
+        self.errors[key] = floor
+
+    def floor(self) -> int:
+        """Most occurrences an untracked key can have had (0 until the summary is full)."""
+        return min(self.counts.values()) if len(self.counts) >= self.capacity else 0
+
+    def top(self, n: int) -> list[tuple[object, int, int]]:
+        """The n highest (key, count, error), highest count first."""
+        items = heapq.nlargest(n, self.counts.items(), key=lambda item: item[1])
+        return [(key, count, self.errors[key]) for key, count in items]
+
+
+class SlidingTopK:
+    """SpaceSaving over a sliding time window, in `slices` steps."""
+
+    def __init__(self, window_seconds: int, slices: int, capacity: int):
+        if window_seconds % slices:
+            raise ValueError("window_seconds must be a multiple of slices")
+        self.window_seconds = window_seconds
+        self.slice_seconds = window_seconds // slices
+        self.capacity = capacity
+        self.slices: dict[int, SpaceSaving] = {}  # Slice start -> summary
+
+    def add(self, key, ts: int, count: int = 1) -> None:
+        start = ts - ts % self.slice_seconds
+        summary = self.slices.get(start)
+        if summary is None:
+            summary = self.slices[start] = SpaceSaving(self.capacity)
+            self._expire(start)
+        summary.add(key, count)
+
+    def _expire(self, now: int) -> None:
+        for start in [start for start in self.slices if not self._live(start, now)]:
+            del self.slices[start]
+
+    def _live(self, start: int, now: int) -> bool:
+        return start + self.slice_seconds > now - self.window_seconds
+
+    def top(self, n: int, now: int) -> list[tuple[object, int, int]]:
+        """
+        The n highest (key, count, error) over the window ending at now.
+
+        The window includes the whole slice it starts in. A key's true count lies
+        within error of count: error adds up each slice's overcount for the key, or
+        the slice's floor where the key wasn't tracked.
+        """
+        live = [summary for start, summary in self.slices.items() if self._live(start, now)]
+        counts, errors = Counter(), Counter()
+        for summary in live:
+            for key, count in summary.counts.items():
+                counts[key] += count
+                errors[key] += summary.errors[key]
+        floors = [(summary, summary.floor()) for summary in live]
+        top = []
+        for key, count in counts.most_common(n):
+            error = errors[key]
+            error += sum(floor for summary, floor in floors if key not in summary.counts)
+            top.append((key, count, error))
+        return top
@@ -0,0 +1,1377 @@
+"""
+Micro-benchmarks for the capture and storage pipeline.
+
+These run against synthetic probes so they can be used on a dev machine or on the Pi
+itself without a monitor-mode adapter.
+
+To run: python -m scripts.benchmark <benchmark> [options]
+"""
+
+import argparse
+import random
+import tempfile
+import time
+import tracemalloc
+from collections import Counter
+from pathlib import Path
+
+from probe_sniffer.models.probe import Probe
+from probe_sniffer.storage import database
+
+SSIDS = ["Undirected Probe", "Red Sox-2.4", "xfinitywifi", "HOME-5G", "Starbucks WiFi"]
+OUIS = ["Locally Assigned", "Apple, Inc.", "Samsung Electronics Co.,Ltd", "Unknown OUI"]
+
+
+def synthetic_probe(rng: random.Random, ts: int, n_devices: int = 500) -> Probe:
+    """Build a plausible probe from a fixed population of devices."""
+    device = rng.randrange(n_devices)
+    return Probe(
+        ts,
+        rng.randint(-90, -30),
+        rng.choice((1, 6, 11)),
+        0x02_00_00_00_00_00 | device,
+        oui=OUIS[device % len(OUIS)],
+        ssid=rng.choice(SSIDS),
+        fingerprint=device.to_bytes(8, "big"),
+    )
+
+
+def run_frame(probe: Probe) -> None:
+    """Per-frame serialization work done by the capture handler."""
+    probe.to_csv()
+    probe.mqtt_json()
+    probe.sighting_params()
+
+
+def bench_alloc(args) -> None:
+    """Measure retained and transient allocations per frame with tracemalloc."""
+    rng = random.Random(0)
+    now = int(time.time())
+
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    kept = [synthetic_probe(rng, now) for _ in range(args.frames)]
+    after = tracemalloc.take_snapshot()
+    retained = sum(stat.size_diff for stat in after.compare_to(before, "filename"))
+    print(f"retained bytes/record:  {retained / args.frames:.1f}")
+
+    # Warm the formatting caches so the peak reflects steady-state frames
+    for probe in kept:
+        run_frame(probe)
+    tracemalloc.reset_peak()
+    base = tracemalloc.get_traced_memory()[0]
+    for probe in kept:
+        run_frame(probe)
+    print(f"peak transient bytes:   {tracemalloc.get_traced_memory()[1] - base}")
+    tracemalloc.stop()
+
+    start = time.perf_counter()
+    for probe in kept:
+        run_frame(probe)
+    elapsed = time.perf_counter() - start
+    print(f"us/frame:               {elapsed / args.frames * 1e6:.2f}")
+
+
+def use_temp_database() -> Path:
+    """Point the storage layer at a fresh database in a temp dir."""
+    database.DB_PATH = Path(tempfile.mkdtemp()) / "bench.db"
+    database.init_database()
+    return database.DB_PATH
+
+
+def bench_batch(args) -> None:
+    """Compare per-frame storage with the vectorized batch pipeline."""
+    from probe_sniffer.capture.batch import ProbeBatch
+    from probe_sniffer.storage.queries import log_sighting, log_sightings_batch
+
+    rng = random.Random(0)
+    now = int(time.time())
+    probes = [synthetic_probe(rng, now + i // 100) for i in range(args.frames)]
+
+    use_temp_database()
+    start = time.perf_counter()
+    for probe in probes:
+        log_sighting(probe)
+    per_frame = time.perf_counter() - start
+    print(f"per-frame: {args.frames / per_frame:>10,.0f} probes/s")
+
+    use_temp_database()
+    batch = ProbeBatch(args.batch_size, {}, set())
+    start = time.perf_counter()
+    for i, probe in enumerate(probes):
+        full = batch.append(
+            probe.ts, probe.mac, probe.dbm, probe.channel, probe.ssid, probe.fingerprint, None
+        )
+        if full or i == len(probes) - 1:
+            result = batch.process()
+            log_sightings_batch(
+                [
+                    (
+                        ts,
+                        mac,
+                        dbm,
+                        batch.ssids[ssid_id],
+                        batch.ouis[oui_id],
+                        f"{fp64:016x}",
+                        channel,
+                    )
+                    for ts, mac, dbm, channel, fp64, oui_id, ssid_id, _seq in result.rows.tolist()
+                ],
+                [(str(mac), str(ts)) for mac, ts in result.devices.tolist()],
+                [(f"{fp:016x}", None, str(ts), n) for fp, ts, n in result.fingerprints.tolist()],
+            )
+    batched = time.perf_counter() - start
+    print(f"batch={args.batch_size}: {args.frames / batched:>10,.0f} probes/s")
+
+
+def _timed(cursor, query: str, params=(), repeat: int = 20) -> float:
+    """Median wall time of a query in milliseconds."""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        cursor.execute(query, params).fetchall()
+        times.append(time.perf_counter() - start)
+    return sorted(times)[len(times) // 2] * 1000
+
+
+def _timed_call(query, repeat: int = 20) -> float:
+    """Median wall time of a storage-layer call in milliseconds."""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        query()
+        times.append(time.perf_counter() - start)
+    return sorted(times)[len(times) // 2] * 1000
+
+
+def _year_of_sightings(rows: int, n_devices: int):
+    """Synthetic sightings spread evenly over the last 365 days."""
+    rng = random.Random(0)
+    end = int(time.time())
+    step = 365 * 86400 / rows
+    for i in range(rows):
+        yield synthetic_probe(rng, int(end - 365 * 86400 + i * step), n_devices)
+
+
+def _compact_database(args) -> Path:
+    """A year of synthetic sightings written through the real (partitioned) write path."""
+    from probe_sniffer.storage.queries import log_sightings_batch
+
+    from probe_sniffer.utils.time_utils import epoch_to_utc_iso
+
+    path = use_temp_database()
+    chunk, devices = [], {}
+    for probe in _year_of_sightings(args.rows, args.devices):
+        chunk.append(probe.sighting_params())
+        devices[probe.mac_str] = epoch_to_utc_iso(probe.ts)
+        if len(chunk) == 10_000:
+            log_sightings_batch(chunk, list(devices.items()), [])
+            chunk, devices = [], {}
+    log_sightings_batch(chunk, list(devices.items()), [])
+    return path
+
+
+def _single_table_copy(path: Path) -> Path:
+    """
+    Copy the sightings of a partitioned database into one unpartitioned sighting_log,
+    registered as the only partition so the storage-layer queries run against it too.
+    """
+    import sqlite3
+
+    from probe_sniffer.storage.schema import SCHEMA, SIGHTING_TABLE
+
+    copy_path = path.with_name("single.db")
+    conn = sqlite3.connect(copy_path)
+    conn.execute("ATTACH DATABASE ? AS src", (str(path),))
+    conn.executescript(SCHEMA + SIGHTING_TABLE.format(table="sighting_log"))
+    conn.execute("INSERT INTO main.ssids SELECT * FROM src.ssids")
+    conn.execute("INSERT INTO main.ouis SELECT * FROM src.ouis")
+    conn.execute(
+        "INSERT INTO main.sighting_partitions VALUES "
+        "('sighting_log', 0, 1 << 40, (SELECT SUM(row_count) FROM src.sighting_partitions))"
+    )
+    partitions = conn.execute("SELECT name FROM src.sighting_partitions ORDER BY start_ts")
+    for (name,) in partitions.fetchall():
+        conn.execute(f"INSERT INTO main.sighting_log SELECT * FROM src.{name}")
+    conn.commit()
+    conn.execute("DETACH DATABASE src")
+    conn.close()
+    return copy_path
+
+
+def bench_schema(args) -> None:
+    """Database size and query time: original text sightings vs compact sighting_log."""
+    import sqlite3
+
+    from probe_sniffer.storage.schema import LEGACY_SIGHTINGS_TABLE
+    from probe_sniffer.utils.time_utils import epoch_to_utc_iso
+
+    # Original layout, built directly from the pre-compaction DDL
+    legacy_path = Path(tempfile.mkdtemp()) / "legacy.db"
+    conn = sqlite3.connect(legacy_path)
+    conn.executescript(
+        LEGACY_SIGHTINGS_TABLE.replace(
+            "FOREIGN KEY (mac) REFERENCES devices(mac)", "CHECK (1)"
+        ).replace("REFERENCES device_identities(identity_id)", "")
+        + "CREATE INDEX idx_sightings_timestamp ON sightings(timestamp);"
+        + "CREATE INDEX idx_sightings_mac ON sightings(mac);"
+        + "CREATE INDEX idx_sightings_fingerprint ON sightings(ie_fingerprint);"
+        + "CREATE INDEX idx_sightings_identity ON sightings(identity_id);"
+    )
+    conn.executemany(
+        "INSERT INTO sightings (timestamp, mac, rssi, dbm, ssid, oui, ie_fingerprint) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?)",
+        (
+            (
+                epoch_to_utc_iso(p.ts),
+                p.mac_str,
+                f"{p.dbm} dBm",
+                p.dbm,
+                p.ssid,
+                p.oui,
+                p.fingerprint_hex,
+            )
+            for p in _year_of_sightings(args.rows, args.devices)
+        ),
+    )
+    conn.commit()
+    conn.close()
+
+    # Compact layout through the real write path, copied into one unpartitioned table
+    compact_path = _single_table_copy(_compact_database(args))
+
+    mac = "02:00:00:00:00:07"
+    day_start = int(time.time()) - 30 * 86400
+    queries = {
+        "sightings for one MAC": (
+            "SELECT * FROM sightings WHERE mac = ? ORDER BY timestamp DESC LIMIT 100",
+            (mac,),
+            "SELECT * FROM sighting_log WHERE mac = ? ORDER BY ts DESC LIMIT 100",
+            (int(mac.replace(":", ""), 16),),
+        ),
+        "100 most recent": (
+            "SELECT * FROM sightings ORDER BY timestamp DESC LIMIT 100",
+            (),
+            "SELECT * FROM sighting_log ORDER BY ts DESC LIMIT 100",
+            (),
+        ),
+        "count for one day": (
+            "SELECT COUNT(*) FROM sightings WHERE timestamp BETWEEN ? AND ?",
+            (epoch_to_utc_iso(day_start), epoch_to_utc_iso(day_start + 86400)),
+            "SELECT COUNT(*) FROM sighting_log WHERE ts BETWEEN ? AND ?",
+            (day_start, day_start + 86400),
+        ),
+        "distinct SSIDs for one MAC": (
+            "SELECT DISTINCT ssid FROM sightings WHERE mac = ?",
+            (mac,),
+            "SELECT DISTINCT ssid_id FROM sighting_log WHERE mac = ?",
+            (int(mac.replace(":", ""), 16),),
+        ),
+    }
+
+    legacy = sqlite3.connect(legacy_path)
+    compact = sqlite3.connect(compact_path)
+    print(f"{args.rows:,} sightings over 365 days, {args.devices} devices")
+    print(f"{'':32} {'text':>10} {'compact':>10}")
+    print(
+        f"{'database size (MB)':32} {legacy_path.stat().st_size / 1e6:>10.1f} "
+        f"{compact_path.stat().st_size / 1e6:>10.1f}"
+    )
+    for name, (legacy_sql, legacy_params, compact_sql, compact_params) in queries.items():
+        print(
+            f"{name + ' (ms)':32} {_timed(legacy, legacy_sql, legacy_params):>10.2f} "
+            f"{_timed(compact, compact_sql, compact_params):>10.2f}"
+        )
+
+
+def bench_partitions(args) -> None:
+    """Query and retention cost: one sighting_log table vs monthly partitions."""
+    import sqlite3
+
+    from probe_sniffer.storage.queries import get_recent_sightings, get_sightings
+
+    partitioned_path = _compact_database(args)
+    single_path = _single_table_copy(partitioned_path)
+
+    day_start = int(time.time()) - 30 * 86400
+    week_start = int(time.time()) - 7 * 86400
+    queries = {
+        "one day, first page": lambda: get_sightings(since=day_start, until=day_start + 86400),
+        "last 7 days, page 50": lambda: get_sightings(since=week_start, offset=4900),
+        "100 most recent": lambda: get_recent_sightings(100),
+        "one MAC, first page": lambda: get_sightings(mac="02:00:00:00:00:07"),
+    }
+
+    print(f"{args.rows:,} sightings over 365 days, {args.devices} devices")
+    print(f"{'':32} {'single':>10} {'monthly':>10}")
+    for name, query in queries.items():
+        database.DB_PATH = single_path
+        single = _timed_call(query)
+        database.DB_PATH = partitioned_path
+        print(f"{name + ' (ms)':32} {single:>10.2f} {_timed_call(query):>10.2f}")
+
+    # Retention: delete the rows older than 6 months vs drop the expired partitions
+    with database.get_cursor() as cursor:
+        cursor.execute(
+            "SELECT MIN(start_ts) FROM sighting_partitions WHERE end_ts > strftime('%s', 'now', "
+            "'start of month', '-6 months')"
+        )
+        cutoff = cursor.fetchone()[0]
+    conn = sqlite3.connect(single_path)
+    start = time.perf_counter()
+    conn.execute("DELETE FROM sighting_log WHERE ts < ?", (cutoff,))
+    conn.commit()
+    deleted = time.perf_counter() - start
+    conn.close()
+
+    start = time.perf_counter()
+    dropped = database.drop_expired_partitions(6)
+    dropped_time = time.perf_counter() - start
+    print(f"{'retention, 6 months (ms)':32} {deleted * 1000:>10.1f} {dropped_time * 1000:>10.1f}")
+    print(f"dropped partitions: {', '.join(dropped)}")
+
+
+def bench_devices(args) -> None:
+    """Device endpoints: per-device sighting aggregation vs the device_summary join."""
+    from probe_sniffer.storage.queries import (
+        get_all_devices,
+        get_device_sighting_stats,
+        get_device_summaries,
+        get_device_summary,
+    )
+
+    database.DB_PATH = _compact_database(args)
+    mac = "02:00:00:00:00:07"
+
+    def list_per_device():
+        devices = get_all_devices()
+        for device in devices:
+            device.update(get_device_sighting_stats(device["mac"]))
+        return devices
+
+    queries = {
+        "list all devices": (list_per_device, lambda: get_device_summaries()),
+        "first page by sightings": (
+            lambda: sorted(list_per_device(), key=lambda d: -d["total_sightings"])[:50],
+            lambda: get_device_summaries(sort="total_sightings", limit=50),
+        ),
+        "one device": (
+            lambda: get_device_sighting_stats(mac),
+            lambda: get_device_summary(mac),
+        ),
+    }
+
+    print(f"{args.rows:,} sightings over 365 days, {args.devices} devices")
+    print(f"{'':32} {'aggregate':>10} {'summary':>10}")
+    for name, (aggregate, summary) in queries.items():
+        print(
+            f"{name + ' (ms)':32} {_timed_call(aggregate, repeat=1):>10.1f} "
+            f"{_timed_call(summary):>10.1f}"
+        )
+
+
+def bench_overview(args) -> None:
+    """/stats/overview: aggregating the sightings per request vs the ingest-time counters."""
+    from probe_sniffer.storage.queries import get_overview_stats
+    from probe_sniffer.utils.time_utils import (
+        eastern_day_start,
+        eastern_week_start,
+        epoch_to_utc_iso,
+    )
+
+    def aggregate(now: int) -> dict:
+        with database.get_cursor() as cursor:
+            periods = [
+                cursor.execute(
+                    "SELECT COUNT(*), COUNT(DISTINCT mac) FROM sightings WHERE timestamp >= ?",
+                    (epoch_to_utc_iso(start),),
+                ).fetchone()
+                for start in (eastern_day_start(now), eastern_week_start(now))
+            ]
+            cursor.execute("SELECT COUNT(*) FROM sightings").fetchone()
+            cursor.execute(
+                "SELECT oui, COUNT(DISTINCT mac) AS n FROM sightings GROUP BY oui "
+                "ORDER BY n DESC LIMIT 5"
+            ).fetchall()
+            cursor.execute(
+                "SELECT ssid, COUNT(*) AS n FROM sightings GROUP BY ssid ORDER BY n DESC LIMIT 5"
+            ).fetchall()
+            cursor.execute(
+                "SELECT strftime('%H', timestamp), COUNT(*) FROM sightings "
+                "WHERE timestamp >= ? GROUP BY 1",
+                (epoch_to_utc_iso(now - 86400),),
+            ).fetchall()
+            return {"periods": periods}
+
+    print(f"{'sightings':>10} {'aggregate (ms)':>15} {'counters (ms)':>14}")
+    for rows in (args.rows // 10, args.rows):
+        database.DB_PATH = _compact_database(argparse.Namespace(rows=rows, devices=args.devices))
+        now = int(time.time())
+        print(
+            f"{rows:>10,} {_timed_call(lambda: aggregate(now), repeat=3):>15.1f} "
+            f"{_timed_call(lambda: get_overview_stats(now)):>14.2f}"
+        )
+
+
+def bench_shedding(args) -> None:
+    """Storing a busy stream of known devices at each load-shedding level."""
+    from probe_sniffer.capture.shedding import LoadShedder
+    from probe_sniffer.storage.queries import log_sightings_batch
+    from probe_sniffer.utils.time_utils import epoch_to_utc_iso
+
+    rng = random.Random(0)
+    start = int(time.time()) - 3600
+    # Ten minutes of the same devices probing every few seconds
+    stream = sorted(
+        (
+            synthetic_probe(rng, start + rng.randrange(600), args.devices).sighting_params()
+            for _ in range(args.frames)
+        ),
+        key=lambda row: row[0],
+    )
+    print(f"{len(stream):,} sightings of {args.devices} devices over 10 minutes")
+    print(f"{'level':>5} {'written':>8} {'seconds':>8}")
+    for level in (0, 1, 3, 6):
+        use_temp_database()
+        shedder = LoadShedder()
+        began = time.perf_counter()
+        written = 0
+        for i in range(0, len(stream), args.batch_size):
+            rows = stream[i : i + args.batch_size]
+            devices = {f"{row[1]:012x}": epoch_to_utc_iso(row[0]) for row in rows}
+            rows, shed = shedder.filter(rows)
+            shedder.level = level  # The first batch makes the devices known
+            written += len(rows)
+            log_sightings_batch(rows, list(devices.items()), [], shed)
+        print(f"{level:>5} {written:>8,} {time.perf_counter() - began:>8.2f}")
+
+
+def bench_uniques(args) -> None:
+    """Unique MACs per range: COUNT(DISTINCT) over the sightings vs HyperLogLog sketch unions."""
+    from probe_sniffer.storage.queries import get_unique_counts
+    from probe_sniffer.utils.time_utils import epoch_to_utc_iso
+
+    database.DB_PATH = _compact_database(args)
+    now = int(time.time())
+    now -= now % 3600
+
+    def exact(since: int) -> int:
+        with database.get_cursor() as cursor:
+            cursor.execute(
+                "SELECT COUNT(DISTINCT mac) FROM sightings WHERE timestamp >= ?",
+                (epoch_to_utc_iso(since),),
+            )
+            return cursor.fetchone()[0]
+
+    print(f"{args.rows:,} sightings over 365 days, {args.devices} devices")
+    print(f"{'range':10} {'exact':>8} {'estimate':>9} {'distinct (ms)':>14} {'sketch (ms)':>12}")
+    for name, days in (("day", 1), ("week", 7), ("month", 30), ("year", 365)):
+        since = now - days * 86400
+        estimate = get_unique_counts("mac", since, now)["total"]["estimate"]
+        print(
+            f"{name:10} {exact(since):>8} {estimate:>9} "
+            f"{_timed_call(lambda: exact(since), repeat=3):>14.1f} "
+            f"{_timed_call(lambda: get_unique_counts('mac', since, now)):>12.2f}"
+        )
+
+
+def bench_similar(args) -> None:
+    """Similar-fingerprint queries and merge proposals over --fingerprints fingerprints."""
+    from probe_sniffer.storage.queries import log_sightings_batch
+    from probe_sniffer.storage.similarity import find_similar_fingerprints, propose_identity_merges
+
+    def ies(caps: bytes, rates: bytes, extra: bool) -> list[dict]:
+        elements = [(1, rates), (45, caps[:26]), (127, caps[26:34]), (191, caps[34:])]
+        if extra:
+            elements.append((70, b"\x70\x00\x00\x00\x00"))
+        return [{"id": ie_id, "len": len(data), "data": data.hex()} for ie_id, data in elements]
+
+    # Device models with random capabilities; each drifts into a few fingerprints by
+    # flipping capability bits or adding an IE
+    rng = random.Random(0)
+    use_temp_database()
+    variants = 4
+    fingerprints, start = [], time.perf_counter()
+    for model in range(args.fingerprints // variants):
+        caps = bytearray(rng.randbytes(46))
+        rates = rng.randbytes(rng.randint(4, 8))
+        for variant in range(variants):
+            if variant:
+                bit = rng.randrange(len(caps) * 8)
+                caps[bit // 8] ^= 1 << bit % 8
+            fingerprint_id = f"{model * variants + variant:016x}"
+            fingerprints.append((fingerprint_id, ies(caps, rates, variant == 3), "2026-01-01", 1))
+        if len(fingerprints) >= 10_000:
+            log_sightings_batch([], [], fingerprints)
+            fingerprints = []
+    log_sightings_batch([], [], fingerprints)
+    elapsed = time.perf_counter() - start
+    print(
+        f"indexed {args.fingerprints:,} fingerprints: {elapsed / args.fingerprints * 1e6:.0f} us each"
+    )
+
+    queries = [f"{rng.randrange(args.fingerprints):016x}" for _ in range(50)]
+    times, found = [], 0
+    for fingerprint_id in queries:
+        began = time.perf_counter()
+        similar = find_similar_fingerprints(fingerprint_id, min_similarity=0.8)
+        times.append(time.perf_counter() - began)
+        model = int(fingerprint_id, 16) // variants
+        found += sum(int(row["fingerprint_id"], 16) // variants == model for row in similar)
+    times.sort()
+    print(
+        f"similar: median {times[len(times) // 2] * 1000:.1f} ms, max {times[-1] * 1000:.1f} ms, "
+        f"found {found / (len(queries) * (variants - 1)):.1%} of same-model fingerprints"
+    )
+
+    began = time.perf_counter()
+    proposals = propose_identity_merges()
+    grouped = sum(len(proposal["fingerprints"]) for proposal in proposals)
+    print(
+        f"merge proposals: {len(proposals):,} groups covering {grouped / args.fingerprints:.1%} "
+        f"of fingerprints in {time.perf_counter() - began:.1f} s"
+    )
+
+
+def bench_topk(args) -> None:
+    """Top SSIDs of the last 24 hours: GROUP BY over the sightings vs the streaming top-K."""
+    from probe_sniffer.heavy_hitters import HeavyHitters
+    from probe_sniffer.storage.queries import log_sightings_batch
+    from probe_sniffer.utils.time_utils import epoch_to_utc_iso
+
+    use_temp_database()
+    rng = random.Random(0)
+    names = [f"Network {rank}" for rank in range(5_000)]
+    weights = [1 / (rank + 1) for rank in range(len(names))]
+    now = int(time.time())
+    sightings = []
+    for i, ssid in enumerate(rng.choices(names, weights, k=args.rows)):
+        device = rng.randrange(args.devices)
+        ts = now - 86400 + i * 86400 // args.rows
+        sightings.append(
+            (ts, 0x020000000000 | device, -60, ssid, OUIS[device % len(OUIS)], f"{device:016x}", 6)
+        )
+
+    tracker = HeavyHitters()
+    start = time.perf_counter()
+    for i in range(0, len(sightings), args.batch_size):
+        tracker.add_sightings(sightings[i : i + args.batch_size])
+    per_probe = (time.perf_counter() - start) / len(sightings) * 1e6
+    for i in range(0, len(sightings), 10_000):
+        chunk = sightings[i : i + 10_000]
+        devices = {f"{row[1]:012x}": epoch_to_utc_iso(row[0]) for row in chunk}
+        log_sightings_batch(chunk, list(devices.items()), [])
+
+    def group_by():
+        with database.get_cursor() as cursor:
+            cursor.execute(
+                "SELECT ssid, COUNT(*) AS n FROM sightings WHERE timestamp >= ? "
+                "GROUP BY ssid ORDER BY n DESC LIMIT 10",
+                (epoch_to_utc_iso(now - 86400),),
+            )
+            return [(row["ssid"], row["n"]) for row in cursor.fetchall()]
+
+    exact = group_by()
+    approx = tracker.top("ssid", "24h", 10, now)
+    print(f"{args.rows:,} sightings over 24 hours, {len(names)} SSIDs (Zipf)")
+    print(f"tracker:  {per_probe:.2f} us per probe, in batches of {args.batch_size}")
+    print(f"GROUP BY: {_timed_call(group_by, repeat=3):.1f} ms")
+    print(f"top-K:    {_timed_call(lambda: tracker.top('ssid', '24h', 10, now)):.2f} ms")
+    print(f"same top 10: {[key for key, _ in exact] == [key for key, *_ in approx]}")
+    print(f"largest error bound: {max(error for *_, error in approx)}")
+
+
+def bench_pages(args) -> None:
+    """Page 1 vs page 1000 of /sightings: OFFSET + COUNT(*) vs keyset cursors."""
+    from probe_sniffer.storage.queries import get_sightings, get_sightings_page
+
+    database.DB_PATH = _compact_database(args)
+    limit = 100
+
+    # Walk to page 1000 once to get its cursor
+    token = None
+    for _ in range(999):
+        token = get_sightings_page(limit=limit, cursor_token=token)["next_cursor"]
+    mac = "02:00:00:00:00:07"
+    mac_token = None
+    for _ in range(9):
+        mac_token = get_sightings_page(mac=mac, limit=limit, cursor_token=mac_token)["next_cursor"]
+
+    queries = {
+        "page 1": (
+            lambda: get_sightings(limit=limit),
+            lambda: get_sightings_page(limit=limit),
+        ),
+        "page 1000": (
+            lambda: get_sightings(limit=limit, offset=999 * limit),
+            lambda: get_sightings_page(limit=limit, cursor_token=token),
+        ),
+        "one MAC, page 10": (
+            lambda: get_sightings(mac=mac, limit=limit, offset=9 * limit),
+            lambda: get_sightings_page(mac=mac, limit=limit, cursor_token=mac_token),
+        ),
+    }
+
+    print(f"{args.rows:,} sightings over 365 days, {args.devices} devices, {limit} per page")
+    print(f"{'':32} {'offset':>10} {'keyset':>10}")
+    for name, (offset_page, keyset_page) in queries.items():
+        print(
+            f"{name + ' (ms)':32} {_timed_call(offset_page, repeat=5):>10.2f} "
+            f"{_timed_call(keyset_page):>10.2f}"
+        )
+
+
+def bench_export(args) -> None:
+    """/sightings/export throughput (rows/s) and peak memory per format."""
+    from probe_sniffer.api import export
+    from probe_sniffer.storage.queries import iter_sightings
+
+    database.DB_PATH = _compact_database(args)
+    formats = [f for f in export.EXPORT_FORMATS if export.pa or f not in export.ARROW_FORMATS]
+
+    print(f"{args.rows:,} sightings over 365 days, {args.devices} devices")
+    print(f"{'format':10} {'rows/s':>12} {'MB':>10} {'peak MB':>10}")
+    for export_format in formats:
+        start = time.perf_counter()
+        size = sum(len(chunk) for chunk in export.encode(export_format, iter_sightings()))
+        elapsed = time.perf_counter() - start
+
+        # Peak memory on a separate pass, tracemalloc slows the encoders down
+        tracemalloc.start()
+        for _ in export.encode(export_format, iter_sightings()):
+            pass
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        print(
+            f"{export_format:10} {args.rows / elapsed:>12,.0f} {size / 1e6:>10.1f} "
+            f"{peak / 1e6:>10.1f}"
+        )
+
+
+def bench_seen(args) -> None:
+    """New-device checks for a batch of MACs: device_summary lookups vs the Bloom prefilter."""
+    from probe_sniffer.storage.seen import forget_filters, seen_filters
+    from probe_sniffer.utils.mac_utils import int_to_mac
+
+    database.DB_PATH = _compact_database(args)
+    rng = random.Random(1)
+    with database.get_cursor() as cursor:
+        cursor.execute("SELECT mac FROM device_summary")
+        known = [row[0] for row in cursor.fetchall()]
+    forget_filters()  # Built while the database was written; time a build from scratch
+    began = time.perf_counter()
+    seen = seen_filters()
+    build = time.perf_counter() - began
+
+    def lookup(macs):
+        with database.get_cursor() as cursor:
+            for start in range(0, len(macs), 500):
+                chunk = [int_to_mac(mac) for mac in macs[start : start + 500]]
+                cursor.execute(
+                    f"SELECT mac, last_ts FROM device_summary WHERE mac IN "
+                    f"({', '.join('?' * len(chunk))})",
+                    chunk,
+                )
+                cursor.fetchall()
+
+    print(f"{len(known):,} known devices; filters built in {build * 1000:.0f} ms: {seen.report()}")
+    print(f"{'new MACs':>8} {'lookup (ms)':>12} {'filter + lookup (ms)':>21}")
+    for new_share in (0.0, 0.5, 0.9):
+        macs = [
+            (
+                0x020000000000 | rng.getrandbits(40)
+                if rng.random() < new_share
+                else int(rng.choice(known).replace(":", ""), 16)
+            )
+            for _ in range(args.batch_size)
+        ]
+
+        def filtered():
+            unseen = seen.unseen_macs(macs)
+            lookup([mac for mac in macs if mac not in unseen])
+
+        print(
+            f"{new_share:>8.0%} {_timed_call(lambda: lookup(macs)):>12.2f} "
+            f"{_timed_call(filtered):>21.2f}"
+        )
+
+
+def bench_serialize(args) -> None:
+    """Per-endpoint response serialization: response_model vs the trusted fast path."""
+    import json
+
+    from pydantic import TypeAdapter
+
+    from probe_sniffer.api import encoding
+    from probe_sniffer.api.schemas import Device, Sighting, SightingsResponse, Visit
+    from probe_sniffer.storage.queries import (
+        get_device_summaries,
+        get_recent_sightings,
+        get_sightings_page,
+        get_visits,
+    )
+
+    database.DB_PATH = _compact_database(args)
+    page = {**get_sightings_page(limit=1000), "limit": 1000, "offset": 0}
+    endpoints = {
+        f"/devices ({args.devices})": (list[Device], Device, get_device_summaries()[0]),
+        "/sightings?limit=1000": (SightingsResponse, SightingsResponse, page),
+        "/sightings/recent?limit=500": (
+            list[Sighting],
+            Sighting,
+            get_recent_sightings(limit=500),
+        ),
+        "/visits?limit=1000": (list[Visit], Visit, get_visits(limit=1000)),
+    }
+
+    def response_model(model, content) -> bytes:
+        # What FastAPI does with a response_model: validate, dump to JSON types, json.dumps
+        adapter = TypeAdapter(model)
+        data = adapter.dump_python(adapter.validate_python(content), mode="json")
+        return json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode()
+
+    def fast_path(model, content, use_orjson: bool) -> bytes:
+        original = encoding.orjson
+        encoding.orjson = original if use_orjson else None
+        try:
+            return encoding.dumps(encoding.shape(model, content))
+        finally:
+            encoding.orjson = original
+
+    print(f"{args.rows:,} sightings over 365 days, {args.devices} devices")
+    print(
+        f"{'endpoint (ms)':30} {'response_model':>15} {'trusted+json':>13} "
+        f"{'trusted+orjson':>15} {'kB':>8} {'gzip kB':>8} {'gzip ms':>8} "
+        f"{'zstd kB':>8} {'zstd ms':>8}"
+    )
+    for name, (response_model_type, item_model, content) in endpoints.items():
+        body = fast_path(item_model, content, encoding.orjson is not None)
+        gzip_ms = _timed_call(lambda: encoding.compress(body, "gzip"))
+        columns = [
+            _timed_call(lambda: response_model(response_model_type, content)),
+            _timed_call(lambda: fast_path(item_model, content, False)),
+        ]
+        columns.append(
+            _timed_call(lambda: fast_path(item_model, content, True))
+            if encoding.orjson
+            else float("nan")
+        )
+        if encoding.zstandard is not None:
+            zstd_kb = len(encoding.compress(body, "zstd")) / 1e3
+            zstd_ms = _timed_call(lambda: encoding.compress(body, "zstd"))
+        else:
+            zstd_kb = zstd_ms = float("nan")
+        print(
+            f"{name:30} {columns[0]:>15.2f} {columns[1]:>13.2f} {columns[2]:>15.2f} "
+            f"{len(body) / 1e3:>8.1f} {len(encoding.compress(body, 'gzip')) / 1e3:>8.1f} "
+            f"{gzip_ms:>8.2f} {zstd_kb:>8.1f} {zstd_ms:>8.2f}"
+        )
+
+
+def bench_live(args) -> None:
+    """/ws/probes: sniffer-side cost per probe and hub fan-out cost per client count."""
+    from probe_sniffer import ipc
+    from probe_sniffer.api import live
+    from probe_sniffer.api.schemas import LiveFilter
+
+    rng = random.Random(0)
+    now = int(time.time())
+    probes = [synthetic_probe(rng, now) for _ in range(args.frames)]
+
+    # What the capture handler pays to hand probes to the IPC channel's buffer
+    channel = ipc.IpcClient(path="/nonexistent")
+    start = time.perf_counter()
+    for probe in probes:
+        channel.publish_probes([probe.live_json()])
+    per_frame = (time.perf_counter() - start) / args.frames * 1e6
+    payloads = [probe.live_json() for probe in probes]
+    start = time.perf_counter()
+    for i in range(0, len(payloads), args.batch_size):
+        channel.publish_probes(payloads[i : i + args.batch_size])
+    per_batch = (time.perf_counter() - start) / args.frames * 1e6
+    print(f"sniffer us/probe:  per-frame {per_frame:.2f}, batched {per_batch:.2f}")
+
+    # Hub work per probe as clients are added; half filter on dBm, a quarter on OUI
+    print(f"{'clients':>8} {'us/probe':>10} {'queued/probe':>14}")
+    for clients in (0, 1, 10, 50, 100):
+        hub = live.ProbeHub()
+        for i in range(clients):
+            hub.subscribe(
+                LiveFilter(min_dbm=-60 if i % 2 else None, oui=OUIS[1] if i % 4 == 1 else None)
+            )
+        start = time.perf_counter()
+        for payload in payloads:
+            hub.publish(payload)
+        elapsed = time.perf_counter() - start
+        queued = sum(s.dropped + len(s.backlog) for s in hub.subscriptions) / args.frames
+        print(f"{clients:>8} {elapsed / args.frames * 1e6:>10.2f} {queued:>14.1f}")
+
+
+def _percentile(samples: list[float], p: float) -> float:
+    if not samples:
+        return float("nan")
+    return sorted(samples)[min(len(samples) - 1, int(len(samples) * p))]
+
+
+def bench_ipc(args) -> None:
+    """Sniffer -> API notifications: HTTP POST /internal/notify vs the Unix socket channel."""
+    import asyncio
+    import json
+    import threading
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    import requests
+
+    from probe_sniffer import ipc
+    from probe_sniffer.api.ipc_server import IpcServer
+    from probe_sniffer.api.schemas import NotifyRequest
+
+    fingerprint = {"fingerprint_id": "0123456789abcdef", "alias": None, "sighting_count": 42}
+    probe_data = {"mac": "02:00:00:00:00:aa", "dbm": -60, "ssid": "HOME-5G", "oui": OUIS[0]}
+    message = {"fingerprint": fingerprint, "probe_data": probe_data, "notification_type": "new"}
+    n = args.frames // 10
+    received = []
+
+    # Baseline: what the sniffer used to do, one requests.post per notification.
+    # A stdlib server with the same pydantic parsing stands in for uvicorn + FastAPI.
+    class NotifyHandler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers["Content-Length"]))
+            received.append(NotifyRequest.model_validate_json(body))
+            reply = b'{"status":"sent"}'
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(reply)))
+            self.end_headers()
+            self.wfile.write(reply)
+
+        def log_message(self, *args):
+            pass
+
+    http = ThreadingHTTPServer(("127.0.0.1", 0), NotifyHandler)
+    threading.Thread(target=http.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{http.server_address[1]}/internal/notify"
+    latencies = []
+    start = time.perf_counter()
+    for _ in range(n):
+        sent = time.perf_counter()
+        requests.post(url, json=message, timeout=5).raise_for_status()
+        latencies.append((time.perf_counter() - sent) * 1e3)
+    http_rate = n / (time.perf_counter() - start)
+    http.shutdown()
+    results = {"http": (latencies, latencies, http_rate)}
+
+    # Channel: round trips via PING/PONG, throughput as NOTIFY frames parsed by the API
+    path = str(Path(tempfile.mkdtemp()) / "ipc.sock")
+    server = IpcServer(path)
+    server.on(
+        ipc.NOTIFY, lambda payload: received.append(NotifyRequest.model_validate_json(payload))
+    )
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_forever, daemon=True).start()
+    asyncio.run_coroutine_threadsafe(server.start(), loop).result()
+    client = ipc.IpcClient(path, buffer_frames=n).start()
+    client.connected.wait(5)
+
+    pong = threading.Event()
+    client.on(ipc.PONG, lambda payload: pong.set())
+    latencies, enqueue = [], []
+    for _ in range(n):
+        pong.clear()
+        sent = time.perf_counter()
+        client.send(ipc.PING, b"")
+        pong.wait(5)
+        latencies.append((time.perf_counter() - sent) * 1e3)
+
+    received.clear()
+    start = time.perf_counter()
+    for _ in range(n):
+        sent = time.perf_counter()
+        client.notify(fingerprint, probe_data, "new")
+        enqueue.append((time.perf_counter() - sent) * 1e3)
+    while len(received) < n:
+        time.sleep(0.001)
+    ipc_rate = n / (time.perf_counter() - start)
+    results["ipc"] = (latencies, enqueue, ipc_rate)
+    client.close()
+    asyncio.run_coroutine_threadsafe(server.close(), loop).result()
+
+    print(f"{n:,} notifications of {len(json.dumps(message))} bytes")
+    print(
+        f"{'transport':10} {'rtt p50 ms':>11} {'rtt p99 ms':>11} {'caller p99 ms':>14} "
+        f"{'notify/s':>10}"
+    )
+    for name, (rtt, caller, rate) in results.items():
+        print(
+            f"{name:10} {_percentile(rtt, 0.5):>11.3f} {_percentile(rtt, 0.99):>11.3f} "
+            f"{_percentile(caller, 0.99):>14.4f} {rate:>10,.0f}"
+        )
+
+
+def bench_flood(args) -> None:
+    """Ten seconds of a 2000/s probe flood: storage time with and without flood shedding."""
+    from probe_sniffer.capture.flood import SHED, FloodDetector
+    from probe_sniffer.storage.queries import log_sightings_batch
+    from probe_sniffer.utils.time_utils import epoch_to_utc_iso
+
+    rng = random.Random(0)
+    start = int(time.time()) - 600
+    stream = [synthetic_probe(rng, start + i // 3).sighting_params() for i in range(1500)]
+    for second in range(start + 500, start + 510):
+        stream.extend(synthetic_probe(rng, second).sighting_params() for _ in range(5))
+        stream.extend(
+            (
+                second,
+                0x020000000000 | rng.getrandbits(40),
+                -40,
+                "Undirected Probe",
+                "Locally Assigned",
+                f"{rng.getrandbits(64):016x}",
+                1,
+            )
+            for _ in range(2000)
+        )
+
+    detector = FloodDetector()
+    began = time.perf_counter()
+    kept = [row for row in stream if detector.check(row[0], row[1], row[4], row[5], row[6]) != SHED]
+    per_probe = (time.perf_counter() - began) / len(stream) * 1e6
+
+    def store(rows) -> float:
+        use_temp_database()
+        began = time.perf_counter()
+        for i in range(0, len(rows), args.batch_size):
+            chunk = rows[i : i + args.batch_size]
+            devices = {f"{row[1]:012x}": epoch_to_utc_iso(row[0]) for row in chunk}
+            log_sightings_batch(chunk, list(devices.items()), [])
+        return time.perf_counter() - began
+
+    print(f"{len(stream):,} probes, {len(stream) - len(kept):,} shed")
+    print(f"detector:      {per_probe:.2f} us per probe")
+    print(f"store all:     {store(stream):.2f} s")
+    print(f"store kept:    {store(kept):.2f} s")
+
+
+def bench_load(args) -> None:
+    """API read latency (p50/p99) under concurrent clients while the sniffer writes."""
+    import asyncio
+    import sqlite3
+    import threading
+
+    from probe_sniffer.storage.aio import AsyncStorage, StorageBusy
+    from probe_sniffer.storage.queries import (
+        get_device_summary,
+        get_recent_sightings,
+        get_sightings_page,
+        log_sightings_batch,
+    )
+
+    database.DB_PATH = _compact_database(args)
+    reads = [
+        lambda: get_sightings_page(limit=100),
+        lambda: get_sightings_page(limit=100, mac="02:00:00:00:00:07"),
+        lambda: get_device_summary("02:00:00:00:00:07"),
+        lambda: get_recent_sightings(limit=50),
+    ]
+
+    def sniffer(stop: threading.Event, written: list, failed: list):
+        # 100-probe batches every 50 ms, as the batch pipeline flushes under load
+        rng = random.Random(1)
+        while not stop.is_set():
+            now = int(time.time())
+            batch = [synthetic_probe(rng, now, args.devices).sighting_params() for _ in range(100)]
+            try:
+                log_sightings_batch(batch, [], [])
+                written.append(len(batch))
+            except sqlite3.OperationalError:
+                failed.append(len(batch))
+            stop.wait(0.05)
+
+    async def client(storage, deadline: float, latencies: list, errors: list):
+        rng = random.Random()
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            try:
+                if storage is None:
+                    # What the routes did before: the query blocks the event loop
+                    rng.choice(reads)()
+                    await asyncio.sleep(0)
+                else:
+                    await storage.read(rng.choice(reads))
+                latencies.append((time.perf_counter() - start) * 1e3)
+            except StorageBusy:
+                errors.append(1)
+
+    async def load(storage, latencies: list, errors: list):
+        deadline = time.perf_counter() + args.seconds
+        await asyncio.gather(
+            *(client(storage, deadline, latencies, errors) for _ in range(args.clients))
+        )
+
+    print(f"{args.rows:,} sightings, {args.clients} clients for {args.seconds}s each")
+    print(
+        f"{'reads':8} {'reads/s':>9} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>8} "
+        f"{'busy':>6} {'writes/s':>9} {'lost':>6}"
+    )
+    for mode, storage in (("on loop", None), ("facade", AsyncStorage())):
+        stop, written, failed, latencies, errors = threading.Event(), [], [], [], []
+        writer = threading.Thread(target=sniffer, args=(stop, written, failed))
+        writer.start()
+        asyncio.run(load(storage, latencies, errors))
+        stop.set()
+        writer.join()
+        print(
+            f"{mode:8} {len(latencies) / args.seconds:>9,.0f} "
+            f"{_percentile(latencies, 0.5):>8.1f} {_percentile(latencies, 0.99):>8.1f} "
+            f"{max(latencies, default=float('nan')):>8.1f} {len(errors):>6} "
+            f"{sum(written) / args.seconds:>9,.0f} {sum(failed):>6}"
+        )
+
+
+def bench_linker(args) -> None:
+    """Replay of --devices phones rotating random MACs: linking precision/recall and speed."""
+    from probe_sniffer.capture.linker import MacLinker
+
+    # Phones of a few hundred models (shared fingerprints) scan every 30-90 s in bursts
+    # of three probes and rotate their MAC every 5-15 minutes; most keep counting
+    # sequence numbers across a rotation. Each is present for 20-120 minutes of a
+    # 2 hour capture, at a fixed spot with +-3 dB of noise.
+    rng = random.Random(0)
+    ssids = [f"net-{i}" for i in range(500)]
+    frames, owner = [], {}
+    for device in range(args.devices):
+        fingerprint = f"{rng.randrange(args.devices // 10):016x}"
+        dbm = rng.randint(-90, -35)
+        known = rng.sample(ssids, rng.choice((0, 0, 1, 2, 3)))
+        keeps_seq = rng.random() < 0.7
+        seq = rng.randrange(4096)
+        ts = rng.randrange(7200)
+        leave = min(7200, ts + rng.randint(1200, 7200))
+        rotate = ts
+        while ts < leave:
+            if ts >= rotate:
+                mac = 0x020000000000 | rng.getrandbits(40)
+                owner[mac] = device
+                rotate = ts + rng.randint(300, 900)
+                if not keeps_seq:
+                    seq = rng.randrange(4096)
+            for ssid in ["Undirected Probe", *known]:
+                frames.append((ts, mac, dbm + rng.randint(-3, 3), ssid, fingerprint, seq))
+                seq = (seq + 1) % 4096
+            ts += rng.randint(30, 90)
+    frames.sort(key=lambda frame: frame[0])
+
+    def pairs(counts) -> int:
+        return sum(n * (n - 1) // 2 for n in counts)
+
+    true_pairs = pairs(Counter(owner.values()).values())
+    print(
+        f"{len(frames):,} frames, {len(owner):,} MACs of {args.devices:,} devices, "
+        f"{true_pairs:,} same-device MAC pairs"
+    )
+    print(f"{'evidence':<24} {'identities':>10} {'precision':>9} {'recall':>7} {'frames/s':>10}")
+    for label, use_seq in (("all", True), ("no sequence numbers", False)):
+        linker = MacLinker()
+        identity = {}
+        began = time.perf_counter()
+        for ts, mac, dbm, ssid, fingerprint, seq in frames:
+            identity[mac] = linker.assign(ts, mac, dbm, ssid, fingerprint, seq if use_seq else None)
+        elapsed = time.perf_counter() - began
+        linked = pairs(Counter(identity.values()).values())
+        correct = pairs(Counter((identity[mac], owner[mac]) for mac in owner).values())
+        precision = f"{correct / linked:.1%}" if linked else "-"
+        print(
+            f"{label:<24} {len(set(identity.values())):>10,} {precision:>9} "
+            f"{correct / true_pairs:>7.1%} {len(frames) / elapsed:>10,.0f}"
+        )
+
+
+def bench_aggregates(args) -> None:
+    """Fingerprint and identity endpoints: aggregating the sightings vs ingest-time aggregates."""
+    from probe_sniffer.storage import queries
+    from probe_sniffer.storage.aggregates import rebuild_aggregates, refresh_identities
+    from probe_sniffer.utils.time_utils import epoch_to_utc_iso
+
+    database.DB_PATH = _compact_database(args)
+    with database.get_cursor() as cursor:
+        cursor.execute("SELECT name FROM sighting_partitions")
+        partitions = [row[0] for row in cursor.fetchall()]
+        counts = Counter()
+        for partition in partitions:
+            cursor.execute(f"SELECT ie_fingerprint, COUNT(*) FROM {partition} GROUP BY 1")
+            counts.update(dict(cursor.fetchall()))
+        # One fingerprint per device; every ten devices' fingerprints are one identity
+        cursor.executemany(
+            "INSERT OR IGNORE INTO device_identities (identity_id, first_seen, last_seen) "
+            "VALUES (?, '', '')",
+            {(f"id-{int(fid, 16) // 10}",) for fid in counts},
+        )
+        cursor.executemany(
+            "INSERT INTO device_fingerprints "
+            "(fingerprint_id, identity_id, first_seen, last_seen, sighting_count) "
+            "VALUES (?, ?, '', '', ?)",
+            ((fid, f"id-{int(fid, 16) // 10}", count) for fid, count in counts.items()),
+        )
+    began = time.perf_counter()
+    fingerprints, identities = rebuild_aggregates()
+    print(
+        f"{args.rows:,} sightings over 365 days: rebuilt {fingerprints:,} fingerprints and "
+        f"{identities:,} identities in {time.perf_counter() - began:.1f} s"
+    )
+
+    def fingerprint_stats(fingerprint_id: str) -> dict:
+        """What GET /fingerprints/{id} used to compute per request."""
+        ssids, macs = set(), set()
+        with database.get_cursor() as cursor:
+            for partition in partitions:
+                cursor.execute(
+                    f"SELECT DISTINCT ssids.ssid FROM {partition} AS s "
+                    "JOIN ssids ON ssids.ssid_id = s.ssid_id "
+                    "WHERE s.ie_fingerprint = ? AND ssids.ssid != 'Undirected Probe'",
+                    (fingerprint_id,),
+                )
+                ssids.update(row[0] for row in cursor.fetchall())
+                cursor.execute(
+                    f"SELECT DISTINCT mac FROM {partition} WHERE ie_fingerprint = ?",
+                    (fingerprint_id,),
+                )
+                macs.update(row[0] for row in cursor.fetchall())
+        return {"ssid_signature": sorted(ssids), "unique_mac_count": len(macs)}
+
+    def identity_stats(identity_id: str) -> None:
+        """Counting an identity from its sightings (done once per relink now)."""
+        with database.get_cursor() as cursor:
+            refresh_identities(cursor, [identity_id])
+
+    fingerprint_id = f"{7:016x}"
+    print(f"{'':32} {'aggregate':>10} {'maintained':>10}")
+    for name, (aggregate, maintained) in {
+        "one fingerprint (ms)": (
+            lambda: fingerprint_stats(fingerprint_id),
+            lambda: queries.get_device_fingerprint(fingerprint_id),
+        ),
+        "one identity (ms)": (
+            lambda: identity_stats("id-0"),
+            lambda: queries.get_device_identity("id-0"),
+        ),
+    }.items():
+        print(
+            f"{name:32} {_timed_call(aggregate, repeat=5):>10.2f} {_timed_call(maintained):>10.2f}"
+        )
+
+    # Write path: the same batches with and without the aggregate maintenance
+    rng = random.Random(1)
+    now = int(time.time())
+    batches = []
+    for batch in range(50):
+        probes = [synthetic_probe(rng, now + batch, args.devices) for _ in range(args.batch_size)]
+        fingerprints = {}
+        for probe in probes:
+            fingerprints[probe.fingerprint_hex] = fingerprints.get(probe.fingerprint_hex, 0) + 1
+        batches.append(
+            (
+                [probe.sighting_params() for probe in probes],
+                [(probe.mac_str, epoch_to_utc_iso(probe.ts)) for probe in probes],
+                [(fid, None, epoch_to_utc_iso(now), n) for fid, n in fingerprints.items()],
+                {probe.mac: f"id-{(probe.mac & 0xFFFF) // 10}" for probe in probes},
+            )
+        )
+    maintain = queries.update_aggregates
+    for label, update in (
+        ("without aggregates", lambda *a, **k: None),
+        ("with aggregates", maintain),
+    ):
+        queries.update_aggregates = update
+        began = time.perf_counter()
+        for sightings, devices, fingerprints, linked in batches:
+            queries.log_sightings_batch(sightings, devices, fingerprints, identities=linked)
+        elapsed = time.perf_counter() - began
+        print(f"{'batch write, ' + label + ' (ms)':32} {elapsed / len(batches) * 1000:>10.2f}")
+    queries.update_aggregates = maintain
+
+
+def bench_ssids(args) -> None:
+    """SSID queries: reading the sightings of each SSID vs the SSID posting lists."""
+    from probe_sniffer.storage import queries, ssid_index
+    from probe_sniffer.utils.mac_utils import int_to_mac
+    from probe_sniffer.utils.time_utils import epoch_to_utc_iso
+
+    # Each device remembers a few networks, mostly rare ones (log-uniform over a pool
+    # of home and work networks); a third also probe for a carrier hotspot
+    rng = random.Random(0)
+    pool = [f"Net-{i:05d}" for i in range(args.devices * 2)]
+    remembered = []
+    for _ in range(args.devices):
+        networks = {pool[int(len(pool) ** rng.random()) - 1] for _ in range(rng.randrange(1, 8))}
+        if rng.random() < 0.3:
+            networks.add("xfinitywifi")
+        remembered.append(sorted(networks))
+
+    def sightings(count: int, start: int, step: float):
+        for i in range(count):
+            device = rng.randrange(args.devices)
+            ssid = "Undirected Probe"
+            if rng.random() < 0.4:
+                ssid = rng.choice(remembered[device])
+            ts = int(start + i * step)
+            yield (ts, 0x020000000000 + device, -60, ssid, "Locally Assigned", f"{device:016x}", 6)
+
+    database.DB_PATH = use_temp_database()
+    end = int(time.time())
+    began = time.perf_counter()
+    chunk, fingerprints = [], Counter()
+    for row in sightings(args.rows, end - 365 * 86400, 365 * 86400 / args.rows):
+        chunk.append(row)
+        fingerprints[row[5]] += 1
+        if len(chunk) == 10_000:
+            devices = {int_to_mac(row[1]): epoch_to_utc_iso(row[0]) for row in chunk}
+            seen = epoch_to_utc_iso(chunk[-1][0])
+            queries.log_sightings_batch(
+                chunk,
+                list(devices.items()),
+                [(fid, None, seen, count) for fid, count in fingerprints.items()],
+            )
+            chunk, fingerprints = [], Counter()
+    with database.get_cursor() as cursor:
+        cursor.execute("SELECT name FROM sighting_partitions")
+        partitions = [row[0] for row in cursor.fetchall()]
+        cursor.execute("SELECT COUNT(*) FROM ssid_devices")
+        postings = cursor.fetchone()[0]
+        # A network in the middle of the pool's long tail, and a device remembering it
+        cursor.execute(
+            "SELECT ssid FROM ssids WHERE ssid LIKE 'Net-%' AND device_count BETWEEN 3 AND 20 "
+            "ORDER BY ssid_id LIMIT 1"
+        )
+        rare = cursor.fetchone()[0]
+    print(
+        f"{args.rows:,} sightings of {args.devices:,} devices, {postings:,} postings "
+        f"(written in {time.perf_counter() - began:.0f} s)"
+    )
+    device = next(i for i, networks in enumerate(remembered) if rare in networks)
+    mac = int_to_mac(0x020000000000 + device)
+    popular = Counter(ssid for networks in remembered for ssid in networks)
+    common = [ssid for ssid, _ in popular.most_common(3) if ssid != "xfinitywifi"][:2]
+
+    def probed_for(ssid: str) -> set[int]:
+        """The devices that probed for an SSID, from its sightings (ssid_id index)."""
+        macs = set()
+        with database.get_cursor() as cursor:
+            for partition in partitions:
+                cursor.execute(
+                    f"SELECT DISTINCT s.mac FROM {partition} AS s "
+                    "JOIN ssids ON ssids.ssid_id = s.ssid_id WHERE ssids.ssid = ?",
+                    (ssid,),
+                )
+                macs.update(row[0] for row in cursor.fetchall())
+        return macs
+
+    def overlap_from_sightings() -> Counter:
+        """Devices sharing SSIDs with one, from the sightings of each of its SSIDs."""
+        shared = Counter()
+        for ssid in remembered[device]:
+            shared.update(probed_for(ssid))
+        return shared
+
+    print(f"{'':36} {'sightings':>10} {'postings':>10}")
+    for name, (scan, indexed) in {
+        "devices for xfinitywifi (ms)": (
+            lambda: probed_for("xfinitywifi"),
+            lambda: ssid_index.get_ssid_devices(["xfinitywifi"], limit=500),
+        ),
+        f"devices for {rare} (ms)": (
+            lambda: probed_for(rare),
+            lambda: ssid_index.get_ssid_devices([rare]),
+        ),
+        "two common SSIDs, both (ms)": (
+            lambda: probed_for(common[0]) & probed_for(common[1]),
+            lambda: ssid_index.get_ssid_devices(common),
+        ),
+        "xfinitywifi and a rare SSID (ms)": (
+            lambda: probed_for("xfinitywifi") & probed_for(rare),
+            lambda: ssid_index.get_ssid_devices(["xfinitywifi", rare]),
+        ),
+        "devices sharing SSIDs (ms)": (
+            overlap_from_sightings,
+            lambda: ssid_index.find_ssid_overlap(mac, min_shared=1),
+        ),
+    }.items():
+        print(f"{name:36} {_timed_call(scan, repeat=5):>10.2f} {_timed_call(indexed):>10.2f}")
+
+    has_index = ssid_index._has_search_index
+    print(f"{'':36} {'LIKE':>10} {'FTS5':>10}")
+    for text in ("net-01", "xfin"):
+        fts = _timed_call(lambda: ssid_index.search_ssids(text))
+        ssid_index._has_search_index = lambda cursor: False
+        like = _timed_call(lambda: ssid_index.search_ssids(text))
+        ssid_index._has_search_index = has_index
+        print(f"{'search ' + repr(text) + ' (ms)':36} {like:>10.2f} {fts:>10.2f}")
+
+    # Write path: the same batches with and without the posting list maintenance
+    batches = []
+    for batch in range(50):
+        rows = list(sightings(args.batch_size, end + batch, 1 / args.batch_size))
+        batches.append(
+            (
+                rows,
+                [(int_to_mac(row[1]), epoch_to_utc_iso(row[0])) for row in rows],
+                [
+                    (fid, None, epoch_to_utc_iso(end), n)
+                    for fid, n in Counter(r[5] for r in rows).items()
+                ],
+            )
+        )
+    maintain = queries.update_ssid_index
+    for label, update in (
+        ("without SSID index", lambda *a, **k: None),
+        ("with SSID index", maintain),
+    ):
+        queries.update_ssid_index = update
+        began = time.perf_counter()
+        for rows, devices, fingerprints in batches:
+            queries.log_sightings_batch(rows, devices, fingerprints)
+        elapsed = time.perf_counter() - began
+        print(f"{'batch write, ' + label + ' (ms)':36} {elapsed / len(batches) * 1000:>10.2f}")
+    queries.update_ssid_index = maintain
+
+
+BENCHMARKS = {
+    "aggregates": bench_aggregates,
+    "alloc": bench_alloc,
+    "batch": bench_batch,
+    "devices": bench_devices,
+    "export": bench_export,
+    "flood": bench_flood,
+    "ipc": bench_ipc,
+    "linker": bench_linker,
+    "live": bench_live,
+    "load": bench_load,
+    "overview": bench_overview,
+    "pages": bench_pages,
+    "partitions": bench_partitions,
+    "schema": bench_schema,
+    "seen": bench_seen,
+    "serialize": bench_serialize,
+    "shedding": bench_shedding,
+    "similar": bench_similar,
+    "ssids": bench_ssids,
+    "topk": bench_topk,
+    "uniques": bench_uniques,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("benchmark", choices=sorted(BENCHMARKS))
+    parser.add_argument("--frames", type=int, default=10_000)
+    parser.add_argument("--batch-size", type=int, default=512)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--devices", type=int, default=2_000)
+    parser.add_argument("--clients", type=int, default=32)
+    parser.add_argument("--seconds", type=float, default=10.0)
+    parser.add_argument("--fingerprints", type=int, default=200_000)
+    args = parser.parse_args()
+    BENCHMARKS[args.benchmark](args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+"""
+Propose device identities for fingerprints that look like one device after IE drift.
+
+Prints one proposal per group of similar fingerprints (see storage/similarity.py);
+with --apply, links each group's fingerprints to the proposed identity, creating it
+if needed.
+
+To run: python -m scripts.propose_merges [--threshold 0.8] [--apply]
+"""
+
+import argparse
+import json
+
+from probe_sniffer import config
+from probe_sniffer.storage.queries import create_device_identity, link_fingerprint_to_identity
+from probe_sniffer.storage.similarity import propose_identity_merges
+
+
+def apply(proposal: dict) -> None:
+    fingerprint_ids = [fingerprint["fingerprint_id"] for fingerprint in proposal["fingerprints"]]
+    if proposal["identity_id"] not in proposal["identity_ids"]:
+        create_device_identity(proposal["identity_id"], fingerprint_ids=fingerprint_ids)
+        return
+    for fingerprint_id in fingerprint_ids:
+        link_fingerprint_to_identity(fingerprint_id, proposal["identity_id"])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--threshold", type=float, default=config.SIMILARITY_MERGE_THRESHOLD)
+    parser.add_argument("--max-bucket", type=int, default=config.SIMILARITY_MAX_BUCKET)
+    parser.add_argument("--apply", action="store_true", help="Link the fingerprints")
+    args = parser.parse_args()
+
+    proposals = propose_identity_merges(args.threshold, args.max_bucket)
+    for proposal in proposals:
+        print(json.dumps(proposal))
+        if args.apply:
+            apply(proposal)
+    print(f"{len(proposals)} proposals{', applied' if args.apply and proposals else ''}")
+
+
+if __name__ == "__main__":
+    main()
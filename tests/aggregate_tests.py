@@ -0,0 +1,201 @@
+import unittest
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+from fastapi.testclient import TestClient
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+from probe_sniffer.api.app import app
+from probe_sniffer.storage import database
+from probe_sniffer.storage.aggregates import rebuild_aggregates
+from probe_sniffer.storage.queries import (
+    create_device_identity,
+    get_device_fingerprint,
+    get_device_identity,
+    link_fingerprint_to_identity,
+    log_sightings_batch,
+)
+
+START = 1759968000  # 2025-10-09 00:00:00 UTC
+PHONE = "00000000000000aa"
+LAPTOP = "00000000000000bb"
+RANDOM = 0x020000000000
+
+AGGREGATES = ("sighting_count", "unique_mac_count", "ssid_signature")
+IDENTITY_AGGREGATES = (
+    "first_seen",
+    "last_seen",
+    "total_sightings",
+    "unique_mac_count",
+    "ssid_signature",
+)
+
+
+def sighting(offset: int, mac: int, ssid: str, fingerprint_id: str) -> tuple:
+    return (START + offset, mac, -50, ssid, "Locally Assigned", fingerprint_id, 6)
+
+
+def write(rows: list[tuple], identities: dict | None = None, shed=()) -> None:
+    """Write a batch the way the sniffer does, with per-fingerprint frame counts."""
+    counts = {}
+    for row in rows:
+        counts[row[5]] = counts.get(row[5], 0) + 1
+    for row in shed:
+        counts[row[4]] = counts.get(row[4], 0) + row[5]
+    log_sightings_batch(
+        rows,
+        [],
+        [(fid, None, "2025-10-09 00:00:00", count) for fid, count in counts.items()],
+        shed,
+        identities,
+    )
+
+
+class TestAggregates(unittest.TestCase):
+    def setUp(self):
+        self.original_path = database.DB_PATH
+        database.DB_PATH = Path(tempfile.mkdtemp()) / "probes.db"
+        database.init_database()
+
+    def tearDown(self):
+        database.DB_PATH = self.original_path
+
+    def fingerprint(self, fingerprint_id: str) -> tuple:
+        row = get_device_fingerprint(fingerprint_id)
+        return tuple(row[name] for name in AGGREGATES)
+
+    def identity(self, identity_id: str) -> tuple:
+        row = get_device_identity(identity_id)
+        return tuple(row[name] for name in IDENTITY_AGGREGATES)
+
+    def test_fingerprint_aggregates(self):
+        write(
+            [
+                sighting(0, RANDOM + 1, "Work", PHONE),
+                sighting(1, RANDOM + 1, "Undirected Probe", PHONE),
+                sighting(2, RANDOM + 2, "Home", PHONE),
+                sighting(3, RANDOM + 3, "Cafe", LAPTOP),
+            ]
+        )
+        self.assertEqual(self.fingerprint(PHONE), (3, 2, ["Home", "Work"]))
+        # Known MACs and SSIDs don't change the signature; shed frames count
+        write([sighting(60, RANDOM + 2, "Work", PHONE)])
+        shed = [
+            (START + 60, RANDOM + 4, "Airport", "Locally Assigned", PHONE, 5, 5, -250, -50, -50)
+        ]
+        write([], shed=shed)
+        self.assertEqual(self.fingerprint(PHONE), (9, 3, ["Airport", "Home", "Work"]))
+        self.assertEqual(self.fingerprint(LAPTOP), (1, 1, ["Cafe"]))
+
+    def test_identity_aggregates(self):
+        write(
+            [
+                sighting(0, RANDOM + 1, "Work", PHONE),
+                sighting(60, RANDOM + 2, "Home", LAPTOP),
+                sighting(120, RANDOM + 3, "Cafe", LAPTOP),
+            ],
+            # The linker continued RANDOM + 1 as RANDOM + 2
+            identities={RANDOM + 1: "rand-1", RANDOM + 2: "rand-1", RANDOM + 3: "rand-3"},
+        )
+        # A new identity starts with its fingerprint's past sightings
+        create_device_identity("phone", fingerprint_ids=[PHONE])
+        self.assertEqual(
+            self.identity("phone"), ("2025-10-09 00:00:00", "2025-10-09 00:00:00", 1, 1, ["Work"])
+        )
+        self.assertEqual(
+            self.identity("rand-1"),
+            ("2025-10-09 00:00:00", "2025-10-09 00:01:00", 2, 2, ["Home", "Work"]),
+        )
+
+        # Linking a fingerprint brings its past sightings along, and takes them away
+        # from the identity it was linked to before
+        link_fingerprint_to_identity(LAPTOP, "phone")
+        self.assertEqual(
+            self.identity("phone"),
+            ("2025-10-09 00:00:00", "2025-10-09 00:02:00", 3, 3, ["Cafe", "Home", "Work"]),
+        )
+        link_fingerprint_to_identity(PHONE, "rand-1")
+        self.assertEqual(self.identity("phone")[2:], (2, 2, ["Cafe", "Home"]))
+        # Both of its MACs already count toward rand-1: counted once
+        self.assertEqual(self.identity("rand-1")[2:], (2, 2, ["Home", "Work"]))
+
+        # New sightings count toward their fingerprint's identity, and once toward an
+        # identity they are linked to both ways
+        write(
+            [sighting(180, RANDOM + 1, "Gym", PHONE), sighting(240, RANDOM + 9, "Gym", LAPTOP)],
+            identities={RANDOM + 1: "rand-1"},
+        )
+        self.assertEqual(
+            self.identity("rand-1")[1:], ("2025-10-09 00:03:00", 3, 2, ["Gym", "Home", "Work"])
+        )
+        self.assertEqual(
+            self.identity("phone")[1:], ("2025-10-09 00:04:00", 3, 3, ["Cafe", "Gym", "Home"])
+        )
+
+    def test_rebuild_matches_incremental(self):
+        for batch in range(4):
+            write(
+                [
+                    sighting(batch * 60 + i, RANDOM + i % 5, ssid, (PHONE, LAPTOP)[i % 2])
+                    for i, ssid in enumerate(["Home", "Undirected Probe", "Work", f"Net{batch}"])
+                ],
+                identities={RANDOM + i: f"rand-{i % 2}" for i in range(5)},
+            )
+            if batch == 1:
+                create_device_identity("laptop", fingerprint_ids=[LAPTOP])
+        fingerprints = [self.fingerprint(PHONE), self.fingerprint(LAPTOP)]
+        identities = [self.identity(name) for name in ("laptop", "rand-0", "rand-1")]
+
+        with database.get_cursor() as cursor:
+            cursor.execute(
+                "UPDATE device_fingerprints SET unique_mac_count = 0, ssid_signature = '[]'"
+            )
+            cursor.execute("DELETE FROM device_identities WHERE identity_id LIKE 'rand-%'")
+        self.assertEqual(rebuild_aggregates(), (2, 3))
+        self.assertEqual([self.fingerprint(PHONE), self.fingerprint(LAPTOP)], fingerprints)
+        self.assertEqual(
+            [self.identity(name) for name in ("laptop", "rand-0", "rand-1")], identities
+        )
+
+    def test_rebuild_matches_incremental_with_shed(self):
+        # The shedder keeps a minute's first frame of each MAC and sheds the rest
+        identities = {RANDOM + 1: "rand-1", RANDOM + 2: "rand-1"}
+        for minute in range(3):
+            rows = [sighting(minute * 60, RANDOM + 1, "Home", PHONE)]
+            rows.append(sighting(minute * 60 + 5, RANDOM + 2, "Work", LAPTOP))
+            shed = [
+                (START + minute * 60, RANDOM + 1, "Home", "", PHONE, 7, 7, -350, -50, -50),
+                (START + minute * 60, RANDOM + 2, "Work", "", LAPTOP, 3, 3, -150, -50, -50),
+            ]
+            write(rows, identities, shed)
+        create_device_identity("laptop", fingerprint_ids=[LAPTOP])
+        write([sighting(180, RANDOM + 2, "Work", LAPTOP)], identities, shed=[shed[1]])
+        expected = [self.identity(name) for name in ("laptop", "rand-1")]
+        self.assertEqual([row[2] for row in expected], [4, 7])
+
+        with database.get_cursor() as cursor:
+            cursor.execute("DELETE FROM device_identities WHERE identity_id = 'rand-1'")
+        rebuild_aggregates()
+        self.assertEqual([self.identity(name) for name in ("laptop", "rand-1")], expected)
+
+    def test_routes(self):
+        write([sighting(0, RANDOM + 1, "Work", PHONE), sighting(1, RANDOM + 2, "Home", PHONE)])
+        create_device_identity("phone", fingerprint_ids=[PHONE])
+
+        client = TestClient(app)
+        fingerprint = client.get(f"/fingerprints/{PHONE}").json()
+        self.assertEqual(
+            (fingerprint["ssid_signature"], fingerprint["unique_mac_count"]), (["Home", "Work"], 2)
+        )
+        identity = client.get("/identities/phone").json()
+        self.assertEqual(
+            (identity["ssid_signature"], identity["unique_mac_count"], identity["total_sightings"]),
+            (["Home", "Work"], 2, 2),
+        )
+        self.assertEqual(client.get("/identities/").json()[0]["ssid_signature"], ["Home", "Work"])
+
+
+if __name__ == "__main__":
+    unittest.main()
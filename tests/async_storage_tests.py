@@ -0,0 +1,121 @@
+import unittest
+import asyncio
+import os
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from fastapi.testclient import TestClient
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+from probe_sniffer.api.app import app
+from probe_sniffer.models.probe import Probe
+from probe_sniffer.storage import aio, database
+from probe_sniffer.storage.queries import log_sightings_batch
+
+
+class TestAsyncStorage(unittest.TestCase):
+    def test_results_and_errors_pass_through(self):
+        storage = aio.AsyncStorage(readers=2)
+
+        def fails():
+            raise ValueError("bad cursor")
+
+        async def run():
+            self.assertEqual(await storage.read(divmod, 7, 2), (3, 1))
+            self.assertEqual(await storage.write(sorted, [3, 1], reverse=True), [3, 1])
+            with self.assertRaises(ValueError):
+                await storage.read(fails)
+
+        asyncio.run(run())
+
+    def test_pending_calls_are_limited(self):
+        storage = aio.AsyncStorage(readers=1, max_pending=2)
+        release = threading.Event()
+
+        async def run():
+            blocked = [asyncio.ensure_future(storage.read(release.wait)) for _ in range(2)]
+            await asyncio.sleep(0.01)
+            with self.assertRaises(aio.StorageBusy):
+                await storage.read(time.time)
+            # The writer pool has its own limit
+            self.assertEqual(await storage.write(divmod, 7, 2), (3, 1))
+            release.set()
+            await asyncio.gather(*blocked)
+            await storage.read(time.time)
+
+        asyncio.run(run())
+
+    def test_timeout(self):
+        storage = aio.AsyncStorage(readers=1, max_pending=1, timeout=0.05)
+        release = threading.Event()
+
+        async def run():
+            with self.assertRaises(aio.StorageBusy):
+                await storage.read(release.wait)
+            # The timed-out call still holds the reader thread, and its slot
+            self.assertEqual(storage.reader.pending, 1)
+            with self.assertRaises(aio.StorageBusy):
+                await storage.read(time.time)
+            release.set()
+            await asyncio.sleep(0.05)
+            self.assertEqual(storage.reader.pending, 0)
+            await storage.read(time.time)
+
+        asyncio.run(run())
+
+    def test_writes_are_serialized(self):
+        storage = aio.AsyncStorage()
+        active, overlaps = [], []
+
+        def write():
+            active.append(1)
+            overlaps.append(len(active))
+            time.sleep(0.01)
+            active.pop()
+
+        async def run():
+            await asyncio.gather(*(storage.write(write) for _ in range(5)))
+
+        asyncio.run(run())
+        self.assertEqual(overlaps, [1] * 5)
+
+
+class TestAsyncRoutes(unittest.TestCase):
+    def setUp(self):
+        self.original_path = database.DB_PATH
+        database.DB_PATH = Path(tempfile.mkdtemp()) / "probes.db"
+        database.init_database()
+        probes = [Probe(1704067200 + i, -50, 6, 0x0200000000AA) for i in range(3)]
+        log_sightings_batch([p.sighting_params() for p in probes], [], [])
+        self.client = TestClient(app)
+
+    def tearDown(self):
+        database.DB_PATH = self.original_path
+
+    def test_wal_mode(self):
+        with database.get_cursor() as cursor:
+            cursor.execute("PRAGMA journal_mode")
+            self.assertEqual(cursor.fetchone()[0], "wal")
+
+    def test_routes_read_through_the_facade(self):
+        response = self.client.get("/sightings/", params={"limit": 2})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()["sightings"]), 2)
+        self.assertEqual(self.client.get("/fingerprints/missing").status_code, 404)
+
+    def test_busy_database_is_a_503(self):
+        original = aio.db.reader.max_pending
+        aio.db.reader.max_pending = 0
+        try:
+            response = self.client.get("/sightings/recent")
+        finally:
+            aio.db.reader.max_pending = original
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response.headers["Retry-After"], "1")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,64 @@
+import unittest
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+from probe_sniffer.capture.batch import ProbeBatch
+
+TS = 1760000000
+INTEL = 0x103D1CCF3D61
+RANDOM = 0x0200000000AA
+TRUSTED = 0x111111111111
+FP = (1).to_bytes(8, "big")
+
+
+class TestProbeBatch(unittest.TestCase):
+    def setUp(self):
+        self.batch = ProbeBatch(8, {0x103D1C: "Intel Corporate"}, {TRUSTED})
+
+    def test_append_reports_full(self):
+        for i in range(7):
+            self.assertFalse(self.batch.append(TS + i, INTEL, -50, 6, "Home", None, None))
+        self.assertTrue(self.batch.append(TS + 7, INTEL, -50, 6, "Home", None, None))
+
+    def test_trusted_filtered(self):
+        self.batch.append(TS, TRUSTED, -50, 6, "Home", None, None)
+        self.batch.append(TS, INTEL, -50, 6, "Home", None, None)
+        result = self.batch.process()
+        self.assertEqual(result.dropped_trusted, 1)
+        self.assertEqual(result.rows["mac48"].tolist(), [INTEL])
+
+    def test_dedup_keeps_strongest(self):
+        self.batch.append(TS, INTEL, -70, 1, "Home", FP, [{"id": 1}])
+        self.batch.append(TS, INTEL, -40, 6, "Home", FP, [{"id": 1}])
+        self.batch.append(TS, INTEL, -60, 11, "Work", FP, [{"id": 1}])
+        result = self.batch.process()
+        self.assertEqual(result.dropped_duplicate, 1)
+        self.assertEqual(result.rows["dbm"].tolist(), [-40, -60])
+
+    def test_oui_resolution(self):
+        self.batch.append(TS, INTEL, -50, 6, "Home", None, None)
+        self.batch.append(TS, RANDOM, -50, 6, "Home", None, None)
+        self.batch.append(TS, 0x0000AA000001, -50, 6, "Home", None, None)
+        result = self.batch.process()
+        ouis = [self.batch.ouis[oui_id] for oui_id in result.rows["oui_id"].tolist()]
+        self.assertEqual(ouis, ["Intel Corporate", "Locally Assigned", "Unknown OUI"])
+
+    def test_coalesce(self):
+        self.batch.append(TS, INTEL, -50, 6, "Home", FP, [{"id": 1}])
+        self.batch.append(TS + 5, INTEL, -50, 6, "Home", FP, [{"id": 1}])
+        self.batch.append(TS + 2, RANDOM, -50, 6, "Home", None, None)
+        result = self.batch.process()
+        self.assertEqual(result.devices.tolist(), [(RANDOM, TS + 2), (INTEL, TS + 5)])
+        self.assertEqual(result.fingerprints.tolist(), [(1, TS + 5, 2)])
+        self.assertEqual(result.ie_data, {1: [{"id": 1}]})
+
+    def test_process_resets_buffer(self):
+        self.batch.append(TS, INTEL, -50, 6, "Home", None, None)
+        self.batch.process()
+        self.assertEqual(len(self.batch), 0)
+        self.assertEqual(len(self.batch.process().rows), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
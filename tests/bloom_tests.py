@@ -0,0 +1,124 @@
+import unittest
+import os
+import random
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+from probe_sniffer.storage import database
+from probe_sniffer.storage.queries import log_sightings_batch
+from probe_sniffer.storage.seen import forget_filters, seen_filters
+from probe_sniffer.utils.bloom import BloomFilter, ScalableBloomFilter
+from probe_sniffer.utils.mac_utils import int_to_mac
+
+TS = 1760000000
+
+
+class TestBloomFilter(unittest.TestCase):
+    def test_no_false_negatives(self):
+        bloom = BloomFilter(10_000, 0.01)
+        keys = random.Random(0).sample(range(1 << 48), 10_000)
+        for key in keys:
+            bloom.add(key)
+        self.assertTrue(all(bloom.might_contain(key) for key in keys))
+
+    def test_false_positive_rate(self):
+        for fp_rate in (0.01, 0.001):
+            with self.subTest(fp_rate=fp_rate):
+                bloom = BloomFilter(20_000, fp_rate)
+                for key in range(20_000):
+                    bloom.add(key)
+                false = sum(bloom.might_contain(key) for key in range(1 << 40, (1 << 40) + 100_000))
+                self.assertLess(false / 100_000, 1.5 * fp_rate)
+                self.assertLess(bloom.estimated_fp_rate(), 1.5 * fp_rate)
+        # ~9.6 bits per key at 1%
+        self.assertEqual(BloomFilter(100_000, 0.01).size, 958_506)
+
+    def test_scales(self):
+        bloom = ScalableBloomFilter(1_000, 0.01)
+        for key in range(50_000):
+            bloom.add(key)
+        self.assertGreater(len(bloom.stages), 1)
+        # Keys the filter already (falsely) reported as present aren't counted
+        self.assertGreater(len(bloom), 0.99 * 50_000)
+        self.assertTrue(all(bloom.might_contain(key) for key in range(50_000)))
+        false = sum(bloom.might_contain(key) for key in range(1 << 40, (1 << 40) + 100_000))
+        self.assertLess(false / 100_000, 0.01)
+        self.assertLess(bloom.estimated_fp_rate(), 0.01)
+        self.assertTrue(bloom.add(123))  # Already there
+
+
+def log(rows):
+    """rows: (ts, mac, fingerprint_id) per sighting"""
+    log_sightings_batch(
+        [(ts, mac, -60, "Home", "Apple, Inc.", fp, 6) for ts, mac, fp in rows],
+        [(int_to_mac(mac), "2025-10-09 08:53:20") for _, mac, _ in rows],
+        [(fp, None, "2025-10-09 08:53:20", 1) for _, _, fp in rows],
+    )
+
+
+class TestSeenFilters(unittest.TestCase):
+    def setUp(self):
+        self.original_path = database.DB_PATH
+        database.DB_PATH = Path(tempfile.mkdtemp()) / "probes.db"
+        database.init_database()
+
+    def tearDown(self):
+        database.DB_PATH = self.original_path
+
+    def test_lookups_skipped_for_new_keys(self):
+        log([(TS, 0x020000000001, "00000000000000aa")])
+        seen = seen_filters()
+        self.assertEqual(seen.checked, 0)  # Both keys were definitely new
+        self.assertEqual(seen.skipped, 2)
+
+        log(
+            [
+                (TS + 1, 0x020000000001, "00000000000000aa"),
+                (TS + 1, 0x020000000002, "00000000000000bb"),
+            ]
+        )
+        self.assertEqual(seen.checked, 2)
+        self.assertEqual(seen.skipped, 4)
+
+    def test_rebuilt_from_database(self):
+        log([(TS, 0x020000000000 + i, f"{i:016x}") for i in range(1, 500)])
+        forget_filters()
+        seen = seen_filters()
+        self.assertEqual(seen.unseen_macs([0x020000000000 + i for i in range(1, 500)]), set())
+        self.assertEqual(seen.unseen_fingerprints([f"{i:016x}" for i in range(1, 500)]), set())
+        report = seen.report()
+        self.assertEqual(report["macs"]["keys"], 499)
+        self.assertLess(report["macs"]["fp_rate"], 0.001)
+
+    def test_results_unchanged(self):
+        # Known fingerprints come back as they were, new ones as inserted, exactly as
+        # without the filter
+        log([(TS, 0x020000000001, "00000000000000aa")])
+        log([(TS + 60, 0x020000000002, "00000000000000bb")])
+        old = log_sightings_batch(
+            [
+                (TS + 120, 0x020000000001, -60, "Home", "Apple, Inc.", "00000000000000aa", 6),
+                (TS + 120, 0x020000000003, -60, "Home", "Apple, Inc.", "00000000000000cc", 6),
+            ],
+            [
+                ("02:00:00:00:00:01", "2025-10-09 08:55:20"),
+                ("02:00:00:00:00:03", "2025-10-09 08:55:20"),
+            ],
+            [
+                ("00000000000000aa", None, "2025-10-09 08:55:20", 1),
+                ("00000000000000cc", None, "2025-10-09 08:55:20", 1),
+            ],
+        )
+        self.assertEqual(
+            {fid: (row["inserted"], row["sighting_count"]) for fid, row in old.items()},
+            {"00000000000000aa": (False, 1), "00000000000000cc": (True, 1)},
+        )
+        with database.get_cursor() as cursor:
+            cursor.execute("SELECT new_devices FROM stat_periods WHERE period = 'day'")
+            self.assertEqual(cursor.fetchone()[0], 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
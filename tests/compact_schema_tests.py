@@ -0,0 +1,146 @@
+import unittest
+import os
+import sqlite3
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+from probe_sniffer.models.probe import Probe
+from probe_sniffer.storage import database
+from probe_sniffer.storage.queries import (
+    get_activity,
+    get_sightings,
+    get_sightings_page,
+    iter_sightings,
+    log_sighting,
+)
+from probe_sniffer.storage.schema import LEGACY_SIGHTINGS_TABLE
+
+MAC = "aa:bb:cc:dd:ee:ff"
+# First id of the 2024-01 sighting partition
+JAN_2024_ID = (202401 << 32) + 1
+
+
+def legacy_database(path: Path, rows: int) -> None:
+    """Create a database with the pre-compaction sightings table."""
+    conn = sqlite3.connect(path)
+    conn.executescript("""
+        CREATE TABLE devices (mac TEXT PRIMARY KEY, name TEXT, is_trusted INTEGER DEFAULT 0,
+                              first_seen TEXT NOT NULL, last_seen TEXT NOT NULL);
+        CREATE TABLE device_identities (identity_id TEXT PRIMARY KEY, alias TEXT,
+                                        alias_set_at TEXT, ssid_signature TEXT,
+                                        first_seen TEXT NOT NULL, last_seen TEXT NOT NULL,
+                                        total_sightings INTEGER DEFAULT 0);
+        """ + LEGACY_SIGHTINGS_TABLE)
+    conn.execute(f"INSERT INTO devices VALUES ('{MAC}', NULL, 0, '2024-01-01', '2024-01-01')")
+    conn.executemany(
+        "INSERT INTO sightings (timestamp, mac, rssi, dbm, ssid, oui, ie_fingerprint) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?)",
+        [
+            (
+                f"2024-01-01 00:00:{i:02d}",
+                MAC,
+                f"{-70 + i}dBm",
+                None if i == 0 else -70 + i,
+                "Home" if i % 2 else "Undirected Probe",
+                "Apple, Inc.",
+                "0123456789abcdef",
+            )
+            for i in range(rows)
+        ],
+    )
+    conn.commit()
+    conn.close()
+
+
+class TestCompactSightings(unittest.TestCase):
+    def setUp(self):
+        self.original_path = database.DB_PATH
+        database.DB_PATH = Path(tempfile.mkdtemp()) / "probes.db"
+
+    def tearDown(self):
+        database.DB_PATH = self.original_path
+
+    def view_rows(self) -> list[dict]:
+        with database.get_cursor() as cursor:
+            cursor.execute("SELECT * FROM sightings ORDER BY id")
+            return [dict(row) for row in cursor.fetchall()]
+
+    def test_fresh_database_uses_view(self):
+        database.init_database()
+        log_sighting(Probe(1704067200, -50, 6, 0xAABBCCDDEEFF, oui="Apple, Inc.", ssid="Home"))
+        self.assertEqual(
+            self.view_rows(),
+            [
+                {
+                    "id": JAN_2024_ID,
+                    "timestamp": "2024-01-01 00:00:00",
+                    "mac": MAC,
+                    "rssi": "-50 dBm",
+                    "dbm": -50,
+                    "ssid": "Home",
+                    "oui": "Apple, Inc.",
+                    "ie_fingerprint": "no_stable_ies",
+                    "identity_id": None,
+                    "channel": 6,
+                }
+            ],
+        )
+
+    def test_online_migration(self):
+        legacy_database(database.DB_PATH, 12)
+        database.init_database()
+        before = self.view_rows()
+
+        # Visits are built from the legacy rows before the backfill moves them
+        with database.get_cursor() as cursor:
+            cursor.execute("SELECT frame_count FROM visits")
+            self.assertEqual([row["frame_count"] for row in cursor.fetchall()], [12])
+
+        # New writes during the migration land above every legacy id
+        log_sighting(Probe(1704067300, -40, 6, 0xAABBCCDDEEFF, ssid="Work"))
+        self.assertEqual(self.view_rows()[-1]["id"], JAN_2024_ID)
+
+        # Until the backfill moves them, legacy rows are missing from the partition
+        # reads but counted in the activity rollups
+        self.assertEqual(get_sightings_page()["total"], 1)
+        self.assertEqual([len(chunk) for chunk in iter_sightings(mac=MAC)], [1])
+        activity = get_activity("mac", 0xAABBCCDDEEFF, since=1704067200, until=1704067800)
+        self.assertEqual(sum(bucket["count"] for bucket in activity["buckets"]), 13)
+
+        self.assertEqual(database.backfill_compact_sightings(chunk_size=5), 12)
+        after = self.view_rows()
+        unchanged = ("id", "timestamp", "mac", "ssid", "oui", "ie_fingerprint")
+        self.assertEqual(
+            [{k: row[k] for k in unchanged} for row in after[:12]],
+            [{k: row[k] for k in unchanged} for row in before],
+        )
+        # rssi is derived from dbm; the "-70dBm" text form is recovered when dbm is missing
+        self.assertEqual((after[0]["dbm"], after[0]["rssi"]), (-70, "-70 dBm"))
+
+        with database.get_cursor() as cursor:
+            cursor.execute("SELECT name FROM sqlite_master WHERE name = 'sightings_legacy'")
+            self.assertIsNone(cursor.fetchone())
+
+        sightings, total = get_sightings(mac=MAC.upper(), limit=2, order="ASC")
+        self.assertEqual(total, 13)
+        self.assertEqual(get_sightings_page()["total"], 13)
+        self.assertEqual([len(chunk) for chunk in iter_sightings(mac=MAC)], [13])
+        self.assertEqual([s["id"] for s in sightings], [1, 2])
+
+    def test_insert_through_view(self):
+        database.init_database()
+        with database.get_cursor() as cursor:
+            cursor.execute(
+                "INSERT INTO sightings (timestamp, mac, dbm, ssid, oui) "
+                "VALUES ('2024-02-01 00:00:00', 'AA:BB:CC:DD:EE:01', -30, 'Cafe', 'Apple, Inc.')"
+            )
+        row = self.view_rows()[0]
+        self.assertEqual(
+            (row["mac"], row["ssid"], row["rssi"]), ("aa:bb:cc:dd:ee:01", "Cafe", "-30 dBm")
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,101 @@
+import unittest
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+from probe_sniffer.models.probe import Probe
+from probe_sniffer.storage import database
+from probe_sniffer.storage.queries import (
+    get_device_sighting_stats,
+    get_device_summaries,
+    get_device_summary,
+    log_sightings_batch,
+    update_device,
+)
+from probe_sniffer.storage.summaries import rebuild_device_summary
+from probe_sniffer.utils.time_utils import epoch_to_utc_iso
+
+TS = 1760000000  # 2025-10-09 08:53:20 UTC
+PHONE = "02:00:00:00:00:aa"
+LAPTOP = "02:00:00:00:00:bb"
+
+
+def summary_rows() -> list[dict]:
+    with database.get_cursor() as cursor:
+        cursor.execute("SELECT * FROM device_summary ORDER BY mac")
+        return [dict(row) for row in cursor.fetchall()]
+
+
+def log(batch):
+    probes = [Probe(ts, dbm, 6, mac, oui=oui, ssid=ssid) for ts, mac, dbm, ssid, oui in batch]
+    log_sightings_batch(
+        [p.sighting_params() for p in probes],
+        [(p.mac_str, epoch_to_utc_iso(p.ts)) for p in probes],
+        [],
+    )
+
+
+class TestDeviceSummary(unittest.TestCase):
+    def setUp(self):
+        self.original_path = database.DB_PATH
+        database.DB_PATH = Path(tempfile.mkdtemp()) / "probes.db"
+        database.init_database()
+
+        # A late-arriving older sighting must not replace the latest OUI/signal
+        log([(TS, 0x0200000000AA, -60, "Work", "Apple"), (TS, 0x0200000000BB, -70, "", "Dell")])
+        log([(TS + 60, 0x0200000000AA, -40, "Home", "Apple, Inc.")])
+        log([(TS + 30, 0x0200000000AA, -50, "Home", "Old")])
+
+    def tearDown(self):
+        database.DB_PATH = self.original_path
+
+    def test_incremental_summary(self):
+        phone = get_device_summary(PHONE)
+        self.assertEqual(phone["oui"], "Apple, Inc.")
+        self.assertEqual(phone["last_dbm"], -40)
+        self.assertEqual(phone["ssids"], ["Home", "Work"])
+        self.assertEqual(phone["total_sightings"], 3)
+        self.assertEqual(phone["avg_signal_dbm"], -50)
+        self.assertEqual(get_device_summary(LAPTOP)["ssids"], [])
+
+    def test_matches_sighting_stats(self):
+        for mac in (PHONE, LAPTOP):
+            summary = get_device_summary(mac)
+            stats = get_device_sighting_stats(mac)
+            self.assertEqual({k: summary[k] for k in stats}, stats)
+
+    def test_rebuild_matches_incremental(self):
+        incremental = summary_rows()
+        self.assertEqual(rebuild_device_summary(), 2)
+        self.assertEqual(summary_rows(), incremental)
+
+    def test_sorting_and_pagination(self):
+        devices, total = get_device_summaries(sort="total_sightings", order="DESC", limit=1)
+        self.assertEqual(total, 2)
+        self.assertEqual([d["mac"] for d in devices], [PHONE])
+
+        devices, _ = get_device_summaries(sort="avg_signal_dbm", order="ASC", offset=1)
+        self.assertEqual([d["mac"] for d in devices], [PHONE])
+
+        update_device(LAPTOP, is_trusted=True)
+        devices, total = get_device_summaries(is_trusted=False)
+        self.assertEqual((total, [d["mac"] for d in devices]), (1, [PHONE]))
+
+        with self.assertRaises(ValueError):
+            get_device_summaries(sort="ssids")
+
+    def test_device_without_sightings(self):
+        with database.get_cursor() as cursor:
+            cursor.execute(
+                "INSERT INTO devices (mac, first_seen, last_seen) VALUES ('02:00:00:00:00:cc', 'x', 'x')"
+            )
+        device = get_device_summary("02:00:00:00:00:cc")
+        self.assertEqual((device["total_sightings"], device["ssids"]), (0, []))
+        devices, total = get_device_summaries(sort="total_sightings")
+        self.assertEqual((total, devices[-1]["mac"]), (3, "02:00:00:00:00:cc"))
+
+
+if __name__ == "__main__":
+    unittest.main()
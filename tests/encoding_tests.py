@@ -0,0 +1,199 @@
+import unittest
+import gzip
+import json
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+from fastapi.testclient import TestClient
+from pydantic import TypeAdapter
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+from probe_sniffer.api import encoding
+from probe_sniffer.api.app import app
+from probe_sniffer.api.cache import cache
+from probe_sniffer.api.schemas import (
+    Device,
+    DevicePresence,
+    DeviceWithStats,
+    Sighting,
+    SightingsResponse,
+    Visit,
+)
+from probe_sniffer.models.probe import Probe
+from probe_sniffer.storage import database
+from probe_sniffer.storage.queries import (
+    get_device_summaries,
+    get_device_summary,
+    get_devices_present,
+    get_recent_sightings,
+    get_sightings,
+    get_sightings_page,
+    get_visits,
+    log_sightings_batch,
+    update_device,
+)
+from probe_sniffer.utils.time_utils import epoch_to_utc_iso
+
+TS = 1760000000  # 2025-10-09 08:53:20 UTC
+
+
+def validated(model, content) -> bytes:
+    """What FastAPI's response_model produces."""
+    adapter = TypeAdapter(model)
+    return adapter.dump_json(adapter.validate_python(content))
+
+
+class TestTrustedShapes(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.original_path = database.DB_PATH
+        database.DB_PATH = Path(tempfile.mkdtemp()) / "probes.db"
+        database.init_database()
+        probes = [
+            Probe(TS + i * 40, -40 - i, 6, 0x0200000000AA + i % 3, oui="Apple, Inc.", ssid="Café")
+            for i in range(30)
+        ]
+        probes.append(Probe(TS, -70, 11, 0x0200000000FF))  # No OUI, SSID or fingerprint
+        log_sightings_batch(
+            [p.sighting_params() for p in probes],
+            [(p.mac_str, epoch_to_utc_iso(p.ts)) for p in probes],
+            [],
+        )
+        update_device("02:00:00:00:00:ab", name="Phone", is_trusted=True)
+
+    @classmethod
+    def tearDownClass(cls):
+        database.DB_PATH = cls.original_path
+
+    def assertSameJson(self, model, content):
+        self.assertEqual(
+            json.loads(encoding.dumps(encoding.shape(model, content))),
+            json.loads(validated(model, content)),
+        )
+
+    def test_routes_match_their_response_models(self):
+        cases = {
+            "devices": (list[Device], Device, get_device_summaries()[0]),
+            "device": (DeviceWithStats, DeviceWithStats, get_device_summary("02:00:00:00:00:ab")),
+            "recent": (list[Sighting], Sighting, get_recent_sightings(limit=50)),
+            "visits": (list[Visit], Visit, get_visits(limit=100)),
+            "present": (list[DevicePresence], DevicePresence, get_devices_present(TS, TS + 3600)),
+        }
+        page = {**get_sightings_page(limit=10), "limit": 10, "offset": 0}
+        sightings, total = get_sightings(limit=10, offset=5)
+        cases["page"] = (SightingsResponse, SightingsResponse, page)
+        cases["offset page"] = (
+            SightingsResponse,
+            SightingsResponse,
+            {"sightings": sightings, "total": total, "limit": 10, "offset": 5},
+        )
+        for name, (response_model, item_model, content) in cases.items():
+            with self.subTest(name):
+                self.assertTrue(content)
+                self.assertEqual(
+                    json.loads(encoding.dumps(encoding.shape(item_model, content))),
+                    json.loads(validated(response_model, content)),
+                )
+
+    def test_plain_rows_are_not_copied(self):
+        rows = get_recent_sightings(limit=5)
+        self.assertIs(encoding.shape(Sighting, rows), rows)
+        # Extra columns (Device has no avg_signal_dbm) and bools need shaping
+        devices = get_device_summaries()[0]
+        shaped = encoding.shape(Device, devices)
+        self.assertNotIn("avg_signal_dbm", shaped[0])
+        self.assertIn(True, [device["is_trusted"] for device in shaped])
+
+    def test_json_fallback_produces_the_same_bytes(self):
+        content = encoding.shape(Sighting, get_recent_sightings(limit=50))
+        fast = encoding.dumps(content)
+        original, encoding.orjson = encoding.orjson, None
+        try:
+            self.assertEqual(encoding.dumps(content), fast)
+        finally:
+            encoding.orjson = original
+
+
+class TestCompression(unittest.TestCase):
+    def test_negotiate(self):
+        has_zstd = encoding.zstandard is not None
+        zstd = "zstd" if has_zstd else "gzip"
+        cases = {
+            None: None,
+            "": None,
+            "identity": None,
+            "gzip": "gzip",
+            "gzip, deflate, br": "gzip",
+            "gzip, zstd": zstd,
+            "gzip;q=1.0, zstd;q=0.5": "gzip",
+            "gzip;q=0, *": "zstd" if has_zstd else None,
+            "*;q=0": None,
+            "GZIP;q=0.8": "gzip",
+            "gzip;q=bad": None,
+        }
+        for header, expected in cases.items():
+            with self.subTest(header):
+                self.assertEqual(encoding.negotiate(header), expected)
+
+
+class TestCompressedResponses(unittest.TestCase):
+    def setUp(self):
+        self.original_path = database.DB_PATH
+        database.DB_PATH = Path(tempfile.mkdtemp()) / "probes.db"
+        database.init_database()
+        probes = [Probe(TS + i, -50, 6, 0x020000000000 + i) for i in range(100)]
+        log_sightings_batch(
+            [p.sighting_params() for p in probes],
+            [(p.mac_str, epoch_to_utc_iso(p.ts)) for p in probes],
+            [],
+        )
+        cache.clear()
+        self.client = TestClient(app)
+
+    def tearDown(self):
+        database.DB_PATH = self.original_path
+
+    def test_large_lists_are_compressed(self):
+        plain = self.client.get("/sightings/", headers={"Accept-Encoding": "identity"})
+        self.assertNotIn("Content-Encoding", plain.headers)
+        self.assertIn("Accept-Encoding", plain.headers["Vary"])
+
+        compressed = self.client.get(
+            "/sightings/", headers={"Accept-Encoding": "gzip"}, params={"limit": 100}
+        )
+        self.assertEqual(compressed.headers["Content-Encoding"], "gzip")
+        self.assertLess(int(compressed.headers["Content-Length"]), len(plain.content) / 4)
+        self.assertEqual(compressed.json()["sightings"], plain.json()["sightings"])
+
+        small = self.client.get("/sightings/recent", params={"limit": 1})
+        self.assertNotIn("Content-Encoding", small.headers)
+
+    def test_cached_variants_have_their_own_etags(self):
+        plain = self.client.get("/devices/", headers={"Accept-Encoding": "identity"})
+        zipped = self.client.get("/devices/", headers={"Accept-Encoding": "gzip"})
+        self.assertEqual(zipped.headers["Content-Encoding"], "gzip")
+        self.assertEqual(zipped.json(), plain.json())
+        self.assertNotEqual(zipped.headers["ETag"], plain.headers["ETag"])
+        self.assertEqual(list(cache.entries.values())[0].encoded.keys(), {"gzip"})
+
+        # Either representation's ETag validates the other's
+        for etag in (plain.headers["ETag"], zipped.headers["ETag"]):
+            response = self.client.get(
+                "/devices/", headers={"If-None-Match": etag, "Accept-Encoding": "gzip"}
+            )
+            self.assertEqual(response.status_code, 304)
+
+    def test_compressed_body_round_trips(self):
+        body = encoding.dumps(get_recent_sightings(limit=100))
+        self.assertEqual(gzip.decompress(encoding.compress(body, "gzip")), body)
+        if encoding.zstandard is not None:
+            decompressed = encoding.zstandard.ZstdDecompressor().decompress(
+                encoding.compress(body, "zstd")
+            )
+            self.assertEqual(decompressed, body)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,87 @@
+import unittest
+import csv
+import io
+import json
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+from probe_sniffer.api import export
+from probe_sniffer.models.probe import Probe
+from probe_sniffer.storage import database
+from probe_sniffer.storage.queries import get_sightings, iter_sightings, log_sightings_batch
+from probe_sniffer.storage.schema import SIGHTING_FIELDS
+
+JAN_2024 = 1704067200
+FEB_2024 = 1706745600
+
+
+class TestExport(unittest.TestCase):
+    def setUp(self):
+        self.original_path = database.DB_PATH
+        database.DB_PATH = Path(tempfile.mkdtemp()) / "probes.db"
+        database.init_database()
+
+        # 25 sightings over two partitions, half of them for "Home"
+        probes = [
+            Probe(
+                (JAN_2024 if i < 15 else FEB_2024) + i // 2,
+                -40 - i,
+                6,
+                0x0200000000AA,
+                ssid="Home" if i % 2 else 'Café, "quoted"',
+            )
+            for i in range(25)
+        ]
+        log_sightings_batch([p.sighting_params() for p in probes], [], [])
+
+    def tearDown(self):
+        database.DB_PATH = self.original_path
+
+    def test_chunks_cover_every_row_in_order(self):
+        for order in ("ASC", "DESC"):
+            chunks = list(iter_sightings(order=order, chunk_size=4))
+            self.assertTrue(all(len(chunk) <= 4 for chunk in chunks))
+            ids = [row[0] for chunk in chunks for row in chunk]
+            expected = [s["id"] for s in get_sightings(limit=100, order=order)[0]]
+            self.assertEqual(ids, expected)
+
+    def test_filters(self):
+        rows = [row for chunk in iter_sightings(chunk_size=5, ssid="Home") for row in chunk]
+        self.assertEqual(len(rows), 12)
+        self.assertEqual({row[SIGHTING_FIELDS.index("ssid")] for row in rows}, {"Home"})
+        self.assertEqual(list(iter_sightings(ssid="Never seen")), [])
+
+    def test_ndjson(self):
+        lines = b"".join(export.encode("ndjson", iter_sightings(chunk_size=7))).splitlines()
+        self.assertEqual(len(lines), 25)
+        first = json.loads(lines[0])
+        self.assertEqual(list(first), list(SIGHTING_FIELDS))
+        self.assertEqual((first["timestamp"], first["channel"]), ("2024-01-01 00:00:00", 6))
+
+    def test_csv(self):
+        text = b"".join(export.encode("csv", iter_sightings(chunk_size=7))).decode()
+        rows = list(csv.reader(io.StringIO(text)))
+        self.assertEqual(rows[0], list(SIGHTING_FIELDS))
+        self.assertEqual(len(rows), 26)
+        self.assertEqual(rows[1][SIGHTING_FIELDS.index("ssid")], 'Café, "quoted"')
+
+        empty = b"".join(export.encode("csv", iter_sightings(ssid="Never seen"))).decode()
+        self.assertEqual(empty.splitlines(), [",".join(SIGHTING_FIELDS)])
+
+    @unittest.skipIf(export.pa is None, "pyarrow not installed")
+    def test_arrow_and_parquet(self):
+        data = b"".join(export.encode("arrow", iter_sightings(chunk_size=7)))
+        table = export.pa.ipc.open_stream(data).read_all()
+        self.assertEqual((table.num_rows, table.column_names), (25, list(SIGHTING_FIELDS)))
+
+        data = b"".join(export.encode("parquet", iter_sightings(chunk_size=7)))
+        table = export.pq.read_table(export.pa.BufferReader(data))
+        self.assertEqual(table.num_rows, 25)
+        self.assertEqual(table.column("dbm").to_pylist()[:2], [-40, -41])
+
+
+if __name__ == "__main__":
+    unittest.main()
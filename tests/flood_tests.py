@@ -0,0 +1,157 @@
+import unittest
+import os
+import random
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+from probe_sniffer.capture.flood import KEEP, SAMPLE, SHED, FloodDetector, alert_payload
+from probe_sniffer.models.probe import NO_STABLE_IES
+
+TS = 1760000000
+PHONE = 0x3C0754000001  # Globally administered (Apple)
+RANDOM = 0x020000000000  # Locally administered base
+
+
+class TestFloodDetector(unittest.TestCase):
+    def setUp(self):
+        self.alerts = []
+        self.detector = FloodDetector(on_alert=self.alerts.append)
+        self.rng = random.Random(0)
+
+    def background(self, start: int, seconds: int) -> list[int]:
+        """A few probes a second from a handful of regular devices."""
+        verdicts = []
+        for second in range(start, start + seconds):
+            for _ in range(self.rng.randint(0, 6)):
+                device = self.rng.randrange(20)
+                verdicts.append(
+                    self.detector.check(second, PHONE + device, "Apple, Inc.", f"{device:016x}", 6)
+                )
+        return verdicts
+
+    def test_normal_traffic_kept(self):
+        verdicts = self.background(TS, 600)
+        self.assertEqual(set(verdicts), {KEEP})
+        self.assertEqual(self.detector.floods, {})
+        self.assertEqual(self.alerts, [])
+        # Baselines settle near the real rate (3 a second)
+        self.assertAlmostEqual(self.detector.baselines["global", ""].mean, 3, delta=1.5)
+
+    def test_fingerprint_flood_sampled(self):
+        self.background(TS, 300)
+        verdicts, others = [], []
+        for second in range(TS + 300, TS + 310):
+            for i in range(2000):
+                verdicts.append(
+                    self.detector.check(second, PHONE + 99, "Espressif Inc.", "00000000000bad00", 1)
+                )
+                if i % 500 == 0:
+                    others.append(
+                        self.detector.check(second, PHONE + 1, "Apple, Inc.", f"{1:016x}", 6)
+                    )
+
+        # Everything over the limit in the first second, then all but 1 in 100, is shed
+        shed = verdicts.count(SHED)
+        self.assertGreater(shed, 0.95 * len(verdicts))
+        self.assertEqual(verdicts.count(SAMPLE) + shed, len(verdicts) - verdicts.index(SAMPLE))
+        # The global class floods too, but the regular device isn't shed because of it
+        self.assertEqual(set(others), {KEEP})
+        self.assertIn(("fingerprint", "00000000000bad00"), self.detector.floods)
+
+        # One summary alert for the whole episode
+        self.assertEqual(len(self.alerts), 1)
+        summary = alert_payload(self.alerts[0])
+        kinds = {flood["kind"] for flood in summary["floods"]}
+        self.assertTrue({"fingerprint", "oui", "global"} <= kinds)
+        by_kind = {flood["kind"]: flood for flood in summary["floods"]}
+        self.assertEqual(by_kind["fingerprint"]["peak"], 2000)
+        self.assertEqual(by_kind["fingerprint"]["baseline"], 0)
+
+        # Back to normal: the flood ends after the quiet period, and doesn't alert again
+        self.background(TS + 310, 60)
+        self.assertEqual(self.detector.floods, {})
+        self.assertIsNone(self.detector.episode)
+        self.assertEqual(len(self.alerts), 1)
+        self.assertEqual(self.detector.shed_total, shed)
+
+    def test_baseline_frozen_during_flood(self):
+        self.background(TS, 300)
+        # The first probe of the next second folds the last background second in
+        self.detector.check(TS + 300, PHONE + 5, "Apple, Inc.", f"{5:016x}", 6)
+        before = self.detector.baselines["oui", "Apple, Inc."].mean
+        for second in range(TS + 300, TS + 600):
+            for _ in range(300):
+                self.detector.check(second, PHONE + 5, "Apple, Inc.", f"{5:016x}", 6)
+        # Five minutes in it still floods
+        self.assertIn(("oui", "Apple, Inc."), self.detector.floods)
+        self.assertEqual(self.detector.baselines["oui", "Apple, Inc."].mean, before)
+        self.assertEqual(len(self.alerts), 1)
+
+    def test_random_mac_storm(self):
+        self.background(TS, 300)
+        # A phone using a randomized MAC, heard before the storm
+        self.detector.check(TS + 299, RANDOM + 1, "Locally Assigned", NO_STABLE_IES, 11)
+
+        verdicts, returning = [], []
+        mac = RANDOM + 1000
+        for second in range(TS + 300, TS + 305):
+            for i in range(500):
+                channel = (1, 6, 11)[i % 3]
+                fingerprint = f"{self.rng.getrandbits(64):016x}"
+                verdicts.append(
+                    self.detector.check(second, mac, "Locally Assigned", fingerprint, channel)
+                )
+                mac += 1
+            returning.append(
+                self.detector.check(second, RANDOM + 1, "Locally Assigned", NO_STABLE_IES, 11)
+            )
+
+        self.assertIn(("random_mac", ""), self.detector.floods)
+        self.assertGreater(verdicts.count(SHED), 0.9 * len(verdicts))
+        # No single fingerprint floods, each new MAC comes with a new one
+        self.assertFalse(any(kind == "fingerprint" for kind, _ in self.detector.floods))
+        # Past the first 50, nothing of the storm gets through unsampled
+        self.assertNotIn(KEEP, verdicts[50:])
+        # The known random MAC isn't new, but shares the flooding OUI class
+        self.assertNotIn(KEEP, returning)
+        self.assertEqual(len(self.alerts), 1)
+
+    def test_new_devices_exempt(self):
+        new = {f"{0xF00D:016x}"}
+        self.detector.exempt = lambda mac, fingerprint_id: fingerprint_id in new
+        self.background(TS, 300)
+        verdicts, first_heard = [], []
+        for second in range(TS + 300, TS + 303):
+            for i in range(1000):
+                verdicts.append(
+                    self.detector.check(second, PHONE + 99, "Espressif Inc.", "00000000000bad00", 1)
+                )
+                if i % 250 == 0:
+                    # A new device on the flooding OUI and channel
+                    first_heard.append(
+                        self.detector.check(
+                            second, PHONE + 98, "Espressif Inc.", f"{0xF00D:016x}", 1
+                        )
+                    )
+        self.assertGreater(verdicts.count(SHED), 0.9 * len(verdicts))
+        self.assertEqual(set(first_heard), {KEEP})
+
+        # Except for new random MACs in a random-MAC storm
+        new.update(f"{i:032x}" for i in range(1500))
+        storm = [
+            self.detector.check(TS + 310 + i // 500, RANDOM + i, "Locally Assigned", f"{i:032x}", 6)
+            for i in range(1500)
+        ]
+        self.assertGreater(storm.count(SHED), 0.5 * len(storm))
+
+    def test_idle_gap_decays_baselines(self):
+        self.background(TS, 300)
+        self.assertTrue(self.detector.baselines)
+        self.detector.check(TS + 3600, PHONE, "Apple, Inc.", f"{0:016x}", 6)
+        self.detector.check(TS + 3601, PHONE, "Apple, Inc.", f"{0:016x}", 6)
+        # Classes not heard during the gap are forgotten
+        self.assertNotIn(("fingerprint", f"{1:016x}"), self.detector.baselines)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,206 @@
+import unittest
+import os
+import random
+import sys
+import tempfile
+from pathlib import Path
+
+from fastapi.testclient import TestClient
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+from probe_sniffer import config
+from probe_sniffer.api.app import app
+from probe_sniffer.models.probe import Probe
+from probe_sniffer.storage import database
+from probe_sniffer.storage.queries import get_unique_counts, log_sightings_batch
+from probe_sniffer.storage.sketches import rebuild_sketches
+from probe_sniffer.utils.hyperloglog import HyperLogLog, hash64
+from probe_sniffer.utils.time_utils import epoch_to_utc_iso
+
+DAY = 86400
+START = 1759968000  # 2025-10-09 00:00:00 UTC
+
+
+def sketch_of(values, p: int = 12) -> HyperLogLog:
+    sketch = HyperLogLog(p)
+    sketch.update(map(hash64, values))
+    return sketch
+
+
+class TestHyperLogLog(unittest.TestCase):
+    def test_error_bounds(self):
+        # Within 3 standard errors of the exact count, for small and large counts
+        for p in (10, 12):
+            for n in (1, 10, 100, 1_000, 10_000, 100_000):
+                with self.subTest(p=p, n=n):
+                    sketch = sketch_of(range(n), p)
+                    self.assertLessEqual(abs(sketch.estimate() - n), 3 * sketch.relative_error * n)
+
+    def test_error_spread(self):
+        # Over many sketches the error is unbiased with the documented standard error
+        n, errors = 5_000, []
+        for trial in range(50):
+            sketch = sketch_of(range(trial << 32, (trial << 32) + n))
+            errors.append(sketch.estimate() / n - 1)
+        mean = sum(errors) / len(errors)
+        rms = (sum(e * e for e in errors) / len(errors)) ** 0.5
+        self.assertLess(abs(mean), 0.01)
+        self.assertLess(rms, 1.5 * HyperLogLog().relative_error)
+
+    def test_small_counts_exact(self):
+        for n in (0, 1, 2, 5, 20):
+            self.assertEqual(len(sketch_of(range(n))), n)
+
+    def test_duplicates_ignored(self):
+        sketch = sketch_of(range(1000))
+        self.assertFalse(sketch.update(map(hash64, range(1000))))
+        self.assertEqual(len(sketch), len(sketch_of(list(range(1000)) * 3)))
+
+    def test_union_is_lossless(self):
+        rng = random.Random(0)
+        parts = [[rng.getrandbits(48) for _ in range(rng.randint(0, 3000))] for _ in range(24)]
+        union = HyperLogLog.union(sketch_of(part) for part in parts)
+        everything = sketch_of(value for part in parts for value in part)
+        self.assertEqual(union.registers, everything.registers)
+
+        merged = sketch_of(parts[0])
+        merged.merge(sketch_of(parts[1]))
+        self.assertEqual(merged.registers, sketch_of(parts[0] + parts[1]).registers)
+        self.assertEqual(len(HyperLogLog.union([])), 0)
+
+    def test_blob_round_trip(self):
+        for p, n in ((10, 0), (10, 50), (12, 100_000)):
+            sketch = sketch_of(range(n), p)
+            loaded = HyperLogLog.from_blob(sketch.to_blob())
+            self.assertEqual((loaded.p, loaded.registers), (p, sketch.registers))
+        self.assertLess(len(sketch_of(range(10)).to_blob()), 100)
+
+    def test_precision_mismatch(self):
+        with self.assertRaises(ValueError):
+            HyperLogLog.union([HyperLogLog(10), HyperLogLog(12)])
+        with self.assertRaises(ValueError):
+            HyperLogLog(12).merge(HyperLogLog(10))
+
+
+def log(batch):
+    """batch: (ts, mac, ssid, fingerprint) per probe"""
+    probes = [
+        Probe(ts, -60, 6, mac, ssid=ssid, fingerprint=fingerprint)
+        for ts, mac, ssid, fingerprint in batch
+    ]
+    log_sightings_batch(
+        [p.sighting_params() for p in probes],
+        [(p.mac_str, epoch_to_utc_iso(p.ts)) for p in probes],
+        [(p.fingerprint_hex, None, epoch_to_utc_iso(p.ts), 1) for p in probes if p.fingerprint],
+    )
+
+
+class TestSketchStorage(unittest.TestCase):
+    def setUp(self):
+        self.original_path = database.DB_PATH
+        database.DB_PATH = Path(tempfile.mkdtemp()) / "probes.db"
+        database.init_database()
+
+        # Three days of traffic: 2000 devices, each seen in a few random hours, some
+        # with fingerprints, a third of them probing "Home"
+        rng = random.Random(1)
+        self.sightings = []
+        for device in range(2000):
+            mac = 0x020000000000 + device
+            for _ in range(rng.randint(1, 4)):
+                ts = START + rng.randrange(3 * DAY)
+                fingerprint = device.to_bytes(8, "big") if device % 2 else None
+                ssid = "Home" if device % 3 == 0 else "Undirected Probe"
+                self.sightings.append((ts, mac, ssid, fingerprint))
+        self.sightings.sort()
+        for i in range(0, len(self.sightings), 500):
+            log(self.sightings[i : i + 500])
+
+    def tearDown(self):
+        database.DB_PATH = self.original_path
+
+    def exact(self, since, until, column=1, ssid=None):
+        return len(
+            {
+                row[column]
+                for row in self.sightings
+                if since <= row[0] < until and row[column] and (ssid is None or row[2] == ssid)
+            }
+        )
+
+    def assertClose(self, result, exact):
+        error = 3 * result["relative_error"] * exact
+        self.assertLessEqual(abs(result["total"]["estimate"] - exact), max(error, 1))
+
+    def test_ranges_against_exact_counts(self):
+        ranges = [
+            (START, START + 3 * DAY),  # Whole days
+            (START + 5 * 3600, START + 2 * DAY + 7 * 3600),  # Hours at both ends
+            (START + DAY + 3600, START + DAY + 2 * 3600),  # One hour
+        ]
+        for since, until in ranges:
+            with self.subTest(since=since, until=until):
+                macs = get_unique_counts("mac", since, until)
+                self.assertEqual(macs["total"]["since"], epoch_to_utc_iso(since))
+                self.assertEqual(macs["total"]["until"], epoch_to_utc_iso(until))
+                self.assertClose(macs, self.exact(since, until))
+                self.assertClose(
+                    get_unique_counts("fingerprint", since, until), self.exact(since, until, 3)
+                )
+                # Audiences only have day sketches, so the range is rounded out to days
+                home = get_unique_counts("mac", since, until, ssid="Home")
+                day_since, day_until = since - since % DAY, until + (-until % DAY)
+                self.assertEqual(home["total"]["since"], epoch_to_utc_iso(day_since))
+                self.assertClose(home, self.exact(day_since, day_until, ssid="Home"))
+
+    def test_series(self):
+        result = get_unique_counts("mac", START, START + 3 * DAY, step=DAY)
+        self.assertEqual(len(result["buckets"]), 3)
+        for day, bucket in enumerate(result["buckets"]):
+            exact = self.exact(START + day * DAY, START + (day + 1) * DAY)
+            self.assertLessEqual(abs(bucket["estimate"] - exact), 3 * 0.0163 * exact)
+
+    def test_rebuild_matches_incremental(self):
+        with database.get_cursor() as cursor:
+            cursor.execute("SELECT * FROM sketch_day UNION ALL SELECT * FROM sketch_hour")
+            incremental = sorted(map(tuple, cursor.fetchall()))
+        rebuild_sketches(now=START + 3 * DAY)
+        with database.get_cursor() as cursor:
+            cursor.execute("SELECT * FROM sketch_day UNION ALL SELECT * FROM sketch_hour")
+            self.assertEqual(sorted(map(tuple, cursor.fetchall())), incremental)
+
+    def test_old_hours_pruned(self):
+        later = START + (config.SKETCH_HOUR_DAYS + 2) * DAY
+        log([(later, 0x02000000FFFF, "Home", None)])
+        with database.get_cursor() as cursor:
+            cursor.execute("SELECT MIN(bucket_ts) FROM sketch_hour WHERE subject = 'mac'")
+            self.assertGreaterEqual(cursor.fetchone()[0], START + 2 * DAY)
+
+        # The pruned first day's partial range now comes from its day sketch
+        result = get_unique_counts("mac", START + 3600, START + 2 * 3600)
+        self.assertEqual(result["total"]["since"], epoch_to_utc_iso(START))
+        self.assertClose(result, self.exact(START, START + DAY))
+
+    def test_route(self):
+        client = TestClient(app)
+        response = client.get(
+            "/stats/uniques",
+            params={
+                "since": epoch_to_utc_iso(START),
+                "until": epoch_to_utc_iso(START + 2 * DAY),
+                "step": 86400,
+            },
+        )
+        self.assertEqual(response.status_code, 200)
+        body = response.json()
+        self.assertEqual(len(body["buckets"]), 2)
+        self.assertClose(body, self.exact(START, START + 2 * DAY))
+
+        response = client.get("/stats/uniques", params={"subject": "fingerprint", "ssid": "Home"})
+        self.assertEqual(response.status_code, 400)
+        response = client.get("/stats/uniques", params={"step": 60})
+        self.assertEqual(response.status_code, 422)
+
+
+if __name__ == "__main__":
+    unittest.main()
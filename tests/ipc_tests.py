@@ -0,0 +1,143 @@
+import unittest
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+from probe_sniffer import ipc
+from probe_sniffer.api.ipc_server import IpcServer
+
+
+def wait_until(condition, timeout: float = 3) -> bool:
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+class ServerThread:
+    """An IpcServer on its own event loop, as it runs inside the API."""
+
+    def __init__(self, path: str):
+        self.server = IpcServer(path)
+        self.received = []
+        self.server.on(ipc.NOTIFY, lambda payload: self.received.append(json.loads(payload)))
+        self.server.on(ipc.PROBES, self.received.append)
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever, daemon=True)
+        self.thread.start()
+        self.call(self.server.start())
+
+    def call(self, coro):
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result(timeout=3)
+
+    def broadcast(self, kind: int, payload: bytes):
+        async def broadcast():
+            return self.server.broadcast(kind, payload)
+
+        return self.call(broadcast())
+
+    def stop(self):
+        self.call(self.server.close())
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+
+
+class TestFrames(unittest.TestCase):
+    def test_round_trip_split_anywhere(self):
+        frames = [(ipc.NOTIFY, b'{"a":1}'), (ipc.PROBES, b""), (ipc.CONFIG, b"x" * 300)]
+        stream = b"".join(ipc.encode_frame(kind, payload) for kind, payload in frames)
+        reader = ipc.FrameReader()
+        decoded = []
+        for i in range(len(stream)):
+            decoded.extend(reader.feed(stream[i : i + 1]))
+        self.assertEqual(decoded, frames)
+        self.assertEqual(reader.buffer, b"")
+
+    def test_oversized_frame_is_rejected(self):
+        with self.assertRaises(ValueError):
+            ipc.FrameReader().feed(ipc.HEADER.pack(ipc.MAX_FRAME_BYTES + 1, ipc.NOTIFY))
+        with self.assertRaises(ValueError):
+            ipc.encode_frame(ipc.NOTIFY, b"x" * (ipc.MAX_FRAME_BYTES + 1))
+
+    def test_buffers_are_bounded(self):
+        client = ipc.IpcClient(path="/nonexistent", buffer_frames=4)
+        for i in range(10):
+            client.publish_probes([f'{{"n": {i}}}'])
+        client.notify({"fingerprint_id": "ab"}, {}, "new")
+        self.assertEqual(len(client.probes), 4)
+        self.assertEqual(client.dropped, 6)
+        frames = ipc.FrameReader().feed(b"".join(client.probes))
+        self.assertEqual([payload for _, payload in frames][0], b'{"n": 6}')
+        self.assertEqual(len(client.messages), 1)
+
+
+class TestChannel(unittest.TestCase):
+    def setUp(self):
+        self.path = os.path.join(tempfile.mkdtemp(), "ipc.sock")
+        self.server = ServerThread(self.path)
+        self.client = ipc.IpcClient(self.path)
+
+    def tearDown(self):
+        self.client.close()
+        self.server.stop()
+
+    def test_notifications_and_probes_reach_the_api(self):
+        self.client.start()
+        self.client.notify({"fingerprint_id": "ab"}, {"mac": "02:00:00:00:00:aa"}, "new")
+        self.client.publish_probes(['{"mac": "02:00:00:00:00:aa"}', '{"mac": "02:00:00:00:00:bb"}'])
+        self.assertTrue(wait_until(lambda: len(self.server.received) == 2))
+        self.assertEqual(
+            self.server.received,
+            [
+                {
+                    "fingerprint": {"fingerprint_id": "ab"},
+                    "probe_data": {"mac": "02:00:00:00:00:aa"},
+                    "notification_type": "new",
+                },
+                b'{"mac": "02:00:00:00:00:aa"}\n{"mac": "02:00:00:00:00:bb"}',
+            ],
+        )
+
+    def test_config_changes_reach_the_sniffer(self):
+        changes = []
+        self.client.on(ipc.CONFIG, lambda payload: changes.append(json.loads(payload)))
+        self.client.start()
+        self.assertTrue(self.client.connected.wait(3))
+        self.assertTrue(wait_until(lambda: self.server.server.writers))
+
+        message = {"kind": "trusted", "mac": "02:00:00:00:00:aa", "is_trusted": True}
+        self.assertEqual(self.server.broadcast(ipc.CONFIG, ipc.encode_json(message)), 1)
+        self.assertTrue(wait_until(lambda: changes == [message]))
+
+    def test_ping_both_ways(self):
+        pongs = []
+        self.client.on(ipc.PONG, pongs.append)
+        self.server.server.on(ipc.PONG, pongs.append)
+        self.client.start()
+        self.client.send(ipc.PING, b"from sniffer")
+        self.assertTrue(wait_until(lambda: pongs == [b"from sniffer"]))
+        self.server.broadcast(ipc.PING, b"from api")
+        self.assertTrue(wait_until(lambda: pongs == [b"from sniffer", b"from api"]))
+
+    def test_reconnects_and_keeps_notifications(self):
+        self.client.start()
+        self.assertTrue(wait_until(lambda: self.server.server.writers))
+
+        # API restart: messages queued while it is down are delivered afterwards
+        self.server.stop()
+        self.assertTrue(wait_until(lambda: not self.client.connected.is_set()))
+        self.client.notify({"fingerprint_id": "cd"}, {}, "returning")
+        self.server = ServerThread(self.path)
+        self.assertTrue(wait_until(lambda: len(self.server.received) == 1, timeout=10))
+        self.assertEqual(self.server.received[0]["fingerprint"], {"fingerprint_id": "cd"})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,136 @@
+import unittest
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+from probe_sniffer.capture.linker import MacLinker
+from probe_sniffer.models.probe import NO_STABLE_IES
+from probe_sniffer.storage import database
+from probe_sniffer.storage.queries import get_device_identity, log_sightings_batch
+
+START = 1759968000  # 2025-10-09 00:00:00 UTC
+RANDOM = 0x020000000000
+INTEL = 0x0024D7000001
+PHONE_FP = "00000000000000aa"
+
+
+def burst(linker, ts, mac, dbm=-50, ssid="Undirected Probe", fingerprint=PHONE_FP, seq=None):
+    """A scan burst of three probes; returns the identity of the last."""
+    for i in range(3):
+        identity = linker.assign(ts, mac, dbm, ssid, fingerprint, None if seq is None else seq + i)
+    return identity
+
+
+class TestMacLinker(unittest.TestCase):
+    def test_rotation_linked(self):
+        linker = MacLinker()
+        first = burst(linker, START, RANDOM + 1, seq=100)
+        self.assertEqual(first, "rand-020000000001")
+        # Same fingerprint, next sequence numbers, same spot: the MAC rotated
+        self.assertEqual(burst(linker, START + 40, RANDOM + 2, seq=103), first)
+        # The old MAC keeps its identity if heard again
+        self.assertEqual(linker.assign(START + 41, RANDOM + 1, -50, "Home", PHONE_FP), first)
+        # Each MAC is continued once: the next rotation continues the second MAC
+        self.assertEqual(burst(linker, START + 100, RANDOM + 3, seq=106), first)
+        self.assertEqual((linker.linked, linker.created), (2, 1))
+
+    def test_sequence_numbers_without_fingerprint(self):
+        linker = MacLinker()
+        first = burst(linker, START, RANDOM + 1, fingerprint=NO_STABLE_IES, seq=4060)
+        # Wraps around at 4096
+        linked = burst(linker, START + 30, RANDOM + 2, fingerprint=NO_STABLE_IES, seq=4)
+        self.assertEqual(linked, first)
+        # No sequence continuity and no stable IEs: not enough to link
+        other = burst(linker, START + 60, RANDOM + 3, fingerprint=NO_STABLE_IES, seq=900)
+        self.assertEqual(other, "rand-020000000003")
+
+    def test_not_linked(self):
+        linker = MacLinker(window_seconds=300)
+        burst(linker, START, RANDOM + 1)
+        # Different stable IEs are a different device
+        self.assertEqual(
+            burst(linker, START + 10, RANDOM + 2, fingerprint="bb" * 8), "rand-020000000002"
+        )
+        # Out of the window
+        self.assertEqual(burst(linker, START + 400, RANDOM + 3), "rand-020000000003")
+        # Globally unique MACs have no identity
+        self.assertIsNone(linker.assign(START, INTEL, -50, "Home", PHONE_FP))
+
+    def test_same_model_devices(self):
+        linker = MacLinker()
+        near = burst(linker, START, RANDOM + 1, dbm=-40, ssid="Home")
+        far = burst(linker, START, RANDOM + 2, dbm=-80, ssid="Work")
+        # Signal strength and probed SSIDs tell two phones of one model apart
+        self.assertEqual(burst(linker, START + 60, RANDOM + 3, dbm=-78, ssid="Work"), far)
+        self.assertEqual(burst(linker, START + 60, RANDOM + 4, dbm=-43, ssid="Home"), near)
+        # Same model and spot, but nothing else in common: not enough to link
+        self.assertEqual(burst(linker, START + 120, RANDOM + 5, dbm=-43), "rand-020000000005")
+
+        # Two equally likely candidates: ambiguous, so a new identity. MACs heard at
+        # the same time are different devices
+        burst(linker, START + 200, RANDOM + 6, dbm=-60, seq=100)
+        burst(linker, START + 200, RANDOM + 7, dbm=-60, seq=110)
+        new = burst(linker, START + 230, RANDOM + 8, dbm=-60, seq=113)
+        self.assertEqual(new, "rand-020000000008")
+
+    def test_bounded_memory(self):
+        linker = MacLinker(max_tracks=100, memory_seconds=600)
+        for i in range(1000):
+            linker.assign(START + i, RANDOM + i, -50, "Home", f"{i % 7:016x}")
+        self.assertLessEqual(len(linker.tracks), 100)
+        self.assertLessEqual(sum(map(len, linker.open_tracks.values())), 100)
+        # Idle tracks are forgotten
+        linker.assign(START + 5000, RANDOM + 5000, -50, "Home", PHONE_FP)
+        self.assertEqual(list(linker.tracks), [RANDOM + 5000])
+        self.assertEqual(list(linker.open_tracks), [PHONE_FP])
+
+
+class TestIdentityStorage(unittest.TestCase):
+    def setUp(self):
+        self.original_path = database.DB_PATH
+        database.DB_PATH = Path(tempfile.mkdtemp()) / "probes.db"
+        database.init_database()
+
+    def tearDown(self):
+        database.DB_PATH = self.original_path
+
+    def test_identity_written(self):
+        rows = [
+            (START, RANDOM + 1, -50, "Home", "Locally Assigned", PHONE_FP, 6),
+            (START + 60, RANDOM + 2, -50, "Home", "Locally Assigned", PHONE_FP, 6),
+            (START + 60, INTEL, -70, "Work", "Intel Corporate", NO_STABLE_IES, 1),
+        ]
+        identities = {RANDOM + 1: "rand-020000000001", RANDOM + 2: "rand-020000000001"}
+        log_sightings_batch(rows, [], [], identities=identities)
+        shed = [
+            (START + 120, RANDOM + 2, "Home", "Locally Assigned", PHONE_FP, 5, 5, -250, -50, -50)
+        ]
+        log_sightings_batch(rows[1:2], [], [], shed, identities)
+
+        with database.get_cursor() as cursor:
+            cursor.execute(
+                f"SELECT mac, identity_id FROM {database.partition_name(START)} ORDER BY id"
+            )
+            written = [tuple(row) for row in cursor.fetchall()]
+        self.assertEqual(
+            written,
+            [
+                (RANDOM + 1, "rand-020000000001"),
+                (RANDOM + 2, "rand-020000000001"),
+                (INTEL, None),
+                (RANDOM + 2, "rand-020000000001"),
+            ],
+        )
+        identity = get_device_identity("rand-020000000001")
+        # Shed frames move last seen but only stored sightings are counted
+        self.assertEqual(identity["total_sightings"], 3)
+        self.assertEqual(
+            (identity["first_seen"], identity["last_seen"]),
+            ("2025-10-09 00:00:00", "2025-10-09 00:02:00"),
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,142 @@
+import unittest
+import json
+import os
+import sys
+import time
+
+from fastapi.testclient import TestClient
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+from probe_sniffer import ipc
+from probe_sniffer.api import live
+from probe_sniffer.api.app import app
+from probe_sniffer.api.schemas import LiveFilter
+from probe_sniffer.models.probe import Probe
+
+APPLE = "Apple, Inc."
+
+
+def payload(mac: int, dbm: int, oui: str = APPLE) -> str:
+    return Probe(1704067200, dbm, 6, mac, oui=oui, ssid='Café "5G"').live_json()
+
+
+class TestProbeHub(unittest.TestCase):
+    def test_live_payload_is_a_sighting_without_ids(self):
+        probe = Probe(1704067200, -55, 11, 0x0200000000AA, oui=APPLE, ssid='Café "5G"')
+        self.assertEqual(
+            json.loads(probe.live_json()),
+            {
+                "timestamp": "2024-01-01 00:00:00",
+                "mac": "02:00:00:00:00:aa",
+                "rssi": "-55 dBm",
+                "dbm": -55,
+                "ssid": 'Café "5G"',
+                "oui": APPLE,
+                "ie_fingerprint": "no_stable_ies",
+                "channel": 11,
+            },
+        )
+
+    def test_filters(self):
+        hub = live.ProbeHub()
+        hub.set_trusted("02:00:00:00:00:AA", True)
+        everything = hub.subscribe(LiveFilter(hide_trusted=False))
+        untrusted = hub.subscribe(LiveFilter())
+        apple = hub.subscribe(LiveFilter(oui=APPLE))
+        strong = hub.subscribe(LiveFilter(min_dbm=-60))
+
+        hub.publish(payload(0x0200000000AA, -50))
+        hub.publish(payload(0x0200000000BB, -70))
+        hub.publish(payload(0x0200000000CC, -40, oui="Samsung"))
+
+        def macs(subscription):
+            return [json.loads(m)["mac"][-2:] for m in subscription.backlog]
+
+        self.assertEqual(macs(everything), ["aa", "bb", "cc"])
+        self.assertEqual(macs(untrusted), ["bb", "cc"])
+        self.assertEqual(macs(apple), ["bb"])
+        self.assertEqual(macs(strong), ["cc"])
+
+        hub.set_trusted("02:00:00:00:00:aa", False)
+        hub.publish(payload(0x0200000000AA, -50))
+        self.assertEqual(macs(untrusted), ["bb", "cc", "aa"])
+
+    def test_backlog_drops_oldest(self):
+        hub = live.ProbeHub(queue_size=3)
+        slow = hub.subscribe(LiveFilter())
+        for dbm in range(-50, -60, -1):
+            hub.publish(payload(0x0200000000AA, dbm))
+        self.assertEqual([json.loads(m)["dbm"] for m in slow.backlog], [-57, -58, -59])
+        self.assertEqual(slow.dropped, 7)
+        self.assertEqual(hub.published, 10)
+
+    def test_unsubscribe(self):
+        hub = live.ProbeHub()
+        subscription = hub.subscribe(LiveFilter())
+        hub.unsubscribe(subscription)
+        hub.publish(payload(0x0200000000AA, -50))
+        self.assertEqual(len(subscription.backlog), 0)
+
+
+class TestLiveFeedFrames(unittest.TestCase):
+    def test_payloads_are_packed_into_frames(self):
+        client = ipc.IpcClient(path="/nonexistent")
+        payloads = [payload(0x020000000000 + i, -50) for i in range(100)]
+        client.publish_probes(payloads)
+        self.assertLess(len(client.probes), 10)
+
+        hub = live.ProbeHub()
+        subscription = hub.subscribe(LiveFilter())
+        for kind, frame in ipc.FrameReader().feed(b"".join(client.probes)):
+            self.assertEqual(kind, ipc.PROBES)
+            self.assertLessEqual(len(frame), ipc.MAX_PROBES_FRAME_BYTES)
+            hub.publish_lines(frame)
+        self.assertEqual(list(subscription.backlog), payloads)
+
+
+class TestProbeWebSocket(unittest.TestCase):
+    def setUp(self):
+        self.client = TestClient(app)
+
+    def tearDown(self):
+        live.hub.subscriptions.clear()
+        live.hub.trusted.clear()
+
+    def wait_for_subscribers(self, count: int):
+        deadline = time.monotonic() + 2
+        while len(live.hub.subscriptions) < count and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(len(live.hub.subscriptions), count)
+
+    def test_filters_and_filter_updates(self):
+        with self.client.websocket_connect("/ws/probes?min_dbm=-60") as ws:
+            self.wait_for_subscribers(1)
+            ws.portal.call(live.hub.publish, payload(0x0200000000AA, -70))
+            ws.portal.call(live.hub.publish, payload(0x0200000000BB, -50))
+            self.assertEqual(ws.receive_json()["mac"], "02:00:00:00:00:bb")
+
+            ws.send_text(json.dumps({"oui": "Samsung"}))
+            ws.send_text("not json")
+            self.assertIn("error", ws.receive_json())
+            ws.portal.call(live.hub.publish, payload(0x0200000000AA, -70))
+            ws.portal.call(live.hub.publish, payload(0x0200000000CC, -70, oui="Samsung"))
+            self.assertEqual(ws.receive_json()["mac"], "02:00:00:00:00:cc")
+
+        self.wait_for_subscribers(0)
+
+    def test_fan_out(self):
+        with (
+            self.client.websocket_connect("/ws/probes") as first,
+            self.client.websocket_connect("/ws/probes?hide_trusted=false") as second,
+        ):
+            self.wait_for_subscribers(2)
+            live.hub.trusted.add("02:00:00:00:00:aa")
+            first.portal.call(live.hub.publish, payload(0x0200000000AA, -50))
+            first.portal.call(live.hub.publish, payload(0x0200000000BB, -50))
+            self.assertEqual(first.receive_json()["mac"], "02:00:00:00:00:bb")
+            self.assertEqual(second.receive_json()["mac"], "02:00:00:00:00:aa")
+            self.assertEqual(second.receive_json()["mac"], "02:00:00:00:00:bb")
+
+
+if __name__ == "__main__":
+    unittest.main()
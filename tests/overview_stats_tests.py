@@ -0,0 +1,150 @@
+import unittest
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+from fastapi.testclient import TestClient
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+from probe_sniffer.api.app import app
+from probe_sniffer.models.probe import Probe
+from probe_sniffer.storage import database
+from probe_sniffer.storage.queries import get_overview_stats, log_sightings_batch, update_device
+from probe_sniffer.storage.stats import rebuild_overview_stats
+from probe_sniffer.utils.time_utils import eastern_day_start, epoch_to_utc_iso
+
+TS = 1760000000  # Thursday 2025-10-09 04:53:20 Eastern
+DAY = 86400
+PHONE, LAPTOP, WATCH = 0x0200000000AA, 0x0200000000BB, 0x0200000000CC
+STAT_TABLES = (
+    "stat_totals",
+    "stat_periods",
+    "stat_device_days",
+    "stat_minutes",
+    "stat_ouis",
+    "stat_ssids",
+)
+
+
+def stat_rows() -> dict[str, list[tuple]]:
+    with database.get_cursor() as cursor:
+        rows = {}
+        for table in STAT_TABLES:
+            cursor.execute(f"SELECT * FROM {table} ORDER BY 1, 2")
+            rows[table] = [tuple(row) for row in cursor.fetchall()]
+        return rows
+
+
+def log(batch):
+    """batch: (ts, mac, ssid, oui, fingerprint) per probe"""
+    probes = [
+        Probe(ts, -60, 6, mac, oui=oui, ssid=ssid, fingerprint=fingerprint)
+        for ts, mac, ssid, oui, fingerprint in batch
+    ]
+    log_sightings_batch(
+        [p.sighting_params() for p in probes],
+        [(p.mac_str, epoch_to_utc_iso(p.ts)) for p in probes],
+        [(p.fingerprint_hex, None, epoch_to_utc_iso(p.ts), 1) for p in probes if p.fingerprint],
+    )
+
+
+class TestOverviewStats(unittest.TestCase):
+    def setUp(self):
+        self.original_path = database.DB_PATH
+        database.DB_PATH = Path(tempfile.mkdtemp()) / "probes.db"
+        database.init_database()
+
+        log(
+            [
+                (TS, PHONE, "Home", "Apple", b"\x01" * 8),
+                (TS + 10, PHONE, "Home", "Apple", b"\x01" * 8),
+                (TS + 20, LAPTOP, "Undirected Probe", "Dell", None),
+            ]
+        )
+        # Next day: the phone is back, the watch is new
+        log(
+            [
+                (TS + DAY, PHONE, "Work", "Apple", b"\x01" * 8),
+                (TS + DAY + 5, WATCH, "Home", "Apple", b"\x02" * 8),
+                (TS + DAY + 70, WATCH, "Home", "Apple", b"\x02" * 8),
+            ]
+        )
+        self.now = TS + DAY + 90
+
+    def tearDown(self):
+        database.DB_PATH = self.original_path
+
+    def test_overview(self):
+        stats = get_overview_stats(self.now)
+        self.assertEqual(stats["total_devices"], 3)
+        self.assertEqual(stats["total_sightings"], 6)
+        self.assertEqual(stats["total_fingerprints"], 2)
+        self.assertEqual(stats["devices_today"], 2)
+        self.assertEqual(stats["devices_this_week"], 3)
+        self.assertEqual(stats["new_today"], 1)
+        self.assertEqual(stats["new_this_week"], 3)
+        self.assertEqual(stats["new_fingerprints_today"], 1)
+        self.assertEqual(stats["new_fingerprints_this_week"], 2)
+        self.assertEqual(stats["sightings_today"], 3)
+        self.assertEqual(
+            stats["most_active_today"],
+            {"mac": "02:00:00:00:00:cc", "name": None, "sightings": 2},
+        )
+        self.assertEqual(
+            stats["top_manufacturers"], [{"oui": "Apple", "count": 2}, {"oui": "Dell", "count": 1}]
+        )
+        self.assertEqual(
+            stats["top_ssids"], [{"ssid": "Home", "count": 4}, {"ssid": "Work", "count": 1}]
+        )
+        # The first day's probes fell out of the 24-hour window when the second batch came
+        self.assertEqual(sum(stats["probes_by_hour"]), 3)
+        self.assertEqual(stats["probes_by_hour"][-1], 3)
+        self.assertEqual(stats["probes_per_minute"][-3:], [0, 2, 1])
+
+    def test_unique_devices_across_batches(self):
+        log(
+            [
+                (TS + DAY + 80, PHONE, "Home", "Apple", None),
+                (TS + DAY + 85, WATCH, "", "Apple", None),
+            ]
+        )
+        stats = get_overview_stats(self.now)
+        self.assertEqual(stats["devices_today"], 2)
+        self.assertEqual(stats["devices_this_week"], 3)
+        self.assertEqual(stats["new_today"], 1)
+
+        # Monday starts a new week; per-device counts older than yesterday are pruned
+        monday = TS + 4 * DAY
+        log([(monday, LAPTOP, "Home", "Dell", None)])
+        stats = get_overview_stats(monday)
+        self.assertEqual((stats["devices_today"], stats["devices_this_week"]), (1, 1))
+        self.assertEqual((stats["new_today"], stats["new_this_week"]), (0, 0))
+        self.assertEqual(stats["most_active_today"]["mac"], "02:00:00:00:00:bb")
+        with database.get_cursor() as cursor:
+            cursor.execute("SELECT MIN(day_ts) FROM stat_device_days")
+            self.assertEqual(cursor.fetchone()[0], eastern_day_start(monday))
+
+    def test_trusted_counts(self):
+        update_device("02:00:00:00:00:aa", name="Phone", is_trusted=True)
+        update_device("02:00:00:00:00:aa", is_trusted=True)  # No change, no double count
+        stats = get_overview_stats(self.now)
+        self.assertEqual((stats["trusted_count"], stats["unknown_count"]), (1, 2))
+        update_device("02:00:00:00:00:aa", is_trusted=False)
+        self.assertEqual(get_overview_stats(self.now)["trusted_count"], 0)
+
+    def test_rebuild_matches_incremental(self):
+        update_device("02:00:00:00:00:bb", is_trusted=True)
+        incremental = stat_rows()
+        rebuild_overview_stats(self.now)
+        self.assertEqual(stat_rows(), incremental)
+
+    def test_route(self):
+        response = TestClient(app).get("/stats/overview")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["total_devices"], 3)
+        self.assertEqual(len(response.json()["probes_by_hour"]), 24)
+
+
+if __name__ == "__main__":
+    unittest.main()
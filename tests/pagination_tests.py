@@ -0,0 +1,142 @@
+import unittest
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+from probe_sniffer.models.probe import Probe
+from probe_sniffer.storage import database
+from probe_sniffer.storage.queries import (
+    get_fingerprints_page,
+    get_overview_stats,
+    get_sightings,
+    get_sightings_page,
+    log_sightings_batch,
+)
+from probe_sniffer.utils.time_utils import epoch_to_utc_iso
+
+JAN_2024 = 1704067200
+FEB_2024 = 1706745600
+PHONE = 0x0200000000AA
+LAPTOP = 0x0200000000BB
+
+
+def walk(direction: str = "next_cursor", **filters) -> list[list[int]]:
+    """Ids of every page, following one kind of cursor from the first page."""
+    pages, token = [], None
+    while True:
+        page = get_sightings_page(limit=3, cursor_token=token, **filters)
+        pages.append([s["id"] for s in page["sightings"]])
+        token = page[direction]
+        if token is None:
+            return pages
+
+
+class TestKeysetPagination(unittest.TestCase):
+    def setUp(self):
+        self.original_path = database.DB_PATH
+        database.DB_PATH = Path(tempfile.mkdtemp()) / "probes.db"
+        database.init_database()
+
+        # 8 sightings over two partitions, several sharing a timestamp
+        probes = [Probe(JAN_2024 + 60 * (i // 2), -50, 6, PHONE) for i in range(5)]
+        probes += [Probe(FEB_2024 + i, -60, 6, LAPTOP) for i in range(3)]
+        log_sightings_batch(
+            [p.sighting_params() for p in probes],
+            [(p.mac_str, epoch_to_utc_iso(p.ts)) for p in probes],
+            [],
+        )
+
+    def tearDown(self):
+        database.DB_PATH = self.original_path
+
+    def test_pages_match_offset_order(self):
+        for order in ("DESC", "ASC"):
+            expected = [s["id"] for s in get_sightings(order=order)[0]]
+            pages = walk(order=order)
+            self.assertEqual([len(p) for p in pages], [3, 3, 2])
+            self.assertEqual(sum(pages, []), expected)
+
+    def test_prev_cursor_walks_back(self):
+        last = get_sightings_page(limit=3)
+        while last["next_cursor"]:
+            first_of_last = last
+            last = get_sightings_page(limit=3, cursor_token=last["next_cursor"])
+        back = get_sightings_page(limit=3, cursor_token=last["prev_cursor"])
+        self.assertEqual(back["sightings"], first_of_last["sightings"])
+        self.assertIsNotNone(back["next_cursor"])
+
+        first = get_sightings_page(limit=3, cursor_token=back["prev_cursor"])
+        self.assertIsNone(first["prev_cursor"])
+        self.assertEqual(first["sightings"], get_sightings_page(limit=3)["sightings"])
+
+    def test_filters_apply_to_every_page(self):
+        pages = walk(mac="02:00:00:00:00:aa", order="ASC")
+        self.assertEqual([len(p) for p in pages], [3, 2])
+        self.assertTrue(all(i >> 32 == 202401 for i in sum(pages, [])))
+
+    def test_exact_totals_from_counters(self):
+        page = get_sightings_page()
+        self.assertEqual((page["total"], page["total_is_approximate"]), (8, False))
+        page = get_sightings_page(mac="02:00:00:00:00:bb")
+        self.assertEqual((page["total"], page["total_is_approximate"]), (3, False))
+
+        # The compatibility view's INSERT trigger keeps the counters too
+        with database.get_cursor() as cursor:
+            cursor.execute(
+                "INSERT INTO sightings (timestamp, mac, dbm) VALUES (?, '02:00:00:00:00:bb', -70)",
+                (epoch_to_utc_iso(FEB_2024 + 60),),
+            )
+        self.assertEqual(get_sightings_page()["total"], 9)
+
+    def test_time_range_totals_are_estimates(self):
+        page = get_sightings_page(since=FEB_2024)
+        self.assertEqual((page["total"], page["total_is_approximate"]), (3, False))
+
+        page = get_sightings_page(since=JAN_2024, until=JAN_2024 + 60)
+        self.assertTrue(page["total_is_approximate"])
+        self.assertEqual(len(page["sightings"]), 2)
+
+        page = get_sightings_page(mac="02:00:00:00:00:aa", since=JAN_2024, until=JAN_2024 + 3600)
+        self.assertEqual((page["total"], page["total_is_approximate"]), (5, True))
+
+    def test_invalid_cursor(self):
+        for token in ("not a cursor", "eDox", ""):
+            with self.assertRaises(ValueError):
+                get_sightings_page(cursor_token=token or "=")
+
+    def test_fingerprint_pages(self):
+        log_sightings_batch(
+            [],
+            [],
+            [(f"{i:016x}", None, epoch_to_utc_iso(JAN_2024), i % 3 + 1) for i in range(7)],
+        )
+        page = get_fingerprints_page(limit=3)
+        self.assertEqual((page["total"], page["prev_cursor"]), (7, None))
+        seen = [f["fingerprint_id"] for f in page["fingerprints"]]
+        while page["next_cursor"]:
+            page = get_fingerprints_page(limit=3, cursor_token=page["next_cursor"])
+            seen += [f["fingerprint_id"] for f in page["fingerprints"]]
+        self.assertEqual(len(set(seen)), 7)
+
+        back = get_fingerprints_page(limit=3, cursor_token=page["prev_cursor"])
+        self.assertEqual(len(back["fingerprints"]), 3)
+        counts = [f["sighting_count"] for f in back["fingerprints"]]
+        self.assertEqual(counts, sorted(counts, reverse=True))
+
+    def test_fingerprint_total_after_delete(self):
+        log_sightings_batch(
+            [], [], [(f"{i:016x}", None, epoch_to_utc_iso(JAN_2024), 1) for i in range(4)]
+        )
+        # As when a merge or pruning removes a fingerprint that isn't the newest
+        with database.get_cursor() as cursor:
+            cursor.execute(
+                "DELETE FROM device_fingerprints WHERE fingerprint_id = ?", (f"{1:016x}",)
+            )
+        self.assertEqual(get_fingerprints_page()["total"], 3)
+        self.assertEqual(get_overview_stats()["total_fingerprints"], 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
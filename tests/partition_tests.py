@@ -0,0 +1,154 @@
+import unittest
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+from probe_sniffer.models.probe import Probe
+from probe_sniffer.storage import database
+from probe_sniffer.storage.queries import (
+    get_device_sighting_stats,
+    get_recent_sightings,
+    get_sightings,
+    get_sightings_page,
+    log_sighting,
+)
+from probe_sniffer.storage.schema import SIGHTING_TABLE
+
+MAC = 0xAABBCCDDEEFF
+JAN_2024 = 1704067200
+FEB_2024 = 1706745600
+MAR_2024 = 1709251200
+
+
+def partitions() -> list[str]:
+    with database.get_cursor() as cursor:
+        cursor.execute("SELECT name FROM sighting_partitions ORDER BY start_ts")
+        return [row["name"] for row in cursor.fetchall()]
+
+
+class TestPartitions(unittest.TestCase):
+    def setUp(self):
+        self.original_path = database.DB_PATH
+        database.DB_PATH = Path(tempfile.mkdtemp()) / "probes.db"
+        database.init_database()
+        for ts in (JAN_2024, JAN_2024 + 60, FEB_2024, MAR_2024):
+            log_sighting(Probe(ts, -50, 6, MAC, oui="Apple, Inc.", ssid=f"Net {ts}"))
+
+    def tearDown(self):
+        database.DB_PATH = self.original_path
+
+    def test_month_bounds(self):
+        self.assertEqual(database.partition_name(FEB_2024 - 1), "sighting_log_202401")
+        self.assertEqual(database.month_bounds("sighting_log_202401"), (JAN_2024, FEB_2024))
+        self.assertEqual(database.month_bounds("sighting_log_202312")[1], JAN_2024)
+
+    def test_rows_routed_by_month(self):
+        self.assertIn("sighting_log_202401", partitions())
+        with database.get_cursor() as cursor:
+            cursor.execute("SELECT COUNT(*) FROM sighting_log_202401")
+            self.assertEqual(cursor.fetchone()[0], 2)
+
+    def test_ids_increase_across_partitions(self):
+        sightings, total = get_sightings(order="ASC")
+        self.assertEqual(total, 4)
+        ids = [s["id"] for s in sightings]
+        self.assertEqual(ids, sorted(ids))
+        self.assertEqual(ids[2] >> 32, 202402)
+
+    def test_time_range(self):
+        sightings, total = get_sightings(since=FEB_2024, until=MAR_2024 + 1)
+        self.assertEqual(total, 2)
+        self.assertEqual(
+            [s["timestamp"] for s in sightings], ["2024-03-01 00:00:00", "2024-02-01 00:00:00"]
+        )
+
+    def test_pagination_spans_partitions(self):
+        sightings, total = get_sightings(limit=2, offset=1, order="ASC")
+        self.assertEqual(total, 4)
+        self.assertEqual(
+            [s["timestamp"] for s in sightings], ["2024-01-01 00:01:00", "2024-02-01 00:00:00"]
+        )
+        self.assertEqual(len(get_recent_sightings(limit=3)), 3)
+
+    def test_device_stats_across_partitions(self):
+        stats = get_device_sighting_stats("aa:bb:cc:dd:ee:ff")
+        self.assertEqual(stats["total_sightings"], 4)
+        self.assertEqual(stats["avg_signal_dbm"], -50)
+        self.assertEqual(len(stats["ssids"]), 4)
+
+    def test_view_covers_all_partitions(self):
+        with database.get_cursor() as cursor:
+            cursor.execute("SELECT COUNT(*) FROM sightings")
+            self.assertEqual(cursor.fetchone()[0], 4)
+
+    def test_retention_drops_whole_partitions(self):
+        dropped = database.drop_expired_partitions(retention_months=1)
+        self.assertEqual(
+            dropped, ["sighting_log_202401", "sighting_log_202402", "sighting_log_202403"]
+        )
+        self.assertEqual(partitions(), [database.partition_name(int(time.time()))])
+        self.assertEqual(get_sightings()[1], 0)
+        with database.get_cursor() as cursor:
+            cursor.execute("SELECT COUNT(*) FROM sightings")
+            self.assertEqual(cursor.fetchone()[0], 0)
+
+    def test_retention_disabled(self):
+        self.assertEqual(database.drop_expired_partitions(retention_months=0), [])
+
+
+class TestUnpartitionedUpgrade(unittest.TestCase):
+    def setUp(self):
+        self.original_path = database.DB_PATH
+        database.DB_PATH = Path(tempfile.mkdtemp()) / "probes.db"
+
+    def tearDown(self):
+        database.DB_PATH = self.original_path
+
+    def test_existing_sighting_log_is_registered(self):
+        conn = sqlite3.connect(database.DB_PATH)
+        conn.executescript(SIGHTING_TABLE.format(table="sighting_log"))
+        conn.execute("INSERT INTO sighting_log (ts, mac, dbm) VALUES (?, ?, -60)", (JAN_2024, MAC))
+        conn.commit()
+        conn.close()
+
+        database.init_database()
+        log_sighting(Probe(int(time.time()), -40, 6, MAC))
+
+        self.assertEqual(partitions()[0], "sighting_log")
+        sightings, total = get_sightings(order="ASC")
+        self.assertEqual(total, 2)
+        self.assertEqual([s["dbm"] for s in sightings], [-60, -40])
+        self.assertEqual(get_sightings_page()["total"], 2)
+
+    def test_old_table_gains_channel_and_filter_indexes(self):
+        conn = sqlite3.connect(database.DB_PATH)
+        conn.executescript("""
+            CREATE TABLE sighting_log (
+                id INTEGER PRIMARY KEY AUTOINCREMENT, ts INTEGER NOT NULL,
+                mac INTEGER NOT NULL, dbm INTEGER, ssid_id INTEGER, oui_id INTEGER,
+                ie_fingerprint TEXT, identity_id TEXT
+            );
+            CREATE INDEX idx_sighting_log_fingerprint ON sighting_log(ie_fingerprint);
+            INSERT INTO sighting_log (ts, mac, dbm) VALUES (1704067200, 1, -60);
+        """)
+        conn.commit()
+        conn.close()
+
+        database.init_database()
+        log_sighting(Probe(int(time.time()), -40, 11, MAC))
+
+        sightings, _ = get_sightings(order="ASC")
+        self.assertEqual([s["channel"] for s in sightings], [None, 11])
+        with database.get_cursor() as cursor:
+            cursor.execute("SELECT name FROM sqlite_master WHERE tbl_name = 'sighting_log'")
+            indexes = {row["name"] for row in cursor.fetchall()}
+        self.assertIn("idx_sighting_log_ssid_ts", indexes)
+        self.assertNotIn("idx_sighting_log_fingerprint", indexes)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,76 @@
+import unittest
+import json
+import os
+import sys
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+from probe_sniffer.models.probe import NO_STABLE_IES, Probe
+from probe_sniffer.utils.mac_utils import int_to_mac, is_locally_administered, mac_to_int
+
+# 2025-10-09 08:53:20 UTC / 04:53:20 Eastern
+TS = 1760000000
+
+
+def make_probe(**kwargs) -> Probe:
+    fields = {
+        "oui": "Locally Assigned",
+        "ssid": "Red Sox-2.4",
+        "fingerprint": bytes.fromhex("0123456789abcdef"),
+    }
+    fields.update(kwargs)
+    return Probe(TS, -77, 8, 0xE21D5E173F0D, **fields)
+
+
+class TestMacUtils(unittest.TestCase):
+    def test_round_trip(self):
+        self.assertEqual(int_to_mac(mac_to_int("E2:1D:5E:17:3F:0D")), "e2:1d:5e:17:3f:0d")
+
+    def test_leading_zeros(self):
+        self.assertEqual(int_to_mac(1), "00:00:00:00:00:01")
+
+    def test_locally_administered(self):
+        self.assertTrue(is_locally_administered(mac_to_int("e2:1d:5e:17:3f:0d")))
+        self.assertFalse(is_locally_administered(mac_to_int("10:3d:1c:cf:3d:61")))
+
+
+class TestProbe(unittest.TestCase):
+    def test_immutable(self):
+        probe = make_probe()
+        with self.assertRaises(AttributeError):
+            probe.ssid = "Other"
+
+    def test_slotted(self):
+        self.assertFalse(hasattr(make_probe(), "__dict__"))
+
+    def test_to_csv(self):
+        self.assertEqual(
+            make_probe().to_csv(),
+            "2025-10-09 04:53:20,-77 dBm,Ch: 8,e2:1d:5e:17:3f:0d,Locally Assigned,Red Sox-2.4",
+        )
+
+    def test_mqtt_json_matches_json_dumps(self):
+        probe = make_probe(ssid='Quote "me" é')
+        expected = json.dumps(
+            {
+                "timestamp": "2025-10-09 04:53:20",
+                "rssi": -77,
+                "channel": 8,
+                "MAC": "e2:1d:5e:17:3f:0d",
+                "clientOUI": "Locally Assigned",
+                "SSID": 'Quote "me" é',
+            }
+        )
+        self.assertEqual(probe.mqtt_json(), expected)
+
+    def test_sighting_params(self):
+        self.assertEqual(
+            make_probe().sighting_params(),
+            (TS, 0xE21D5E173F0D, -77, "Red Sox-2.4", "Locally Assigned", "0123456789abcdef", 8),
+        )
+
+    def test_no_stable_ies(self):
+        self.assertEqual(make_probe(fingerprint=None).fingerprint_hex, NO_STABLE_IES)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,117 @@
+import unittest
+import itertools
+import os
+import re
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+from probe_sniffer.models.probe import Probe
+from probe_sniffer.storage import database
+from probe_sniffer.storage.filters import SightingFilter
+from probe_sniffer.storage.queries import (
+    _keyset_condition,
+    get_sightings_page,
+    log_sightings_batch,
+    sighting_page_query,
+)
+
+TS = 1760000000  # 2025-10-09 08:53:20 UTC
+MAC = 0x0200000000AA
+
+# One value per supported filter
+FILTERS = {
+    "mac": "02:00:00:00:00:aa",
+    "since": TS - 3600,
+    "until": TS + 3600,
+    "min_dbm": -60,
+    "max_dbm": -40,
+    "oui": "Apple, Inc.",
+    "ssid": "HOME-5G",
+    "fingerprint": "0123456789abcdef",
+    "identity": "identity-1",
+    "channel": 6,
+    "randomized": True,
+}
+
+# A bare "SCAN s" reads the whole partition; "SCAN s USING INDEX" walks an index in
+# ts order and stops at the page size
+FULL_SCAN = re.compile(r"\bSCAN s\b(?! USING)")
+SORT = "USE TEMP B-TREE FOR ORDER BY"
+
+
+class TestSightingQueryPlans(unittest.TestCase):
+    """Every filter combination of the sightings API must be served by an index."""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.original_path = database.DB_PATH
+        database.DB_PATH = Path(tempfile.mkdtemp()) / "probes.db"
+        database.init_database()
+        probe = Probe(
+            TS,
+            -50,
+            6,
+            MAC,
+            oui="Apple, Inc.",
+            ssid="HOME-5G",
+            fingerprint=bytes.fromhex(FILTERS["fingerprint"]),
+        )
+        log_sightings_batch([probe.sighting_params()], [], [])
+
+        with database.get_cursor() as cursor:
+            cursor.execute("SELECT name FROM sighting_partitions")
+            cls.partition = cursor.fetchone()["name"]
+
+    @classmethod
+    def tearDownClass(cls):
+        database.DB_PATH = cls.original_path
+
+    def plan(self, sql: str, params: list) -> str:
+        with database.get_cursor() as cursor:
+            cursor.execute(f"EXPLAIN QUERY PLAN {sql}", params)
+            return "\n".join(row["detail"] for row in cursor.fetchall())
+
+    def assert_indexed(self, filters: dict):
+        with database.get_cursor() as cursor:
+            conditions, params = SightingFilter(**filters).compile(cursor)
+
+        for descending, cursor_key in itertools.product((True, False), (None, (TS, 1))):
+            page_conditions, page_params = list(conditions), list(params)
+            if cursor_key:
+                page_conditions.append(_keyset_condition("s.ts", "s.id", descending))
+                page_params += [cursor_key[0], cursor_key[0], cursor_key[1]]
+            sql = sighting_page_query(page_conditions, descending).format(partition=self.partition)
+            plan = self.plan(sql, page_params + [100])
+            with self.subTest(filters=sorted(filters), descending=descending, cursor=cursor_key):
+                self.assertNotRegex(plan, FULL_SCAN)
+                self.assertNotIn(SORT, plan)
+
+    def test_each_filter(self):
+        for name, value in FILTERS.items():
+            self.assert_indexed({name: value})
+
+    def test_filter_pairs(self):
+        for a, b in itertools.combinations(FILTERS, 2):
+            self.assert_indexed({a: FILTERS[a], b: FILTERS[b]})
+
+    def test_all_filters(self):
+        self.assert_indexed(FILTERS)
+
+    def test_unfiltered(self):
+        self.assert_indexed({})
+
+    def test_filters_match(self):
+        page = get_sightings_page(**{k: v for k, v in FILTERS.items() if k != "identity"})
+        self.assertEqual(len(page["sightings"]), 1)
+        self.assertEqual(page["sightings"][0]["channel"], 6)
+        self.assertEqual((page["total"], page["total_is_approximate"]), (1, False))
+
+        for name, value in (("ssid", "Never seen"), ("randomized", False), ("channel", 11)):
+            with self.subTest(name=name):
+                self.assertEqual(get_sightings_page(**{name: value})["sightings"], [])
+
+
+if __name__ == "__main__":
+    unittest.main()
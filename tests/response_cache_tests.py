@@ -0,0 +1,160 @@
+import unittest
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+from fastapi.testclient import TestClient
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+from probe_sniffer.api import cache
+from probe_sniffer.api.app import app
+from probe_sniffer.models.probe import Probe
+from probe_sniffer.storage import database
+from probe_sniffer.storage.queries import (
+    create_device_identity,
+    get_table_versions,
+    log_sightings_batch,
+    update_device,
+)
+from probe_sniffer.storage.schema import VERSIONED_TABLES
+from probe_sniffer.utils.time_utils import epoch_to_utc_iso
+
+TS = 1760000000  # 2025-10-09 08:53:20 UTC
+
+
+def log(ts: int, mac: int):
+    probe = Probe(ts, -50, 6, mac, fingerprint=b"\x01" * 8)
+    log_sightings_batch(
+        [probe.sighting_params()],
+        [(probe.mac_str, epoch_to_utc_iso(ts))],
+        [(probe.fingerprint_hex, None, epoch_to_utc_iso(ts), 1)],
+    )
+
+
+class TestTableVersions(unittest.TestCase):
+    def setUp(self):
+        self.original_path = database.DB_PATH
+        database.DB_PATH = Path(tempfile.mkdtemp()) / "probes.db"
+        database.init_database()
+
+    def tearDown(self):
+        database.DB_PATH = self.original_path
+
+    def test_writes_bump_only_their_tables(self):
+        before = get_table_versions(VERSIONED_TABLES)
+        self.assertEqual(set(before), set(VERSIONED_TABLES))
+
+        log(TS, 0x0200000000AA)
+        after = get_table_versions(VERSIONED_TABLES)
+        for table in ("devices", "device_summary", "device_fingerprints"):
+            self.assertGreater(after[table], before[table], table)
+        self.assertEqual(after["device_identities"], before["device_identities"])
+
+        create_device_identity("phone")
+        self.assertGreater(
+            get_table_versions(["device_identities"])["device_identities"],
+            after["device_identities"],
+        )
+
+    def test_migration_is_idempotent(self):
+        update_device("02:00:00:00:00:aa", name="nobody")  # No row: no bump
+        versions = get_table_versions(VERSIONED_TABLES)
+        database.migrate_to_table_versions()
+        self.assertEqual(get_table_versions(VERSIONED_TABLES), versions)
+
+
+class TestResponseCache(unittest.TestCase):
+    def setUp(self):
+        self.original_path = database.DB_PATH
+        database.DB_PATH = Path(tempfile.mkdtemp()) / "probes.db"
+        database.init_database()
+        log(TS, 0x0200000000AA)
+        log(TS + 60, 0x0200000000BB)
+
+        cache.cache.clear()
+        self.original_max_entries = cache.cache.max_entries
+        cache.cache.max_entries = 4
+        self.client = TestClient(app)
+
+    def tearDown(self):
+        database.DB_PATH = self.original_path
+        cache.cache.max_entries = self.original_max_entries
+
+    def test_conditional_get(self):
+        first = self.client.get("/devices/", params={"sort": "mac", "order": "ASC"})
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(
+            [d["mac"] for d in first.json()], ["02:00:00:00:00:aa", "02:00:00:00:00:bb"]
+        )
+        self.assertIs(first.json()[0]["is_trusted"], False)
+        etag = first.headers["ETag"]
+
+        again = self.client.get(
+            "/devices/", params={"sort": "mac", "order": "ASC"}, headers={"If-None-Match": etag}
+        )
+        self.assertEqual(again.status_code, 304)
+        self.assertEqual(again.headers["ETag"], etag)
+        self.assertEqual(again.content, b"")
+
+        # Served from the LRU, headers included
+        hit = self.client.get("/devices/", params={"sort": "mac", "order": "ASC"})
+        self.assertEqual(hit.content, first.content)
+        self.assertEqual(hit.headers["X-Total-Count"], "2")
+
+        update_device("02:00:00:00:00:aa", name="Phone")
+        changed = self.client.get(
+            "/devices/", params={"sort": "mac", "order": "ASC"}, headers={"If-None-Match": etag}
+        )
+        self.assertEqual(changed.status_code, 200)
+        self.assertNotEqual(changed.headers["ETag"], etag)
+        self.assertEqual(changed.json()[0]["name"], "Phone")
+
+        stats = self.client.get("/metrics/cache").json()
+        self.assertEqual((stats["misses"], stats["hits"], stats["not_modified"]), (2, 1, 1))
+        self.assertEqual(stats["hit_rate"], 0.5)
+        self.assertEqual(stats["saved_bytes"], len(first.content))
+
+    def test_etag_depends_on_the_url_and_its_tables(self):
+        devices = self.client.get("/devices/").headers["ETag"]
+        identities = self.client.get("/identities/").headers["ETag"]
+        self.assertNotEqual(
+            devices, self.client.get("/devices/", params={"limit": 1}).headers["ETag"]
+        )
+
+        # Sightings change devices but not identities
+        log(TS + 120, 0x0200000000CC)
+        self.assertNotEqual(self.client.get("/devices/").headers["ETag"], devices)
+        response = self.client.get("/identities/", headers={"If-None-Match": f"W/{identities}"})
+        self.assertEqual(response.status_code, 304)
+
+    def test_errors_are_not_cached(self):
+        self.assertEqual(self.client.get("/identities/phone").status_code, 404)
+        create_device_identity("phone", alias="Phone")
+        response = self.client.get("/identities/phone")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["alias"], "Phone")
+        self.assertEqual(
+            self.client.get("/fingerprints/", params={"cursor": "junk"}).status_code, 400
+        )
+
+    def test_if_none_match_any(self):
+        # * only matches a resource that exists
+        missing = self.client.get("/identities/phone", headers={"If-None-Match": "*"})
+        self.assertEqual(missing.status_code, 404)
+        create_device_identity("phone", alias="Phone")
+        for _ in range(2):  # Built, then cached
+            response = self.client.get("/identities/phone", headers={"If-None-Match": "*"})
+            self.assertEqual(response.status_code, 304)
+            self.assertEqual(response.content, b"")
+
+    def test_lru_eviction(self):
+        for limit in range(1, 7):
+            self.client.get("/fingerprints/", params={"limit": limit})
+        self.assertEqual(len(cache.cache.entries), 4)
+        self.assertEqual(cache.cache.evictions, 2)
+        self.assertEqual(next(iter(cache.cache.entries)), "/fingerprints/?limit=3")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,82 @@
+import unittest
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+from probe_sniffer.models.probe import Probe
+from probe_sniffer.storage import database
+from probe_sniffer.storage.queries import get_activity, log_sightings_batch
+from probe_sniffer.storage.rollups import compact_rollups, rebuild_rollups
+
+MAC = 0x0200000000AA
+FP = bytes.fromhex("0123456789abcdef")
+# Top of the hour two hours ago, so every sighting below is in the past
+NOW = int(time.time())
+HOUR = NOW - NOW % 3600 - 2 * 3600
+
+
+def table_count(table: str) -> int:
+    with database.get_cursor() as cursor:
+        cursor.execute(f"SELECT COALESCE(SUM(count), 0) FROM {table}")
+        return cursor.fetchone()[0]
+
+
+class TestRollups(unittest.TestCase):
+    def setUp(self):
+        self.original_path = database.DB_PATH
+        database.DB_PATH = Path(tempfile.mkdtemp()) / "probes.db"
+        database.init_database()
+
+        # 3 frames in the first minute, 1 frame 30 minutes later
+        probes = [
+            Probe(HOUR, -60, 6, MAC, fingerprint=FP),
+            Probe(HOUR + 10, -40, 6, MAC, fingerprint=FP),
+            Probe(HOUR + 20, -50, 6, MAC),
+            Probe(HOUR + 1800, -70, 6, MAC, fingerprint=FP),
+        ]
+        log_sightings_batch([p.sighting_params() for p in probes], [], [])
+
+    def tearDown(self):
+        database.DB_PATH = self.original_path
+
+    def test_minute_buckets(self):
+        activity = get_activity("mac", MAC, since=HOUR, until=HOUR + 3600)
+        self.assertEqual(activity["resolution"], "minute")
+        self.assertEqual([b["count"] for b in activity["buckets"]], [3, 1])
+        first = activity["buckets"][0]
+        self.assertEqual((first["avg_dbm"], first["min_dbm"], first["max_dbm"]), (-50, -60, -40))
+
+    def test_fingerprint_buckets(self):
+        activity = get_activity("fingerprint", FP.hex(), since=HOUR, until=HOUR + 3600)
+        self.assertEqual([b["count"] for b in activity["buckets"]], [2, 1])
+
+    def test_range_picks_resolution(self):
+        activity = get_activity("mac", MAC)
+        self.assertEqual(activity["resolution"], "hour")
+        self.assertEqual([b["count"] for b in activity["buckets"]], [4])
+        self.assertEqual(sum(activity["by_hour"]), 4)
+        self.assertEqual(sum(activity["by_day_of_week"]), 4)
+        self.assertEqual(len(activity["by_date"]), 31)
+        self.assertEqual(get_activity("mac", MAC, since=NOW - 90 * 86400)["resolution"], "day")
+
+    def test_compaction_keeps_counts(self):
+        compact_rollups(now=NOW + 200 * 86400)
+        self.assertEqual(table_count("mac_activity_minute"), 0)
+        self.assertEqual(table_count("mac_activity_day"), 4)
+
+        activity = get_activity("mac", MAC, since=HOUR, until=HOUR + 3600)
+        self.assertEqual([b["count"] for b in activity["buckets"]], [4])
+        self.assertEqual(activity["buckets"][0]["min_dbm"], -70)
+
+    def test_rebuild_matches_incremental(self):
+        before = get_activity("mac", MAC, since=HOUR, until=HOUR + 3600)
+        rebuild_rollups()
+        self.assertEqual(get_activity("mac", MAC, since=HOUR, until=HOUR + 3600), before)
+        self.assertEqual(table_count("fingerprint_activity_minute"), 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
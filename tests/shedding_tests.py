@@ -0,0 +1,150 @@
+import unittest
+import os
+import random
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+from probe_sniffer.capture.shedding import LoadShedder
+from probe_sniffer.models.probe import NO_STABLE_IES
+from probe_sniffer.storage import database
+from probe_sniffer.storage.queries import log_sightings_batch
+from probe_sniffer.utils.mac_utils import int_to_mac
+from probe_sniffer.utils.time_utils import epoch_to_utc_iso
+
+START = 1759968000  # 2025-10-09 00:00:00 UTC
+PHONE = 0x3C0754000000
+
+
+def sighting(ts, device, dbm=-60, ssid="Home"):
+    fingerprint = f"{device:016x}" if device % 3 else NO_STABLE_IES
+    return (ts, PHONE + device, dbm, ssid, "Apple, Inc.", fingerprint, 6)
+
+
+class TestLoadShedder(unittest.TestCase):
+    def test_level_follows_backlog(self):
+        shedder = LoadShedder(target_latency=2.0, max_queue=4, max_level=3)
+        self.assertEqual(shedder.observe(0, 0.5), 0)
+        self.assertEqual(shedder.observe(6, 0.5), 1)  # Queue over target
+        self.assertEqual(shedder.observe(0, 3.0), 2)  # Latency over target
+        self.assertEqual(shedder.observe(8, 9.0), 3)
+        self.assertEqual(shedder.observe(8, 9.0), 3)  # Capped
+        self.assertEqual(shedder.observe(3, 1.5), 3)  # Between half and the target: hold
+        self.assertEqual(shedder.observe(1, 0.5), 2)
+        self.assertEqual(shedder.observe(0, 0.1), 1)
+
+    def test_new_devices_kept(self):
+        shedder = LoadShedder()
+        shedder.level = 6
+        # A device's whole first minute is kept, however busy
+        first_minute = [sighting(START + i % 60, 1) for i in range(100)]
+        kept, shed = shedder.filter(first_minute)
+        self.assertEqual(len(kept), 100)
+        self.assertEqual(shed, [])
+
+        # Next minute it is known: its first frame, then 1 in 64
+        kept, shed = shedder.filter([sighting(START + 60 + i % 60, 1) for i in range(200)])
+        self.assertEqual(len(kept), 4)  # Frames 0, 64, 128 and 192
+        self.assertEqual(sum(row[5] for row in shed), 196)
+
+        # A new fingerprint on a known MAC is kept too
+        kept, _ = shedder.filter([sighting(START + 61, 1)] * 3 + [sighting(START + 61, 2)] * 3)
+        self.assertEqual(kept, [sighting(START + 61, 2)] * 3)
+
+    def test_level_zero_keeps_everything(self):
+        shedder = LoadShedder()
+        rows = [sighting(START + i, i % 5) for i in range(600)]
+        self.assertEqual(shedder.filter(rows), (rows, []))
+        self.assertEqual(shedder.shed_total, 0)
+
+    def test_shed_aggregates(self):
+        shedder = LoadShedder()
+        shedder.filter([sighting(START, 1)])
+        shedder.level = 1
+        kept, shed = shedder.filter(
+            [sighting(START + 60, 1, dbm) for dbm in (-50, -70, -40, -80, -60)]
+        )
+        self.assertEqual([row[2] for row in kept], [-50, -40, -60])
+        minute, mac, ssid, oui, fingerprint, count, dbm_count, dbm_sum, low, high = shed[0]
+        self.assertEqual((minute, mac, count), (START + 60, PHONE + 1, 2))
+        self.assertEqual((dbm_count, dbm_sum, low, high), (2, -150, -80, -70))
+
+
+class TestShedCounts(unittest.TestCase):
+    """Counters built from a shed stream match the ones built from the whole stream."""
+
+    COMPARED = {
+        "mac_activity_minute": "SELECT * FROM mac_activity_minute",
+        "fingerprint_activity_minute": "SELECT * FROM fingerprint_activity_minute",
+        # The latest sighting may have been shed, the counts must not be
+        "device_summary": (
+            "SELECT mac, oui, ssids, total_sightings, dbm_sum, dbm_count FROM device_summary"
+        ),
+        "stat_periods": "SELECT * FROM stat_periods",
+        "stat_minutes": "SELECT * FROM stat_minutes",
+        "stat_device_days": "SELECT * FROM stat_device_days",
+        "stat_ssids": "SELECT ssid, sightings FROM stat_ssids JOIN ssids USING (ssid_id)",
+        "stat_ouis": "SELECT oui, devices FROM stat_ouis JOIN ouis USING (oui_id)",
+        "sketches": "SELECT * FROM sketch_hour UNION ALL SELECT * FROM sketch_day",
+        # Shed frames only tell their minute, so a visit's end may come earlier
+        "visits": "SELECT mac, frame_count, min_dbm, max_dbm, dbm_sum, ssids FROM visits",
+    }
+
+    def setUp(self):
+        self.original_path = database.DB_PATH
+
+    def tearDown(self):
+        database.DB_PATH = self.original_path
+
+    def write(self, batches, shedder=None) -> dict:
+        database.DB_PATH = Path(tempfile.mkdtemp()) / "probes.db"
+        database.init_database()
+        written = 0
+        for rows in batches:
+            devices = {int_to_mac(row[1]): epoch_to_utc_iso(row[0]) for row in rows}
+            fingerprints = {}
+            for row in rows:
+                if row[5] != NO_STABLE_IES:
+                    _, _, _, count = fingerprints.get(row[5], (0, 0, 0, 0))
+                    fingerprints[row[5]] = (row[5], None, epoch_to_utc_iso(row[0]), count + 1)
+            shed = []
+            if shedder is not None:
+                rows, shed = shedder.filter(rows)
+            written += len(rows)
+            log_sightings_batch(rows, list(devices.items()), list(fingerprints.values()), shed)
+
+        tables = {"written": written}
+        with database.get_cursor() as cursor:
+            for name, query in self.COMPARED.items():
+                cursor.execute(query)
+                tables[name] = sorted(map(tuple, cursor.fetchall()))
+        return tables
+
+    def test_counts_exact(self):
+        # Ten minutes of 40 chatty devices, with new ones turning up along the way
+        rng = random.Random(2)
+        stream = []
+        for minute in range(10):
+            for device in range(20 + 2 * minute):
+                for _ in range(rng.randint(5, 40)):
+                    ts = START + minute * 60 + rng.randrange(60)
+                    ssid = rng.choice(("Home", "Undirected Probe", "Cafe"))
+                    stream.append(sighting(ts, device, rng.randint(-90, -30), ssid))
+        stream.sort(key=lambda row: row[0])
+        batches = [stream[i : i + 256] for i in range(0, len(stream), 256)]
+
+        everything = self.write(batches)
+        shedder = LoadShedder()
+        shedder.level = 3
+        shed = self.write(batches, shedder)
+
+        self.assertLess(shed.pop("written"), everything.pop("written") / 2)
+        self.assertGreater(shedder.shed_total, 0)
+        for name in self.COMPARED:
+            with self.subTest(table=name):
+                self.assertEqual(shed[name], everything[name])
+
+
+if __name__ == "__main__":
+    unittest.main()
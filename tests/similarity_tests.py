@@ -0,0 +1,190 @@
+import unittest
+import os
+import random
+import sys
+import tempfile
+from pathlib import Path
+
+from fastapi.testclient import TestClient
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+from probe_sniffer.api.app import app
+from probe_sniffer.storage import database
+from probe_sniffer.storage.queries import create_device_identity, log_sightings_batch
+from probe_sniffer.storage.similarity import (
+    find_similar_fingerprints,
+    ie_features,
+    propose_identity_merges,
+    rebuild_similarity_index,
+)
+from probe_sniffer.utils import minhash
+
+START = 1759968000  # 2025-10-09 00:00:00 UTC
+
+
+def ie(ie_id: int, data: str) -> dict:
+    return {"id": ie_id, "len": len(data) // 2, "data": data}
+
+
+def phone_ies(ht_caps="ef0117ffff000000000000000000000000000000000000000000", changes=()) -> list:
+    """A plausible phone's probe request IEs, with some IEs replaced or added."""
+    ies = {
+        0: ie(0, "486f6d65"),
+        1: ie(1, "02040b16"),
+        50: ie(50, "0c12182430486c"),
+        3: ie(3, "06"),
+        45: ie(45, ht_caps),
+        127: ie(127, "0400000200000040"),
+        191: ie(191, "b2798933faff0c03faff0c03"),
+        221: ie(221, "0017f2000a0001"),
+    }
+    ies.update((value["id"], value) for value in changes)
+    return list(ies.values())
+
+
+def flip(hex_data: str, bit: int) -> str:
+    data = bytearray.fromhex(hex_data)
+    data[bit // 8] ^= 1 << bit % 8
+    return data.hex()
+
+
+class TestMinHash(unittest.TestCase):
+    def test_estimate(self):
+        # Within 4 standard errors of the exact similarity
+        rng = random.Random(0)
+        for shared in (10, 50, 90):
+            common = {f"c{rng.random()}" for _ in range(shared)}
+            a = common | {f"a{i}" for i in range(100 - shared)}
+            b = common | {f"b{i}" for i in range(100 - shared)}
+            exact = minhash.jaccard(a, b)
+            estimate = minhash.estimate(minhash.signature(a), minhash.signature(b))
+            with self.subTest(exact=exact):
+                self.assertLess(abs(estimate - exact), 4 * (0.25 / minhash.NUM_PERM) ** 0.5)
+
+    def test_pure_python_matches_numpy(self):
+        features = {f"feature{i}" for i in range(30)}
+        vectorized = minhash.signature(features)
+        signatures = [vectorized, minhash.signature(set(list(features)[:20]) | {"other"})]
+        pairs = [(0, 1), (1, 1)]
+        estimates = minhash.estimate_pairs(signatures, pairs)
+        numpy, minhash.np = minhash.np, None
+        try:
+            self.assertEqual(minhash.signature(features), vectorized)
+            self.assertEqual(minhash.estimate_pairs(signatures, pairs), estimates)
+        finally:
+            minhash.np = numpy
+        self.assertEqual(estimates[1], 1.0)
+        self.assertEqual(minhash.unpack(minhash.pack(vectorized)), vectorized)
+
+    def test_bands(self):
+        a = minhash.signature({"x", "y", "z"})
+        self.assertEqual(minhash.band_buckets(a), minhash.band_buckets(a))
+        self.assertEqual(len(minhash.band_buckets(a)), minhash.BANDS)
+
+
+class TestIEFeatures(unittest.TestCase):
+    def test_bit_flip_changes_one_feature(self):
+        base = phone_ies()
+        drifted = phone_ies(ht_caps=flip(base[4]["data"], 40))
+        self.assertEqual(ie_features(base) ^ ie_features(drifted), {"45:bit:40"})
+        self.assertGreater(minhash.jaccard(ie_features(base), ie_features(drifted)), 0.95)
+
+    def test_variable_ies_ignored(self):
+        # SSID, channel and vendor IE payloads don't change the features
+        other = phone_ies(changes=[ie(0, "576f726b"), ie(3, "0b"), ie(221, "0017f2000a0099")])
+        self.assertEqual(ie_features(phone_ies()), ie_features(other))
+        self.assertEqual(ie_features(None), set())
+        self.assertEqual(ie_features([ie(0, "486f6d65")]), set())
+
+
+class TestFingerprintSimilarity(unittest.TestCase):
+    def setUp(self):
+        self.original_path = database.DB_PATH
+        database.DB_PATH = Path(tempfile.mkdtemp()) / "probes.db"
+        database.init_database()
+
+        base = phone_ies()
+        self.fingerprints = {
+            "000000000000000a": base,
+            # One capability bit flipped
+            "000000000000000b": phone_ies(ht_caps=flip(base[4]["data"], 4)),
+            # OS update: a new IE and different extended capabilities
+            "000000000000000c": phone_ies(
+                changes=[ie(127, "0400080200000040"), ie(70, "7000000000")]
+            ),
+            # Another device entirely
+            "000000000000000d": [
+                ie(1, "8284"),
+                ie(45, "2c0103ff00000000000000000000000000000000000000000000"),
+                ie(221, "0050f204104a0001"),
+            ],
+        }
+        log_sightings_batch(
+            [],
+            [],
+            [
+                (fingerprint_id, ie_data, "2025-10-09 00:00:00", 1 + index)
+                for index, (fingerprint_id, ie_data) in enumerate(self.fingerprints.items())
+            ],
+        )
+
+    def tearDown(self):
+        database.DB_PATH = self.original_path
+
+    def index_rows(self):
+        with database.get_cursor() as cursor:
+            cursor.execute("SELECT * FROM fingerprint_signatures ORDER BY fingerprint_id")
+            signatures = [tuple(row) for row in cursor.fetchall()]
+            cursor.execute("SELECT * FROM fingerprint_lsh ORDER BY band, bucket, fingerprint_id")
+            return signatures, [tuple(row) for row in cursor.fetchall()]
+
+    def test_similar(self):
+        similar = find_similar_fingerprints("000000000000000a")
+        self.assertEqual(
+            [row["fingerprint_id"] for row in similar], ["000000000000000b", "000000000000000c"]
+        )
+        self.assertGreater(similar[0]["similarity"], 0.95)
+        self.assertEqual((similar[0]["removed"], similar[0]["added"]), ([], ["45:bit:4"]))
+        self.assertIn("70", similar[1]["added"])
+
+        self.assertEqual(len(find_similar_fingerprints("000000000000000a", limit=1)), 1)
+        self.assertEqual(find_similar_fingerprints("000000000000000a", min_similarity=1.0), [])
+        self.assertEqual(find_similar_fingerprints("000000000000000d"), [])
+        self.assertIsNone(find_similar_fingerprints("ffffffffffffffff"))
+
+    def test_route(self):
+        client = TestClient(app)
+        response = client.get("/fingerprints/000000000000000b/similar", params={"limit": 1})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["similar"][0]["fingerprint_id"], "000000000000000a")
+        self.assertEqual(client.get("/fingerprints/ffffffffffffffff/similar").status_code, 404)
+
+    def test_merge_proposals(self):
+        proposals = propose_identity_merges(threshold=0.8)
+        self.assertEqual(len(proposals), 1)
+        proposal = proposals[0]
+        ids = [fingerprint["fingerprint_id"] for fingerprint in proposal["fingerprints"]]
+        self.assertEqual(sorted(ids), ["000000000000000a", "000000000000000b", "000000000000000c"])
+        # Most sighted fingerprint names the new identity
+        self.assertEqual((proposal["identity_id"], proposal["identity_ids"]), (ids[2], []))
+        self.assertGreaterEqual(proposal["similarity"], 0.8)
+
+        # Once they are one identity there is nothing left to propose
+        create_device_identity("phone", fingerprint_ids=ids[:2])
+        proposal = propose_identity_merges(threshold=0.8)[0]
+        self.assertEqual((proposal["identity_id"], proposal["identity_ids"]), ("phone", ["phone"]))
+        create_device_identity("phone-2", fingerprint_ids=ids[2:])
+        self.assertEqual(len(propose_identity_merges(threshold=0.8)), 1)
+        with database.get_cursor() as cursor:
+            cursor.execute("UPDATE device_fingerprints SET identity_id = 'phone'")
+        self.assertEqual(propose_identity_merges(threshold=0.8), [])
+
+    def test_rebuild_matches_incremental(self):
+        incremental = self.index_rows()
+        self.assertEqual(len(incremental[0]), 4)
+        self.assertEqual(rebuild_similarity_index(), 4)
+        self.assertEqual(self.index_rows(), incremental)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,185 @@
+import unittest
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+from unittest import mock
+
+from scapy.all import Dot11, Dot11Elt, Dot11ProbeReq, RadioTap
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+os.environ.setdefault("LOG_PATH", os.path.join(tempfile.mkdtemp(), "sniffer.log"))
+from probe_sniffer.capture import flood, sniffer
+from probe_sniffer.capture.batch import ProbeBatch
+from probe_sniffer.storage import database
+from probe_sniffer.storage.queries import get_sightings
+from probe_sniffer.utils import mac_utils
+
+INTEL = 0x103D1CCF3D61
+PHONE = 0x103D1CCF3D62
+LAPTOP_FP = (0xAA).to_bytes(8, "big")
+PHONE_FP = (0xBB).to_bytes(8, "big")
+IES = [{"id": 1, "len": 1, "data": "82"}]
+
+
+def probe_packet(mac: str) -> RadioTap:
+    """A probe request for "Home" as captured (radiotap header included)."""
+    return RadioTap(
+        bytes(
+            RadioTap()
+            / Dot11(type=0, subtype=4, addr2=mac)
+            / Dot11ProbeReq()
+            / Dot11Elt(ID=0, info=b"Home")
+        )
+    )
+
+
+def total_sightings(mac: str) -> int | None:
+    with database.get_cursor() as cursor:
+        cursor.execute("SELECT total_sightings FROM device_summary WHERE mac = ?", (mac,))
+        row = cursor.fetchone()
+    return row and row[0]
+
+
+class TestWriteBatch(unittest.TestCase):
+    def setUp(self):
+        self.original_path = database.DB_PATH
+        database.DB_PATH = Path(tempfile.mkdtemp()) / "probes.db"
+        database.init_database()
+        self.batch = ProbeBatch(64, {0x103D1C: "Intel Corporate"}, set())
+        self.mqtt = mock.Mock()
+        self.notify = mock.patch.object(
+            sniffer.discord_notifier, "post_discord_notification"
+        ).start()
+        self.addCleanup(mock.patch.stopall)
+
+    def tearDown(self):
+        database.DB_PATH = self.original_path
+
+    def write(self, frames: list[tuple]) -> None:
+        """Buffer (ts, mac, fingerprint) frames, then process and write them as one batch."""
+        for ts, mac, fingerprint in frames:
+            self.batch.append(ts, mac, -50, 6, "Home", fingerprint, IES)
+        sniffer.write_batch(self.batch.process(), self.batch, logging.getLogger("TEST"), self.mqtt)
+
+    def notified(self) -> list[tuple[str, str]]:
+        calls = [(call.args[0]["fingerprint_id"], call.args[2]) for call in self.notify.mock_calls]
+        self.notify.reset_mock()
+        return calls
+
+    def test_new_device_burst(self):
+        # A new device's first probes arrive as a burst in one batch
+        now = int(time.time())
+        self.write([(now, INTEL, LAPTOP_FP), (now, INTEL, LAPTOP_FP), (now + 1, INTEL, LAPTOP_FP)])
+        self.assertEqual(self.notified(), [(f"{0xAA:016x}", "new")])
+        # Heard again a moment later: neither new nor returning
+        self.write([(now + 30, INTEL, LAPTOP_FP), (now + 31, INTEL, LAPTOP_FP)])
+        self.assertEqual(self.notified(), [])
+
+    def test_fully_shed_fingerprint(self):
+        now = int(time.time())
+        self.write([(now - 1200, PHONE, PHONE_FP)])
+        self.assertEqual(self.notified(), [(f"{0xBB:016x}", "new")])
+
+        # The phone returns, but the flood detector sheds every frame of it (none of the
+        # new laptop's): there's no probe to notify about
+        def check(ts, mac, oui, fingerprint_id, channel):
+            return flood.SHED if mac == PHONE else flood.KEEP
+
+        with mock.patch.object(sniffer.flood.detector, "check", side_effect=check):
+            self.write([(now + 5, PHONE, PHONE_FP), (now + 5, INTEL, LAPTOP_FP)])
+        self.assertEqual(self.notified(), [(f"{0xAA:016x}", "new")])
+        # Only the phone's first frame was stored
+        self.assertEqual(get_sightings(mac="10:3d:1c:cf:3d:62")[1], 1)
+
+    def test_flood(self):
+        detector = flood.FloodDetector(
+            min_rate=5, sample_every=1000, on_alert=[].append, exempt=flood.definitely_new
+        )
+        mock.patch.object(sniffer.flood, "detector", detector).start()
+        now = int(time.time())
+        phones = [PHONE + i for i in range(30)]  # Sharing a fingerprint
+        self.write([(now - 1200, mac, PHONE_FP) for mac in phones])
+        self.notified()
+
+        # The known phones flood, and a laptop is heard for the first time in the middle
+        # of it: the laptop is kept and notifies, the phones' shed frames are counted
+        flooding = [(now, mac, PHONE_FP) for mac in phones]
+        self.write(flooding[:15] + [(now, INTEL, LAPTOP_FP)] + flooding[15:])
+        self.assertEqual(self.notified(), [(f"{0xAA:016x}", "new")])
+        self.assertGreater(detector.shed_total, 20)
+        self.assertEqual(get_sightings(mac="10:3d:1c:cf:3d:61")[1], 1)
+        macs = [mac_utils.int_to_mac(mac) for mac in phones]
+        self.assertEqual(sum(total_sightings(mac) for mac in macs), 60)
+        self.assertLess(sum(get_sightings(mac=mac)[1] for mac in macs), 40)
+
+
+class TestPacketHandler(unittest.TestCase):
+    def setUp(self):
+        self.original_path = database.DB_PATH
+        database.DB_PATH = Path(tempfile.mkdtemp()) / "probes.db"
+        database.init_database()
+        mock.patch.object(sniffer, "connect_mqtt").start()
+        self.addCleanup(mock.patch.stopall)
+
+    def tearDown(self):
+        database.DB_PATH = self.original_path
+
+    def test_flood_shed_probes_are_counted(self):
+        mock.patch.object(sniffer.flood.detector, "check", return_value=flood.SHED).start()
+        clock = mock.patch.object(sniffer.time, "time").start()
+        handler = sniffer.create_packet_handler(logging.getLogger("TEST"))
+        minute = int(time.time()) // 60 * 60
+        for ts in (minute, minute + 10, minute + 59):
+            clock.return_value = ts
+            handler(probe_packet("10:3d:1c:cf:3d:62"))
+        # Stored as one aggregate when the next minute starts
+        self.assertIsNone(total_sightings("10:3d:1c:cf:3d:62"))
+        clock.return_value = minute + 60
+        handler(probe_packet("10:3d:1c:cf:3d:62"))
+        self.assertEqual(total_sightings("10:3d:1c:cf:3d:62"), 3)
+        self.assertEqual(get_sightings(mac="10:3d:1c:cf:3d:62")[1], 0)
+
+
+class TestOuiLookup(unittest.TestCase):
+    def test_shipped_oui_file(self):
+        original_path = database.DB_PATH
+        database.DB_PATH = Path(tempfile.mkdtemp()) / "probes.db"
+        try:
+            database.init_database()
+            sniffer.build_oui_lookup()
+        finally:
+            database.DB_PATH = original_path
+        self.assertEqual(sniffer.OUIMEM[0x103D1C], "Intel Corporate")
+        self.assertEqual(sniffer.OUIMEM[0x00000C], "Cisco Systems, Inc")
+        # Only whole 24-bit OUIs are kept
+        self.assertLess(max(sniffer.OUIMEM), 1 << 24)
+
+
+class TestBatchWriter(unittest.TestCase):
+    def test_writer_survives_a_failed_batch(self):
+        packet = probe_packet("10:3d:1c:cf:3d:61")
+        written = threading.Semaphore(0)
+
+        def write_batch(*args):
+            written.release()
+            if write.call_count == 1:
+                raise RuntimeError("database is locked")
+
+        mock.patch.object(sniffer, "connect_mqtt").start()
+        write = mock.patch.object(sniffer, "write_batch", side_effect=write_batch).start()
+        self.addCleanup(mock.patch.stopall)
+        with self.assertLogs("GENERAL", level="ERROR"):
+            handler = sniffer.create_batch_handler(logging.getLogger("TEST"), 1)
+            handler(packet)
+            self.assertTrue(written.acquire(timeout=5))
+            # The writer thread is still there for the next batch
+            handler(packet)
+            self.assertTrue(written.acquire(timeout=5))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,219 @@
+import unittest
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+from fastapi.testclient import TestClient
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+from probe_sniffer import config
+from probe_sniffer.api.app import app
+from probe_sniffer.storage import database
+from probe_sniffer.storage.queries import log_sightings_batch
+from probe_sniffer.storage.ssid_index import (
+    find_ssid_overlap,
+    get_ssid_devices,
+    get_ssid_fingerprints,
+    rebuild_ssid_index,
+    search_ssids,
+    ssid_similarity,
+)
+
+START = 1759968000  # 2025-10-09 00:00:00 UTC
+PHONE = "00000000000000aa"
+LAPTOP = "00000000000000bb"
+
+# MAC -> SSIDs it probes for
+REMEMBERED = {
+    1: ["Home", "Work", "Gym"],
+    2: ["Home", "Work", "Cafe"],
+    3: ["Home", "Cafe"],
+    4: ["Airport WiFi", "Work"],
+    5: [],
+}
+
+
+def mac(number: int) -> str:
+    return f"00:00:00:00:00:{number:02x}"
+
+
+def write(rows: list[tuple], shed=()) -> None:
+    fingerprints = {row[5] for row in rows} | {row[4] for row in shed}
+    devices = {row[1] for row in rows} | {row[1] for row in shed}
+    log_sightings_batch(
+        rows,
+        [(mac(number), "2025-10-09 00:00:00") for number in sorted(devices)],
+        [(fid, None, "2025-10-09 00:00:00", 1) for fid in sorted(fingerprints)],
+        shed,
+    )
+
+
+def probes(offset: int = 0) -> list[tuple]:
+    rows = []
+    for number, ssids in REMEMBERED.items():
+        fingerprint = PHONE if number % 2 else LAPTOP
+        for i, ssid in enumerate(ssids + ["Undirected Probe"]):
+            rows.append((START + offset + i, number, -50, ssid, "Apple, Inc.", fingerprint, 6))
+    return rows
+
+
+class TestSsidIndex(unittest.TestCase):
+    def setUp(self):
+        self.original_path = database.DB_PATH
+        database.DB_PATH = Path(tempfile.mkdtemp()) / "probes.db"
+        database.init_database()
+        write(probes())
+
+    def tearDown(self):
+        database.DB_PATH = self.original_path
+
+    def postings(self) -> list[tuple]:
+        with database.get_cursor() as cursor:
+            cursor.execute("SELECT * FROM ssid_devices ORDER BY ssid_id, mac")
+            postings = [tuple(row) for row in cursor.fetchall()]
+            cursor.execute("SELECT ssid, device_count FROM ssids ORDER BY ssid")
+            return postings + [tuple(row) for row in cursor.fetchall()]
+
+    def test_postings(self):
+        write(probes(60))
+        shed = [(START + 120, 3, "Gym", "Apple, Inc.", LAPTOP, 4, 4, -200, -50, -50)]
+        write([], shed=shed)
+
+        home = get_ssid_devices(["Home"])
+        self.assertEqual(home["total"], 3)
+        self.assertEqual([device["mac"] for device in home["devices"]], [mac(1), mac(2), mac(3)])
+        self.assertEqual(home["devices"][0]["sightings"], 2)
+        gym = get_ssid_devices(["Gym"])["devices"]
+        # Shed frames count, and only tell the minute they were heard in
+        self.assertEqual(
+            [(device["mac"], device["sightings"], device["first_seen"]) for device in gym],
+            [(mac(3), 4, "2025-10-09 00:02:00"), (mac(1), 2, "2025-10-09 00:00:02")],
+        )
+        with database.get_cursor() as cursor:
+            cursor.execute(
+                "SELECT device_count FROM ssids WHERE ssid IN ('Gym', 'Undirected Probe')"
+            )
+            self.assertEqual(sorted(row[0] for row in cursor.fetchall()), [0, 2])
+
+    def test_intersection(self):
+        both = get_ssid_devices(["Home", "Work"])
+        # Both last heard at the same time
+        self.assertEqual([device["mac"] for device in both["devices"]], [mac(1), mac(2)])
+        self.assertEqual(both["devices"][0]["matched"], 2)
+
+        any_two = get_ssid_devices(["Home", "Work", "Cafe"], min_match=2)
+        self.assertEqual(any_two["total"], 3)
+        self.assertEqual(
+            get_ssid_devices(["Home", "Work", "Cafe"], min_match=2, offset=3)["total"], 3
+        )
+        page = get_ssid_devices(["Home", "Work", "Cafe"], min_match=2, limit=1, offset=1)
+        self.assertEqual((page["total"], len(page["devices"])), (3, 1))
+
+        # Unknown and undirected SSIDs match nothing
+        self.assertEqual(get_ssid_devices(["Home", "Nowhere"])["total"], 0)
+        self.assertEqual(get_ssid_devices(["Home", "Nowhere"], min_match=1)["total"], 3)
+        self.assertEqual(get_ssid_devices(["Undirected Probe"])["total"], 0)
+        with self.assertRaises(ValueError):
+            get_ssid_devices(["Home"], min_match=2)
+
+    def test_overlap_and_similarity(self):
+        overlap = find_ssid_overlap(mac(1))
+        self.assertEqual(
+            [(device["mac"], device["shared"], device["similarity"]) for device in overlap],
+            [(mac(2), 2, 0.5)],
+        )
+        self.assertEqual(overlap[0]["shared_ssids"], ["Home", "Work"])
+        self.assertEqual(len(find_ssid_overlap(mac(1), min_shared=1)), 3)
+        self.assertEqual(find_ssid_overlap(mac(5)), [])
+        self.assertIsNone(find_ssid_overlap(mac(9)))
+
+        # SSIDs probed for by too many devices don't bring in candidates
+        original = config.SSID_OVERLAP_MAX_DEVICES
+        config.SSID_OVERLAP_MAX_DEVICES = 2
+        try:
+            self.assertEqual([device["mac"] for device in find_ssid_overlap(mac(3))], [mac(2)])
+        finally:
+            config.SSID_OVERLAP_MAX_DEVICES = original
+
+        similarity = ssid_similarity(mac(1), mac(3).upper())
+        self.assertEqual(
+            (similarity["similarity"], similarity["shared"], similarity["only_b"]),
+            (0.25, ["Home"], ["Cafe"]),
+        )
+        self.assertEqual(ssid_similarity(mac(5), mac(5))["similarity"], 0.0)
+        self.assertIsNone(ssid_similarity(mac(1), mac(9)))
+
+    def test_fingerprints(self):
+        fingerprints = get_ssid_fingerprints("Home")
+        self.assertEqual(
+            [fingerprint["fingerprint_id"] for fingerprint in fingerprints], [PHONE, LAPTOP]
+        )
+        self.assertEqual([row["fingerprint_id"] for row in get_ssid_fingerprints("Gym")], [PHONE])
+        self.assertIsNone(get_ssid_fingerprints("Nowhere"))
+
+    def test_search(self):
+        def names(text):
+            return [row["ssid"] for row in search_ssids(text)]
+
+        for fts in (True, False):
+            if not fts:
+                with database.get_cursor() as cursor:
+                    cursor.execute("DROP TRIGGER IF EXISTS ssids_search_insert")
+                    cursor.execute("DROP TABLE IF EXISTS ssid_search")
+            with self.subTest(fts=fts):
+                # Most probed-for first
+                self.assertEqual(
+                    search_ssids("h")[0],
+                    {"ssid": "Home", "device_count": 3, "fingerprint_count": 2},
+                )
+                self.assertEqual(names("Airport"), ["Airport WiFi"])
+                self.assertEqual(names("zzz"), [])
+                self.assertEqual(names("undirected"), [])
+                self.assertEqual(names("%"), [])
+        self.assertEqual(names("WOR"), ["Work"])
+        write([(START + 600, 6, -50, "New Net", "Apple, Inc.", PHONE, 6)])
+        self.assertEqual(names("new"), ["New Net"])
+
+    def test_word_search(self):
+        write([(START + 600, 6, -50, "Guest-5G Home", "Apple, Inc.", PHONE, 6)])
+        self.assertEqual([row["ssid"] for row in search_ssids("5g ho")], ["Guest-5G Home"])
+
+    def test_rebuild_matches_incremental(self):
+        write(probes(60))
+        incremental = self.postings()
+        with database.get_cursor() as cursor:
+            cursor.execute("DELETE FROM ssid_devices")
+            cursor.execute("UPDATE ssids SET device_count = 0")
+        self.assertEqual(rebuild_ssid_index(), 10)
+        self.assertEqual(self.postings(), incremental)
+
+    def test_routes(self):
+        client = TestClient(app)
+        response = client.get("/ssids/devices", params={"ssid": ["Home", "Cafe"]})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([device["mac"] for device in response.json()["devices"]], [mac(2), mac(3)])
+        response = client.get("/ssids/devices", params={"ssid": ["Home"], "min_match": 2})
+        self.assertEqual(response.status_code, 400)
+
+        self.assertEqual(
+            client.get("/ssids/search", params={"q": "ca"}).json()["ssids"][0]["ssid"], "Cafe"
+        )
+        fingerprints = client.get("/ssids/fingerprints", params={"ssid": "Gym"}).json()
+        self.assertEqual(fingerprints["fingerprints"][0]["fingerprint_id"], PHONE)
+        self.assertEqual(
+            client.get("/ssids/fingerprints", params={"ssid": "Nowhere"}).status_code, 404
+        )
+
+        overlap = client.get("/ssids/overlap", params={"mac": mac(2)}).json()
+        self.assertEqual([device["mac"] for device in overlap["devices"]], [mac(3), mac(1)])
+        self.assertEqual(client.get("/ssids/overlap", params={"mac": "nope"}).status_code, 400)
+        similarity = client.get("/ssids/similarity", params={"a": mac(1), "b": mac(2)}).json()
+        self.assertEqual(similarity["similarity"], 0.5)
+        self.assertEqual(
+            client.get("/ssids/similarity", params={"a": mac(1), "b": mac(9)}).status_code, 404
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,156 @@
+import unittest
+import os
+import random
+import sys
+from collections import Counter
+from unittest import mock
+
+from fastapi.testclient import TestClient
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+from probe_sniffer import config, heavy_hitters, ipc
+from probe_sniffer.api.app import app
+from probe_sniffer.heavy_hitters import HeavyHitters
+from probe_sniffer.storage.queries import should_notify_fingerprint
+from probe_sniffer.utils.topk import SlidingTopK, SpaceSaving
+
+TS = 1760000000
+
+
+def zipf_stream(n: int, keys: int, seed: int = 0) -> list[str]:
+    rng = random.Random(seed)
+    weights = [1 / (rank + 1) for rank in range(keys)]
+    return rng.choices([f"key{rank}" for rank in range(keys)], weights, k=n)
+
+
+class TestSpaceSaving(unittest.TestCase):
+    def test_count_bounds(self):
+        stream = zipf_stream(20_000, 2_000)
+        exact = Counter(stream)
+        summary = SpaceSaving(100)
+        for key in stream:
+            summary.add(key)
+
+        self.assertEqual(len(summary.counts), 100)
+        self.assertEqual(sum(summary.counts.values()), len(stream))
+        for key, count, error in summary.top(100):
+            self.assertLessEqual(count - error, exact[key])
+            self.assertLessEqual(exact[key], count)
+        # Everything seen more than n / capacity times is tracked
+        for key, count in exact.items():
+            if count > len(stream) / 100:
+                self.assertIn(key, summary.counts)
+        # The true top 10 come out on top
+        self.assertEqual(
+            {key for key, *_ in summary.top(10)}, {key for key, _ in exact.most_common(10)}
+        )
+
+    def test_weighted_adds(self):
+        summary = SpaceSaving(2)
+        summary.add("a", 5)
+        summary.add("b", 3)
+        summary.add("c", 1)  # Replaces b, inheriting its count as error
+        self.assertEqual(summary.top(2), [("a", 5, 0), ("c", 4, 3)])
+        self.assertEqual(summary.floor(), 4)
+
+
+class TestSlidingTopK(unittest.TestCase):
+    def test_window_slides(self):
+        window = SlidingTopK(3600, 12, 50)
+        for minute in range(60):
+            window.add("early", TS + minute * 60, 2)
+        self.assertEqual(window.top(5, TS + 60 * 60 - 1), [("early", 120, 0)])
+        for minute in range(60, 120):
+            window.add("late", TS + minute * 60, 2)
+        top = dict((key, count) for key, count, _ in window.top(5, TS + 120 * 60 - 1))
+        self.assertEqual(top["late"], 120)
+        # Only the slice the window starts in still holds early traffic
+        self.assertLessEqual(top.get("early", 0), 2 * 5)
+        # Memory is bounded by the slices in the window
+        self.assertLessEqual(len(window.slices), 13)
+
+    def test_merged_error_bounds(self):
+        stream = zipf_stream(30_000, 3_000, seed=1)
+        window = SlidingTopK(3600, 12, 100)
+        exact = Counter()
+        for i, key in enumerate(stream):
+            ts = TS + i * 7200 // len(stream)  # Two hours, so half of it has expired
+            window.add(key, ts)
+            if ts - ts % 300 + 300 > TS + 7199 - 3600:  # In a live slice
+                exact[key] += 1
+        for key, count, error in window.top(20, TS + 7199):
+            self.assertLessEqual(abs(exact[key] - count), error)
+        self.assertEqual(window.top(1, TS + 7199)[0][0], exact.most_common(1)[0][0])
+
+
+def sighting(ts, ssid="Home", oui="Apple", fingerprint="00000000000000aa"):
+    return (ts, 0x020000000001, -60, ssid, oui, fingerprint, 6)
+
+
+class TestHeavyHitters(unittest.TestCase):
+    def test_dimensions_and_windows(self):
+        tracker = HeavyHitters(capacity=20)
+        tracker.add_sightings(
+            [sighting(TS)] * 3
+            + [sighting(TS, ssid="Undirected Probe", fingerprint="no_stable_ies")]
+            + [sighting(TS + 600, ssid="Work", oui="Dell")]
+        )
+        now = TS + 601
+        self.assertEqual(tracker.top("ssid", "1h", 5, now), [("Home", 3, 0), ("Work", 1, 0)])
+        self.assertEqual(tracker.top("ssid", "5m", 5, now), [("Work", 1, 0)])
+        self.assertEqual(tracker.top("oui", "24h", 5, now), [("Apple", 4, 0), ("Dell", 1, 0)])
+        self.assertEqual(tracker.top("fingerprint", "24h", 5, now), [("00000000000000aa", 4, 0)])
+
+        snapshot = tracker.make_snapshot(now)
+        self.assertEqual(snapshot["windows"]["1h"]["ssid"][0], ("Home", 3, 0))
+
+    def test_is_noisy(self):
+        tracker = HeavyHitters(capacity=50)
+        tracker.warm_up([("00000000000000aa", TS - 3600, config.NOTIFY_NOISY_MIN_SIGHTINGS)])
+        tracker.add_sightings([sighting(TS, fingerprint="00000000000000bb")] * 5)
+        self.assertTrue(tracker.is_noisy("00000000000000aa", TS))
+        self.assertFalse(tracker.is_noisy("00000000000000bb", TS))
+        # A day later the neighbour's device has dropped out of the window
+        self.assertFalse(tracker.is_noisy("00000000000000aa", TS + 86400 + 3600))
+
+    def test_spam_filter(self):
+        tracker = HeavyHitters(capacity=50)
+        tracker.add_sightings([sighting(TS)] * config.NOTIFY_NOISY_MIN_SIGHTINGS)
+        returning = {
+            "fingerprint_id": "00000000000000aa",
+            "sighting_count": 50,
+            "last_seen": "2020-01-01 00:00:00",
+        }
+        with mock.patch.object(heavy_hitters, "tracker", tracker):
+            with mock.patch("time.time", return_value=TS):
+                self.assertEqual(should_notify_fingerprint(returning), (False, ""))
+                quiet = {**returning, "fingerprint_id": "00000000000000bb"}
+                self.assertEqual(should_notify_fingerprint(quiet), (True, "returning"))
+                # Seen over 100 times in total no longer blocks a returning device
+                self.assertEqual(
+                    should_notify_fingerprint({**quiet, "sighting_count": 500}),
+                    (True, "returning"),
+                )
+
+    def test_snapshot_replaces_pending(self):
+        client = ipc.IpcClient(path="/nonexistent")
+        client.publish_top({"ts": 1})
+        client.publish_top({"ts": 2})
+        self.assertEqual(list(client.latest.values()), [ipc.encode_frame(ipc.TOP, b'{"ts":2}')])
+        self.assertEqual(len(client.messages), 0)
+
+    def test_route(self):
+        tracker = HeavyHitters(capacity=20)
+        tracker.add_sightings([sighting(TS)] * 3 + [sighting(TS, ssid="Work")])
+        api_tracker = HeavyHitters()
+        with mock.patch("probe_sniffer.api.routes.stats.tracker", api_tracker):
+            client = TestClient(app)
+            self.assertEqual(client.get("/stats/top").json()["items"], [])
+            api_tracker.receive_snapshot(ipc.encode_json(tracker.make_snapshot(TS + 1)))
+            body = client.get("/stats/top", params={"dimension": "ssid", "limit": 1}).json()
+            self.assertEqual(body["items"], [{"key": "Home", "count": 3, "error": 0}])
+            self.assertEqual(body["updated_at"], "2025-10-09 08:53:21")
+
+
+if __name__ == "__main__":
+    unittest.main()
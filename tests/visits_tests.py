@@ -0,0 +1,78 @@
+import unittest
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+from probe_sniffer.models.probe import Probe
+from probe_sniffer.storage import database
+from probe_sniffer.storage.queries import get_devices_present, get_visits, log_sightings_batch
+from probe_sniffer.storage.visits import rebuild_visits
+
+TS = 1760000000  # 2025-10-09 08:53:20 UTC
+PHONE = 0x0200000000AA
+LAPTOP = 0x0200000000BB
+
+
+def visit_rows() -> list[dict]:
+    with database.get_cursor() as cursor:
+        cursor.execute("SELECT * FROM visits ORDER BY mac, start_ts")
+        return [{k: row[k] for k in row.keys() if k != "visit_id"} for row in cursor.fetchall()]
+
+
+class TestVisits(unittest.TestCase):
+    def setUp(self):
+        self.original_path = database.DB_PATH
+        database.DB_PATH = Path(tempfile.mkdtemp()) / "probes.db"
+        database.init_database()
+
+        # Phone: two bursts 10 minutes apart (two visits with the default 300s gap)
+        # Laptop: one sighting per minute for 5 minutes (one visit)
+        batches = [
+            [(TS, PHONE, -60, "Home"), (TS + 30, PHONE, -40, "Work"), (TS, LAPTOP, -70, "Home")],
+            [(TS + 60 * i, LAPTOP, -70, "Home") for i in range(1, 5)],
+            [(TS + 630, PHONE, -50, "Home")],
+        ]
+        for batch in batches:
+            log_sightings_batch(
+                [
+                    Probe(ts, dbm, 6, mac, ssid=ssid).sighting_params()
+                    for ts, mac, dbm, ssid in batch
+                ],
+                [],
+                [],
+            )
+
+    def tearDown(self):
+        database.DB_PATH = self.original_path
+
+    def test_incremental_sessionization(self):
+        visits = get_visits(mac="02:00:00:00:00:aa")
+        self.assertEqual([v["frame_count"] for v in visits], [1, 2])
+        first = visits[1]
+        self.assertEqual(first["duration_seconds"], 30)
+        self.assertEqual((first["min_dbm"], first["max_dbm"], first["avg_dbm"]), (-60, -40, -50))
+        self.assertEqual(first["ssids"], ["Home", "Work"])
+
+        laptop = get_visits(mac="02:00:00:00:00:bb")
+        self.assertEqual(len(laptop), 1)
+        self.assertEqual((laptop[0]["frame_count"], laptop[0]["duration_seconds"]), (5, 240))
+
+    def test_rebuild_matches_incremental(self):
+        incremental = visit_rows()
+        self.assertEqual(rebuild_visits(), 3)
+        self.assertEqual(visit_rows(), incremental)
+
+    def test_rebuild_with_other_gap(self):
+        self.assertEqual(rebuild_visits(idle_gap=3600), 2)
+
+    def test_devices_present(self):
+        present = get_devices_present(TS + 400, TS + 700)
+        self.assertEqual([d["mac"] for d in present], ["02:00:00:00:00:aa"])
+        self.assertEqual(len(get_devices_present(TS + 10, TS + 20)), 2)
+        self.assertEqual(get_devices_present(TS + 700, TS + 800), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
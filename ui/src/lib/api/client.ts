@@ -36,6 +36,7 @@ export interface Device {
 	oui?: string | null;
 	ssids?: string[];
 	total_sightings?: number;
+	last_dbm?: number | null;
 }
 
 export interface DeviceWithStats extends Device {
@@ -51,27 +52,75 @@ export interface Sighting {
 	dbm: number;
 	ssid: string | null;
 	oui: string | null;
+	ie_fingerprint?: string | null;
+	identity_id?: string | null;
+	channel?: number | null;
+}
+
+// Live /ws/probes message: a sighting that has not been assigned row ids yet
+export type LiveProbe = Omit<Sighting, 'id' | 'identity_id'>;
+
+export interface LiveFilter {
+	hide_trusted?: boolean;
+	oui?: string | null;
+	min_dbm?: number | null;
+}
+
+export const LIVE_FEED_URL = `${API_BASE.replace(/^http/, 'ws')}/ws/probes`;
+
+export interface SightingFilters {
+	mac?: string;
+	since?: string;
+	until?: string;
+	min_dbm?: number;
+	max_dbm?: number;
+	oui?: string;
+	ssid?: string;
+	fingerprint?: string;
+	identity?: string;
+	channel?: number;
+	randomized?: boolean;
 }
 
 export interface SightingsResponse {
 	sightings: Sighting[];
 	total: number;
+	total_is_approximate?: boolean;
 	limit: number;
 	offset: number;
+	next_cursor?: string | null;
+	prev_cursor?: string | null;
+}
+
+export interface ActivityBucket {
+	start: string;
+	count: number;
+	avg_dbm: number | null;
+	min_dbm: number | null;
+	max_dbm: number | null;
 }
 
 export interface DeviceActivity {
+	resolution: 'minute' | 'hour' | 'day';
+	buckets: ActivityBucket[];
 	by_hour: number[]; // 24 values
-	by_day_of_week: number[]; // 7 values
+	by_day_of_week: number[]; // 7 values, Monday first
 	by_date: Record<string, number>; // Last 30 days
 }
 
 export interface OverviewStats {
 	total_devices: number;
+	total_sightings: number;
+	total_fingerprints: number;
 	new_today: number;
 	new_this_week: number;
 	trusted_count: number;
 	unknown_count: number;
+	devices_today: number; // Unique devices seen today
+	devices_this_week: number;
+	new_fingerprints_today: number;
+	new_fingerprints_this_week: number;
+	sightings_today: number;
 	most_active_today: {
 		mac: string;
 		name: string | null;
@@ -81,7 +130,12 @@ export interface OverviewStats {
 		oui: string;
 		count: number;
 	}>;
-	probes_by_hour: number[]; // Last 24h
+	top_ssids: Array<{
+		ssid: string;
+		count: number;
+	}>;
+	probes_by_hour: number[]; // Last 24h, oldest first
+	probes_per_minute: number[]; // Last 60 minutes, oldest first
 }
 
 export interface DeviceIdentity {
@@ -111,16 +165,27 @@ export interface FingerprintWithDetails extends Fingerprint {
 export interface FingerprintsResponse {
 	fingerprints: Fingerprint[];
 	total: number;
+	total_is_approximate?: boolean;
 	limit: number;
 	offset: number;
+	next_cursor?: string | null;
+	prev_cursor?: string | null;
 }
 
 export const api = {
 	// Devices
-	async getDevices(filters: { is_trusted?: boolean } = {}): Promise<Device[]> {
+	async getDevices(
+		filters: {
+			is_trusted?: boolean;
+			limit?: number;
+			offset?: number;
+			sort?: 'last_seen' | 'first_seen' | 'name' | 'mac' | 'total_sightings' | 'avg_signal_dbm';
+			order?: 'ASC' | 'DESC';
+		} = {}
+	): Promise<Device[]> {
 		const params = new URLSearchParams();
-		if (filters.is_trusted !== undefined) {
-			params.set('is_trusted', String(filters.is_trusted));
+		for (const [key, value] of Object.entries(filters)) {
+			if (value !== undefined) params.set(key, String(value));
 		}
 		const queryString = params.toString();
 		const url = queryString ? `${API_BASE}/devices/?${queryString}` : `${API_BASE}/devices/`;
@@ -148,7 +213,7 @@ export const api = {
 		return res.json();
 	},
 
-	// Activity (NEW - not implemented yet)
+	// Activity
 	async getDeviceActivity(mac: string): Promise<DeviceActivity> {
 		const res = await fetch(`${API_BASE}/devices/${mac}/activity`);
 		if (!res.ok) throw new Error('Failed to fetch device activity');
@@ -156,17 +221,18 @@ export const api = {
 	},
 
 	// Sightings
-	async getSightings(params: {
-		mac?: string;
-		limit?: number;
-		offset?: number;
-		order?: 'ASC' | 'DESC';
-	}): Promise<SightingsResponse> {
+	async getSightings(
+		params: SightingFilters & {
+			limit?: number;
+			offset?: number;
+			order?: 'ASC' | 'DESC';
+			cursor?: string;
+		}
+	): Promise<SightingsResponse> {
 		const searchParams = new URLSearchParams();
-		if (params.mac) searchParams.set('mac', params.mac);
-		if (params.limit) searchParams.set('limit', String(params.limit));
-		if (params.offset) searchParams.set('offset', String(params.offset));
-		if (params.order) searchParams.set('order', params.order);
+		for (const [key, value] of Object.entries(params)) {
+			if (value !== undefined && value !== '') searchParams.set(key, String(value));
+		}
 
 		const res = await fetch(`${API_BASE}/sightings?${searchParams}`);
 		if (!res.ok) throw new Error('Failed to fetch sightings');
@@ -179,7 +245,7 @@ export const api = {
 		return res.json();
 	},
 
-	// Stats (NEW - not implemented yet)
+	// Stats
 	async getOverviewStats(): Promise<OverviewStats> {
 		const res = await fetch(`${API_BASE}/stats/overview`);
 		if (!res.ok) throw new Error('Failed to fetch overview stats');
@@ -224,10 +290,13 @@ export const api = {
 	},
 
 	// Fingerprints
-	async getFingerprints(params: { limit?: number; offset?: number } = {}): Promise<FingerprintsResponse> {
+	async getFingerprints(
+		params: { limit?: number; offset?: number; cursor?: string } = {}
+	): Promise<FingerprintsResponse> {
 		const searchParams = new URLSearchParams();
 		if (params.limit) searchParams.set('limit', String(params.limit));
 		if (params.offset) searchParams.set('offset', String(params.offset));
+		if (params.cursor) searchParams.set('cursor', params.cursor);
 
 		const res = await fetch(`${API_BASE}/fingerprints?${searchParams}`);
 		if (!res.ok) throw new Error('Failed to fetch fingerprints');
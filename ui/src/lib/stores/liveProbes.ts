@@ -2,11 +2,11 @@
  * Svelte store for live probe feed
  */
 
-import { writable } from 'svelte/store';
-import type { Sighting } from '$lib/api/client';
+import { get, writable } from 'svelte/store';
+import { LIVE_FEED_URL, type LiveFilter, type LiveProbe } from '$lib/api/client';
 
 // Live probe stream (last 100)
-export const liveProbes = writable<Sighting[]>([]);
+export const liveProbes = writable<LiveProbe[]>([]);
 
 // Toggle to hide trusted devices in live feed
 export const hideTrusted = writable<boolean>(true);
@@ -18,7 +18,7 @@ export const wsConnected = writable<boolean>(false);
  * Add a new probe to the beginning of the list
  * Keeps only the last 100 probes
  */
-export function addProbe(probe: Sighting) {
+export function addProbe(probe: LiveProbe) {
 	liveProbes.update((probes) => {
 		const updated = [probe, ...probes];
 		return updated.slice(0, 100);
@@ -31,3 +31,41 @@ export function addProbe(probe: Sighting) {
 export function clearProbes() {
 	liveProbes.set([]);
 }
+
+/**
+ * Open the /ws/probes feed, reconnecting after drops
+ * Filters run server-side; hideTrusted changes are sent without reconnecting
+ * Returns a function that closes the feed
+ */
+export function connectLiveFeed(filter: LiveFilter = {}): () => void {
+	let socket: WebSocket | null = null;
+	let closed = false;
+	const current = () => ({ ...filter, hide_trusted: get(hideTrusted) });
+
+	const open = () => {
+		socket = new WebSocket(LIVE_FEED_URL);
+		socket.onopen = () => {
+			wsConnected.set(true);
+			socket?.send(JSON.stringify(current()));
+		};
+		socket.onmessage = (event) => {
+			const message = JSON.parse(event.data);
+			if (!('error' in message)) addProbe(message);
+		};
+		socket.onclose = () => {
+			wsConnected.set(false);
+			if (!closed) setTimeout(open, 2000);
+		};
+	};
+
+	const unsubscribe = hideTrusted.subscribe(() => {
+		if (socket?.readyState === WebSocket.OPEN) socket.send(JSON.stringify(current()));
+	});
+	open();
+
+	return () => {
+		closed = true;
+		unsubscribe();
+		socket?.close();
+	};
+}